@@ -6,10 +6,11 @@ from typing import Optional
 
 from fastapi import Depends, HTTPException, WebSocket, WebSocketException, status
 from fastapi.security import OAuth2PasswordBearer
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
 from app.auth.jwt import decode_token
-from app.db.database import get_db
+from app.db.database import AsyncSessionLocal, get_db
 from app.db.models import User, UserRole
 
 # OAuth2 scheme for token authentication
@@ -141,15 +142,18 @@ def get_current_admin_user(current_user: User = Depends(get_current_user)) -> Us
 
 
 async def get_current_user_websocket(
-    websocket: WebSocket, token: Optional[str] = None, db: Session = Depends(get_db)
+    websocket: WebSocket, token: Optional[str] = None, db: Optional[AsyncSession] = None
 ) -> Optional[User]:
     """
     Get the current authenticated user for WebSocket connections.
 
+    The user lookup runs on an async session so authenticating a socket does
+    not block the event loop.
+
     Args:
         websocket: WebSocket connection
         token: JWT token (from query params or headers)
-        db: Database session
+        db: Optional async database session; a new one is opened if omitted
 
     Returns:
         User object if authenticated, None otherwise
@@ -190,7 +194,11 @@ async def get_current_user_websocket(
             )
 
         # Get user from database
-        user = db.query(User).filter(User.id == user_id).first()
+        if db is None:
+            async with AsyncSessionLocal() as session:
+                user = await session.get(User, int(user_id))
+        else:
+            user = await db.get(User, int(user_id))
         if user is None:
             raise WebSocketException(
                 code=status.WS_1008_POLICY_VIOLATION, reason="User not found"
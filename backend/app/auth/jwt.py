@@ -2,6 +2,7 @@
 JWT authentication module.
 """
 
+import hashlib
 import os
 import uuid
 from datetime import datetime, timedelta
@@ -17,8 +18,9 @@ ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", "30"))
 REFRESH_TOKEN_EXPIRE_DAYS = int(os.getenv("REFRESH_TOKEN_EXPIRE_DAYS", "7"))
 
-# Password hashing
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# Password hashing; hashes with a different cost factor are upgraded on login
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=BCRYPT_ROUNDS)
 
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
@@ -79,7 +81,9 @@ def create_access_token(
 
 
 def create_refresh_token(
-    data: Dict[str, Any], expires_delta: Optional[timedelta] = None
+    data: Dict[str, Any],
+    expires_delta: Optional[timedelta] = None,
+    family_id: Optional[str] = None,
 ) -> str:
     """
     Create a JWT refresh token.
@@ -87,6 +91,7 @@ def create_refresh_token(
     Args:
         data: Data to encode in the token
         expires_delta: Token expiration time
+        family_id: Rotation family the token belongs to (new family if omitted)
 
     Returns:
         JWT token string
@@ -102,12 +107,26 @@ def create_refresh_token(
     to_encode.update({
         "exp": expire,
         "type": "refresh",
-        "jti": str(uuid.uuid4())  # JWT ID for uniqueness
+        "jti": str(uuid.uuid4()),  # JWT ID for uniqueness
+        "fid": family_id or str(uuid.uuid4()),  # Rotation family
     })
 
     return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
 
 
+def hash_token_id(jti: str) -> str:
+    """
+    Hash a token's JWT ID for storage.
+
+    Args:
+        jti: JWT ID claim
+
+    Returns:
+        Hex-encoded SHA-256 digest
+    """
+    return hashlib.sha256(jti.encode("utf-8")).hexdigest()
+
+
 def decode_token(token: str) -> Dict[str, Any]:
     """
     Decode a JWT token.
@@ -0,0 +1,231 @@
+"""
+Bounded worker pool for password hashing.
+
+bcrypt costs roughly 250ms of CPU per hash or verification. Running it
+inline in request handlers blocks the event loop (``async def`` handlers)
+or lets a login storm occupy every threadpool worker and saturate the CPU.
+PasswordHasher runs hashing on a small dedicated thread pool (bcrypt
+releases the GIL, so threads give real parallelism without pickling
+overhead) and bounds how many operations may be queued; beyond that,
+callers get PasswordHasherOverloaded and should answer 503.
+
+Configuration:
+- PASSWORD_HASH_WORKERS: worker threads (default: min(4, CPU count))
+- PASSWORD_HASH_MAX_PENDING: queued + running operations allowed (default 64)
+- BCRYPT_ROUNDS: bcrypt cost factor; see app.auth.jwt
+"""
+
+import asyncio
+import logging
+import os
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from app.auth.jwt import pwd_context
+
+logger = logging.getLogger(__name__)
+
+
+class PasswordHasherOverloaded(RuntimeError):
+    """Raised when too many password hashing operations are pending."""
+
+
+class PasswordHasher:
+    """Dispatches password hashing to a bounded thread pool."""
+
+    def __init__(self, max_workers: Optional[int] = None, max_pending: int = 64):
+        """
+        Initialize the password hasher.
+
+        Args:
+            max_workers: Number of hashing threads
+            max_pending: Maximum number of queued plus running operations
+        """
+        self.max_workers = max_workers or min(4, os.cpu_count() or 1)
+        self.max_pending = max_pending
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._running = 0
+        self.stats = {
+            "submitted": 0,
+            "completed": 0,
+            "rejected": 0,
+            "rehashed": 0,
+            "max_queue_depth": 0,
+            "total_wait_ms": 0.0,
+            "total_hash_ms": 0.0,
+        }
+
+    # ===== SUBMISSION =====
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(
+                        max_workers=self.max_workers, thread_name_prefix="password-hash"
+                    )
+        return self._executor
+
+    def _submit(self, func: Callable[..., Any], *args: Any) -> Future:
+        """Submit a hashing call, rejecting it if the queue is full."""
+        with self._lock:
+            if self._pending >= self.max_pending:
+                self.stats["rejected"] += 1
+                raise PasswordHasherOverloaded(
+                    f"Password hashing queue is full ({self._pending} pending)"
+                )
+            self._pending += 1
+            self.stats["submitted"] += 1
+            self.stats["max_queue_depth"] = max(
+                self.stats["max_queue_depth"], self._pending - self._running
+            )
+
+        submitted_at = time.perf_counter()
+
+        def run():
+            started_at = time.perf_counter()
+            with self._lock:
+                self._running += 1
+                self.stats["total_wait_ms"] += (started_at - submitted_at) * 1000
+            try:
+                return func(*args)
+            finally:
+                finished_at = time.perf_counter()
+                with self._lock:
+                    self._running -= 1
+                    self._pending -= 1
+                    self.stats["completed"] += 1
+                    self.stats["total_hash_ms"] += (finished_at - started_at) * 1000
+
+        try:
+            return self._get_executor().submit(run)
+        except Exception:
+            with self._lock:
+                self._pending -= 1
+            raise
+
+    # ===== ASYNC API (event loop callers) =====
+
+    async def hash(self, password: str) -> str:
+        """
+        Hash a password without blocking the event loop.
+
+        Args:
+            password: Plain text password
+
+        Returns:
+            Hashed password
+        """
+        return await asyncio.wrap_future(self._submit(pwd_context.hash, password))
+
+    async def verify(self, password: str, hashed_password: str) -> bool:
+        """
+        Verify a password without blocking the event loop.
+
+        Args:
+            password: Plain text password
+            hashed_password: Stored hash
+
+        Returns:
+            True if password matches hash, False otherwise
+        """
+        return await asyncio.wrap_future(
+            self._submit(pwd_context.verify, password, hashed_password)
+        )
+
+    async def verify_and_update(
+        self, password: str, hashed_password: str
+    ) -> Tuple[bool, Optional[str]]:
+        """
+        Verify a password and rehash it if the stored hash is outdated.
+
+        Args:
+            password: Plain text password
+            hashed_password: Stored hash
+
+        Returns:
+            Tuple of (valid, new hash or None if no rehash is needed)
+        """
+        return self._count_rehash(
+            await asyncio.wrap_future(
+                self._submit(pwd_context.verify_and_update, password, hashed_password)
+            )
+        )
+
+    # ===== SYNC API (threadpool callers) =====
+
+    def hash_sync(self, password: str) -> str:
+        """Hash a password on the pool, blocking the calling (worker) thread."""
+        return self._submit(pwd_context.hash, password).result()
+
+    def verify_and_update_sync(
+        self, password: str, hashed_password: str
+    ) -> Tuple[bool, Optional[str]]:
+        """Verify and possibly rehash on the pool, blocking the calling (worker) thread."""
+        return self._count_rehash(
+            self._submit(
+                pwd_context.verify_and_update, password, hashed_password
+            ).result()
+        )
+
+    def _count_rehash(
+        self, result: Tuple[bool, Optional[str]]
+    ) -> Tuple[bool, Optional[str]]:
+        if result[1] is not None:
+            with self._lock:
+                self.stats["rehashed"] += 1
+        return result
+
+    # ===== METRICS =====
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Get pool and queue statistics.
+
+        Returns:
+            Dictionary with queue depth, throughput and timing statistics
+        """
+        with self._lock:
+            stats = dict(self.stats)
+            completed = stats["completed"]
+            stats.update(
+                {
+                    "max_workers": self.max_workers,
+                    "max_pending": self.max_pending,
+                    "running": self._running,
+                    "queue_depth": self._pending - self._running,
+                    "avg_wait_ms": round(stats["total_wait_ms"] / completed, 2)
+                    if completed
+                    else 0.0,
+                    "avg_hash_ms": round(stats["total_hash_ms"] / completed, 2)
+                    if completed
+                    else 0.0,
+                }
+            )
+        return stats
+
+    def shutdown(self) -> None:
+        """Stop the worker threads after pending operations finish."""
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+
+# Global password hasher instance
+_password_hasher: Optional[PasswordHasher] = None
+
+
+def get_password_hasher() -> PasswordHasher:
+    """Get the global password hasher instance."""
+    global _password_hasher
+    if _password_hasher is None:
+        workers = os.getenv("PASSWORD_HASH_WORKERS")
+        _password_hasher = PasswordHasher(
+            max_workers=int(workers) if workers else None,
+            max_pending=int(os.getenv("PASSWORD_HASH_MAX_PENDING", "64")),
+        )
+    return _password_hasher
@@ -0,0 +1,396 @@
+"""
+Refresh token storage, rotation and revocation.
+
+Refresh tokens are stored as the SHA-256 hash of their ``jti`` claim plus a
+rotation family ID, never as the full JWT. Rotating a token revokes it and
+issues its successor in a single transaction, guarded by a conditional
+UPDATE so a token can only be rotated once. Presenting an already rotated
+token revokes its whole family (token replay).
+
+Revoked token IDs and families are kept in a denylist until the token would
+have expired anyway, so replayed tokens are rejected without a database
+round-trip. The denylist lives in memory and, with
+``TOKEN_DENYLIST_BACKEND=redis``, is shared through Redis between workers.
+A background job purges expired token rows so the table stays small.
+"""
+
+import asyncio
+import logging
+import math
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from fastapi import HTTPException, status
+from sqlalchemy import delete, select, update
+from sqlalchemy.orm import Session
+
+from app.auth.jwt import (
+    REFRESH_TOKEN_EXPIRE_DAYS,
+    create_refresh_token,
+    decode_token,
+    hash_token_id,
+)
+from app.db.models import Token as TokenModel
+from app.db.models import User as UserModel
+
+logger = logging.getLogger(__name__)
+
+DENYLIST_KEY_PREFIX = "token_denylist:"
+
+
+def _credentials_error(detail: str) -> HTTPException:
+    """Build the 401 error returned for unusable refresh tokens."""
+    return HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail=detail,
+        headers={"WWW-Authenticate": "Bearer"},
+    )
+
+
+class TokenDenylist:
+    """Revoked token IDs and families, each kept until its token expires."""
+
+    def __init__(self, redis_url: Optional[str] = None, max_entries: int = 100000):
+        """
+        Initialize the denylist.
+
+        Args:
+            redis_url: Optional Redis URL used to share entries between workers
+            max_entries: Maximum number of in-memory entries
+        """
+        self.max_entries = max_entries
+        self._entries: Dict[str, float] = {}
+        self._lock = threading.Lock()
+        self._redis = None
+
+        if redis_url:
+            try:
+                import redis
+
+                self._redis = redis.Redis.from_url(
+                    redis_url, socket_timeout=0.5, socket_connect_timeout=0.5
+                )
+            except Exception as e:
+                logger.warning(f"Token denylist falling back to memory only: {e}")
+
+    def add(self, key: str, expires_at: float) -> None:
+        """
+        Deny a token ID or family until ``expires_at``.
+
+        Args:
+            key: Hashed token ID or ``family:<id>``
+            expires_at: Unix timestamp after which the entry is no longer needed
+        """
+        ttl = expires_at - time.time()
+        if ttl <= 0:
+            return
+
+        with self._lock:
+            self._entries[key] = expires_at
+            if len(self._entries) > self.max_entries:
+                self._purge_locked(time.time())
+                # Still full: drop the entries closest to expiry
+                while len(self._entries) > self.max_entries:
+                    oldest = min(self._entries, key=self._entries.get)
+                    del self._entries[oldest]
+
+        if self._redis is not None:
+            try:
+                self._redis.setex(f"{DENYLIST_KEY_PREFIX}{key}", math.ceil(ttl), "1")
+            except Exception as e:
+                logger.warning(f"Failed to write token denylist entry to Redis: {e}")
+
+    def contains(self, key: str) -> bool:
+        """
+        Check whether a token ID or family is denied.
+
+        Args:
+            key: Hashed token ID or ``family:<id>``
+
+        Returns:
+            True if the key is denied
+        """
+        now = time.time()
+        with self._lock:
+            expires_at = self._entries.get(key)
+            if expires_at is not None:
+                if expires_at > now:
+                    return True
+                del self._entries[key]
+
+        if self._redis is not None:
+            try:
+                return bool(self._redis.exists(f"{DENYLIST_KEY_PREFIX}{key}"))
+            except Exception as e:
+                logger.warning(f"Failed to read token denylist from Redis: {e}")
+        return False
+
+    def purge_expired(self) -> int:
+        """
+        Drop expired in-memory entries (Redis expires its own).
+
+        Returns:
+            Number of entries removed
+        """
+        with self._lock:
+            return self._purge_locked(time.time())
+
+    def _purge_locked(self, now: float) -> int:
+        expired = [
+            key for key, expires_at in self._entries.items() if expires_at <= now
+        ]
+        for key in expired:
+            del self._entries[key]
+        return len(expired)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class RefreshTokenStore:
+    """Issues, rotates and revokes refresh tokens."""
+
+    def __init__(
+        self,
+        denylist: Optional[TokenDenylist] = None,
+        session_factory: Optional[Callable[[], Session]] = None,
+        purge_interval: float = 3600.0,
+    ):
+        """
+        Initialize the refresh token store.
+
+        Args:
+            denylist: Revocation denylist (in-memory if omitted)
+            session_factory: Callable returning a new database session for the purge job
+            purge_interval: Seconds between purges of expired token rows
+        """
+        self.denylist = denylist or TokenDenylist()
+        self._session_factory = session_factory
+        self.purge_interval = purge_interval
+        self._task: Optional[asyncio.Task] = None
+
+    def issue(
+        self, db: Session, user: UserModel, family_id: Optional[str] = None
+    ) -> str:
+        """
+        Create a refresh token and add its row to the session (not committed).
+
+        Args:
+            db: Database session
+            user: Token owner
+            family_id: Rotation family to join (new family if omitted)
+
+        Returns:
+            Encoded refresh token
+        """
+        token = create_refresh_token(
+            data={"sub": str(user.id), "username": user.username, "role": user.role},
+            expires_delta=timedelta(days=REFRESH_TOKEN_EXPIRE_DAYS),
+            family_id=family_id,
+        )
+        payload = decode_token(token)
+        db.add(
+            TokenModel(
+                jti_hash=hash_token_id(payload["jti"]),
+                family_id=payload["fid"],
+                user_id=user.id,
+                expires_at=datetime.utcfromtimestamp(payload["exp"]),
+            )
+        )
+        return token
+
+    def rotate(self, db: Session, payload: Dict[str, Any]) -> Tuple[UserModel, str]:
+        """
+        Revoke a refresh token and issue its successor in one transaction.
+
+        Args:
+            db: Database session
+            payload: Decoded and signature-checked refresh token payload
+
+        Returns:
+            Tuple of (token owner, new refresh token)
+
+        Raises:
+            HTTPException: If the token is unknown, revoked or its owner is inactive
+        """
+        jti = payload.get("jti")
+        if not jti:
+            raise _credentials_error("Invalid token payload")
+        jti_hash = hash_token_id(jti)
+        family_id = payload.get("fid")
+        user_id = payload.get("sub")
+
+        if self.denylist.contains(jti_hash) or (
+            family_id and self.denylist.contains(f"family:{family_id}")
+        ):
+            raise _credentials_error("Invalid or revoked token")
+
+        # Compare-and-set: only one request can rotate a given token
+        revoked = db.execute(
+            update(TokenModel)
+            .where(
+                TokenModel.jti_hash == jti_hash,
+                TokenModel.user_id == user_id,
+                TokenModel.is_revoked == False,
+            )
+            .values(is_revoked=True)
+            .execution_options(synchronize_session=False)
+        ).rowcount
+        if revoked != 1:
+            db.rollback()
+            self._handle_reuse(db, jti_hash, user_id)
+            raise _credentials_error("Invalid or revoked token")
+
+        user = db.get(UserModel, user_id)
+        if not user or not user.is_active:
+            db.rollback()
+            raise _credentials_error("User not found or inactive")
+
+        new_token = self.issue(db, user, family_id=family_id)
+        db.commit()
+
+        self.denylist.add(jti_hash, payload.get("exp", 0))
+        return user, new_token
+
+    def _handle_reuse(self, db: Session, jti_hash: str, user_id: Any) -> None:
+        """Revoke the whole family if an already rotated token is presented again."""
+        family_id = db.scalar(
+            select(TokenModel.family_id).where(
+                TokenModel.jti_hash == jti_hash,
+                TokenModel.user_id == user_id,
+                TokenModel.is_revoked == True,
+            )
+        )
+        if family_id is None:
+            return
+
+        db.execute(
+            update(TokenModel)
+            .where(TokenModel.family_id == family_id, TokenModel.is_revoked == False)
+            .values(is_revoked=True)
+            .execution_options(synchronize_session=False)
+        )
+        db.commit()
+
+        family_expiry = datetime.utcnow() + timedelta(days=REFRESH_TOKEN_EXPIRE_DAYS)
+        self.denylist.add(f"family:{family_id}", family_expiry.timestamp())
+        logger.warning(
+            f"Refresh token reuse detected for user {user_id}; revoked token family {family_id}"
+        )
+
+    def revoke(self, db: Session, payload: Dict[str, Any], user_id: int) -> bool:
+        """
+        Revoke a single refresh token (e.g. on logout).
+
+        Args:
+            db: Database session
+            payload: Decoded refresh token payload
+            user_id: ID of the user the token must belong to
+
+        Returns:
+            True if an active token was revoked
+        """
+        jti = payload.get("jti")
+        if not jti or payload.get("type") != "refresh":
+            return False
+        jti_hash = hash_token_id(jti)
+
+        revoked = db.execute(
+            update(TokenModel)
+            .where(
+                TokenModel.jti_hash == jti_hash,
+                TokenModel.user_id == user_id,
+                TokenModel.is_revoked == False,
+            )
+            .values(is_revoked=True)
+            .execution_options(synchronize_session=False)
+        ).rowcount
+        db.commit()
+
+        if revoked:
+            self.denylist.add(jti_hash, payload.get("exp", 0))
+        return revoked == 1
+
+    def purge_expired(self, db: Optional[Session] = None) -> int:
+        """
+        Delete expired token rows and expired denylist entries.
+
+        Args:
+            db: Optional database session; a new one is created if omitted
+
+        Returns:
+            Number of token rows deleted
+        """
+        owns_session = db is None
+        if owns_session:
+            db = self._new_session()
+
+        try:
+            deleted = db.execute(
+                delete(TokenModel)
+                .where(TokenModel.expires_at < datetime.utcnow())
+                .execution_options(synchronize_session=False)
+            ).rowcount
+            db.commit()
+        finally:
+            if owns_session:
+                db.close()
+
+        self.denylist.purge_expired()
+        if deleted:
+            logger.info(f"Purged {deleted} expired refresh tokens")
+        return deleted
+
+    # ===== BACKGROUND PURGE =====
+
+    def _new_session(self) -> Session:
+        """Create a database session for the purge job."""
+        if self._session_factory is None:
+            from app.db.database import SessionLocal
+
+            self._session_factory = SessionLocal
+        return self._session_factory()
+
+    async def _purge_periodically(self) -> None:
+        """Purge expired tokens every ``purge_interval`` seconds."""
+        while True:
+            try:
+                await asyncio.to_thread(self.purge_expired)
+            except Exception as e:
+                logger.error(f"Error purging expired refresh tokens: {e}")
+            await asyncio.sleep(self.purge_interval)
+
+    def start(self) -> None:
+        """Start the background purge loop on the running event loop."""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._purge_periodically())
+
+    async def stop(self) -> None:
+        """Stop the background purge loop."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+# Global refresh token store instance
+_refresh_token_store: Optional[RefreshTokenStore] = None
+
+
+def get_refresh_token_store() -> RefreshTokenStore:
+    """Get the global refresh token store instance."""
+    global _refresh_token_store
+    if _refresh_token_store is None:
+        redis_url = None
+        if os.getenv("TOKEN_DENYLIST_BACKEND", "memory").lower() == "redis":
+            redis_url = os.getenv("REDIS_URL", "redis://localhost:6379")
+        _refresh_token_store = RefreshTokenStore(
+            denylist=TokenDenylist(redis_url=redis_url)
+        )
+    return _refresh_token_store
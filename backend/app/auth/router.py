@@ -13,12 +13,8 @@ from sqlalchemy.orm import Session
 from app.auth.dependencies import get_current_user
 from app.auth.jwt import (
     ACCESS_TOKEN_EXPIRE_MINUTES,
-    REFRESH_TOKEN_EXPIRE_DAYS,
     create_access_token,
-    create_refresh_token,
     decode_token,
-    get_password_hash,
-    verify_password,
 )
 from app.auth.models import (
     EmailVerificationConfirm,
@@ -34,9 +30,10 @@ from app.auth.models import (
     UserUpdate,
     UserUpdateAdmin,
 )
+from app.auth.password_hasher import PasswordHasherOverloaded, get_password_hasher
+from app.auth.refresh_tokens import get_refresh_token_store
 from app.db.database import get_db
 from app.db.models import EmailVerificationToken, PasswordResetToken
-from app.db.models import Token as TokenModel
 from app.db.models import User as UserModel
 from app.db.models import UserRole
 from app.email.service import get_email_service
@@ -168,7 +165,7 @@ async def register_user(user_in: UserCreate, db: Session = Depends(get_db)) -> A
     db_user = UserModel(
         username=user_in.username,
         email=user_in.email,
-        hashed_password=get_password_hash(user_in.password),
+        hashed_password=await _hash_password(user_in.password),
         full_name=user_in.full_name,
         is_email_verified=False,  # Require email verification
     )
@@ -221,13 +218,21 @@ def login(login_data: LoginRequest, db: Session = Depends(get_db)) -> Any:
             headers={"WWW-Authenticate": "Bearer"},
         )
 
-    # Verify password
-    if not verify_password(login_data.password, user.hashed_password):
+    # Verify password on the hashing pool, upgrading outdated hashes
+    try:
+        valid, new_hash = get_password_hasher().verify_and_update_sync(
+            login_data.password, user.hashed_password
+        )
+    except PasswordHasherOverloaded:
+        raise _hasher_overloaded_error()
+    if not valid:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid username/email or password",
             headers={"WWW-Authenticate": "Bearer"},
         )
+    if new_hash:
+        user.hashed_password = new_hash
 
     # Create access token
     access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
@@ -236,21 +241,8 @@ def login(login_data: LoginRequest, db: Session = Depends(get_db)) -> Any:
         expires_delta=access_token_expires,
     )
 
-    # Create refresh token
-    refresh_token_expires = timedelta(days=REFRESH_TOKEN_EXPIRE_DAYS)
-    refresh_token = create_refresh_token(
-        data={"sub": str(user.id), "username": user.username, "role": user.role},
-        expires_delta=refresh_token_expires,
-    )
-
-    # Store refresh token in database
-    token_expires = datetime.utcnow() + refresh_token_expires
-    db_token = TokenModel(
-        token=refresh_token,
-        user_id=user.id,
-        expires_at=token_expires,
-    )
-    db.add(db_token)
+    # Create refresh token (stored as a hashed jti)
+    refresh_token = get_refresh_token_store().issue(db, user)
     db.commit()
 
     return {
@@ -296,31 +288,8 @@ def refresh_token(refresh_data: RefreshRequest, db: Session = Depends(get_db)) -
                 headers={"WWW-Authenticate": "Bearer"},
             )
 
-        # Check if token exists in database
-        db_token = (
-            db.query(TokenModel)
-            .filter(
-                TokenModel.token == refresh_data.refresh_token,
-                TokenModel.user_id == user_id,
-                TokenModel.is_revoked == False,
-            )
-            .first()
-        )
-        if not db_token:
-            raise HTTPException(
-                status_code=status.HTTP_401_UNAUTHORIZED,
-                detail="Invalid or revoked token",
-                headers={"WWW-Authenticate": "Bearer"},
-            )
-
-        # Get user from database
-        user = db.query(UserModel).filter(UserModel.id == user_id).first()
-        if not user or not user.is_active:
-            raise HTTPException(
-                status_code=status.HTTP_401_UNAUTHORIZED,
-                detail="User not found or inactive",
-                headers={"WWW-Authenticate": "Bearer"},
-            )
+        # Revoke the token and issue its successor in one transaction
+        user, new_refresh_token = get_refresh_token_store().rotate(db, payload)
 
         # Create new access token
         access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
@@ -329,27 +298,6 @@ def refresh_token(refresh_data: RefreshRequest, db: Session = Depends(get_db)) -
             expires_delta=access_token_expires,
         )
 
-        # Revoke old refresh token first
-        db_token.is_revoked = True
-        db.commit()  # Commit the revocation first
-
-        # Create new refresh token
-        refresh_token_expires = timedelta(days=REFRESH_TOKEN_EXPIRE_DAYS)
-        new_refresh_token = create_refresh_token(
-            data={"sub": str(user.id), "username": user.username, "role": user.role},
-            expires_delta=refresh_token_expires,
-        )
-
-        # Store new refresh token in database
-        token_expires = datetime.utcnow() + refresh_token_expires
-        new_db_token = TokenModel(
-            token=new_refresh_token,
-            user_id=user.id,
-            expires_at=token_expires,
-        )
-        db.add(new_db_token)
-        db.commit()
-
         return {
             "access_token": access_token,
             "refresh_token": new_refresh_token,
@@ -386,27 +334,18 @@ def logout(
     Raises:
         HTTPException: If refresh token is invalid
     """
-    # Find token in database
-    db_token = (
-        db.query(TokenModel)
-        .filter(
-            TokenModel.token == refresh_data.refresh_token,
-            TokenModel.user_id == current_user.id,
-            TokenModel.is_revoked == False,
-        )
-        .first()
-    )
+    # Revoke token
+    try:
+        payload = decode_token(refresh_data.refresh_token)
+    except HTTPException:
+        payload = {}
 
-    if not db_token:
+    if not get_refresh_token_store().revoke(db, payload, current_user.id):
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Invalid or already revoked token",
         )
 
-    # Revoke token
-    db_token.is_revoked = True
-    db.commit()
-
     return {"detail": "Successfully logged out"}
 
 
@@ -500,7 +439,7 @@ def confirm_password_reset(
         )
 
     # Update user password
-    user.hashed_password = get_password_hash(reset_confirm.new_password)
+    user.hashed_password = _hash_password_sync(reset_confirm.new_password)
 
     # Mark token as used
     reset_token.is_used = True
@@ -559,7 +498,7 @@ def update_user_me(
     if user_in.full_name:
         current_user.full_name = user_in.full_name
     if user_in.password:
-        current_user.hashed_password = get_password_hash(user_in.password)
+        current_user.hashed_password = _hash_password_sync(user_in.password)
 
     db.add(current_user)
     db.commit()
@@ -655,6 +594,31 @@ async def confirm_email_verification(
 
 
 # Helper functions
+def _hasher_overloaded_error() -> HTTPException:
+    """Build the error returned when the password hashing pool is saturated."""
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail="Authentication service busy, please retry",
+        headers={"Retry-After": "1"},
+    )
+
+
+async def _hash_password(password: str) -> str:
+    """Hash a password on the hashing pool from an async handler."""
+    try:
+        return await get_password_hasher().hash(password)
+    except PasswordHasherOverloaded:
+        raise _hasher_overloaded_error()
+
+
+def _hash_password_sync(password: str) -> str:
+    """Hash a password on the hashing pool from a threadpool handler."""
+    try:
+        return get_password_hasher().hash_sync(password)
+    except PasswordHasherOverloaded:
+        raise _hasher_overloaded_error()
+
+
 async def _send_email_verification(user: UserModel, db: Session) -> None:
     """Send email verification email."""
     try:
@@ -1,27 +1,66 @@
 """
 Database connection module.
+
+Provides a synchronous engine/session for regular request handlers and
+background jobs, and an asyncio engine/session (aiosqlite/asyncpg) for hot
+read paths served from ``async def`` handlers, so those queries do not block
+the event loop. Both engines are built by DatabaseOptimizationService, which
+owns pool sizing and SQLite tuning (WAL, synchronous=NORMAL, mmap, cache and
+busy timeout).
 """
 
 import os
-from typing import Generator
+from typing import Any, AsyncGenerator, Dict, Generator
+
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
 
-from sqlalchemy import create_engine
-from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from app.services.database_optimization import get_db_optimization_service
 
 # Get database URL from environment variable or use SQLite as default
 SQLALCHEMY_DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./dockerdeployer.db")
 
-# Create engine with appropriate parameters
-if SQLALCHEMY_DATABASE_URL.startswith("sqlite"):
-    engine = create_engine(
-        SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False}
-    )
-else:
-    engine = create_engine(SQLALCHEMY_DATABASE_URL)
+# Async driver for each synchronous URL scheme
+ASYNC_DRIVERS = {
+    "sqlite": "sqlite+aiosqlite",
+    "postgresql": "postgresql+asyncpg",
+    "postgres": "postgresql+asyncpg",
+    "mysql": "mysql+aiomysql",
+}
+
+
+def get_async_database_url(database_url: str) -> str:
+    """
+    Convert a synchronous database URL to its asyncio driver equivalent.
+
+    Args:
+        database_url: Synchronous database URL (e.g. ``sqlite:///./app.db``)
+
+    Returns:
+        Database URL using an asyncio driver (e.g. ``sqlite+aiosqlite:///./app.db``)
+    """
+    scheme, sep, rest = database_url.partition("://")
+    dialect = scheme.split("+", 1)[0]
+    if dialect not in ASYNC_DRIVERS:
+        raise ValueError(f"No async driver configured for database dialect: {dialect}")
+    return f"{ASYNC_DRIVERS[dialect]}{sep}{rest}"
+
+
+# Create engines through the optimization service (pooling and PRAGMAs are
+# configured per dialect; see app/services/database_optimization.py)
+db_optimizer = get_db_optimization_service(SQLALCHEMY_DATABASE_URL)
+engine = db_optimizer.create_optimized_engine()
 
 # Create session factory
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+SessionLocal = db_optimizer.SessionLocal
+
+# Create async engine
+ASYNC_SQLALCHEMY_DATABASE_URL = get_async_database_url(SQLALCHEMY_DATABASE_URL)
+async_engine = db_optimizer.create_optimized_async_engine(ASYNC_SQLALCHEMY_DATABASE_URL)
+
+# Create async session factory
+AsyncSessionLocal = async_sessionmaker(
+    bind=async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False
+)
 
 # Import Base from models to avoid circular imports
 from app.db.models import Base
@@ -41,6 +80,17 @@ def get_db() -> Generator:
         db.close()
 
 
+async def get_async_db() -> AsyncGenerator[AsyncSession, None]:
+    """
+    Get asyncio database session.
+
+    Yields:
+        Async database session
+    """
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
 def get_database_url() -> str:
     """
     Get database URL.
@@ -51,6 +101,16 @@ def get_database_url() -> str:
     return SQLALCHEMY_DATABASE_URL
 
 
+def get_pool_stats() -> Dict[str, Any]:
+    """
+    Get live connection pool statistics for the application engine.
+
+    Returns:
+        Dictionary with pool and connection statistics
+    """
+    return db_optimizer.get_connection_stats()
+
+
 def init_db() -> None:
     """
     Initialize database by creating all tables.
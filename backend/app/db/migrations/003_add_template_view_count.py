@@ -0,0 +1,44 @@
+"""
+Migration: Add template view counter
+
+This migration adds a view_count column to the marketplace_templates table.
+Views are counted through the buffered TemplateCounterBuffer and flushed in
+batches, alongside the existing downloads counter.
+
+Created: 2024-06-XX
+"""
+
+from sqlalchemy import text
+
+from app.db.database import engine
+
+
+def upgrade():
+    """Apply the migration."""
+    print("🔄 Running migration: Add template view counter...")
+
+    with engine.connect() as connection:
+        try:
+            connection.execute(
+                text(
+                    """
+                ALTER TABLE marketplace_templates
+                ADD COLUMN view_count INTEGER NOT NULL DEFAULT 0
+            """
+                )
+            )
+            print("✅ Added view_count column")
+
+            connection.commit()
+            print("✅ Migration completed successfully")
+
+        except Exception as e:
+            print(f"❌ Migration failed: {e}")
+            connection.rollback()
+            raise
+
+
+def downgrade():
+    """Reverse the migration."""
+    print("🔄 Reversing migration: Remove template view counter...")
+    print("⚠️ Downgrade not supported for SQLite - would require table recreation")
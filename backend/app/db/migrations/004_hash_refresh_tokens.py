@@ -0,0 +1,103 @@
+"""
+Migration: Store refresh tokens as hashed JWT IDs
+
+This migration replaces the full refresh token string stored in the tokens
+table with the SHA-256 hash of the token's jti claim and a rotation family
+ID. Existing unexpired tokens are converted in place (each becomes its own
+family); expired rows are deleted. An index on expires_at supports the
+periodic purge of expired tokens.
+
+Created: 2024-06-XX
+"""
+
+import uuid
+from datetime import datetime
+
+import jwt
+from sqlalchemy import text
+
+from app.auth.jwt import hash_token_id
+from app.db.database import engine
+
+
+def upgrade():
+    """Apply the migration."""
+    print("🔄 Running migration: Store refresh tokens as hashed JWT IDs...")
+
+    with engine.connect() as connection:
+        try:
+            connection.execute(
+                text("DELETE FROM tokens WHERE expires_at < :now"),
+                {"now": datetime.utcnow()},
+            )
+            print("✅ Deleted expired tokens")
+
+            connection.execute(
+                text("ALTER TABLE tokens ADD COLUMN jti_hash VARCHAR(64)")
+            )
+            connection.execute(
+                text("ALTER TABLE tokens ADD COLUMN family_id VARCHAR(36)")
+            )
+            print("✅ Added jti_hash and family_id columns")
+
+            rows = connection.execute(text("SELECT id, token FROM tokens")).fetchall()
+            converted = 0
+            for token_id, token in rows:
+                try:
+                    payload = jwt.decode(token, options={"verify_signature": False})
+                    jti = payload["jti"]
+                except Exception:
+                    connection.execute(
+                        text("DELETE FROM tokens WHERE id = :id"), {"id": token_id}
+                    )
+                    continue
+
+                connection.execute(
+                    text(
+                        "UPDATE tokens SET jti_hash = :jti_hash, family_id = :family_id WHERE id = :id"
+                    ),
+                    {
+                        "jti_hash": hash_token_id(jti),
+                        "family_id": str(uuid.uuid4()),
+                        "id": token_id,
+                    },
+                )
+                converted += 1
+            print(f"✅ Converted {converted} refresh tokens")
+
+            connection.execute(text("DROP INDEX IF EXISTS ix_tokens_token"))
+            connection.execute(text("ALTER TABLE tokens DROP COLUMN token"))
+            print("✅ Dropped token column")
+
+            connection.execute(
+                text(
+                    "CREATE UNIQUE INDEX IF NOT EXISTS ix_tokens_jti_hash ON tokens (jti_hash)"
+                )
+            )
+            connection.execute(
+                text(
+                    "CREATE INDEX IF NOT EXISTS ix_tokens_family_id ON tokens (family_id)"
+                )
+            )
+            connection.execute(
+                text(
+                    "CREATE INDEX IF NOT EXISTS ix_tokens_expires_at ON tokens (expires_at)"
+                )
+            )
+            print("✅ Created jti_hash, family_id and expires_at indexes")
+
+            connection.commit()
+            print("✅ Migration completed successfully")
+
+        except Exception as e:
+            print(f"❌ Migration failed: {e}")
+            connection.rollback()
+            raise
+
+
+def downgrade():
+    """Reverse the migration."""
+    print("🔄 Reversing migration: Store refresh tokens as hashed JWT IDs...")
+    print(
+        "⚠️ Downgrade not supported - full token strings cannot be recovered from hashes"
+    )
@@ -0,0 +1,78 @@
+"""
+Migration: Add alert rule options
+
+This migration adds rule options evaluated by the alert rule engine to the
+metrics_alerts table:
+- rule_type: "threshold" (compare the value) or "rate" (compare the per-second change)
+- hysteresis: Margin the value must clear past the threshold before resolving
+- for_samples: Consecutive matching samples required before the alert fires
+
+Created: 2024-06-XX
+"""
+
+from sqlalchemy import text
+
+from app.db.database import engine
+
+
+def upgrade():
+    """Apply the migration."""
+    print("🔄 Running migration: Add alert rule options...")
+
+    with engine.connect() as connection:
+        try:
+            connection.execute(
+                text(
+                    "ALTER TABLE metrics_alerts "
+                    "ADD COLUMN rule_type VARCHAR NOT NULL DEFAULT 'threshold'"
+                )
+            )
+            print("✅ Added rule_type column")
+
+            connection.execute(
+                text(
+                    "ALTER TABLE metrics_alerts ADD COLUMN hysteresis FLOAT NOT NULL DEFAULT 0"
+                )
+            )
+            print("✅ Added hysteresis column")
+
+            connection.execute(
+                text(
+                    "ALTER TABLE metrics_alerts ADD COLUMN for_samples INTEGER NOT NULL DEFAULT 1"
+                )
+            )
+            print("✅ Added for_samples column")
+
+            connection.commit()
+            print("✅ Migration completed successfully")
+
+        except Exception as e:
+            print(f"❌ Migration failed: {e}")
+            connection.rollback()
+            raise
+
+
+def downgrade():
+    """Reverse the migration."""
+    print("🔄 Reversing migration: Remove alert rule options...")
+
+    with engine.connect() as connection:
+        try:
+            connection.execute(
+                text("ALTER TABLE metrics_alerts DROP COLUMN for_samples")
+            )
+            connection.execute(
+                text("ALTER TABLE metrics_alerts DROP COLUMN hysteresis")
+            )
+            connection.execute(text("ALTER TABLE metrics_alerts DROP COLUMN rule_type"))
+            connection.commit()
+            print("✅ Removed alert rule option columns")
+
+        except Exception as e:
+            print(f"❌ Downgrade failed: {e}")
+            connection.rollback()
+            raise
+
+
+if __name__ == "__main__":
+    upgrade()
@@ -0,0 +1,81 @@
+"""
+Migration: Add notification outbox table
+
+This migration adds the notification_outbox table. Alert triggers append
+notifications to it, and the delivery worker drains it in batches, so
+pending notifications survive restarts and failed channels are retried.
+
+Created: 2024-06-XX
+"""
+
+from sqlalchemy import text
+
+from app.db.database import engine
+
+
+def upgrade():
+    """Apply the migration."""
+    print("🔄 Running migration: Add notification outbox table...")
+
+    notification_outbox_sql = """
+    CREATE TABLE IF NOT EXISTS notification_outbox (
+        id INTEGER PRIMARY KEY,
+        idempotency_key VARCHAR(128) NOT NULL UNIQUE,
+        kind VARCHAR(50) NOT NULL,
+        user_id INTEGER NOT NULL,
+        payload TEXT NOT NULL,
+        status VARCHAR(20) NOT NULL DEFAULT 'pending',
+        channels_done VARCHAR NOT NULL DEFAULT '',
+        attempts INTEGER NOT NULL DEFAULT 0,
+        next_attempt_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+        last_error TEXT,
+        locked_by VARCHAR(36),
+        locked_until DATETIME,
+        created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+        delivered_at DATETIME,
+        FOREIGN KEY (user_id) REFERENCES users (id)
+    );
+    """
+
+    notification_outbox_indexes = [
+        "CREATE INDEX IF NOT EXISTS ix_notification_outbox_user_id ON notification_outbox (user_id);",
+        "CREATE INDEX IF NOT EXISTS ix_notification_outbox_status ON notification_outbox (status);",
+        "CREATE INDEX IF NOT EXISTS ix_notification_outbox_next_attempt_at ON notification_outbox (next_attempt_at);",
+    ]
+
+    with engine.connect() as connection:
+        try:
+            connection.execute(text(notification_outbox_sql))
+            print("✅ Created notification_outbox table")
+
+            for index_sql in notification_outbox_indexes:
+                connection.execute(text(index_sql))
+            print("✅ Created notification_outbox indexes")
+
+            connection.commit()
+            print("✅ Migration completed successfully")
+
+        except Exception as e:
+            print(f"❌ Migration failed: {e}")
+            connection.rollback()
+            raise
+
+
+def downgrade():
+    """Reverse the migration."""
+    print("🔄 Reversing migration: Remove notification outbox table...")
+
+    with engine.connect() as connection:
+        try:
+            connection.execute(text("DROP TABLE IF EXISTS notification_outbox"))
+            connection.commit()
+            print("✅ Dropped notification_outbox table")
+
+        except Exception as e:
+            print(f"❌ Downgrade failed: {e}")
+            connection.rollback()
+            raise
+
+
+if __name__ == "__main__":
+    upgrade()
@@ -0,0 +1,44 @@
+"""
+Migration: Add deployment stage timings
+
+This migration adds a stage_timings column to the template_deployment_history
+table. The compose deployment service records how long each deployment stage
+(files, images, resources, services) took, as JSON.
+
+Created: 2024-06-XX
+"""
+
+from sqlalchemy import text
+
+from app.db.database import engine
+
+
+def upgrade():
+    """Apply the migration."""
+    print("🔄 Running migration: Add deployment stage timings...")
+
+    with engine.connect() as connection:
+        try:
+            connection.execute(
+                text(
+                    """
+                ALTER TABLE template_deployment_history
+                ADD COLUMN stage_timings JSON
+            """
+                )
+            )
+            print("✅ Added stage_timings column")
+
+            connection.commit()
+            print("✅ Migration completed successfully")
+
+        except Exception as e:
+            print(f"❌ Migration failed: {e}")
+            connection.rollback()
+            raise
+
+
+def downgrade():
+    """Reverse the migration."""
+    print("🔄 Reversing migration: Remove deployment stage timings...")
+    print("⚠️ Downgrade not supported for SQLite - would require table recreation")
@@ -24,6 +24,10 @@ from sqlalchemy.orm import relationship
 
 Base = declarative_base()
 
+# SQLite only auto-increments INTEGER PRIMARY KEY columns, so BIGINT keys
+# fall back to INTEGER there.
+BigIntegerPK = BigInteger().with_variant(Integer, "sqlite")
+
 
 class UserRole(str, Enum):
     """User role enum."""
@@ -85,14 +89,20 @@ class Team(Base):
 
 
 class Token(Base):
-    """Token model for user authentication."""
+    """
+    Refresh token model for user authentication.
+
+    Only the SHA-256 hash of the token's ``jti`` claim is stored; tokens
+    issued by rotating an earlier one share its ``family_id``.
+    """
 
     __tablename__ = "tokens"
 
     id = Column(Integer, primary_key=True, index=True)
-    token = Column(String, unique=True, index=True)
+    jti_hash = Column(String(64), unique=True, index=True, nullable=False)
+    family_id = Column(String(36), index=True, nullable=False)
     user_id = Column(Integer, ForeignKey("users.id"))
-    expires_at = Column(DateTime)
+    expires_at = Column(DateTime, index=True)
     is_revoked = Column(Boolean, default=False)
     created_at = Column(DateTime, default=datetime.utcnow)
 
@@ -174,6 +184,13 @@ class ComparisonOperator(str, Enum):
     NOT_EQUAL = "!="
 
 
+class AlertRuleType(str, Enum):
+    """How an alert's threshold is applied to its metric."""
+
+    THRESHOLD = "threshold"  # Compare the sampled value
+    RATE = "rate"  # Compare the per-second rate of change
+
+
 class ContainerMetrics(Base):
     """
     Enhanced container metrics model for storing high-frequency performance data.
@@ -184,7 +201,7 @@ class ContainerMetrics(Base):
     __tablename__ = "container_metrics"
 
     # Use BigInteger for high-volume time-series data
-    id = Column(BigInteger, primary_key=True, index=True)
+    id = Column(BigIntegerPK, primary_key=True, index=True)
     container_id = Column(String(255), index=True, nullable=False)
     container_name = Column(String(255), index=True, nullable=True)
 
@@ -250,7 +267,7 @@ class ContainerMetricsAggregated(Base):
 
     __tablename__ = "container_metrics_aggregated"
 
-    id = Column(BigInteger, primary_key=True, index=True)
+    id = Column(BigIntegerPK, primary_key=True, index=True)
     container_id = Column(String(255), index=True, nullable=False)
     container_name = Column(String(255), index=True, nullable=True)
 
@@ -313,7 +330,7 @@ class ContainerBaseline(Base):
 
     __tablename__ = "container_baselines"
 
-    id = Column(BigInteger, primary_key=True, index=True)
+    id = Column(BigIntegerPK, primary_key=True, index=True)
     container_id = Column(String(255), index=True, nullable=False)
     container_name = Column(String(255), index=True, nullable=True)
 
@@ -403,6 +420,9 @@ class MetricsAlert(Base):
     metric_type = Column(String, nullable=False)  # MetricType enum
     threshold_value = Column(Float, nullable=False)
     comparison_operator = Column(String, nullable=False)  # ComparisonOperator enum
+    rule_type = Column(String, default="threshold", nullable=False)  # AlertRuleType enum
+    hysteresis = Column(Float, default=0.0, nullable=False)  # Margin to clear before resolving
+    for_samples = Column(Integer, default=1, nullable=False)  # Consecutive samples before firing
 
     # Alert state
     is_active = Column(Boolean, default=True)
@@ -427,6 +447,40 @@ class MetricsAlert(Base):
     acknowledger = relationship("User", foreign_keys=[acknowledged_by])
 
 
+class NotificationOutbox(Base):
+    """
+    Notification awaiting delivery.
+
+    Alert triggers append rows here instead of delivering inline; the
+    delivery worker claims due rows in batches and records which channels
+    (websocket, history, email) have been completed, so retries never
+    repeat a channel that already succeeded.
+    """
+
+    __tablename__ = "notification_outbox"
+
+    id = Column(Integer, primary_key=True, index=True)
+    idempotency_key = Column(String(128), unique=True, index=True, nullable=False)
+    kind = Column(String(50), nullable=False)  # e.g. alert_triggered
+    user_id = Column(Integer, ForeignKey("users.id"), index=True, nullable=False)
+    payload = Column(Text, nullable=False)  # JSON notification message
+
+    # Delivery state
+    status = Column(String(20), default="pending", index=True, nullable=False)  # pending, delivered, failed
+    channels_done = Column(String, default="", nullable=False)  # Comma-separated completed channels
+    attempts = Column(Integer, default=0, nullable=False)
+    next_attempt_at = Column(DateTime, default=datetime.utcnow, index=True, nullable=False)
+    last_error = Column(Text, nullable=True)
+
+    # Claim held by a delivery worker
+    locked_by = Column(String(36), nullable=True)
+    locked_until = Column(DateTime, nullable=True)
+
+    # Timestamps
+    created_at = Column(DateTime, default=datetime.utcnow)
+    delivered_at = Column(DateTime, nullable=True)
+
+
 class ContainerMetricsHistory(Base):
     """Container metrics history model for aggregated time-series data."""
 
@@ -553,6 +607,7 @@ class MarketplaceTemplate(Base):
     docker_compose_yaml = Column(Text, nullable=False)
     status = Column(String, default=TemplateStatus.PENDING, nullable=False)
     downloads = Column(Integer, default=0, nullable=False)
+    view_count = Column(Integer, default=0, nullable=False)
     rating_avg = Column(Float, default=0.0, nullable=False)
     rating_count = Column(Integer, default=0, nullable=False)
     tags = Column(JSON, nullable=True)  # Array of tags as JSON
@@ -645,7 +700,7 @@ class TemplateAnalytics(Base):
 
     __tablename__ = "template_analytics"
 
-    id = Column(BigInteger, primary_key=True, index=True)
+    id = Column(BigIntegerPK, primary_key=True, index=True)
     template_id = Column(Integer, ForeignKey("marketplace_templates.id"), nullable=False)
     container_id = Column(String(255), nullable=True)
     deployment_id = Column(String(255), nullable=True)
@@ -689,7 +744,7 @@ class TemplateSecurityScan(Base):
 
     __tablename__ = "template_security_scans"
 
-    id = Column(BigInteger, primary_key=True, index=True)
+    id = Column(BigIntegerPK, primary_key=True, index=True)
     template_id = Column(Integer, ForeignKey("marketplace_templates.id"), nullable=False)
     template_version_id = Column(Integer, ForeignKey("template_versions.id"), nullable=True)
     scan_type = Column(String(50), default="automated", nullable=False)
@@ -766,7 +821,7 @@ class TemplateDeploymentHistory(Base):
 
     __tablename__ = "template_deployment_history"
 
-    id = Column(BigInteger, primary_key=True, index=True)
+    id = Column(BigIntegerPK, primary_key=True, index=True)
     template_id = Column(Integer, ForeignKey("marketplace_templates.id"), nullable=False)
     template_version_id = Column(Integer, ForeignKey("template_versions.id"), nullable=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
@@ -799,6 +854,7 @@ class TemplateDeploymentHistory(Base):
     containers_created = Column(Integer, default=0, nullable=True)
     networks_created = Column(Integer, default=0, nullable=True)
     volumes_created = Column(Integer, default=0, nullable=True)
+    stage_timings = Column(JSON, nullable=True)  # Seconds per deployment stage
 
     # Integration with Phase 4 metrics
     metrics_collection_enabled = Column(Boolean, default=True, nullable=True)
@@ -819,7 +875,7 @@ class TemplatePerformanceMetrics(Base):
 
     __tablename__ = "template_performance_metrics"
 
-    id = Column(BigInteger, primary_key=True, index=True)
+    id = Column(BigIntegerPK, primary_key=True, index=True)
     template_id = Column(Integer, ForeignKey("marketplace_templates.id"), nullable=False)
     deployment_id = Column(String(255), nullable=True)
 
@@ -875,7 +931,7 @@ class TemplateMarketplaceCache(Base):
 
     __tablename__ = "template_marketplace_cache"
 
-    id = Column(BigInteger, primary_key=True, index=True)
+    id = Column(BigIntegerPK, primary_key=True, index=True)
     cache_key = Column(String(512), unique=True, nullable=False)
     cache_value = Column(JSON, nullable=False)
     cache_type = Column(String(50), default="search_result", nullable=False)
@@ -2,6 +2,7 @@
 Email service for sending emails via SendGrid or Gmail.
 """
 
+import asyncio
 import os
 import smtplib
 from abc import ABC, abstractmethod
@@ -9,11 +10,11 @@ from email.mime.multipart import MIMEMultipart
 from email.mime.text import MIMEText
 from typing import List, Optional
 
-import aiosmtplib
 from sendgrid import SendGridAPIClient
 from sendgrid.helpers.mail import Mail
 
 from app.config.settings_manager import SettingsManager
+from app.email.smtp_pool import SMTPConnectionPool
 
 
 class EmailProvider(ABC):
@@ -30,15 +31,23 @@ class EmailProvider(ABC):
         """Send an email."""
         pass
 
+    async def close(self) -> None:
+        """Release connections held by the provider."""
+        pass
+
 
 class SendGridProvider(EmailProvider):
     """SendGrid email provider."""
 
-    def __init__(self, api_key: str, from_email: str, from_name: str):
+    def __init__(
+        self, api_key: str, from_email: str, from_name: str, max_concurrency: int = 4
+    ):
         self.api_key = api_key
         self.from_email = from_email
         self.from_name = from_name
         self.client = SendGridAPIClient(api_key=api_key)
+        # The SendGrid client is blocking; bound how many calls run in threads at once
+        self._semaphore = asyncio.Semaphore(max_concurrency)
 
     async def send_email(
         self,
@@ -57,7 +66,8 @@ class SendGridProvider(EmailProvider):
                 plain_text_content=text_content,
             )
 
-            response = self.client.send(message)
+            async with self._semaphore:
+                response = await asyncio.to_thread(self.client.send, message)
             return response.status_code in [200, 202]
         except Exception as e:
             print(f"SendGrid email error: {e}")
@@ -75,6 +85,7 @@ class GmailProvider(EmailProvider):
         from_name: str,
         smtp_host: str = "smtp.gmail.com",
         smtp_port: int = 587,
+        pool_size: int = 2,
     ):
         self.username = username
         self.password = password
@@ -82,6 +93,16 @@ class GmailProvider(EmailProvider):
         self.from_name = from_name
         self.smtp_host = smtp_host
         self.smtp_port = smtp_port
+        # Reuse authenticated SMTP/TLS sessions instead of one per email
+        self.pool = SMTPConnectionPool(
+            smtp_host,
+            smtp_port,
+            username=username,
+            password=password,
+            start_tls=True,
+            max_size=pool_size,
+            timeout=30,
+        )
 
     async def send_email(
         self,
@@ -109,18 +130,8 @@ class GmailProvider(EmailProvider):
             html_part = MIMEText(html_content, "html")
             message.attach(html_part)
 
-            print(f"🔗 Connecting to {self.smtp_host}:{self.smtp_port}...")
-
-            # Send email with timeout
-            await aiosmtplib.send(
-                message,
-                hostname=self.smtp_host,
-                port=self.smtp_port,
-                start_tls=True,
-                username=self.username,
-                password=self.password,
-                timeout=30,  # 30 second timeout
-            )
+            # Send on a pooled connection (30 second timeout)
+            await self.pool.send_message(message)
             print("✅ Email sent successfully via Gmail SMTP")
             return True
         except Exception as e:
@@ -130,6 +141,10 @@ class GmailProvider(EmailProvider):
             traceback.print_exc()
             return False
 
+    async def close(self) -> None:
+        """Close pooled SMTP connections."""
+        await self.pool.close()
+
 
 class TestEmailProvider(EmailProvider):
     """Test email provider that simulates email sending."""
@@ -192,7 +207,12 @@ class EmailService:
                 if not api_key:
                     print("Warning: SENDGRID_API_KEY not configured")
                     return
-                self._provider = SendGridProvider(api_key, from_email, from_name)
+                self._provider = SendGridProvider(
+                    api_key,
+                    from_email,
+                    from_name,
+                    max_concurrency=int(os.getenv("EMAIL_MAX_CONCURRENCY", "4")),
+                )
 
             elif email_provider == "gmail":
                 username = os.getenv("GMAIL_USERNAME")
@@ -205,7 +225,13 @@ class EmailService:
                     return
 
                 self._provider = GmailProvider(
-                    username, password, from_email, from_name, smtp_host, smtp_port
+                    username,
+                    password,
+                    from_email,
+                    from_name,
+                    smtp_host,
+                    smtp_port,
+                    pool_size=int(os.getenv("EMAIL_SMTP_POOL_SIZE", "2")),
                 )
 
             elif email_provider == "test":
@@ -238,6 +264,11 @@ class EmailService:
         """Check if email service is properly configured."""
         return self._provider is not None
 
+    async def close(self) -> None:
+        """Close connections held by the provider."""
+        if self._provider:
+            await self._provider.close()
+
 
 # Global email service instance
 _email_service: Optional[EmailService] = None
@@ -0,0 +1,151 @@
+"""
+Pooled SMTP connections for email providers.
+
+Opening an SMTP session costs a TCP connect, a STARTTLS handshake and an
+AUTH exchange. The pool keeps up to ``max_size`` authenticated aiosmtplib
+connections open and reuses them for consecutive sends; idle connections
+are dropped after ``idle_timeout`` seconds and every connection is
+recycled after ``max_messages`` messages, since providers cap messages per
+session. A send on a reused connection that the server already closed is
+retried once on a fresh connection.
+"""
+
+import asyncio
+import logging
+import time
+from collections import deque
+from email.message import Message
+from typing import Deque, Dict, Optional, Tuple
+
+import aiosmtplib
+
+logger = logging.getLogger(__name__)
+
+
+class SMTPConnectionPool:
+    """Bounded pool of authenticated SMTP connections to one server."""
+
+    def __init__(
+        self,
+        hostname: str,
+        port: int,
+        username: Optional[str] = None,
+        password: Optional[str] = None,
+        start_tls: bool = True,
+        max_size: int = 2,
+        idle_timeout: float = 60.0,
+        max_messages: int = 100,
+        timeout: float = 30.0,
+    ):
+        """
+        Initialize the pool.
+
+        Args:
+            hostname: SMTP server host
+            port: SMTP server port
+            username: Login username
+            password: Login password
+            start_tls: Upgrade connections with STARTTLS
+            max_size: Maximum number of open connections (and concurrent sends)
+            idle_timeout: Seconds an unused connection is kept open
+            max_messages: Messages sent on a connection before it is recycled
+            timeout: Connect and command timeout in seconds
+        """
+        self.hostname = hostname
+        self.port = port
+        self.username = username
+        self.password = password
+        self.start_tls = start_tls
+        self.max_size = max_size
+        self.idle_timeout = idle_timeout
+        self.max_messages = max_messages
+        self.timeout = timeout
+
+        # Idle entries are (connection, messages sent on it, last used)
+        self._idle: Deque[Tuple[aiosmtplib.SMTP, int, float]] = deque()
+        self._semaphore = asyncio.Semaphore(max_size)
+        self.stats = {"opened": 0, "reused": 0, "sent": 0, "retried": 0, "errors": 0}
+
+    async def _acquire(self) -> Tuple[aiosmtplib.SMTP, int, bool]:
+        """Take a live idle connection, or open a new one."""
+        now = time.monotonic()
+        while self._idle:
+            smtp, sent, last_used = self._idle.pop()
+            if smtp.is_connected and now - last_used < self.idle_timeout:
+                self.stats["reused"] += 1
+                return smtp, sent, True
+            await self._discard(smtp)
+
+        smtp = aiosmtplib.SMTP(
+            hostname=self.hostname,
+            port=self.port,
+            username=self.username,
+            password=self.password,
+            start_tls=self.start_tls,
+            timeout=self.timeout,
+        )
+        await smtp.connect()
+        self.stats["opened"] += 1
+        return smtp, 0, False
+
+    async def _release(self, smtp: aiosmtplib.SMTP, sent: int) -> None:
+        if sent >= self.max_messages:
+            await self._discard(smtp, graceful=True)
+        else:
+            self._idle.append((smtp, sent, time.monotonic()))
+
+    async def _discard(self, smtp: aiosmtplib.SMTP, graceful: bool = False) -> None:
+        try:
+            if graceful and smtp.is_connected:
+                await smtp.quit()
+            else:
+                smtp.close()
+        except Exception:
+            pass
+
+    async def send_message(self, message: Message) -> None:
+        """
+        Send a message on a pooled connection.
+
+        Args:
+            message: Message with From/To headers set
+
+        Raises:
+            aiosmtplib.SMTPException: If the server rejects the message
+        """
+        async with self._semaphore:
+            smtp, sent, reused = await self._acquire()
+            try:
+                await smtp.send_message(message)
+            except (aiosmtplib.SMTPServerDisconnected, ConnectionError) as e:
+                await self._discard(smtp)
+                if not reused:
+                    self.stats["errors"] += 1
+                    raise
+                # The server closed the idle connection; try once on a new one
+                logger.debug(f"Pooled SMTP connection dropped ({e}); reconnecting")
+                self.stats["retried"] += 1
+                smtp, sent, _ = await self._acquire()
+                try:
+                    await smtp.send_message(message)
+                except Exception:
+                    await self._discard(smtp)
+                    self.stats["errors"] += 1
+                    raise
+            except Exception:
+                await self._discard(smtp)
+                self.stats["errors"] += 1
+                raise
+
+            self.stats["sent"] += 1
+            await self._release(smtp, sent + 1)
+
+    async def close(self) -> None:
+        """Close all idle connections."""
+        while self._idle:
+            smtp, _, _ = self._idle.pop()
+            await self._discard(smtp, graceful=True)
+
+    def get_stats(self) -> Dict[str, int]:
+        """Get connection reuse statistics."""
+        return {**self.stats, "idle": len(self._idle)}
@@ -34,6 +34,8 @@ class EmailTemplates:
             return self._render_welcome(**kwargs)
         elif template_name == "alert_notification":
             return self._render_alert_notification(**kwargs)
+        elif template_name == "alert_digest":
+            return self._render_alert_digest(**kwargs)
         else:
             raise ValueError(f"Unknown template: {template_name}")
 
@@ -386,6 +388,96 @@ View Dashboard: {{ dashboard_url }}
 
         return html_tmpl.render(**context), text_tmpl.render(**context)
 
+    def _render_alert_digest(self, **kwargs) -> tuple[str, str]:
+        """Render alert digest email template (several alerts in one email)."""
+        username = kwargs.get("username", "")
+        alerts = kwargs.get("alerts", [])
+        app_name = kwargs.get("app_name", "DockerDeployer")
+
+        html_template = """
+<!DOCTYPE html>
+<html>
+<head>
+    <meta charset="utf-8">
+    <meta name="viewport" content="width=device-width, initial-scale=1.0">
+    <title>{{ app_name }} Alert Digest</title>
+    <style>
+        body { font-family: Arial, sans-serif; line-height: 1.6; color: #333; }
+        .container { max-width: 600px; margin: 0 auto; padding: 20px; }
+        .header { background: #f44336; color: white; padding: 20px; text-align: center; border-radius: 5px 5px 0 0; }
+        .content { background: #f9f9f9; padding: 20px; border-radius: 0 0 5px 5px; }
+        table { width: 100%; border-collapse: collapse; background: white; }
+        th, td { text-align: left; padding: 8px; border-bottom: 1px solid #eee; }
+        .metric-value { font-weight: bold; color: #f44336; }
+        .footer { text-align: center; margin-top: 20px; color: #666; font-size: 0.9em; }
+        .button { display: inline-block; padding: 10px 20px; background: #2196F3; color: white; text-decoration: none; border-radius: 5px; margin: 10px 0; }
+    </style>
+</head>
+<body>
+    <div class="container">
+        <div class="header">
+            <h1>🚨 {{ alerts|length }} Alerts Triggered</h1>
+        </div>
+        <div class="content">
+            <p>Hello {{ username }},</p>
+
+            <p>The following alerts were triggered in your {{ app_name }} environment:</p>
+
+            <table>
+                <tr><th>Alert</th><th>Container</th><th>Metric</th><th>Value</th><th>Threshold</th><th>Time</th></tr>
+                {% for alert in alerts %}
+                <tr>
+                    <td>{{ alert.name }}</td>
+                    <td>{{ alert.container_name or alert.container_id }}</td>
+                    <td>{{ alert.metric_type }}</td>
+                    <td class="metric-value">{{ alert.current_value }}</td>
+                    <td>{{ alert.comparison_operator }} {{ alert.threshold_value }}</td>
+                    <td>{{ alert.timestamp }}</td>
+                </tr>
+                {% endfor %}
+            </table>
+
+            <p>Please check your containers and take appropriate action if necessary.</p>
+
+            <a href="{{ dashboard_url }}" class="button">View Dashboard</a>
+        </div>
+        <div class="footer">
+            <p>© 2024 {{ app_name }}. All rights reserved.</p>
+        </div>
+    </div>
+</body>
+</html>
+        """
+
+        text_template = """
+🚨 {{ app_name }}: {{ alerts|length }} Alerts Triggered
+
+Hello {{ username }},
+
+The following alerts were triggered in your {{ app_name }} environment:
+{% for alert in alerts %}
+- {{ alert.name }} on {{ alert.container_name or alert.container_id }}: {{ alert.metric_type }} is {{ alert.current_value }} (threshold: {{ alert.comparison_operator }} {{ alert.threshold_value }}) at {{ alert.timestamp }}
+{%- endfor %}
+
+Please check your containers and take appropriate action if necessary.
+
+View Dashboard: {{ dashboard_url }}
+
+© 2024 {{ app_name }}. All rights reserved.
+        """
+
+        html_tmpl = Template(html_template)
+        text_tmpl = Template(text_template)
+
+        context = {
+            "username": username,
+            "alerts": alerts,
+            "app_name": app_name,
+            "dashboard_url": kwargs.get("dashboard_url", ""),
+        }
+
+        return html_tmpl.render(**context), text_tmpl.render(**context)
+
 
 # Global template instance
 email_templates = EmailTemplates()
@@ -1,5 +1,7 @@
+import asyncio
 import os
 import sys
+import uuid
 from datetime import datetime
 
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
@@ -7,21 +9,31 @@ sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")
 from typing import Any, Dict, List, Optional
 
 import yaml
-from fastapi import Body, Depends, FastAPI, HTTPException, Query, Request, Response, WebSocket, status
+from fastapi import BackgroundTasks, Body, Depends, FastAPI, HTTPException, Query, Request, Response, WebSocket, WebSocketDisconnect, status
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.openapi.docs import get_swagger_ui_html
 from fastapi.responses import JSONResponse
 from pydantic import BaseModel, Field
 from sqlalchemy.orm import Session
 
-from app.auth.dependencies import get_current_admin_user, get_current_user
+from app.auth.dependencies import get_current_admin_user, get_current_user, require_admin
+from app.auth.password_hasher import get_password_hasher
+from app.auth.refresh_tokens import get_refresh_token_store
 from app.auth.router import router as auth_router
 from app.auth.user_management import router as user_management_router
 from app.marketplace.router import router as marketplace_router
 # from app.api.performance import router as performance_router
 from app.config.settings_manager import SettingsManager
-from app.db.database import get_db, init_db
-from app.db.models import User
+from app.db.database import (
+    async_engine,
+    db_optimizer,
+    engine,
+    get_async_db,
+    get_db,
+    get_pool_stats,
+    init_db,
+)
+from app.db.models import MarketplaceTemplate, TemplateStatus, User, UserRole
 from app.middleware.rate_limiting import (
     rate_limit_api,
     rate_limit_auth,
@@ -29,17 +41,32 @@ from app.middleware.rate_limiting import (
     setup_rate_limiting,
 )
 from app.middleware.security import setup_security_middleware
+from app.email.service import get_email_service
 from app.middleware.performance_monitoring import PerformanceMonitoringMiddleware
-from app.services.metrics_service import MetricsService
+from app.middleware.query_profiling import install_query_profiler, is_query_profiling_enabled
+from app.services.alert_rule_engine import get_alert_rule_engine
+from app.services.alert_notification_service import get_connection_manager
+from app.services.compose_deployment_service import get_compose_deployment_service, project_name
+from docker_manager.compose import host_access_options
+from docker_manager.images import get_image_pull_coordinator, is_image_prefetch_enabled
+from app.services.metrics_service import MetricsService, parse_alert_rule_fields
+from app.services.notification_outbox import get_notification_outbox
 from app.services.container_metrics_visualization_service import ContainerMetricsVisualizationService
 from app.services.production_monitoring_service import ProductionMonitoringService
+from app.services.template_counter_service import get_template_counter_buffer
+from app.services.template_recommendation_service import get_recommendation_engine
+from app.websocket.metrics_protocol import PROTOCOL_VERSION, MetricsStreamEncoder
 from app.websocket.notifications import websocket_notifications_endpoint
+from app.websocket.push_rate import AdaptivePushInterval
 from llm.client import LLMClient
 
 # from docker.manager import DockerManager
 from nlp.intent import IntentParser
-from templates.loader import list_templates as list_stack_templates
-from templates.loader import load_template
+from templates.compiler import get_template_compiler
+from templates.loader import get_template_catalog
+from templates.loader import list_cached_templates as list_stack_templates
+from templates.loader import load_cached_template as load_template
+from templates.validator import TemplateValidationError
 from version_control.git_manager import GitManager
 
 app = FastAPI(
@@ -102,6 +129,11 @@ except Exception as e:
 # Set up security middleware
 setup_security_middleware(app)
 
+# Instrument database engines for per-request SQL profiling (opt-in)
+if is_query_profiling_enabled():
+    install_query_profiler(engine)
+    install_query_profiler(async_engine.sync_engine)
+
 # Add performance monitoring middleware
 app.add_middleware(
     PerformanceMonitoringMiddleware,
@@ -189,10 +221,10 @@ def get_docker_manager():
         )
 
 
-def get_metrics_service(db_session=Depends(get_db)):
-    """Get metrics service instance with database session."""
+def get_metrics_service(db_session=Depends(get_db), async_db=Depends(get_async_db)):
+    """Get metrics service instance with sync and async database sessions."""
     docker_manager = get_docker_manager()
-    return MetricsService(db_session, docker_manager)
+    return MetricsService(db_session, docker_manager, async_db=async_db)
 
 
 def get_production_monitoring_service(db_session=Depends(get_db)):
@@ -353,6 +385,9 @@ class TemplateDeployRequest(BaseModel):
     overrides: Optional[Dict[str, Any]] = Field(
         None, description="Template variable overrides"
     )
+    marketplace_template_id: Optional[int] = Field(
+        None, description="Deploy this approved marketplace template instead of a local one"
+    )
 
     class Config:
         schema_extra = {
@@ -370,6 +405,9 @@ class TemplateDeployResponse(BaseModel):
 
     template: str = Field(..., description="Name of the deployed template")
     status: str = Field(..., description="Deployment status")
+    deployment_id: Optional[str] = Field(
+        None, description="ID of the deployment in notification WebSocket progress events"
+    )
 
     class Config:
         schema_extra = {"example": {"template": "wordpress", "status": "deployed"}}
@@ -483,6 +521,45 @@ class SettingsModel(BaseModel):
         return cls.validate_provider_fields(values)
 
 
+# --- Lifecycle ---
+
+
+@app.on_event("startup")
+async def start_background_services():
+    """Start background services that live for the lifetime of the app."""
+    get_template_catalog().start()
+    get_template_counter_buffer().start()
+    get_recommendation_engine().start()
+    get_refresh_token_store().start()
+    get_alert_rule_engine().start()
+    get_notification_outbox().start()
+    if is_image_prefetch_enabled():
+        get_image_pull_coordinator().start(get_compose_deployment_service().popular_images)
+
+    # Fan notifications out across workers when Redis is configured
+    redis_url = os.getenv("REDIS_URL")
+    if redis_url:
+        await get_connection_manager().start(redis_url)
+
+
+@app.on_event("shutdown")
+async def stop_background_services():
+    """Stop background services, flushing any buffered state."""
+    await get_notification_outbox().stop()
+    await get_image_pull_coordinator().stop()
+    await get_email_service().close()
+    await llm_client.aclose()
+    await intent_parser.aclose()
+    await get_connection_manager().stop()
+    await get_alert_rule_engine().stop()
+    await get_refresh_token_store().stop()
+    await get_recommendation_engine().stop()
+    await get_template_counter_buffer().stop()
+    await get_template_catalog().stop()
+    await asyncio.to_thread(get_password_hasher().shutdown)
+    await db_optimizer.cleanup_async()
+
+
 # --- Endpoints ---
 
 
@@ -623,6 +700,8 @@ async def update_settings(
                 or "https://openrouter.ai/api/v1/chat/completions",
                 api_key=settings.openrouter_api_key,
             )
+        # The parser reads provider and model when its gateway is built
+        await intent_parser.reload()
         return settings
     except ValueError as e:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
@@ -765,16 +844,23 @@ async def parse_nlp_command(
         200: {"description": "Deployment successful", "model": DeployResponse},
         400: {"description": "Bad request - Invalid configuration"},
         401: {"description": "Unauthorized - Authentication required"},
+        403: {"description": "Forbidden - Admin access required"},
         500: {"description": "Internal server error - Deployment failed"},
     },
 )
 async def deploy_containers(
-    req: DeployRequest, current_user: User = Depends(get_current_user)
+    req: DeployRequest,
+    background_tasks: BackgroundTasks,
+    current_user: User = Depends(require_admin),
 ):
     """
     Deploy containers using the provided configuration.
 
-    Requires authentication.
+    The configuration is committed, then deployed in the background; progress
+    is sent to the user over the notifications WebSocket.
+
+    Requires admin privileges: the configuration may use any compose option,
+    including privileged mode and host bind mounts.
     """
     try:
         if not req.config or not isinstance(req.config, dict):
@@ -788,11 +874,24 @@ async def deploy_containers(
         config_path = os.path.join(repo_path, "docker-compose.yml")
         with open(config_path, "w") as f:
             yaml.safe_dump(req.config, f)
-        git_manager.commit_all(f"Deploy containers via API by {current_user.username}")
-        # TODO: Add actual deployment logic (e.g., docker-compose up) using secrets if needed
+        await git_manager.commit(
+            [config_path], f"Deploy containers via API by {current_user.username}"
+        )
+        deployment_id = uuid.uuid4().hex
+        background_tasks.add_task(
+            get_compose_deployment_service().deploy,
+            req.config,
+            project=project_name(os.path.basename(repo_path), current_user.id),
+            user_id=current_user.id,
+            deployment_id=deployment_id,
+            allow_host_access=True,
+        )
         return DeployResponse(
             status="success",
-            details={"info": "Config committed and (placeholder) deployment started"},
+            details={
+                "info": "Config committed and deployment started",
+                "deployment_id": deployment_id,
+            },
         )
     except (OSError, yaml.YAMLError) as e:
         raise HTTPException(
@@ -1171,7 +1270,7 @@ async def get_container_metrics_history(
     Requires authentication.
     """
     try:
-        metrics = metrics_service.get_historical_metrics(container_id, hours, limit)
+        metrics = await metrics_service.get_historical_metrics_async(container_id, hours, limit)
         return {
             "container_id": container_id,
             "hours": hours,
@@ -1691,6 +1790,171 @@ async def get_system_health_status(
         )
 
 
+@app.get(
+    "/api/system/database",
+    tags=["Production Monitoring"],
+    summary="Get database pool statistics",
+    description="Get live connection pool statistics for the application database engine.",
+    responses={
+        200: {"description": "Database pool statistics"},
+        401: {"description": "Unauthorized - Authentication required"},
+        403: {"description": "Forbidden - Admin access required"},
+    },
+)
+async def get_database_pool_stats(
+    current_user: User = Depends(get_current_admin_user),
+):
+    """
+    Get live database connection pool statistics.
+
+    Returns pool class, size, checked-out and overflow connections along with
+    connection lifecycle counters for capacity monitoring.
+    """
+    return get_pool_stats()
+
+
+@app.get(
+    "/api/system/password-hashing",
+    tags=["Production Monitoring"],
+    summary="Get password hashing pool statistics",
+    description="Get queue depth, throughput and timing statistics for the password hashing pool.",
+    responses={
+        200: {"description": "Password hashing pool statistics"},
+        401: {"description": "Unauthorized - Authentication required"},
+        403: {"description": "Forbidden - Admin access required"},
+    },
+)
+async def get_password_hashing_stats(
+    current_user: User = Depends(get_current_admin_user),
+):
+    """
+    Get password hashing pool statistics.
+
+    Returns worker count, running and queued operations, rejected requests,
+    rehash count and average wait/hash times.
+    """
+    return get_password_hasher().get_stats()
+
+
+@app.get(
+    "/api/system/websocket-queues",
+    tags=["Production Monitoring"],
+    summary="Get WebSocket send queue statistics",
+    description="Get per-process notification WebSocket send queue statistics.",
+    responses={
+        200: {"description": "WebSocket send queue statistics"},
+        401: {"description": "Unauthorized - Authentication required"},
+        403: {"description": "Forbidden - Admin access required"},
+    },
+)
+async def get_websocket_queue_stats(
+    current_user: User = Depends(get_current_admin_user),
+):
+    """
+    Get WebSocket send queue statistics.
+
+    Returns connection count, queued, sent, dropped and coalesced messages,
+    the deepest queue seen and the active slow-consumer policy.
+    """
+    return get_connection_manager().get_queue_stats()
+
+
+@app.get(
+    "/api/system/alert-engine",
+    tags=["Production Monitoring"],
+    summary="Get alert rule engine statistics",
+    description="Get compiled alert rule index and evaluation statistics for this process.",
+    responses={
+        200: {"description": "Alert rule engine statistics"},
+        401: {"description": "Unauthorized - Authentication required"},
+        403: {"description": "Forbidden - Admin access required"},
+    },
+)
+async def get_alert_engine_stats(
+    current_user: User = Depends(get_current_admin_user),
+):
+    """
+    Get alert rule engine statistics.
+
+    Returns compiled rule, container and metric counts, evaluated batches,
+    fired and resolved alerts, the last batch duration and pending state writes.
+    """
+    return get_alert_rule_engine().get_stats()
+
+
+@app.get(
+    "/api/system/nlp",
+    tags=["Production Monitoring"],
+    summary="Get NLP parsing statistics",
+    description="Get rule classifier and parse cache statistics for NLP command parsing.",
+    responses={
+        200: {"description": "NLP parsing statistics"},
+        401: {"description": "Unauthorized - Authentication required"},
+        403: {"description": "Forbidden - Admin access required"},
+    },
+)
+async def get_nlp_stats(
+    current_user: User = Depends(get_current_admin_user),
+):
+    """
+    Get NLP parsing statistics.
+
+    Returns how many commands the rule classifier resolved locally or passed
+    on to the LLM, and the exact and semantic hit rates of the parse cache.
+    """
+    return intent_parser.get_stats()
+
+
+@app.get(
+    "/api/system/deployments",
+    tags=["Production Monitoring"],
+    summary="Get deployment statistics",
+    description="Get counters for compose deployments and the deployments in progress.",
+    responses={
+        200: {"description": "Deployment statistics"},
+        401: {"description": "Unauthorized - Authentication required"},
+        403: {"description": "Forbidden - Admin access required"},
+    },
+)
+async def get_deployment_stats(
+    current_user: User = Depends(get_current_admin_user),
+):
+    """
+    Get deployment statistics.
+
+    Returns how many deployments were started, succeeded and failed, the
+    projects of the deployments currently running, and image pull, prefetch
+    and eviction counters.
+    """
+    return {
+        **get_compose_deployment_service().get_stats(),
+        "images": get_image_pull_coordinator().get_stats(),
+    }
+
+
+@app.get(
+    "/api/system/notification-outbox",
+    tags=["Production Monitoring"],
+    summary="Get notification outbox statistics",
+    description="Get notification outbox backlog and delivery worker statistics.",
+    responses={
+        200: {"description": "Notification outbox statistics"},
+        401: {"description": "Unauthorized - Authentication required"},
+        403: {"description": "Forbidden - Admin access required"},
+    },
+)
+async def get_notification_outbox_stats(
+    current_user: User = Depends(get_current_admin_user),
+):
+    """
+    Get notification outbox statistics.
+
+    Returns pending, delivered and failed notification counts plus this
+    process's enqueue, delivery, retry and failure counters.
+    """
+    return await asyncio.to_thread(get_notification_outbox().get_stats)
+
+
 @app.post(
     "/api/alerts",
     tags=["Alerts"],
@@ -1728,14 +1992,22 @@ async def create_alert(
                     detail=f"Missing required field: {field}",
                 )
 
+        try:
+            rule = parse_alert_rule_fields(alert_data)
+        except ValueError as e:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
         result = metrics_service.create_alert(
             user_id=current_user.id,
             container_id=alert_data["container_id"],
             name=alert_data["name"],
             metric_type=alert_data["metric_type"],
-            threshold_value=float(alert_data["threshold_value"]),
+            threshold_value=rule["threshold_value"],
             comparison_operator=alert_data["comparison_operator"],
             description=alert_data.get("description"),
+            rule_type=rule.get("rule_type", "threshold"),
+            hysteresis=rule.get("hysteresis", 0.0),
+            for_samples=rule.get("for_samples", 1),
         )
 
         if "error" in result:
@@ -1774,7 +2046,7 @@ async def get_user_alerts(
     Requires authentication.
     """
     try:
-        alerts = metrics_service.get_user_alerts(current_user.id)
+        alerts = await metrics_service.get_user_alerts_async(current_user.id)
         return alerts
     except Exception as e:
         raise HTTPException(
@@ -1919,17 +2191,27 @@ async def list_templates(current_user: User = Depends(get_current_user)):
         },
         400: {"description": "Bad request - Invalid template request"},
         401: {"description": "Unauthorized - Authentication required"},
+        403: {"description": "Forbidden - Template needs host access, admin only"},
         404: {"description": "Template not found"},
         500: {"description": "Internal server error"},
     },
 )
 async def deploy_template(
-    req: TemplateDeployRequest, current_user: User = Depends(get_current_user)
+    req: TemplateDeployRequest,
+    background_tasks: BackgroundTasks,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db),
 ):
     """
     Deploy a template.
 
-    Requires authentication.
+    The rendered template is committed, then deployed in the background;
+    progress is sent to the user over the notifications WebSocket.
+    Deployments of marketplace templates are recorded in the template's
+    deployment history.
+
+    Requires authentication. Only admins may deploy templates that use
+    privileged mode, host namespaces or bind mounts outside the project.
     """
     try:
         if not req.template_name:
@@ -1937,19 +2219,73 @@ async def deploy_template(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="Template name is required.",
             )
-        template = load_template(req.template_name)
+        marketplace_template = None
+        if req.marketplace_template_id is not None:
+            marketplace_template = (
+                db.query(MarketplaceTemplate)
+                .filter(
+                    MarketplaceTemplate.id == req.marketplace_template_id,
+                    MarketplaceTemplate.status == TemplateStatus.APPROVED,
+                )
+                .first()
+            )
+            template = (
+                yaml.safe_load(marketplace_template.docker_compose_yaml)
+                if marketplace_template
+                else None
+            )
+        else:
+            template = load_template(req.template_name)
         if not template:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND, detail="Template not found"
             )
-        config_path = os.path.join(repo_path, f"{req.template_name}_template.yaml")
+        try:
+            rendered = get_template_compiler().compile(template).render(req.overrides)
+        except TemplateValidationError as e:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+        is_admin = current_user.role == UserRole.ADMIN
+        host_access = host_access_options(rendered.config)
+        if host_access and not is_admin:
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail="Admin access required for host access: " + ", ".join(host_access),
+            )
+        # The template name is user input: only sanitized names reach the path
+        if marketplace_template is not None:
+            config_name = f"marketplace_{marketplace_template.id}"
+        else:
+            config_name = project_name(req.template_name)
+        config_path = os.path.join(repo_path, f"{config_name}_template.yaml")
         with open(config_path, "w") as f:
-            yaml.safe_dump(template, f)
-        git_manager.commit_all(
-            f"Deploy template {req.template_name} by {current_user.username}"
+            yaml.safe_dump(rendered.config, f)
+        await git_manager.commit(
+            [config_path], f"Deploy template {req.template_name} by {current_user.username}"
+        )
+        project = project_name(
+            str(rendered.values.get("PROJECT_NAME") or req.template_name), current_user.id
+        )
+        if marketplace_template is not None:
+            history = get_compose_deployment_service().create_history(
+                db, marketplace_template.id, current_user.id, project, req.overrides
+            )
+            deployment_id = history.deployment_id
+            # The deployed template must no longer be recommended to this user
+            get_recommendation_engine().invalidate_user(current_user.id)
+            get_template_counter_buffer().increment(marketplace_template.id, "deployment_count")
+        else:
+            deployment_id = uuid.uuid4().hex
+        background_tasks.add_task(
+            get_compose_deployment_service().deploy,
+            rendered.config,
+            project=project,
+            user_id=current_user.id,
+            deployment_id=deployment_id,
+            allow_host_access=is_admin,
+        )
+        return TemplateDeployResponse(
+            template=req.template_name, status="deployed", deployment_id=deployment_id
         )
-        # TODO: Add actual deployment logic
-        return TemplateDeployResponse(template=req.template_name, status="deployed")
     except (OSError, yaml.YAMLError) as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -2218,14 +2554,22 @@ class HistoryEntry(BaseModel):
         503: {"description": "Service unavailable - History unavailable"},
     },
 )
-async def deployment_history(current_user: User = Depends(get_current_user)):
+async def deployment_history(
+    limit: int = Query(20, ge=1, le=100, description="Number of entries to return"),
+    before: Optional[str] = Query(
+        None, description="Return entries older than this commit, for the next page"
+    ),
+    current_user: User = Depends(get_current_user),
+):
     """
-    Get deployment history.
+    Get deployment history, newest first.
+
+    Pass the last commit of a page as ``before`` to get the next page.
 
     Requires authentication.
     """
     try:
-        history = git_manager.get_history()
+        history = await asyncio.to_thread(git_manager.get_history, limit, before)
         return [HistoryEntry(commit=h[0], author=h[1], message=h[2]) for h in history]
     except Exception as e:
         raise HTTPException(
@@ -2234,6 +2578,51 @@ async def deployment_history(current_user: User = Depends(get_current_user)):
         )
 
 
+class HistoryDiff(BaseModel):
+    """
+    Model for the configuration changes of a deployment.
+    """
+
+    commit: str = Field(..., description="Commit hash", example="def456")
+    base: str = Field(..., description="Commit the changes are relative to", example="abc123")
+    diff: str = Field(..., description="Unified diff of the configuration files")
+
+
+@app.get(
+    "/history/{commit}/diff",
+    response_model=HistoryDiff,
+    tags=["System"],
+    summary="Get deployment changes",
+    description="Returns the configuration changes made by a deployment.",
+    responses={
+        200: {"description": "Deployment changes", "model": HistoryDiff},
+        401: {"description": "Unauthorized - Authentication required"},
+        404: {"description": "Commit not found"},
+    },
+)
+async def deployment_diff(
+    commit: str,
+    base: Optional[str] = Query(
+        None, description="Commit to compare against; defaults to the previous commit"
+    ),
+    current_user: User = Depends(get_current_user),
+):
+    """
+    Get the configuration diff of a deployment.
+
+    Requires authentication.
+    """
+    base = base or f"{commit}^"
+    try:
+        diff = await asyncio.to_thread(git_manager.get_diff, base, commit)
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Commit not found: {str(e)}",
+        )
+    return HistoryDiff(commit=commit, base=base, diff=diff)
+
+
 # --- WebSocket Endpoints ---
 
 
@@ -2255,89 +2644,163 @@ async def websocket_notifications(
     await websocket_notifications_endpoint(websocket, user_id, db)
 
 
-@app.websocket("/ws/metrics/{container_id}")
-async def websocket_metrics_stream(
+@app.websocket("/ws/metrics/multiple")
+async def websocket_multiple_metrics_stream(
     websocket: WebSocket,
-    container_id: str,
     db: Session = Depends(get_db)
 ):
     """
-    WebSocket endpoint for real-time container metrics streaming.
+    WebSocket endpoint for real-time metrics streaming for multiple containers.
 
-    Connect to this endpoint to receive real-time metrics updates for a specific container.
-    Streams CPU, memory, network, and disk I/O metrics every few seconds.
+    Connect to this endpoint and send container IDs to receive real-time metrics
+    for multiple containers simultaneously.
 
     Authentication is required via token in query parameters:
-    ws://localhost:8000/ws/metrics/{container_id}?token=your_jwt_token
+    ws://localhost:8000/ws/metrics/multiple?token=your_jwt_token
+
+    Send a message with container IDs:
+    {"type": "subscribe", "container_ids": ["container1", "container2"]}
+
+    Clients using the v2 protocol (see app.websocket.metrics_protocol) can
+    send {"type": "resync"} to receive a fresh keyframe.
+
+    The push interval adapts to the data (see app.websocket.push_rate); set
+    the requested resolution with ``?interval=2`` or
+    {"type": "set_interval", "interval": 2}.
     """
     import json
     import asyncio
     from app.auth.dependencies import get_current_user_websocket
 
+    send_queue = None
     try:
         # Authenticate user
-        user = await get_current_user_websocket(websocket, db)
+        user = await get_current_user_websocket(websocket)
         if not user:
             await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
             return
 
-        await websocket.accept()
+        stream = MetricsStreamEncoder.negotiate(websocket)
+        await websocket.accept(subprotocol=stream.subprotocol if stream else None)
+
+        # Writes go through the connection's send queue and never wait on the client
+        send_queue = get_connection_manager().create_send_queue(websocket)
+
+        def send_control(message):
+            if stream:
+                return stream.enqueue(send_queue, message)
+            return send_queue.put(json.dumps(message))
 
         # Send connection confirmation
-        await websocket.send_text(
-            json.dumps({
-                "type": "connection_established",
-                "container_id": container_id,
-                "timestamp": datetime.utcnow().isoformat(),
-                "message": f"Connected to metrics stream for container {container_id}",
-            })
-        )
+        connection_message = {
+            "type": "connection_established",
+            "timestamp": datetime.utcnow().isoformat(),
+            "message": "Connected to multiple metrics stream",
+        }
+        if stream:
+            connection_message.update({"protocol": PROTOCOL_VERSION, "encoding": stream.encoding})
+        send_control(connection_message)
 
         # Get metrics service
-        metrics_service = get_metrics_service(db)
+        metrics_service = get_metrics_service(db, None)
+        subscribed_containers = []
+        push_rate = AdaptivePushInterval.from_websocket(websocket, base_interval=5)
+        wake = asyncio.Event()
 
-        # Stream metrics
-        while True:
-            try:
-                # Get current metrics
-                metrics = metrics_service.get_current_metrics(container_id)
+        # Handle incoming messages and stream metrics
+        async def handle_messages():
+            while not send_queue.closed:
+                try:
+                    data = await websocket.receive_text()
+                    message = json.loads(data)
 
-                if "error" not in metrics:
-                    # Send metrics update
-                    await websocket.send_text(
-                        json.dumps({
-                            "type": "metrics_update",
-                            "container_id": container_id,
+                    if message.get("type") == "subscribe":
+                        container_ids = message.get("container_ids", [])
+                        subscribed_containers.clear()
+                        subscribed_containers.extend(container_ids)
+
+                        send_control({
+                            "type": "subscription_updated",
+                            "container_ids": subscribed_containers,
                             "timestamp": datetime.utcnow().isoformat(),
-                            "metrics": metrics,
                         })
-                    )
-                else:
-                    # Send error message
-                    await websocket.send_text(
-                        json.dumps({
-                            "type": "error",
-                            "container_id": container_id,
+                        wake.set()
+                    elif message.get("type") == "set_interval":
+                        interval = push_rate.set_requested_interval(message.get("interval"))
+                        send_control({
+                            "type": "interval_updated",
+                            "interval": interval,
                             "timestamp": datetime.utcnow().isoformat(),
-                            "message": metrics["error"],
                         })
-                    )
+                        wake.set()
+                    elif message.get("type") == "resync" and stream:
+                        stream.request_keyframe()
+                        wake.set()
 
-                # Wait before next update (5 seconds)
-                await asyncio.sleep(5)
+                except WebSocketDisconnect:
+                    break
+                except Exception as e:
+                    send_control({
+                        "type": "error",
+                        "message": f"Error handling message: {str(e)}",
+                    })
 
-            except Exception as e:
-                await websocket.send_text(
-                    json.dumps({
+            # The client is gone: stop streaming
+            await send_queue.close()
+            wake.set()
+
+        async def wait_for_next_push(delay):
+            # Subscription and interval changes cut the wait short
+            try:
+                await asyncio.wait_for(wake.wait(), timeout=delay)
+            except asyncio.TimeoutError:
+                pass
+            wake.clear()
+
+        async def stream_metrics():
+            while not send_queue.closed:
+                try:
+                    delay = push_rate.current
+                    if subscribed_containers:
+                        # Get metrics for all subscribed containers
+                        metrics = metrics_service.get_multiple_container_metrics(subscribed_containers)
+                        changed = push_rate.has_changed(metrics)
+
+                        # Send metrics update; a queued update not yet sent is replaced
+                        backlog = len(send_queue)
+                        if stream:
+                            stream.enqueue_update(send_queue, metrics)
+                        else:
+                            send_queue.put(
+                                json.dumps({
+                                    "type": "multiple_metrics_update",
+                                    "timestamp": datetime.utcnow().isoformat(),
+                                    "metrics": metrics,
+                                }),
+                                coalesce_key="metrics:multiple",
+                            )
+                        delay = push_rate.record(changed, backlog=backlog)
+
+                    # Wait before next update
+                    await wait_for_next_push(delay)
+
+                except Exception as e:
+                    send_control({
                         "type": "error",
-                        "container_id": container_id,
                         "timestamp": datetime.utcnow().isoformat(),
-                        "message": f"Error getting metrics: {str(e)}",
+                        "message": f"Error streaming metrics: {str(e)}",
                     })
-                )
-                await asyncio.sleep(5)
+                    await asyncio.sleep(5)
+
+        # Run both tasks concurrently
+        await asyncio.gather(
+            handle_messages(),
+            stream_metrics()
+        )
 
     except Exception as e:
+        if send_queue is not None:
+            await send_queue.close()
         try:
             await websocket.send_text(
                 json.dumps({
@@ -2351,113 +2814,110 @@ async def websocket_metrics_stream(
             await websocket.close()
 
 
-@app.websocket("/ws/metrics/multiple")
-async def websocket_multiple_metrics_stream(
+@app.websocket("/ws/metrics/{container_id}")
+async def websocket_metrics_stream(
     websocket: WebSocket,
+    container_id: str,
     db: Session = Depends(get_db)
 ):
     """
-    WebSocket endpoint for real-time metrics streaming for multiple containers.
+    WebSocket endpoint for real-time container metrics streaming.
 
-    Connect to this endpoint and send container IDs to receive real-time metrics
-    for multiple containers simultaneously.
+    Connect to this endpoint to receive real-time metrics updates for a specific container.
+    Streams CPU, memory, network, and disk I/O metrics every few seconds.
 
     Authentication is required via token in query parameters:
-    ws://localhost:8000/ws/metrics/multiple?token=your_jwt_token
+    ws://localhost:8000/ws/metrics/{container_id}?token=your_jwt_token
 
-    Send a message with container IDs:
-    {"type": "subscribe", "container_ids": ["container1", "container2"]}
+    Add ``protocol=v2`` (and optionally ``encoding=msgpack``) or offer the
+    ``metrics.v2.json`` / ``metrics.v2.msgpack`` subprotocol for the
+    delta-encoded protocol described in app.websocket.metrics_protocol.
+    Add ``interval=<seconds>`` to request a push resolution; the interval
+    backs off while values are stable (see app.websocket.push_rate).
     """
     import json
     import asyncio
     from app.auth.dependencies import get_current_user_websocket
 
+    send_queue = None
     try:
         # Authenticate user
-        user = await get_current_user_websocket(websocket, db)
+        user = await get_current_user_websocket(websocket)
         if not user:
             await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
             return
 
-        await websocket.accept()
-
-        # Send connection confirmation
-        await websocket.send_text(
-            json.dumps({
-                "type": "connection_established",
-                "timestamp": datetime.utcnow().isoformat(),
-                "message": "Connected to multiple metrics stream",
-            })
-        )
-
-        # Get metrics service
-        metrics_service = get_metrics_service(db)
-        subscribed_containers = []
-
-        # Handle incoming messages and stream metrics
-        async def handle_messages():
-            while True:
-                try:
-                    data = await websocket.receive_text()
-                    message = json.loads(data)
-
-                    if message.get("type") == "subscribe":
-                        container_ids = message.get("container_ids", [])
-                        subscribed_containers.clear()
-                        subscribed_containers.extend(container_ids)
-
-                        await websocket.send_text(
-                            json.dumps({
-                                "type": "subscription_updated",
-                                "container_ids": subscribed_containers,
-                                "timestamp": datetime.utcnow().isoformat(),
-                            })
-                        )
+        stream = MetricsStreamEncoder.negotiate(websocket)
+        await websocket.accept(subprotocol=stream.subprotocol if stream else None)
 
-                except Exception as e:
-                    await websocket.send_text(
-                        json.dumps({
-                            "type": "error",
-                            "message": f"Error handling message: {str(e)}",
-                        })
-                    )
+        # Writes go through the connection's send queue and never wait on the client
+        send_queue = get_connection_manager().create_send_queue(websocket)
 
-        async def stream_metrics():
-            while True:
-                try:
-                    if subscribed_containers:
-                        # Get metrics for all subscribed containers
-                        metrics = metrics_service.get_multiple_container_metrics(subscribed_containers)
+        def send_control(message):
+            if stream:
+                return stream.enqueue(send_queue, message)
+            return send_queue.put(json.dumps(message))
 
-                        # Send metrics update
-                        await websocket.send_text(
-                            json.dumps({
-                                "type": "multiple_metrics_update",
-                                "timestamp": datetime.utcnow().isoformat(),
-                                "metrics": metrics,
-                            })
-                        )
+        # Send connection confirmation
+        connection_message = {
+            "type": "connection_established",
+            "container_id": container_id,
+            "timestamp": datetime.utcnow().isoformat(),
+            "message": f"Connected to metrics stream for container {container_id}",
+        }
+        if stream:
+            connection_message.update({"protocol": PROTOCOL_VERSION, "encoding": stream.encoding})
+        send_control(connection_message)
 
-                    # Wait before next update (5 seconds)
-                    await asyncio.sleep(5)
+        # Get metrics service
+        metrics_service = get_metrics_service(db, None)
+        push_rate = AdaptivePushInterval.from_websocket(websocket, base_interval=5)
 
-                except Exception as e:
-                    await websocket.send_text(
+        # Stream metrics until the client is dropped
+        while not send_queue.closed:
+            try:
+                # Get current metrics
+                metrics = metrics_service.get_current_metrics(container_id)
+                changed = push_rate.has_changed(metrics)
+                backlog = len(send_queue)
+
+                if "error" not in metrics and stream:
+                    stream.enqueue_update(send_queue, metrics)
+                elif "error" not in metrics:
+                    # Send metrics update; a queued update not yet sent is replaced
+                    send_queue.put(
                         json.dumps({
-                            "type": "error",
+                            "type": "metrics_update",
+                            "container_id": container_id,
                             "timestamp": datetime.utcnow().isoformat(),
-                            "message": f"Error streaming metrics: {str(e)}",
-                        })
+                            "metrics": metrics,
+                        }),
+                        coalesce_key=f"metrics:{container_id}",
                     )
-                    await asyncio.sleep(5)
+                else:
+                    # Send error message
+                    send_control({
+                        "type": "error",
+                        "container_id": container_id,
+                        "timestamp": datetime.utcnow().isoformat(),
+                        "message": metrics["error"],
+                    })
 
-        # Run both tasks concurrently
-        await asyncio.gather(
-            handle_messages(),
-            stream_metrics()
-        )
+                # Wait before next update
+                await asyncio.sleep(push_rate.record(changed, backlog=backlog))
+
+            except Exception as e:
+                send_control({
+                    "type": "error",
+                    "container_id": container_id,
+                    "timestamp": datetime.utcnow().isoformat(),
+                    "message": f"Error getting metrics: {str(e)}",
+                })
+                await asyncio.sleep(5)
 
     except Exception as e:
+        if send_queue is not None:
+            await send_queue.close()
         try:
             await websocket.send_text(
                 json.dumps({
@@ -2489,49 +2949,76 @@ async def websocket_enhanced_metrics_stream(
 
     Authentication is required via token in query parameters:
     ws://localhost:8000/ws/metrics/enhanced/{container_id}?token=your_jwt_token
+
+    Supports the v2 delta-encoded protocol (see app.websocket.metrics_protocol)
+    and ``interval=<seconds>`` push resolution requests (see app.websocket.push_rate).
+    Health scores and predictions are shared between subscribers of a container
+    and only recomputed when a new sample has been stored.
     """
     import json
     import asyncio
     from app.auth.dependencies import get_current_user_websocket
 
+    send_queue = None
     try:
         # Authenticate user
-        user = await get_current_user_websocket(websocket, db)
+        user = await get_current_user_websocket(websocket)
         if not user:
             await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
             return
 
-        await websocket.accept()
+        stream = MetricsStreamEncoder.negotiate(websocket)
+        await websocket.accept(subprotocol=stream.subprotocol if stream else None)
+
+        # Writes go through the connection's send queue and never wait on the client
+        send_queue = get_connection_manager().create_send_queue(websocket)
+
+        def send_control(message):
+            if stream:
+                return stream.enqueue(send_queue, message)
+            return send_queue.put(json.dumps(message))
 
         # Send connection confirmation
-        await websocket.send_text(
-            json.dumps({
-                "type": "connection_established",
-                "container_id": container_id,
-                "timestamp": datetime.utcnow().isoformat(),
-                "message": f"Connected to enhanced metrics stream for container {container_id}",
-                "features": ["real_time_metrics", "health_scores", "predictions", "alerts"]
-            })
-        )
+        connection_message = {
+            "type": "connection_established",
+            "container_id": container_id,
+            "timestamp": datetime.utcnow().isoformat(),
+            "message": f"Connected to enhanced metrics stream for container {container_id}",
+            "features": ["real_time_metrics", "health_scores", "predictions", "alerts"]
+        }
+        if stream:
+            connection_message.update({"protocol": PROTOCOL_VERSION, "encoding": stream.encoding})
+        send_control(connection_message)
 
         # Get services
-        metrics_service = get_metrics_service(db)
+        metrics_service = get_metrics_service(db, None)
         visualization_service = get_visualization_service(db)
 
-        # Start real-time collection
-        await metrics_service.start_real_time_collection(container_id, interval_seconds=3)
+        # Start real-time collection; pushes never outpace it
+        sampler_interval = 3
+        await metrics_service.start_real_time_collection(container_id, interval_seconds=sampler_interval)
+        push_rate = AdaptivePushInterval.from_websocket(
+            websocket, base_interval=sampler_interval, sampler_interval=sampler_interval
+        )
 
-        # Stream enhanced metrics
-        while True:
+        # Stream enhanced metrics until the client is dropped
+        while not send_queue.closed:
             try:
                 # Get current metrics
                 current_metrics = metrics_service.get_current_metrics(container_id)
 
+                # Derived fields are cached per container until a new sample lands
+                latest_sample = visualization_service.get_latest_sample_time(container_id)
+
                 # Get health score
-                health_score = visualization_service.calculate_health_score(container_id, hours=1)
+                health_score = visualization_service.get_cached_health_score(
+                    container_id, hours=1, sample_marker=latest_sample
+                )
 
                 # Get predictions (if enough data available)
-                predictions = visualization_service.predict_resource_usage(container_id, hours=6, prediction_hours=1)
+                predictions = visualization_service.get_cached_predictions(
+                    container_id, hours=6, prediction_hours=1, sample_marker=latest_sample
+                )
 
                 # Prepare enhanced metrics payload
                 enhanced_data = {
@@ -2545,23 +3032,31 @@ async def websocket_enhanced_metrics_stream(
                 }
 
                 # Send enhanced metrics update
-                await websocket.send_text(json.dumps(enhanced_data))
+                changed = push_rate.has_changed(
+                    {key: enhanced_data[key] for key in ("current_metrics", "health_score", "predictions")}
+                )
+                backlog = len(send_queue)
+                if stream:
+                    del enhanced_data["type"], enhanced_data["container_id"], enhanced_data["timestamp"]
+                    stream.enqueue_update(send_queue, enhanced_data)
+                else:
+                    send_queue.put(json.dumps(enhanced_data), coalesce_key=f"metrics:{container_id}")
 
-                # Wait before next update (3 seconds for enhanced stream)
-                await asyncio.sleep(3)
+                # Wait before next update
+                await asyncio.sleep(push_rate.record(changed, backlog=backlog))
 
             except Exception as e:
-                await websocket.send_text(
-                    json.dumps({
-                        "type": "error",
-                        "container_id": container_id,
-                        "timestamp": datetime.utcnow().isoformat(),
-                        "message": f"Error getting enhanced metrics: {str(e)}",
-                    })
-                )
+                send_control({
+                    "type": "error",
+                    "container_id": container_id,
+                    "timestamp": datetime.utcnow().isoformat(),
+                    "message": f"Error getting enhanced metrics: {str(e)}",
+                })
                 await asyncio.sleep(5)
 
     except Exception as e:
+        if send_queue is not None:
+            await send_queue.close()
         try:
             await websocket.send_text(
                 json.dumps({
@@ -2572,9 +3067,11 @@ async def websocket_enhanced_metrics_stream(
         except:
             pass
     finally:
+        if send_queue is not None:
+            await send_queue.close()
         # Stop real-time collection
         try:
-            metrics_service = get_metrics_service(db)
+            metrics_service = get_metrics_service(db, None)
             await metrics_service.stop_real_time_collection(container_id)
         except:
             pass
@@ -5,11 +5,13 @@ FastAPI router for Template Marketplace endpoints.
 from typing import List
 
 from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
+from fastapi.responses import PlainTextResponse
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
 from app.auth.dependencies import get_current_user, require_admin
-from app.db.database import get_db
-from app.db.models import User
+from app.db.database import get_async_db, get_db
+from app.db.models import TemplateStatus, User
 from app.marketplace.models import (
     Category,
     MarketplaceStats,
@@ -24,13 +26,16 @@ from app.marketplace.models import (
 )
 from app.marketplace.service import MarketplaceService
 from app.middleware.rate_limiting import rate_limit_admin, rate_limit_api, rate_limit_metrics
+from app.services.template_counter_service import get_template_counter_buffer
 
 router = APIRouter()
 
 
-def get_marketplace_service(db: Session = Depends(get_db)) -> MarketplaceService:
+def get_marketplace_service(
+    db: Session = Depends(get_db), async_db: AsyncSession = Depends(get_async_db)
+) -> MarketplaceService:
     """Get marketplace service instance."""
-    return MarketplaceService(db)
+    return MarketplaceService(db, async_db)
 
 
 @router.post("/templates", response_model=Template, status_code=status.HTTP_201_CREATED)
@@ -94,7 +99,7 @@ async def search_templates(
     )
     
     try:
-        templates_db, total = service.search_templates(search_params)
+        templates_db, total = await service.search_templates_async(search_params)
         pages = (total + per_page - 1) // per_page
 
         # Convert database models to dict format for Pydantic validation
@@ -159,9 +164,42 @@ async def get_template(
             detail="Template not found"
         )
     
+    get_template_counter_buffer().record_view(template_id)
     return template
 
 
+@router.get("/templates/{template_id}/download", response_class=PlainTextResponse)
+@rate_limit_api("60/minute")
+async def download_template(
+    request: Request,
+    response: Response,
+    template_id: int,
+    current_user: User = Depends(get_current_user),
+    service: MarketplaceService = Depends(get_marketplace_service),
+):
+    """
+    Download the Docker Compose YAML of an approved template.
+
+    Downloads are counted through the buffered counter service, so popular
+    templates do not issue a row UPDATE per download.
+    Rate limited to 60 requests per minute per user.
+    """
+    template = service.get_template(template_id)
+
+    if not template or template.status != TemplateStatus.APPROVED:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Template not found or not approved"
+        )
+
+    get_template_counter_buffer().record_download(template_id)
+    return PlainTextResponse(
+        content=template.docker_compose_yaml,
+        media_type="application/x-yaml",
+        headers={"Content-Disposition": f'attachment; filename="template-{template_id}.yml"'},
+    )
+
+
 @router.put("/templates/{template_id}", response_model=Template)
 @rate_limit_api("20/minute")
 async def update_template(
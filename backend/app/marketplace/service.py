@@ -7,7 +7,8 @@ import re
 from datetime import datetime
 from typing import List, Optional, Tuple
 
-from sqlalchemy import and_, desc, func, or_
+from sqlalchemy import Select, and_, desc, func, or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session, joinedload
 
 from app.db.models import (
@@ -32,9 +33,10 @@ from app.marketplace.models import (
 class MarketplaceService:
     """Service class for marketplace operations."""
 
-    def __init__(self, db: Session):
-        """Initialize the service with database session."""
+    def __init__(self, db: Session, async_db: Optional[AsyncSession] = None):
+        """Initialize the service with sync and optional async database sessions."""
         self.db = db
+        self.async_db = async_db
 
     def create_template(self, template_data: TemplateCreate, author_id: int) -> MarketplaceTemplate:
         """Create a new marketplace template."""
@@ -123,18 +125,39 @@ class MarketplaceService:
 
     def search_templates(self, search_params: TemplateSearch) -> Tuple[List[MarketplaceTemplate], int]:
         """Search templates with filters and pagination."""
-        query = self.db.query(MarketplaceTemplate).options(
-            joinedload(MarketplaceTemplate.author),
-            joinedload(MarketplaceTemplate.category),
-        )
-        
+        criteria = self._search_criteria(search_params)
+
+        # Get total count
+        total = self.db.scalar(self._count_statement(criteria))
+
+        # Apply sorting and pagination
+        result = self.db.execute(self._search_statement(criteria, search_params))
+        templates = result.unique().scalars().all()
+
+        return templates, total
+
+    async def search_templates_async(
+        self, search_params: TemplateSearch
+    ) -> Tuple[List[MarketplaceTemplate], int]:
+        """Search templates on the async session so the event loop is not blocked."""
+        if self.async_db is None:
+            return self.search_templates(search_params)
+
+        criteria = self._search_criteria(search_params)
+        total = await self.async_db.scalar(self._count_statement(criteria))
+        result = await self.async_db.execute(self._search_statement(criteria, search_params))
+
+        return result.unique().scalars().all(), total
+
+    def _search_criteria(self, search_params: TemplateSearch) -> list:
+        """Build the WHERE criteria for a template search."""
         # Filter by status (only show approved templates to regular users)
-        query = query.filter(MarketplaceTemplate.status == TemplateStatus.APPROVED)
+        criteria = [MarketplaceTemplate.status == TemplateStatus.APPROVED]
         
         # Apply search filters
         if search_params.query:
             search_term = f"%{search_params.query}%"
-            query = query.filter(
+            criteria.append(
                 or_(
                     MarketplaceTemplate.name.ilike(search_term),
                     MarketplaceTemplate.description.ilike(search_term),
@@ -142,31 +165,43 @@ class MarketplaceService:
             )
         
         if search_params.category_id:
-            query = query.filter(MarketplaceTemplate.category_id == search_params.category_id)
+            criteria.append(MarketplaceTemplate.category_id == search_params.category_id)
         
         if search_params.tags:
             # Filter by tags (JSON contains)
             for tag in search_params.tags:
-                query = query.filter(MarketplaceTemplate.tags.contains([tag]))
+                criteria.append(MarketplaceTemplate.tags.contains([tag]))
         
         if search_params.min_rating:
-            query = query.filter(MarketplaceTemplate.rating_avg >= search_params.min_rating)
-        
+            criteria.append(MarketplaceTemplate.rating_avg >= search_params.min_rating)
+
+        return criteria
+
+    def _count_statement(self, criteria: list) -> Select:
+        """Build the total-count statement for a template search."""
+        return select(func.count(MarketplaceTemplate.id)).where(*criteria)
+
+    def _search_statement(self, criteria: list, search_params: TemplateSearch) -> Select:
+        """Build the sorted, paginated statement for a template search."""
+        stmt = (
+            select(MarketplaceTemplate)
+            .options(
+                joinedload(MarketplaceTemplate.author),
+                joinedload(MarketplaceTemplate.category),
+            )
+            .where(*criteria)
+        )
+
         # Apply sorting
         sort_field = getattr(MarketplaceTemplate, search_params.sort_by)
         if search_params.sort_order == "desc":
-            query = query.order_by(desc(sort_field))
+            stmt = stmt.order_by(desc(sort_field))
         else:
-            query = query.order_by(sort_field)
-        
-        # Get total count
-        total = query.count()
-        
+            stmt = stmt.order_by(sort_field)
+
         # Apply pagination
         offset = (search_params.page - 1) * search_params.per_page
-        templates = query.offset(offset).limit(search_params.per_page).all()
-        
-        return templates, total
+        return stmt.offset(offset).limit(search_params.per_page)
 
     def create_review(self, template_id: int, review_data: ReviewCreate, user_id: int) -> Optional[TemplateReview]:
         """Create a review for a template."""
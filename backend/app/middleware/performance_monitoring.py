@@ -18,6 +18,12 @@ from fastapi import Request, Response
 from starlette.middleware.base import BaseHTTPMiddleware
 from starlette.types import ASGIApp
 
+from app.middleware.query_profiling import (
+    is_query_profiling_enabled,
+    start_query_profile,
+    stop_query_profile,
+)
+
 
 # Configure performance logger
 performance_logger = logging.getLogger("performance")
@@ -42,6 +48,8 @@ class PerformanceMetrics:
         self.system_metrics: List[Dict[str, Any]] = []
         self.slow_requests: List[Dict[str, Any]] = []
         self.endpoint_stats: Dict[str, Dict[str, Any]] = {}
+        self.query_stats: Dict[str, Dict[str, Any]] = {}
+        self.n_plus_one_patterns: Dict[str, Dict[str, Any]] = {}
         self.start_time = time.time()
         
     def add_request_metric(self, metric: Dict[str, Any]):
@@ -72,6 +80,43 @@ class PerformanceMetrics:
             
         if metric["status_code"] >= 400:
             stats["errors"] += 1
+
+        if "db_query_count" in metric:
+            self._add_query_metric(endpoint, metric)
+
+    def _add_query_metric(self, endpoint: str, metric: Dict[str, Any]):
+        """Aggregate SQL profiling data for an endpoint."""
+        if endpoint not in self.query_stats:
+            self.query_stats[endpoint] = {
+                "requests": 0,
+                "total_queries": 0,
+                "max_queries": 0,
+                "total_db_time": 0.0,
+                "n_plus_one_requests": 0,
+            }
+
+        stats = self.query_stats[endpoint]
+        stats["requests"] += 1
+        stats["total_queries"] += metric["db_query_count"]
+        stats["max_queries"] = max(stats["max_queries"], metric["db_query_count"])
+        stats["total_db_time"] += metric.get("db_time_ms", 0.0)
+
+        patterns = metric.get("n_plus_one") or []
+        if patterns:
+            stats["n_plus_one_requests"] += 1
+        for pattern in patterns:
+            key = f"{endpoint} {pattern['fingerprint']}"
+            entry = self.n_plus_one_patterns.setdefault(
+                key,
+                {
+                    "endpoint": endpoint,
+                    "fingerprint": pattern["fingerprint"],
+                    "occurrences": 0,
+                    "max_count": 0,
+                },
+            )
+            entry["occurrences"] += 1
+            entry["max_count"] = max(entry["max_count"], pattern["count"])
     
     def add_system_metric(self, metric: Dict[str, Any]):
         """Add a system metric."""
@@ -119,6 +164,26 @@ class PerformanceMetrics:
                     "errors": stats["errors"],
                     "error_rate": (stats["errors"] / stats["count"]) * 100
                 }
+
+        # SQL profiling data (only present when query profiling is enabled)
+        if self.query_stats:
+            summary["database"] = {
+                "endpoints": {
+                    endpoint: {
+                        "requests": stats["requests"],
+                        "avg_queries": stats["total_queries"] / stats["requests"],
+                        "max_queries": stats["max_queries"],
+                        "avg_db_time_ms": stats["total_db_time"] / stats["requests"],
+                        "n_plus_one_requests": stats["n_plus_one_requests"],
+                    }
+                    for endpoint, stats in self.query_stats.items()
+                },
+                "n_plus_one_patterns": sorted(
+                    self.n_plus_one_patterns.values(),
+                    key=lambda entry: entry["occurrences"],
+                    reverse=True,
+                ),
+            }
         
         return summary
     
@@ -157,6 +222,7 @@ class PerformanceMonitoringMiddleware(BaseHTTPMiddleware):
         slow_request_threshold: float = 200.0,  # milliseconds
         collect_system_metrics: bool = True,
         system_metrics_interval: float = 30.0,  # seconds
+        profile_queries: Optional[bool] = None,
     ):
         """
         Initialize performance monitoring middleware.
@@ -166,9 +232,14 @@ class PerformanceMonitoringMiddleware(BaseHTTPMiddleware):
             slow_request_threshold: Threshold in ms for logging slow requests
             collect_system_metrics: Whether to collect system metrics
             system_metrics_interval: Interval for system metrics collection
+            profile_queries: Whether to profile SQL queries per request
+                (defaults to the SQL_PROFILING_ENABLED environment variable)
         """
         super().__init__(app)
         self.slow_request_threshold = slow_request_threshold
+        self.profile_queries = (
+            is_query_profiling_enabled() if profile_queries is None else profile_queries
+        )
         self.collect_system_metrics = collect_system_metrics
         self.system_metrics_interval = system_metrics_interval
         self.last_system_metrics = 0
@@ -185,6 +256,9 @@ class PerformanceMonitoringMiddleware(BaseHTTPMiddleware):
         method = request.method
         url = str(request.url)
         path = request.url.path
+
+        # Profile SQL queries issued while handling this request
+        query_profile = start_query_profile() if self.profile_queries else None
         
         # Process request
         try:
@@ -201,6 +275,9 @@ class PerformanceMonitoringMiddleware(BaseHTTPMiddleware):
                 status_code=500,
                 content={"detail": "Internal server error during performance monitoring"}
             )
+        finally:
+            if query_profile is not None:
+                stop_query_profile()
         
         # Calculate response time
         end_time = time.time()
@@ -217,6 +294,21 @@ class PerformanceMonitoringMiddleware(BaseHTTPMiddleware):
             "endpoint": self._get_endpoint_name(path),
             "error": error
         }
+
+        if query_profile is not None:
+            profile = query_profile.to_dict()
+            metric.update(
+                {
+                    "db_query_count": profile["query_count"],
+                    "db_time_ms": profile["db_time_ms"],
+                    "n_plus_one": profile["n_plus_one"],
+                }
+            )
+            for pattern in profile["n_plus_one"]:
+                performance_logger.warning(
+                    f"N+1 QUERY: {method} {path} ran {pattern['count']} times "
+                    f"({pattern['total_time_ms']:.2f}ms): {pattern['fingerprint']}"
+                )
         
         # Add to metrics collection
         metrics_collector.add_request_metric(metric)
@@ -234,6 +326,12 @@ class PerformanceMonitoringMiddleware(BaseHTTPMiddleware):
         
         if response_time_ms > self.slow_request_threshold:
             response.headers["X-Performance-Warning"] = "slow-request"
+
+        if query_profile is not None:
+            response.headers["X-DB-Query-Count"] = str(metric["db_query_count"])
+            response.headers["X-DB-Time"] = f"{metric['db_time_ms']:.2f}ms"
+            if metric["n_plus_one"]:
+                response.headers["X-DB-N-Plus-One"] = str(len(metric["n_plus_one"]))
         
         return response
     
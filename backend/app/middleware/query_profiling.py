@@ -0,0 +1,191 @@
+"""
+Per-request SQL query profiling and N+1 detection.
+
+Hooks SQLAlchemy's ``before_cursor_execute``/``after_cursor_execute`` events
+and attributes every statement to the HTTP request that issued it through a
+context variable. For each request it records the number of queries, total
+database time and how often each statement fingerprint (the SQL with
+literals and parameter lists collapsed) was executed. Fingerprints repeated
+at least ``n_plus_one_threshold`` times are reported as N+1 candidates.
+
+Profiling is opt-in: set ``SQL_PROFILING_ENABLED=true`` (threshold via
+``SQL_N_PLUS_ONE_THRESHOLD``, default 10).
+"""
+
+import logging
+import os
+import re
+import threading
+import time
+from collections import Counter, defaultdict
+from contextvars import ContextVar
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger("performance")
+
+DEFAULT_N_PLUS_ONE_THRESHOLD = 10
+MAX_FINGERPRINT_LENGTH = 300
+
+_current_profile: ContextVar[Optional["QueryProfile"]] = ContextVar(
+    "sql_query_profile", default=None
+)
+_instrumented_engines: "set[int]" = set()
+
+_WHITESPACE_RE = re.compile(r"\s+")
+_STRING_LITERAL_RE = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_RE = re.compile(r"\b\d+(?:\.\d+)?\b")
+_PARAM_LIST_RE = re.compile(
+    r"\(\s*(?:\?|%s|%\(\w+\)s|:\w+)(?:\s*,\s*(?:\?|%s|%\(\w+\)s|:\w+))*\s*\)"
+)
+_PARAM_RE = re.compile(r"%\(\w+\)s|%s|:\w+|\$\d+")
+
+
+def is_query_profiling_enabled() -> bool:
+    """Whether SQL query profiling has been enabled in the environment."""
+    return os.getenv("SQL_PROFILING_ENABLED", "false").lower() == "true"
+
+
+def get_n_plus_one_threshold() -> int:
+    """Get the repeat count at which a statement is reported as N+1."""
+    try:
+        return int(os.getenv("SQL_N_PLUS_ONE_THRESHOLD", DEFAULT_N_PLUS_ONE_THRESHOLD))
+    except ValueError:
+        return DEFAULT_N_PLUS_ONE_THRESHOLD
+
+
+def fingerprint_statement(statement: str) -> str:
+    """
+    Normalize a SQL statement so repeated executions share one fingerprint.
+
+    Args:
+        statement: SQL statement as sent to the driver
+
+    Returns:
+        Statement with literals and parameter lists replaced by ``?``
+    """
+    fingerprint = _STRING_LITERAL_RE.sub("?", statement)
+    fingerprint = _PARAM_RE.sub("?", fingerprint)
+    fingerprint = _NUMBER_RE.sub("?", fingerprint)
+    fingerprint = _PARAM_LIST_RE.sub("(?)", fingerprint)
+    fingerprint = _WHITESPACE_RE.sub(" ", fingerprint).strip()
+    return fingerprint[:MAX_FINGERPRINT_LENGTH]
+
+
+class QueryProfile:
+    """Queries recorded for a single request."""
+
+    def __init__(self, n_plus_one_threshold: int = DEFAULT_N_PLUS_ONE_THRESHOLD):
+        """
+        Initialize an empty query profile.
+
+        Args:
+            n_plus_one_threshold: Repeat count at which a fingerprint is flagged
+        """
+        self.n_plus_one_threshold = n_plus_one_threshold
+        self.query_count = 0
+        self.total_time_ms = 0.0
+        self.fingerprints: Counter = Counter()
+        self.fingerprint_time_ms: Dict[str, float] = defaultdict(float)
+        # Sync dependencies and endpoints run in the threadpool
+        self._lock = threading.Lock()
+
+    def record(self, statement: str, duration_ms: float) -> None:
+        """Record one executed statement."""
+        fingerprint = fingerprint_statement(statement)
+        with self._lock:
+            self.query_count += 1
+            self.total_time_ms += duration_ms
+            self.fingerprints[fingerprint] += 1
+            self.fingerprint_time_ms[fingerprint] += duration_ms
+
+    def get_n_plus_one_patterns(self) -> List[Dict[str, Any]]:
+        """
+        Get statements repeated at least ``n_plus_one_threshold`` times.
+
+        Returns:
+            List of patterns ordered by repeat count
+        """
+        with self._lock:
+            return [
+                {
+                    "fingerprint": fingerprint,
+                    "count": count,
+                    "total_time_ms": round(self.fingerprint_time_ms[fingerprint], 2),
+                }
+                for fingerprint, count in self.fingerprints.most_common()
+                if count >= self.n_plus_one_threshold
+            ]
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Get a serializable summary of the profile."""
+        return {
+            "query_count": self.query_count,
+            "db_time_ms": round(self.total_time_ms, 2),
+            "unique_statements": len(self.fingerprints),
+            "n_plus_one": self.get_n_plus_one_patterns(),
+        }
+
+
+def start_query_profile(n_plus_one_threshold: Optional[int] = None) -> QueryProfile:
+    """
+    Start profiling queries for the current request context.
+
+    Args:
+        n_plus_one_threshold: Repeat count at which a fingerprint is flagged
+
+    Returns:
+        The active query profile
+    """
+    if n_plus_one_threshold is None:
+        n_plus_one_threshold = get_n_plus_one_threshold()
+    profile = QueryProfile(n_plus_one_threshold)
+    _current_profile.set(profile)
+    return profile
+
+
+def stop_query_profile() -> None:
+    """Stop profiling queries for the current request context."""
+    _current_profile.set(None)
+
+
+def get_current_query_profile() -> Optional[QueryProfile]:
+    """Get the query profile for the current request context, if any."""
+    return _current_profile.get()
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    """Remember when the statement started if a request is being profiled."""
+    if _current_profile.get() is not None:
+        conn.info.setdefault("query_profiler_start", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    """Attribute the finished statement to the current request's profile."""
+    profile = _current_profile.get()
+    if profile is None:
+        return
+    starts = conn.info.get("query_profiler_start")
+    if not starts:
+        return
+    duration_ms = (time.perf_counter() - starts.pop()) * 1000
+    profile.record(statement, duration_ms)
+
+
+def install_query_profiler(engine: Engine) -> None:
+    """
+    Register the profiling event listeners on an engine (idempotent).
+
+    Args:
+        engine: Synchronous engine (use ``async_engine.sync_engine`` for asyncio engines)
+    """
+    if id(engine) in _instrumented_engines:
+        return
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+    _instrumented_engines.add(id(engine))
+    logger.info(
+        f"SQL query profiling enabled for engine {engine.url.render_as_string(hide_password=True)}"
+    )
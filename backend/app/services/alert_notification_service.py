@@ -5,35 +5,94 @@ Alert notification service for real-time WebSocket notifications and email deliv
 import asyncio
 import json
 import logging
+import os
 from datetime import datetime
-from typing import Any, Dict, List, Optional, Set
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set
 from uuid import uuid4
 
 import redis.asyncio as redis
-from fastapi import WebSocket, WebSocketDisconnect
+from fastapi import WebSocket
 from sqlalchemy.orm import Session
 
 from app.db.models import MetricsAlert, User
 from app.email.service import get_email_service
 from app.email.templates import email_templates
+from app.websocket.send_queue import ClientSendQueue, SlowConsumerPolicy
 
 logger = logging.getLogger(__name__)
 
 
 class ConnectionManager:
-    """Manages WebSocket connections for real-time notifications."""
-
-    def __init__(self):
+    """
+    Manages WebSocket connections for real-time notifications.
+
+    One instance is shared per process. Without Redis, messages are delivered
+    to sockets held by this process only. Once ``start()`` connects to Redis,
+    messages are published once to a per-user or broadcast channel and every
+    worker delivers them to the sockets it holds; each worker subscribes only
+    to the user channels of its own connections.
+
+    Sending never waits on a client: each connection has a bounded
+    ClientSendQueue drained by its own writer task, and a full queue is
+    handled by the slow-consumer policy (WS_SLOW_CONSUMER_POLICY).
+    """
+
+    def __init__(
+        self,
+        channel_prefix: str = "notifications",
+        max_queue_size: Optional[int] = None,
+        slow_consumer_policy: Optional[str] = None,
+        send_timeout: Optional[float] = None,
+    ):
         # Store active connections by user_id
         self.active_connections: Dict[int, Set[WebSocket]] = {}
         self.connection_metadata: Dict[WebSocket, Dict[str, Any]] = {}
 
+        # Per-connection outbound queues
+        self.send_queues: Dict[WebSocket, ClientSendQueue] = {}
+        self.max_queue_size = max_queue_size or int(
+            os.getenv("WS_SEND_QUEUE_SIZE", "256")
+        )
+        self.slow_consumer_policy = SlowConsumerPolicy(
+            slow_consumer_policy or os.getenv("WS_SLOW_CONSUMER_POLICY", "coalesce")
+        )
+        self.send_timeout = send_timeout or float(os.getenv("WS_SEND_TIMEOUT", "10"))
+
+        # Redis pub/sub fan-out (disabled until start() succeeds)
+        self.channel_prefix = channel_prefix
+        self.redis_client: Optional[redis.Redis] = None
+        self._pubsub = None
+        self._listener_task: Optional[asyncio.Task] = None
+        self.stats = {
+            "published": 0,
+            "received": 0,
+            "delivered": 0,
+            "publish_errors": 0,
+        }
+
+    # ===== CHANNELS =====
+
+    def _user_channel(self, user_id: int) -> str:
+        return f"{self.channel_prefix}:user:{user_id}"
+
+    @property
+    def _broadcast_channel(self) -> str:
+        return f"{self.channel_prefix}:broadcast"
+
+    @property
+    def pubsub_enabled(self) -> bool:
+        """Whether messages are fanned out through Redis pub/sub."""
+        return self._pubsub is not None
+
+    # ===== CONNECTIONS =====
+
     async def connect(self, websocket: WebSocket, user_id: int):
         """Accept a WebSocket connection and register it for a user."""
         await websocket.accept()
 
         if user_id not in self.active_connections:
             self.active_connections[user_id] = set()
+            await self._subscribe_user(user_id)
 
         self.active_connections[user_id].add(websocket)
         self.connection_metadata[websocket] = {
@@ -41,6 +100,9 @@ class ConnectionManager:
             "connected_at": datetime.utcnow(),
             "connection_id": str(uuid4()),
         }
+        self.send_queues[websocket] = self.create_send_queue(
+            websocket, on_close=self._on_send_queue_closed
+        )
 
         logger.info(f"WebSocket connected for user {user_id}")
 
@@ -53,66 +115,292 @@ class ConnectionManager:
                 self.active_connections[user_id].discard(websocket)
                 if not self.active_connections[user_id]:
                     del self.active_connections[user_id]
+                    await self._unsubscribe_user(user_id)
 
             del self.connection_metadata[websocket]
+            send_queue = self.send_queues.pop(websocket, None)
+            if send_queue is not None:
+                await send_queue.close()
             logger.info(f"WebSocket disconnected for user {user_id}")
 
-    async def send_personal_message(self, message: Dict[str, Any], user_id: int):
-        """Send a message to all connections for a specific user."""
-        if user_id not in self.active_connections:
+    def create_send_queue(
+        self,
+        websocket: WebSocket,
+        on_close: Optional[Callable[[WebSocket], Awaitable[None]]] = None,
+    ) -> ClientSendQueue:
+        """
+        Start a send queue for a WebSocket with the configured slow-consumer settings.
+
+        Also used by WebSocket endpoints that manage their own connections,
+        such as the metrics streams.
+
+        Args:
+            websocket: Accepted connection
+            on_close: Coroutine called with the websocket once the writer gives up on it
+
+        Returns:
+            The started send queue
+        """
+        send_queue = ClientSendQueue(
+            websocket,
+            max_size=self.max_queue_size,
+            policy=self.slow_consumer_policy,
+            send_timeout=self.send_timeout,
+            on_close=on_close,
+        )
+        send_queue.start()
+        return send_queue
+
+    # ===== SENDING =====
+
+    def send_to_connection(
+        self,
+        websocket: WebSocket,
+        message: Dict[str, Any],
+        coalesce_key: Optional[str] = None,
+    ) -> bool:
+        """
+        Queue a message for one connection of this process.
+
+        Args:
+            websocket: Connection registered with connect()
+            message: Message to send
+            coalesce_key: Optional key; a queued message with the same key is
+                replaced instead of queued behind
+
+        Returns:
+            False if the connection is not registered or its queue is closed
+        """
+        return self._enqueue(websocket, json.dumps(message), coalesce_key)
+
+    async def send_personal_message(
+        self, message: Dict[str, Any], user_id: int, coalesce_key: Optional[str] = None
+    ):
+        """
+        Send a message to all connections for a specific user (on any worker).
+
+        Args:
+            message: Message to send
+            user_id: Recipient user ID
+            coalesce_key: Optional key; a queued message with the same key is
+                replaced instead of queued behind (e.g. latest metrics)
+        """
+        message_str = json.dumps(message)
+        if await self._publish(self._user_channel(user_id), message_str, coalesce_key):
             return
+        self._deliver_to_user(user_id, message_str, coalesce_key)
 
+    async def broadcast_message(
+        self, message: Dict[str, Any], coalesce_key: Optional[str] = None
+    ):
+        """Broadcast a message to all connected users (on every worker)."""
         message_str = json.dumps(message)
-        disconnected_connections = set()
+        if await self._publish(self._broadcast_channel, message_str, coalesce_key):
+            return
+        self._deliver_to_all(message_str, coalesce_key)
+
+    def _deliver_to_user(
+        self, user_id: int, message_str: str, coalesce_key: Optional[str] = None
+    ):
+        """Queue a serialized message for this process's sockets for a user."""
+        for websocket in self.active_connections.get(user_id, ()):
+            self._enqueue(websocket, message_str, coalesce_key)
+
+    def _deliver_to_all(self, message_str: str, coalesce_key: Optional[str] = None):
+        """Queue a serialized message for every socket held by this process."""
+        for websocket in self.send_queues:
+            self._enqueue(websocket, message_str, coalesce_key)
+
+    async def _on_send_queue_closed(self, websocket: WebSocket):
+        """Drop a connection whose writer failed or fell too far behind."""
+        await self.disconnect(websocket)
+
+    def _enqueue(
+        self, websocket: WebSocket, message_str: str, coalesce_key: Optional[str]
+    ) -> bool:
+        send_queue = self.send_queues.get(websocket)
+        if send_queue is not None and send_queue.put(message_str, coalesce_key):
+            self.stats["delivered"] += 1
+            return True
+        return False
+
+    async def flush(self, timeout: Optional[float] = None):
+        """
+        Wait until every queued message has been written to its socket.
+
+        Args:
+            timeout: Maximum number of seconds to wait
+        """
+        await asyncio.wait_for(
+            asyncio.gather(
+                *(queue.join() for queue in list(self.send_queues.values()))
+            ),
+            timeout,
+        )
+
+    # ===== REDIS PUB/SUB =====
 
-        for websocket in self.active_connections[user_id].copy():
+    async def start(self, redis_url: str) -> bool:
+        """
+        Enable cross-worker fan-out through Redis pub/sub.
+
+        Args:
+            redis_url: Redis connection URL
+
+        Returns:
+            True if pub/sub was enabled, False if Redis is unavailable
+        """
+        if self.pubsub_enabled:
+            return True
+
+        try:
+            client = redis.from_url(redis_url, decode_responses=True)
+            await client.ping()
+            pubsub = client.pubsub(ignore_subscribe_messages=True)
+            await pubsub.subscribe(self._broadcast_channel)
+            for user_id in self.active_connections:
+                await pubsub.subscribe(self._user_channel(user_id))
+        except Exception as e:
+            logger.warning(
+                f"Redis pub/sub unavailable, notifications stay process-local: {e}"
+            )
+            return False
+
+        self.redis_client = client
+        self._pubsub = pubsub
+        self._listener_task = asyncio.create_task(self._listen())
+        logger.info("Notification fan-out via Redis pub/sub enabled")
+        return True
+
+    async def stop(self):
+        """Stop the pub/sub listener and close the Redis connection."""
+        if self._listener_task is not None:
+            self._listener_task.cancel()
             try:
-                await websocket.send_text(message_str)
-            except WebSocketDisconnect:
-                disconnected_connections.add(websocket)
-            except Exception as e:
-                logger.error(f"Error sending message to user {user_id}: {e}")
-                disconnected_connections.add(websocket)
+                await self._listener_task
+            except asyncio.CancelledError:
+                pass
+            self._listener_task = None
+
+        pubsub, client = self._pubsub, self.redis_client
+        self._pubsub = None
+        self.redis_client = None
+        try:
+            if pubsub is not None:
+                await pubsub.aclose()
+            if client is not None:
+                await client.aclose()
+        except Exception as e:
+            logger.warning(f"Error closing Redis pub/sub connection: {e}")
 
-        # Clean up disconnected connections
-        for websocket in disconnected_connections:
-            await self.disconnect(websocket)
+    async def _publish(
+        self, channel: str, message_str: str, coalesce_key: Optional[str] = None
+    ) -> bool:
+        """Publish a message; returns False if it must be delivered locally instead."""
+        if not self.pubsub_enabled:
+            return False
+        if coalesce_key is not None:
+            # Messages are JSON objects, so a leading key line is unambiguous
+            message_str = f"{coalesce_key}\n{message_str}"
+        try:
+            await self.redis_client.publish(channel, message_str)
+            self.stats["published"] += 1
+            return True
+        except Exception as e:
+            self.stats["publish_errors"] += 1
+            logger.error(f"Error publishing notification to {channel}: {e}")
+            return False
 
-    async def broadcast_message(self, message: Dict[str, Any]):
-        """Broadcast a message to all connected users."""
-        message_str = json.dumps(message)
-        disconnected_connections = set()
-
-        for user_connections in self.active_connections.values():
-            for websocket in user_connections.copy():
-                try:
-                    await websocket.send_text(message_str)
-                except WebSocketDisconnect:
-                    disconnected_connections.add(websocket)
-                except Exception as e:
-                    logger.error(f"Error broadcasting message: {e}")
-                    disconnected_connections.add(websocket)
-
-        # Clean up disconnected connections
-        for websocket in disconnected_connections:
-            await self.disconnect(websocket)
+    async def _subscribe_user(self, user_id: int):
+        if self._pubsub is None:
+            return
+        try:
+            await self._pubsub.subscribe(self._user_channel(user_id))
+        except Exception as e:
+            logger.error(f"Error subscribing to notifications for user {user_id}: {e}")
+
+    async def _unsubscribe_user(self, user_id: int):
+        if self._pubsub is None:
+            return
+        try:
+            await self._pubsub.unsubscribe(self._user_channel(user_id))
+        except Exception as e:
+            logger.error(
+                f"Error unsubscribing from notifications for user {user_id}: {e}"
+            )
+
+    async def _listen(self):
+        """Deliver messages published by any worker to this process's sockets."""
+        user_prefix = f"{self.channel_prefix}:user:"
+        while True:
+            try:
+                message = await self._pubsub.get_message(timeout=1.0)
+                if message is None or message.get("type") != "message":
+                    continue
+                self.stats["received"] += 1
+
+                channel, data = message["channel"], message["data"]
+                coalesce_key = None
+                if not data.startswith("{"):
+                    coalesce_key, data = data.split("\n", 1)
+
+                if channel == self._broadcast_channel:
+                    self._deliver_to_all(data, coalesce_key)
+                elif channel.startswith(user_prefix):
+                    self._deliver_to_user(
+                        int(channel[len(user_prefix) :]), data, coalesce_key
+                    )
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Error handling pub/sub notification: {e}")
+                await asyncio.sleep(1)
+
+    # ===== INFO =====
 
     def get_connected_users(self) -> List[int]:
-        """Get list of currently connected user IDs."""
+        """Get list of user IDs connected to this process."""
         return list(self.active_connections.keys())
 
     def get_connection_count(self, user_id: int) -> int:
-        """Get number of active connections for a user."""
+        """Get number of active connections for a user on this process."""
         return len(self.active_connections.get(user_id, set()))
 
+    def get_queue_stats(self) -> Dict[str, Any]:
+        """Get aggregated send queue statistics for this process."""
+        totals = {"connections": len(self.send_queues), "queued": 0, "max_depth": 0}
+        for key in ("enqueued", "sent", "dropped", "coalesced"):
+            totals[key] = 0
+        for send_queue in self.send_queues.values():
+            totals["queued"] += len(send_queue)
+            totals["max_depth"] = max(
+                totals["max_depth"], send_queue.stats["max_depth"]
+            )
+            for key in ("enqueued", "sent", "dropped", "coalesced"):
+                totals[key] += send_queue.stats[key]
+        totals.update(
+            {
+                "policy": self.slow_consumer_policy.value,
+                "max_queue_size": self.max_queue_size,
+                **self.stats,
+            }
+        )
+        return totals
+
 
 class AlertNotificationService:
     """Service for handling alert notifications via WebSocket and email."""
 
-    def __init__(self, db: Session, redis_client: Optional[redis.Redis] = None):
+    def __init__(
+        self,
+        db: Session,
+        redis_client: Optional[redis.Redis] = None,
+        manager: Optional[ConnectionManager] = None,
+    ):
         self.db = db
-        self.redis_client = redis_client
-        self.connection_manager = ConnectionManager()
+        # Share the process-wide hub (and its Redis connection) by default
+        self.connection_manager = manager or connection_manager
+        self.redis_client = redis_client or self.connection_manager.redis_client
         self.email_service = get_email_service()
 
     async def notify_alert_triggered(
@@ -131,23 +419,7 @@ class AlertNotificationService:
         """
         try:
             # Create notification message
-            notification = {
-                "type": "alert_triggered",
-                "timestamp": datetime.utcnow().isoformat(),
-                "alert": {
-                    "id": alert.id,
-                    "name": alert.name,
-                    "description": alert.description,
-                    "container_id": alert.container_id,
-                    "container_name": alert.container_name,
-                    "metric_type": alert.metric_type,
-                    "threshold_value": alert.threshold_value,
-                    "comparison_operator": alert.comparison_operator,
-                    "current_value": metric_value,
-                },
-                "severity": self._determine_severity(alert, metric_value),
-                "message": self._generate_alert_message(alert, metric_value),
-            }
+            notification = self.build_alert_notification(alert, metric_value)
 
             # Send WebSocket notification
             await self.connection_manager.send_personal_message(notification, user.id)
@@ -169,6 +441,37 @@ class AlertNotificationService:
             logger.error(f"Error sending alert notification: {e}")
             return False
 
+    def build_alert_notification(
+        self, alert: MetricsAlert, metric_value: float
+    ) -> Dict[str, Any]:
+        """
+        Build the ``alert_triggered`` notification message for an alert.
+
+        Args:
+            alert: The triggered alert
+            metric_value: Current metric value that triggered the alert
+
+        Returns:
+            Notification message
+        """
+        return {
+            "type": "alert_triggered",
+            "timestamp": datetime.utcnow().isoformat(),
+            "alert": {
+                "id": alert.id,
+                "name": alert.name,
+                "description": alert.description,
+                "container_id": alert.container_id,
+                "container_name": alert.container_name,
+                "metric_type": alert.metric_type,
+                "threshold_value": alert.threshold_value,
+                "comparison_operator": alert.comparison_operator,
+                "current_value": metric_value,
+            },
+            "severity": self._determine_severity(alert, metric_value),
+            "message": self._generate_alert_message(alert, metric_value),
+        }
+
     async def acknowledge_alert(self, alert_id: int, user_id: int) -> bool:
         """
         Acknowledge an alert and notify connected clients.
@@ -262,32 +565,94 @@ class AlertNotificationService:
     ):
         """Send email notification for the alert."""
         try:
-            subject = f"DockerDeployer Alert: {alert.name}"
-
-            # Generate email content
-            html_content, text_content = email_templates.render_template(
-                "alert_notification",
-                username=user.username,
-                alert_name=alert.name,
-                alert_description=alert.description,
-                container_name=alert.container_name or alert.container_id,
-                metric_type=alert.metric_type,
-                current_value=metric_value,
-                threshold_value=alert.threshold_value,
-                comparison_operator=alert.comparison_operator,
-                app_name="DockerDeployer",
-            )
-
-            await self.email_service.send_email(
-                to_emails=[user.email],
-                subject=subject,
-                html_content=html_content,
-                text_content=text_content,
-            )
+            alert_data = self.build_alert_notification(alert, metric_value)["alert"]
+            await self.send_alert_email(alert_data, user.email, user.username)
 
         except Exception as e:
             logger.error(f"Error sending email notification: {e}")
 
+    async def send_alert_email(
+        self, alert_data: Dict[str, Any], to_email: str, username: str
+    ) -> bool:
+        """
+        Render and send the email for the ``alert`` section of a notification.
+
+        Args:
+            alert_data: Alert section of an ``alert_triggered`` notification
+            to_email: Recipient address
+            username: Recipient username
+
+        Returns:
+            True if the email provider accepted the message
+        """
+        subject = f"DockerDeployer Alert: {alert_data['name']}"
+
+        # Generate email content
+        html_content, text_content = email_templates.render_template(
+            "alert_notification",
+            username=username,
+            alert_name=alert_data["name"],
+            alert_description=alert_data.get("description"),
+            container_name=alert_data.get("container_name")
+            or alert_data["container_id"],
+            metric_type=alert_data["metric_type"],
+            current_value=alert_data["current_value"],
+            threshold_value=alert_data["threshold_value"],
+            comparison_operator=alert_data["comparison_operator"],
+            app_name="DockerDeployer",
+        )
+
+        return await self.email_service.send_email(
+            to_emails=[to_email],
+            subject=subject,
+            html_content=html_content,
+            text_content=text_content,
+        )
 
-# Global connection manager instance
+    async def send_alert_digest_email(
+        self, notifications: List[Dict[str, Any]], to_email: str, username: str
+    ) -> bool:
+        """
+        Send several ``alert_triggered`` notifications as one digest email.
+
+        Args:
+            notifications: Notifications to include, oldest first
+            to_email: Recipient address
+            username: Recipient username
+
+        Returns:
+            True if the email provider accepted the message
+        """
+        if len(notifications) == 1:
+            return await self.send_alert_email(
+                notifications[0]["alert"], to_email, username
+            )
+
+        alerts = [
+            {**notification["alert"], "timestamp": notification.get("timestamp", "")}
+            for notification in notifications
+        ]
+        subject = f"DockerDeployer Alerts: {len(alerts)} alerts triggered"
+
+        html_content, text_content = email_templates.render_template(
+            "alert_digest",
+            username=username,
+            alerts=alerts,
+            app_name="DockerDeployer",
+        )
+
+        return await self.email_service.send_email(
+            to_emails=[to_email],
+            subject=subject,
+            html_content=html_content,
+            text_content=text_content,
+        )
+
+
+# Global connection manager instance (the per-process hub)
 connection_manager = ConnectionManager()
+
+
+def get_connection_manager() -> ConnectionManager:
+    """Get the process-wide connection manager."""
+    return connection_manager
@@ -0,0 +1,556 @@
+"""
+Compiled, vectorized evaluation of metrics alert rules.
+
+Active ``MetricsAlert`` rows are compiled into NumPy arrays (container
+index, metric index, threshold, operator, hysteresis, ``for`` duration) and
+kept in memory, so checking a batch of samples is a handful of array
+comparisons instead of one query and an ``if/elif`` chain per alert. The
+index is rebuilt when alerts are created, updated or deleted, and every
+``refresh_interval`` seconds to pick up changes made by other workers.
+
+Rules support:
+
+- hysteresis: a triggered alert only resolves once the value is back past
+  the threshold by ``hysteresis`` (e.g. ``> 80`` with hysteresis 5 resolves
+  below 75)
+- ``for_samples``: the condition must hold for N consecutive samples
+  before the alert fires
+- rate rules (``rule_type == "rate"``): the threshold applies to the
+  per-second rate of change of the metric between consecutive samples
+
+Trigger state lives in the engine. State changes are coalesced per alert
+and written back in batches, like the template counters.
+"""
+
+import asyncio
+import logging
+import threading
+import time
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional
+
+import numpy as np
+from sqlalchemy import DateTime, bindparam, text
+from sqlalchemy.orm import Session
+
+from app.db.models import AlertRuleType, MetricsAlert
+
+logger = logging.getLogger(__name__)
+
+OPERATORS = (">", "<", ">=", "<=", "==", "!=")
+
+# Alert metric types that are named differently in container stats
+METRIC_ALIASES = {
+    "network_rx": "network_rx_bytes",
+    "network_tx": "network_tx_bytes",
+    "block_read": "block_read_bytes",
+    "block_write": "block_write_bytes",
+}
+
+_PERSIST_STATE = text(
+    "UPDATE metrics_alerts "
+    "SET is_triggered = :is_triggered, trigger_count = :trigger_count, "
+    "last_triggered_at = :last_triggered_at "
+    "WHERE id = :id"
+).bindparams(bindparam("last_triggered_at", type_=DateTime))
+
+
+@dataclass
+class AlertRule:
+    """Detached snapshot of an active alert, as used for evaluation and notifications."""
+
+    id: int
+    name: str
+    description: Optional[str]
+    container_id: str
+    container_name: Optional[str]
+    metric_type: str
+    threshold_value: float
+    comparison_operator: str
+    created_by: int
+    hysteresis: float = 0.0
+    for_samples: int = 1
+    rule_type: str = AlertRuleType.THRESHOLD.value
+
+    @classmethod
+    def from_alert(cls, alert: MetricsAlert) -> "AlertRule":
+        """Build a rule from a MetricsAlert row."""
+        return cls(
+            id=alert.id,
+            name=alert.name,
+            description=alert.description,
+            container_id=alert.container_id,
+            container_name=alert.container_name,
+            metric_type=getattr(alert.metric_type, "value", alert.metric_type),
+            threshold_value=float(alert.threshold_value),
+            comparison_operator=getattr(
+                alert.comparison_operator, "value", alert.comparison_operator
+            ),
+            created_by=alert.created_by,
+            hysteresis=float(alert.hysteresis or 0.0),
+            for_samples=max(1, int(alert.for_samples or 1)),
+            rule_type=getattr(alert.rule_type, "value", alert.rule_type)
+            or AlertRuleType.THRESHOLD.value,
+        )
+
+    @property
+    def stats_key(self) -> str:
+        """Name of the container stats field this rule reads."""
+        return METRIC_ALIASES.get(self.metric_type, self.metric_type)
+
+
+class AlertRuleEngine:
+    """In-memory rule index evaluating sample batches against every active alert at once."""
+
+    def __init__(
+        self,
+        session_factory: Optional[Callable[[], Session]] = None,
+        flush_interval: float = 5.0,
+        max_pending: int = 500,
+        refresh_interval: float = 60.0,
+    ):
+        """
+        Initialize the rule engine.
+
+        Args:
+            session_factory: Callable returning a new database session
+            flush_interval: Seconds between writes of changed alert state
+            max_pending: Number of changed alerts that triggers an early flush
+            refresh_interval: Seconds after which the rule index is reloaded
+        """
+        self._session_factory = session_factory
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.refresh_interval = refresh_interval
+
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._stale = True
+        self._loaded_at = 0.0
+        self._last_flush = time.monotonic()
+        self._task: Optional[asyncio.Task] = None
+        self._stopping: Optional[asyncio.Event] = None
+
+        # Pending state writes, coalesced per alert ID
+        self._pending: Dict[int, Dict[str, Any]] = {}
+
+        self._compile([])
+        self.stats = {
+            "reloads": 0,
+            "batches": 0,
+            "samples": 0,
+            "fired": 0,
+            "resolved": 0,
+            "flushes": 0,
+            "rows_updated": 0,
+            "errors": 0,
+            "last_batch_ms": 0.0,
+        }
+
+    # ===== RULE INDEX =====
+
+    def invalidate(self) -> None:
+        """Rebuild the rule index before the next evaluation (call after alert CRUD)."""
+        self._stale = True
+
+    def _ensure_loaded(self, db: Optional[Session]) -> None:
+        if (
+            not self._stale
+            and time.monotonic() - self._loaded_at < self.refresh_interval
+        ):
+            return
+
+        owns_session = db is None
+        if owns_session:
+            db = self._new_session()
+        try:
+            alerts = db.query(MetricsAlert).filter(MetricsAlert.is_active == True).all()
+        finally:
+            if owns_session:
+                db.close()
+
+        self._compile(alerts)
+        self._stale = False
+        self._loaded_at = time.monotonic()
+        self.stats["reloads"] += 1
+        logger.debug(f"Compiled {len(self._rules)} alert rules")
+
+    def _compile(self, alerts: List[MetricsAlert]) -> None:
+        """Build the rule arrays, carrying over trigger state of rules already known."""
+        previous = {
+            rule.id: (
+                self._triggered[i],
+                self._streak[i],
+                self._trigger_count[i],
+                self._last_triggered_at[i],
+            )
+            for i, rule in enumerate(getattr(self, "_rules", []))
+        }
+
+        rules: List[AlertRule] = []
+        state = []
+        for alert in alerts:
+            rule = AlertRule.from_alert(alert)
+            if rule.comparison_operator not in OPERATORS:
+                logger.warning(
+                    f"Skipping alert {rule.id}: unknown comparison operator {rule.comparison_operator}"
+                )
+                continue
+            rules.append(rule)
+            state.append(
+                previous.get(
+                    rule.id,
+                    (
+                        bool(alert.is_triggered),
+                        0,
+                        int(alert.trigger_count or 0),
+                        alert.last_triggered_at,
+                    ),
+                )
+            )
+
+        old_container_index = getattr(self, "_container_index", {})
+        old_metric_index = getattr(self, "_metric_index", {})
+        self._container_index: Dict[str, int] = {}
+        self._metric_index: Dict[str, int] = {}
+        for rule in rules:
+            self._container_index.setdefault(
+                rule.container_id, len(self._container_index)
+            )
+            self._metric_index.setdefault(rule.stats_key, len(self._metric_index))
+        self._metric_names = list(self._metric_index)
+
+        count = len(rules)
+        self._rules = rules
+        self._rule_container = np.array(
+            [self._container_index[r.container_id] for r in rules], dtype=np.intp
+        )
+        self._rule_metric = np.array(
+            [self._metric_index[r.stats_key] for r in rules], dtype=np.intp
+        )
+        self._threshold = np.array([r.threshold_value for r in rules], dtype=np.float64)
+        self._for_samples = np.array([r.for_samples for r in rules], dtype=np.int64)
+        self._is_rate = np.array(
+            [r.rule_type == AlertRuleType.RATE.value for r in rules], dtype=bool
+        )
+        self._has_rate = bool(self._is_rate.any())
+
+        operators = np.array([r.comparison_operator for r in rules], dtype=object)
+        self._op_masks = {op: operators == op for op in OPERATORS} if count else {}
+
+        # Threshold a triggered alert must cross back over to resolve
+        hysteresis = np.array([r.hysteresis for r in rules], dtype=np.float64)
+        direction = np.zeros(count)
+        if count:
+            direction[self._op_masks[">"] | self._op_masks[">="]] = 1.0
+            direction[self._op_masks["<"] | self._op_masks["<="]] = -1.0
+        self._release_threshold = self._threshold - direction * hysteresis
+
+        self._triggered = np.array([s[0] for s in state], dtype=bool)
+        self._streak = np.array([s[1] for s in state], dtype=np.int64)
+        self._trigger_count = np.array([s[2] for s in state], dtype=np.int64)
+        self._last_triggered_at: List[Optional[datetime]] = [s[3] for s in state]
+
+        # Previous sample per container, for rate rules (kept across reloads)
+        shape = (len(self._container_index), len(self._metric_names))
+        last_values, last_times = np.full(shape, np.nan), np.full(shape, np.nan)
+        for container_id, row in self._container_index.items():
+            old_row = old_container_index.get(container_id)
+            if old_row is None:
+                continue
+            for col, name in enumerate(self._metric_names):
+                old_col = old_metric_index.get(name)
+                if old_col is not None:
+                    last_values[row, col] = self._last_values[old_row, old_col]
+                    last_times[row, col] = self._last_times[old_row, old_col]
+        self._last_values, self._last_times = last_values, last_times
+
+    # ===== EVALUATION =====
+
+    def _compare(self, values: np.ndarray, thresholds: np.ndarray) -> np.ndarray:
+        masks = self._op_masks
+        return (
+            (masks[">"] & (values > thresholds))
+            | (masks["<"] & (values < thresholds))
+            | (masks[">="] & (values >= thresholds))
+            | (masks["<="] & (values <= thresholds))
+            | (masks["=="] & (values == thresholds))
+            | (masks["!="] & (values != thresholds))
+        )
+
+    def evaluate(
+        self,
+        samples: Dict[str, Dict[str, Any]],
+        db: Optional[Session] = None,
+        timestamp: Optional[float] = None,
+    ) -> List[Dict[str, Any]]:
+        """
+        Evaluate a batch of samples against all active rules.
+
+        Rules of containers missing from the batch, or whose metric is
+        missing from the sample, keep their current state.
+
+        Args:
+            samples: Mapping of container ID to its current metrics
+            db: Database session used to (re)load the rule index
+            timestamp: Unix timestamp of the samples (now if omitted)
+
+        Returns:
+            List of alerts that fired with this batch
+        """
+        now = timestamp if timestamp is not None else time.time()
+        started = time.perf_counter()
+
+        with self._lock:
+            self._ensure_loaded(db)
+            if not self._rules:
+                return []
+
+            # Gather the batch into a containers x metrics matrix (NaN = no value)
+            values = np.full(self._last_values.shape, np.nan)
+            rows = []
+            metric_names = self._metric_names
+            for container_id, metrics in samples.items():
+                row = self._container_index.get(container_id)
+                if row is None or not metrics:
+                    continue
+                rows.append(row)
+                sample = values[row]
+                for col, name in enumerate(metric_names):
+                    value = metrics.get(name)
+                    if type(value) is float or type(value) is int:
+                        sample[col] = value
+
+            rule_c, rule_m = self._rule_container, self._rule_metric
+            observed = values[rule_c, rule_m]
+            if self._has_rate:
+                elapsed = now - self._last_times
+                elapsed[~(elapsed > 0)] = np.nan
+                rates = (values - self._last_values) / elapsed
+                observed = np.where(self._is_rate, rates[rule_c, rule_m], observed)
+                # Metrics missing from this sample keep their previous value
+                present = ~np.isnan(values)
+                self._last_values[present] = values[present]
+                self._last_times[present] = now
+
+            valid = ~np.isnan(observed)
+            observed = np.where(valid, observed, 0.0)
+            condition = valid & self._compare(observed, self._threshold)
+            holding = self._compare(observed, self._release_threshold)
+
+            # Count consecutive matching samples; missing values leave the streak alone
+            self._streak = np.where(
+                condition,
+                np.minimum(self._streak + 1, self._for_samples),
+                np.where(valid, 0, self._streak),
+            )
+
+            fire = condition & ~self._triggered & (self._streak >= self._for_samples)
+            resolve = valid & self._triggered & ~holding
+
+            self._triggered[fire] = True
+            self._triggered[resolve] = False
+            self._trigger_count[fire] += 1
+
+            triggered_alerts = []
+            fired_at = datetime.fromtimestamp(now, timezone.utc).replace(tzinfo=None)
+            for i in np.flatnonzero(fire):
+                rule = self._rules[i]
+                self._last_triggered_at[i] = fired_at
+                triggered_alerts.append(
+                    {
+                        "alert": rule,
+                        "alert_id": rule.id,
+                        "alert_name": rule.name,
+                        "container_id": rule.container_id,
+                        "container_name": rule.container_name,
+                        "metric_type": rule.metric_type,
+                        "metric_value": float(observed[i]),
+                        "threshold_value": rule.threshold_value,
+                        "comparison_operator": rule.comparison_operator,
+                        "trigger_count": int(self._trigger_count[i]),
+                        "fired_at": fired_at,
+                    }
+                )
+            for i in np.flatnonzero(fire | resolve):
+                self._pending[self._rules[i].id] = {
+                    "id": self._rules[i].id,
+                    "is_triggered": bool(self._triggered[i]),
+                    "trigger_count": int(self._trigger_count[i]),
+                    "last_triggered_at": self._last_triggered_at[i],
+                }
+
+            self.stats["batches"] += 1
+            self.stats["samples"] += len(rows)
+            self.stats["fired"] += len(triggered_alerts)
+            self.stats["resolved"] += int(resolve.sum())
+            self.stats["last_batch_ms"] = (time.perf_counter() - started) * 1000
+
+        return triggered_alerts
+
+    def get_rule_state(self, alert_id: int) -> Optional[Dict[str, Any]]:
+        """
+        Get the in-memory state of a compiled rule.
+
+        Args:
+            alert_id: Alert ID
+
+        Returns:
+            Trigger state of the rule, or None if it is not compiled
+        """
+        with self._lock:
+            for i, rule in enumerate(self._rules):
+                if rule.id == alert_id:
+                    return {
+                        "is_triggered": bool(self._triggered[i]),
+                        "trigger_count": int(self._trigger_count[i]),
+                        "last_triggered_at": self._last_triggered_at[i],
+                        "streak": int(self._streak[i]),
+                    }
+        return None
+
+    # ===== PERSISTENCE =====
+
+    def pending(self) -> int:
+        """Number of alerts with state not yet written to the database."""
+        with self._lock:
+            return len(self._pending)
+
+    def _drain(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            drained = list(self._pending.values())
+            self._pending.clear()
+        return drained
+
+    def _restore(self, drained: List[Dict[str, Any]]) -> None:
+        with self._lock:
+            for params in drained:
+                # Newer state recorded meanwhile wins
+                self._pending.setdefault(params["id"], params)
+
+    def flush(self, db: Optional[Session] = None) -> int:
+        """
+        Write pending alert state changes in one transaction.
+
+        Args:
+            db: Optional database session; a new one is created if omitted
+
+        Returns:
+            Number of alert rows updated
+        """
+        with self._flush_lock:
+            self._last_flush = time.monotonic()
+            drained = self._drain()
+            if not drained:
+                return 0
+
+            owns_session = db is None
+            if owns_session:
+                db = self._new_session()
+
+            try:
+                db.execute(_PERSIST_STATE, drained)
+                db.commit()
+            except Exception as e:
+                db.rollback()
+                self._restore(drained)
+                self.stats["errors"] += 1
+                logger.error(f"Failed to flush alert state: {e}")
+                return 0
+            finally:
+                if owns_session:
+                    db.close()
+
+            self.stats["flushes"] += 1
+            self.stats["rows_updated"] += len(drained)
+            logger.debug(f"Flushed state of {len(drained)} alerts")
+            return len(drained)
+
+    def maybe_flush(self, db: Optional[Session] = None) -> int:
+        """
+        Flush if enough changes are pending, or if no background loop is running and the interval elapsed.
+
+        Args:
+            db: Optional database session to flush with
+
+        Returns:
+            Number of alert rows updated
+        """
+        pending = self.pending()
+        if not pending:
+            return 0
+        if pending >= self.max_pending or (
+            self._task is None
+            and time.monotonic() - self._last_flush >= self.flush_interval
+        ):
+            return self.flush(db)
+        return 0
+
+    def _new_session(self) -> Session:
+        """Create a database session for loading rules and flushing."""
+        if self._session_factory is None:
+            from app.db.database import SessionLocal
+
+            self._session_factory = SessionLocal
+        return self._session_factory()
+
+    async def _flush_periodically(self) -> None:
+        """Flush pending state every ``flush_interval`` seconds until stopped."""
+        while not self._stopping.is_set():
+            try:
+                await asyncio.wait_for(
+                    self._stopping.wait(), timeout=self.flush_interval
+                )
+            except asyncio.TimeoutError:
+                pass
+
+            try:
+                await asyncio.to_thread(self.flush)
+            except Exception as e:
+                logger.error(f"Error in alert state flush loop: {e}")
+
+    def start(self) -> None:
+        """Start the background flush loop on the running event loop."""
+        if self._task is not None and not self._task.done():
+            return
+        self._stopping = asyncio.Event()
+        self._task = asyncio.create_task(self._flush_periodically())
+        logger.info(f"Alert state flush loop started (interval {self.flush_interval}s)")
+
+    async def stop(self) -> None:
+        """Stop the background loop and flush whatever state is still pending."""
+        if self._task is not None:
+            self._stopping.set()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+        await asyncio.to_thread(self.flush)
+        logger.info("Alert state flush loop stopped")
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get rule index and evaluation statistics."""
+        with self._lock:
+            return {
+                **self.stats,
+                "rules": len(self._rules),
+                "containers": len(self._container_index),
+                "metrics": len(self._metric_names),
+                "triggered": int(self._triggered.sum()),
+                "pending": len(self._pending),
+            }
+
+
+# Global rule engine instance
+_rule_engine: Optional[AlertRuleEngine] = None
+
+
+def get_alert_rule_engine() -> AlertRuleEngine:
+    """Get the global alert rule engine instance."""
+    global _rule_engine
+    if _rule_engine is None:
+        _rule_engine = AlertRuleEngine()
+    return _rule_engine
@@ -0,0 +1,326 @@
+"""
+Compose deployment service.
+
+Runs deployments with ``docker_manager.compose.ComposeDeployer`` after the
+deploy endpoints have committed the configuration. Progress events are
+streamed to the requesting user over the notifications WebSocket as
+``deployment_progress`` messages. For marketplace templates, the outcome and
+per-stage timings are recorded in ``TemplateDeploymentHistory``.
+
+Image pulls go through the shared image pull coordinator, which prefetches
+the images of featured and most downloaded templates while no deployments
+are running.
+"""
+
+import asyncio
+import logging
+import os
+import re
+import uuid
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+
+import yaml
+from sqlalchemy import desc
+from sqlalchemy.orm import Session
+
+from app.db.models import MarketplaceTemplate, TemplateDeploymentHistory, TemplateStatus
+from docker_manager.compose import ComposeDeployer
+from docker_manager.images import ImagePullCoordinator, get_image_pull_coordinator
+
+logger = logging.getLogger(__name__)
+
+
+def project_name(name: str, user_id: Optional[int] = None) -> str:
+    """
+    Turn a template or stack name into a valid compose project name.
+
+    Deploys recreate the containers of their project, so deploys on behalf of
+    a user get a project of their own by passing ``user_id``.
+    """
+    project = re.sub(r"[^a-z0-9_-]+", "-", name.lower()).strip("-_") or "default"
+    if user_id is not None:
+        project = f"{project}-u{user_id}"
+    return project
+
+
+class ComposeDeploymentService:
+    """Runs compose deployments and reports their progress."""
+
+    def __init__(
+        self,
+        session_factory: Optional[Callable[[], Session]] = None,
+        deployments_dir: Optional[str] = None,
+        max_parallel_pulls: Optional[int] = None,
+        client_factory: Optional[Callable[[], Any]] = None,
+        image_coordinator: Optional[ImagePullCoordinator] = None,
+    ):
+        """
+        Initialize the deployment service.
+
+        Args:
+            session_factory: Callable returning a new database session
+            deployments_dir: Directory holding one working directory per project
+            max_parallel_pulls: Images pulled or built at the same time
+            client_factory: Callable returning a Docker SDK client
+            image_coordinator: Coordinator shared by all deployments' pulls
+        """
+        self._session_factory = session_factory
+        self.deployments_dir = deployments_dir or os.getenv(
+            "DEPLOYMENTS_DIR",
+            os.path.abspath(
+                os.path.join(os.path.dirname(__file__), "../../../deployments")
+            ),
+        )
+        self.max_parallel_pulls = max_parallel_pulls or int(
+            os.getenv("DEPLOY_MAX_PARALLEL_PULLS", "4")
+        )
+        self._client_factory = client_factory
+        self.images = image_coordinator or get_image_pull_coordinator()
+        self.active: Dict[str, str] = {}
+        self._project_locks: Dict[str, asyncio.Lock] = {}
+        self.stats = {"started": 0, "deployed": 0, "failed": 0}
+
+    def _new_session(self) -> Session:
+        """Create a database session for recording history."""
+        if self._session_factory is None:
+            from app.db.database import SessionLocal
+
+            self._session_factory = SessionLocal
+        return self._session_factory()
+
+    def _docker_client(self):
+        if self._client_factory is None:
+            from docker_manager.manager import DockerManager
+
+            return DockerManager().client
+        return self._client_factory()
+
+    def create_history(
+        self,
+        db: Session,
+        template_id: int,
+        user_id: int,
+        deployment_name: str,
+        overrides: Optional[Dict[str, Any]] = None,
+    ) -> TemplateDeploymentHistory:
+        """
+        Record a requested deployment of a marketplace template.
+
+        Args:
+            db: Database session
+            template_id: Marketplace template ID
+            user_id: Requesting user ID
+            deployment_name: Project name of the deployment
+            overrides: Variable overrides the template was rendered with
+
+        Returns:
+            The pending history record
+        """
+        history = TemplateDeploymentHistory(
+            template_id=template_id,
+            user_id=user_id,
+            deployment_id=uuid.uuid4().hex,
+            deployment_name=deployment_name,
+            deployment_status="pending",
+            environment_overrides=overrides or None,
+            deployment_requested_at=datetime.utcnow(),
+        )
+        db.add(history)
+        db.commit()
+        db.refresh(history)
+        return history
+
+    async def deploy(
+        self,
+        config: Dict[str, Any],
+        project: str,
+        user_id: int,
+        deployment_id: Optional[str] = None,
+        allow_host_access: bool = False,
+    ) -> Dict[str, Any]:
+        """
+        Deploy a configuration, streaming progress to the user.
+
+        Args:
+            config: Rendered compose configuration
+            project: Compose project name
+            user_id: User receiving progress events
+            deployment_id: ID of the deployment; a matching
+                ``TemplateDeploymentHistory`` record is updated if one exists
+            allow_host_access: Whether the configuration may use privileged
+                mode, host namespaces or bind mounts outside the project
+
+        Returns:
+            The deployer's result
+        """
+        deployment_id = deployment_id or uuid.uuid4().hex
+        self.stats["started"] += 1
+
+        from app.services.alert_notification_service import get_connection_manager
+
+        async def send(event: Dict[str, Any]) -> None:
+            try:
+                await get_connection_manager().send_personal_message(
+                    {
+                        "type": "deployment_progress",
+                        "deployment_id": deployment_id,
+                        "project": project,
+                        "timestamp": datetime.utcnow().isoformat(),
+                        **event,
+                    },
+                    user_id,
+                )
+            except Exception as e:
+                logger.warning(f"Failed to send deployment progress: {e}")
+
+        # Deploys of one project remove and recreate the same containers
+        lock = self._project_locks.setdefault(project, asyncio.Lock())
+        if lock.locked():
+            await send({"stage": "queued", "status": "waiting"})
+        async with lock:
+            self.active[deployment_id] = project
+            started_at = datetime.utcnow()
+            await asyncio.to_thread(
+                self._update_history,
+                deployment_id,
+                deployment_status="running",
+                deployment_started_at=started_at,
+            )
+            try:
+                try:
+                    client = await asyncio.to_thread(self._docker_client)
+                except Exception as e:
+                    result = {
+                        "project": project,
+                        "status": "failed",
+                        "error": str(e),
+                        "stage_timings": {},
+                    }
+                    await send(
+                        {"stage": "connect", "status": "failed", "error": str(e)}
+                    )
+                else:
+                    deployer = ComposeDeployer(
+                        client,
+                        project,
+                        project_dir=os.path.join(self.deployments_dir, project),
+                        max_parallel_pulls=self.max_parallel_pulls,
+                        on_event=send,
+                        images=self.images,
+                        allow_host_access=allow_host_access,
+                    )
+                    result = await deployer.deploy(config)
+
+                succeeded = result["status"] == "deployed"
+                self.stats["deployed" if succeeded else "failed"] += 1
+                await send(
+                    {
+                        "stage": "deployment",
+                        "status": result["status"],
+                        "stage_timings": result["stage_timings"],
+                        "error": result["error"],
+                    }
+                )
+
+                finished_at = datetime.utcnow()
+                await asyncio.to_thread(
+                    self._update_history,
+                    deployment_id,
+                    deployment_status="completed" if succeeded else "failed",
+                    deployment_success=succeeded,
+                    deployment_completed_at=finished_at if succeeded else None,
+                    deployment_failed_at=None if succeeded else finished_at,
+                    deployment_duration_seconds=int(
+                        (finished_at - started_at).total_seconds()
+                    ),
+                    error_message=result["error"],
+                    containers_created=len(result.get("services", {})),
+                    networks_created=len(result.get("networks", [])),
+                    volumes_created=len(result.get("volumes", [])),
+                    stage_timings=result["stage_timings"],
+                )
+                return result
+            finally:
+                self.active.pop(deployment_id, None)
+
+    def popular_images(self, limit: int = 10) -> List[str]:
+        """
+        Get the images of featured and most downloaded marketplace templates.
+
+        Args:
+            limit: Number of templates taken from each ranking
+
+        Returns:
+            Image references, featured templates first
+        """
+        from app.services.enhanced_template_management_service import (
+            EnhancedTemplateManagementService,
+        )
+
+        db = self._new_session()
+        try:
+            featured = EnhancedTemplateManagementService(db).get_featured_templates(
+                limit=limit
+            )
+            downloaded = (
+                db.query(MarketplaceTemplate)
+                .filter(MarketplaceTemplate.status == TemplateStatus.APPROVED)
+                .order_by(desc(MarketplaceTemplate.downloads))
+                .limit(limit)
+                .all()
+            )
+            images: List[str] = []
+            for template in [*featured, *downloaded]:
+                try:
+                    config = yaml.safe_load(template.docker_compose_yaml or "") or {}
+                except yaml.YAMLError:
+                    continue
+                services = config.get("services") if isinstance(config, dict) else None
+                for service in (services or {}).values():
+                    image = service.get("image") if isinstance(service, dict) else None
+                    # Built or parameterized images can only be resolved at deploy time
+                    if image and "build" not in service and "$" not in str(image):
+                        images.append(str(image))
+            return list(dict.fromkeys(images))
+        finally:
+            db.close()
+
+    def _update_history(self, deployment_id: str, **values) -> None:
+        try:
+            db = self._new_session()
+        except Exception as e:
+            logger.error(f"Failed to record deployment {deployment_id}: {e}")
+            return
+        try:
+            history = (
+                db.query(TemplateDeploymentHistory)
+                .filter(TemplateDeploymentHistory.deployment_id == deployment_id)
+                .first()
+            )
+            if history is None:
+                return
+            for key, value in values.items():
+                setattr(history, key, value)
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            logger.error(f"Failed to record deployment {deployment_id}: {e}")
+        finally:
+            db.close()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get deployment counters and the deployments in progress."""
+        return {**self.stats, "active": dict(self.active)}
+
+
+# Global compose deployment service instance
+_deployment_service: Optional[ComposeDeploymentService] = None
+
+
+def get_compose_deployment_service() -> ComposeDeploymentService:
+    """Get the global compose deployment service instance."""
+    global _deployment_service
+    if _deployment_service is None:
+        _deployment_service = ComposeDeploymentService()
+    return _deployment_service
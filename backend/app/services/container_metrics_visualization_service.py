@@ -13,8 +13,10 @@ features while maintaining compatibility with the existing monitoring infrastruc
 """
 
 import logging
+import threading
+from collections import OrderedDict
 from datetime import datetime, timedelta
-from typing import Any, Dict, List, Optional, Tuple
+from typing import Any, Callable, Dict, List, Optional, Tuple
 from statistics import mean, median, stdev
 
 from sqlalchemy import and_, desc, func
@@ -26,6 +28,85 @@ from docker_manager.manager import DockerManager
 
 logger = logging.getLogger(__name__)
 
+_UNSET = object()
+
+
+class DerivedMetricsCache:
+    """
+    Process-wide cache of derived metrics (health scores, predictions).
+
+    Entries are keyed by container and tagged with the timestamp of the
+    newest stored sample they were computed from, so every subscriber of a
+    container shares one result until a new sample lands.
+    """
+
+    def __init__(self, max_containers: int = 1000):
+        """
+        Initialize the cache.
+
+        Args:
+            max_containers: Maximum number of containers kept (least recently used evicted)
+        """
+        self.max_containers = max_containers
+        self._entries: "OrderedDict[str, Dict[str, Tuple[Any, Any]]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0}
+
+    def get_or_compute(
+        self, container_id: str, name: str, sample_marker: Any, compute: Callable[[], Any]
+    ) -> Any:
+        """
+        Return a cached derived value, recomputing it if a newer sample exists.
+
+        Args:
+            container_id: Container ID or name
+            name: Name of the derived value, including its parameters
+            sample_marker: Timestamp of the newest stored sample (None disables caching)
+            compute: Callable producing the value
+
+        Returns:
+            The derived value
+        """
+        if sample_marker is None:
+            self.stats["misses"] += 1
+            return compute()
+
+        with self._lock:
+            entry = self._entries.get(container_id, {}).get(name)
+            if entry is not None and entry[0] == sample_marker:
+                self._entries.move_to_end(container_id)
+                self.stats["hits"] += 1
+                return entry[1]
+
+        value = compute()
+        with self._lock:
+            self.stats["misses"] += 1
+            self._entries.setdefault(container_id, {})[name] = (sample_marker, value)
+            self._entries.move_to_end(container_id)
+            while len(self._entries) > self.max_containers:
+                self._entries.popitem(last=False)
+        return value
+
+    def invalidate(self, container_id: Optional[str] = None) -> None:
+        """Drop cached values for one container, or for all containers."""
+        with self._lock:
+            if container_id is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(container_id, None)
+
+
+# Global derived metrics cache instance
+_derived_metrics_cache: Optional[DerivedMetricsCache] = None
+
+
+def get_derived_metrics_cache() -> DerivedMetricsCache:
+    """Get the global derived metrics cache instance."""
+    global _derived_metrics_cache
+    if _derived_metrics_cache is None:
+        _derived_metrics_cache = DerivedMetricsCache()
+    return _derived_metrics_cache
+
 
 class ContainerMetricsVisualizationService(MetricsService):
     """
@@ -140,6 +221,59 @@ class ContainerMetricsVisualizationService(MetricsService):
             logger.error(f"Error calculating health score for container {container_id}: {e}")
             return {"error": f"Failed to calculate health score: {str(e)}"}
 
+    def get_cached_health_score(
+        self, container_id: str, hours: int = 1, sample_marker: Any = _UNSET
+    ) -> Dict[str, Any]:
+        """
+        Get a container's health score, recomputed only when new samples land.
+
+        Args:
+            container_id: Container ID or name
+            hours: Number of hours to analyze for health calculation
+            sample_marker: Latest sample time if already known (queried otherwise)
+
+        Returns:
+            Dictionary containing health score and component scores
+        """
+        if sample_marker is _UNSET:
+            sample_marker = self.get_latest_sample_time(container_id)
+        return get_derived_metrics_cache().get_or_compute(
+            container_id,
+            f"health:{hours}",
+            sample_marker,
+            lambda: self.calculate_container_health_score(container_id, hours=hours),
+        )
+
+    def get_cached_predictions(
+        self,
+        container_id: str,
+        hours: int = 24,
+        prediction_hours: int = 6,
+        sample_marker: Any = _UNSET,
+    ) -> Dict[str, Any]:
+        """
+        Get resource usage predictions, recomputed only when new samples land.
+
+        Args:
+            container_id: Container ID or name
+            hours: Number of hours of historical data to analyze
+            prediction_hours: Number of hours to predict into the future
+            sample_marker: Latest sample time if already known (queried otherwise)
+
+        Returns:
+            Dictionary containing resource usage predictions
+        """
+        if sample_marker is _UNSET:
+            sample_marker = self.get_latest_sample_time(container_id)
+        return get_derived_metrics_cache().get_or_compute(
+            container_id,
+            f"predictions:{hours}:{prediction_hours}",
+            sample_marker,
+            lambda: self.predict_resource_usage(
+                container_id, hours=hours, prediction_hours=prediction_hours
+            ),
+        )
+
     def _calculate_cpu_health(self, metrics: List[ContainerMetrics]) -> float:
         """Calculate CPU health score based on usage patterns."""
         cpu_values = [m.cpu_percent for m in metrics if m.cpu_percent is not None]
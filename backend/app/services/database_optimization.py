@@ -1,18 +1,83 @@
 """
 Database optimization service for connection pooling and query optimization.
+
+This is the single factory for the application's database engines. Pool
+sizing and SQLite tuning can be configured through environment variables:
+
+- DB_POOL_SIZE, DB_MAX_OVERFLOW, DB_POOL_TIMEOUT, DB_POOL_RECYCLE, DB_ECHO
+- SQLITE_JOURNAL_MODE, SQLITE_SYNCHRONOUS, SQLITE_CACHE_SIZE,
+  SQLITE_MMAP_SIZE, SQLITE_BUSY_TIMEOUT
 """
 
 import logging
+import os
 from contextlib import asynccontextmanager
 from typing import Any, Dict, Optional
 
-from sqlalchemy import create_engine, event, pool
+from sqlalchemy import create_engine, event, pool, text
 from sqlalchemy.engine import Engine
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
 from sqlalchemy.orm import sessionmaker
 from sqlalchemy.pool import QueuePool
 
 logger = logging.getLogger(__name__)
 
+# Pool defaults per dialect: (pool_size, max_overflow). SQLite connections are
+# cheap and writes are serialized by the database file lock, so a small pool
+# is enough; it still lets readers run concurrently with a writer under WAL.
+DEFAULT_POOL_SETTINGS = {
+    "sqlite": (5, 10),
+    "postgresql": (20, 30),
+    "mysql": (20, 30),
+}
+
+# PRAGMAs applied to every new SQLite connection, in order
+DEFAULT_SQLITE_PRAGMAS = {
+    "journal_mode": "WAL",  # Readers don't block the writer and vice versa
+    "synchronous": "NORMAL",  # Safe with WAL, avoids an fsync per commit
+    "busy_timeout": 5000,  # Wait (ms) for the write lock instead of failing
+    "cache_size": -64000,  # 64MB page cache (negative values are KiB)
+    "mmap_size": 268435456,  # 256MB memory-mapped I/O
+    "temp_store": "MEMORY",  # Store temp tables in memory
+}
+
+
+def _env_int(name: str, default: int) -> int:
+    """Read an integer setting from the environment."""
+    value = os.getenv(name)
+    if value is None or value == "":
+        return default
+    try:
+        return int(value)
+    except ValueError:
+        logger.warning(f"Invalid integer for {name}: {value!r}, using {default}")
+        return default
+
+
+def get_sqlite_pragmas() -> Dict[str, Any]:
+    """
+    Get the SQLite PRAGMAs to apply, including environment overrides.
+
+    Returns:
+        Ordered mapping of PRAGMA name to value
+    """
+    return {
+        "journal_mode": os.getenv(
+            "SQLITE_JOURNAL_MODE", DEFAULT_SQLITE_PRAGMAS["journal_mode"]
+        ),
+        "synchronous": os.getenv(
+            "SQLITE_SYNCHRONOUS", DEFAULT_SQLITE_PRAGMAS["synchronous"]
+        ),
+        "busy_timeout": _env_int(
+            "SQLITE_BUSY_TIMEOUT", DEFAULT_SQLITE_PRAGMAS["busy_timeout"]
+        ),
+        "cache_size": _env_int(
+            "SQLITE_CACHE_SIZE", DEFAULT_SQLITE_PRAGMAS["cache_size"]
+        ),
+        "mmap_size": _env_int("SQLITE_MMAP_SIZE", DEFAULT_SQLITE_PRAGMAS["mmap_size"]),
+        "temp_store": DEFAULT_SQLITE_PRAGMAS["temp_store"],
+    }
+
 
 class DatabaseOptimizationService:
     """Service for database performance optimization."""
@@ -25,7 +90,12 @@ class DatabaseOptimizationService:
             database_url: Database connection URL
         """
         self.database_url = database_url
+        self.dialect = database_url.split(":", 1)[0].split("+", 1)[0]
+        if self.dialect == "postgres":
+            self.dialect = "postgresql"
+        self.sqlite_pragmas = get_sqlite_pragmas()
         self.engine: Optional[Engine] = None
+        self.async_engine: Optional[AsyncEngine] = None
         self.SessionLocal: Optional[sessionmaker] = None
         self._connection_stats = {
             "total_connections": 0,
@@ -36,17 +106,34 @@ class DatabaseOptimizationService:
             "invalidated": 0,
         }
 
+    @property
+    def is_sqlite(self) -> bool:
+        """Whether the configured database is SQLite."""
+        return self.dialect == "sqlite"
+
+    @property
+    def is_sqlite_memory(self) -> bool:
+        """Whether the configured database is an in-memory SQLite database."""
+        return self.is_sqlite and (
+            self.database_url.rstrip("/").endswith(":memory:")
+            or "mode=memory" in self.database_url
+            or self.database_url in ("sqlite://", "sqlite:///")
+        )
+
     def create_optimized_engine(
         self,
-        pool_size: int = 20,
-        max_overflow: int = 30,
-        pool_timeout: int = 30,
-        pool_recycle: int = 3600,
-        echo: bool = False,
+        pool_size: Optional[int] = None,
+        max_overflow: Optional[int] = None,
+        pool_timeout: Optional[int] = None,
+        pool_recycle: Optional[int] = None,
+        echo: Optional[bool] = None,
     ) -> Engine:
         """
         Create an optimized database engine with connection pooling.
 
+        Settings left as None are read from the environment, falling back to
+        per-dialect defaults.
+
         Args:
             pool_size: Number of connections to maintain in the pool
             max_overflow: Maximum number of connections that can overflow the pool
@@ -57,6 +144,18 @@ class DatabaseOptimizationService:
         Returns:
             Optimized SQLAlchemy engine
         """
+        default_size, default_overflow = self._pool_defaults()
+        if pool_size is None:
+            pool_size = default_size
+        if max_overflow is None:
+            max_overflow = default_overflow
+        if pool_timeout is None:
+            pool_timeout = _env_int("DB_POOL_TIMEOUT", 30)
+        if pool_recycle is None:
+            pool_recycle = _env_int("DB_POOL_RECYCLE", 3600)
+        if echo is None:
+            echo = os.getenv("DB_ECHO", "false").lower() == "true"
+
         # Connection pool configuration for production
         engine_config = {
             "poolclass": QueuePool,
@@ -69,39 +168,42 @@ class DatabaseOptimizationService:
         }
 
         # SQLite-specific optimizations
-        if "sqlite" in self.database_url:
+        if self.is_sqlite:
             engine_config.update(
                 {
                     "connect_args": {
                         "check_same_thread": False,
-                        "timeout": 20,
-                        # SQLite performance optimizations
-                        "isolation_level": None,  # Enable autocommit mode
+                        # Matches busy_timeout; the driver retries locked writes
+                        "timeout": self.sqlite_pragmas["busy_timeout"] / 1000,
                     },
-                    # SQLite doesn't support connection pooling in the traditional sense
-                    "poolclass": pool.StaticPool,
-                    "pool_size": 1,
-                    "max_overflow": 0,
+                    # SQLite has no server round-trip to validate
+                    "pool_pre_ping": False,
                 }
             )
+            if self.is_sqlite_memory:
+                # Each connection to :memory: is a separate database, so
+                # all sessions must share one connection
+                engine_config = {
+                    "connect_args": engine_config["connect_args"],
+                    "poolclass": pool.StaticPool,
+                    "echo": echo,
+                }
 
         # PostgreSQL-specific optimizations
-        elif "postgresql" in self.database_url:
+        elif self.dialect == "postgresql":
             engine_config.update(
                 {
                     "connect_args": {
                         "connect_timeout": 10,
-                        "command_timeout": 60,
-                        "server_settings": {
-                            "application_name": "DockerDeployer",
-                            "jit": "off",  # Disable JIT for faster connection times
-                        },
+                        "application_name": "DockerDeployer",
+                        # Disable JIT for faster short queries; 60s statement timeout
+                        "options": "-c jit=off -c statement_timeout=60000",
                     }
                 }
             )
 
         # MySQL-specific optimizations
-        elif "mysql" in self.database_url:
+        elif self.dialect == "mysql":
             engine_config.update(
                 {
                     "connect_args": {
@@ -117,15 +219,77 @@ class DatabaseOptimizationService:
 
         # Set up event listeners for monitoring
         self._setup_event_listeners()
+        if self.is_sqlite:
+            event.listen(self.engine, "connect", self._on_sqlite_connect)
 
         # Create session factory
         self.SessionLocal = sessionmaker(
             autocommit=False, autoflush=False, bind=self.engine
         )
 
-        logger.info(f"Created optimized database engine with pool_size={pool_size}")
+        logger.info(
+            f"Created optimized {self.dialect} database engine "
+            f"({type(self.engine.pool).__name__}, pool_size={engine_config.get('pool_size', 1)}, "
+            f"max_overflow={engine_config.get('max_overflow', 0)})"
+        )
         return self.engine
 
+    def create_optimized_async_engine(self, async_database_url: str) -> AsyncEngine:
+        """
+        Create the asyncio engine matching the synchronous engine's tuning.
+
+        Args:
+            async_database_url: Database URL using an asyncio driver
+
+        Returns:
+            SQLAlchemy async engine
+        """
+        if self.is_sqlite:
+            # aiosqlite connections are bound to the event loop that opened
+            # them, so they are not pooled; PRAGMAs are applied on connect
+            self.async_engine = create_async_engine(
+                async_database_url, poolclass=pool.NullPool
+            )
+            event.listen(
+                self.async_engine.sync_engine, "connect", self._on_sqlite_connect
+            )
+        else:
+            pool_size, max_overflow = self._pool_defaults()
+            self.async_engine = create_async_engine(
+                async_database_url,
+                pool_size=pool_size,
+                max_overflow=max_overflow,
+                pool_recycle=_env_int("DB_POOL_RECYCLE", 3600),
+                pool_pre_ping=True,
+            )
+        return self.async_engine
+
+    def _pool_defaults(self) -> tuple:
+        """Get (pool_size, max_overflow) from the environment or dialect defaults."""
+        default_size, default_overflow = DEFAULT_POOL_SETTINGS.get(
+            self.dialect, (20, 30)
+        )
+        return (
+            _env_int("DB_POOL_SIZE", default_size),
+            _env_int("DB_MAX_OVERFLOW", default_overflow),
+        )
+
+    def _on_sqlite_connect(self, dbapi_connection, connection_record):
+        """Apply the configured PRAGMAs to a new SQLite connection."""
+        cursor = dbapi_connection.cursor()
+        try:
+            for name, value in self.sqlite_pragmas.items():
+                if name == "journal_mode" and self.is_sqlite_memory:
+                    continue  # In-memory databases cannot use WAL
+                try:
+                    cursor.execute(f"PRAGMA {name}={value}")
+                except Exception as e:
+                    logger.warning(
+                        f"Failed to apply SQLite optimization PRAGMA {name}={value}: {e}"
+                    )
+        finally:
+            cursor.close()
+
     def _setup_event_listeners(self):
         """Set up SQLAlchemy event listeners for monitoring."""
         if not self.engine:
@@ -163,16 +327,21 @@ class DatabaseOptimizationService:
             Dictionary with connection statistics
         """
         stats = self._connection_stats.copy()
+        stats["dialect"] = self.dialect
 
-        if self.engine and hasattr(self.engine.pool, "size"):
-            stats.update(
-                {
-                    "pool_size": self.engine.pool.size(),
-                    "checked_out": self.engine.pool.checkedout(),
-                    "overflow": self.engine.pool.overflow(),
-                    "checked_in": self.engine.pool.checkedin(),
-                }
-            )
+        if self.engine:
+            stats["pool_class"] = type(self.engine.pool).__name__
+            stats["pool_status"] = self.engine.pool.status()
+            if isinstance(self.engine.pool, QueuePool):
+                stats.update(
+                    {
+                        "pool_size": self.engine.pool.size(),
+                        "checked_out": self.engine.pool.checkedout(),
+                        "overflow": self.engine.pool.overflow(),
+                        "checked_in": self.engine.pool.checkedin(),
+                        "max_overflow": self.engine.pool._max_overflow,
+                    }
+                )
 
         return stats
 
@@ -197,28 +366,37 @@ class DatabaseOptimizationService:
         finally:
             session.close()
 
-    def optimize_sqlite_settings(self):
-        """Apply SQLite-specific performance optimizations."""
-        if not self.engine or "sqlite" not in self.database_url:
-            return
+    def optimize_sqlite_settings(self) -> Dict[str, Any]:
+        """
+        Run SQLite's query planner optimization and report effective settings.
+
+        Connection-level PRAGMAs are applied on every new connection by the
+        engine's connect listener; this reads them back for verification.
+
+        Returns:
+            Dictionary of effective PRAGMA values
+        """
+        if not self.engine or not self.is_sqlite:
+            return {}
 
+        settings: Dict[str, Any] = {}
         with self.engine.connect() as connection:
-            # Apply SQLite performance optimizations
-            optimizations = [
-                "PRAGMA journal_mode=WAL",  # Write-Ahead Logging
-                "PRAGMA synchronous=NORMAL",  # Faster than FULL, safer than OFF
-                "PRAGMA cache_size=10000",  # 10MB cache
-                "PRAGMA temp_store=MEMORY",  # Store temp tables in memory
-                "PRAGMA mmap_size=268435456",  # 256MB memory-mapped I/O
-                "PRAGMA optimize",  # Optimize query planner
-            ]
-
-            for pragma in optimizations:
+            try:
+                connection.exec_driver_sql("PRAGMA optimize")
+            except Exception as e:
+                logger.warning(
+                    f"Failed to apply SQLite optimization PRAGMA optimize: {e}"
+                )
+
+            for name in self.sqlite_pragmas:
                 try:
-                    connection.execute(pragma)
-                    logger.debug(f"Applied SQLite optimization: {pragma}")
+                    settings[name] = connection.exec_driver_sql(
+                        f"PRAGMA {name}"
+                    ).scalar()
                 except Exception as e:
-                    logger.warning(f"Failed to apply SQLite optimization {pragma}: {e}")
+                    logger.warning(f"Failed to read SQLite PRAGMA {name}: {e}")
+
+        return settings
 
     def get_query_performance_stats(self) -> Dict[str, Any]:
         """
@@ -232,9 +410,11 @@ class DatabaseOptimizationService:
 
         try:
             with self.engine.connect() as connection:
-                if "sqlite" in self.database_url:
+                if self.is_sqlite:
                     # SQLite-specific stats
-                    result = connection.execute("PRAGMA compile_options").fetchall()
+                    result = connection.exec_driver_sql(
+                        "PRAGMA compile_options"
+                    ).fetchall()
                     compile_options = [row[0] for row in result]
 
                     return {
@@ -243,10 +423,11 @@ class DatabaseOptimizationService:
                         "connection_stats": self.get_connection_stats(),
                     }
 
-                elif "postgresql" in self.database_url:
+                elif self.dialect == "postgresql":
                     # PostgreSQL-specific stats
                     result = connection.execute(
-                        """
+                        text(
+                            """
                         SELECT 
                             datname,
                             numbackends,
@@ -262,6 +443,7 @@ class DatabaseOptimizationService:
                         FROM pg_stat_database 
                         WHERE datname = current_database()
                     """
+                        )
                     ).fetchone()
 
                     if result:
@@ -299,6 +481,12 @@ class DatabaseOptimizationService:
             self.engine.dispose()
             logger.info("Database engine disposed")
 
+    async def cleanup_async(self):
+        """Dispose both the asyncio and synchronous engines."""
+        if self.async_engine:
+            await self.async_engine.dispose()
+        self.cleanup()
+
 
 # Global database optimization service
 _db_optimization_service: Optional[DatabaseOptimizationService] = None
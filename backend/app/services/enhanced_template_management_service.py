@@ -38,6 +38,8 @@ from app.db.models import (
     TemplateVersion,
     User,
 )
+from app.services.template_counter_service import get_template_counter_buffer
+from app.services.template_recommendation_service import get_recommendation_engine
 
 logger = logging.getLogger(__name__)
 
@@ -435,6 +437,9 @@ class EnhancedTemplateManagementService:
         """
         Get recommended templates based on user history and performance.
 
+        Templates similar to the user's past deployments come first, followed
+        by the most popular templates; already-deployed templates are excluded.
+
         Args:
             user_id: User ID for personalized recommendations
             category_id: Category ID for category-based recommendations
@@ -444,42 +449,31 @@ class EnhancedTemplateManagementService:
             List of recommended MarketplaceTemplate instances
         """
         try:
-            query = (
+            # Served from precomputed similarity/popularity tables
+            template_ids = get_recommendation_engine().recommend_ids(
+                self.db, user_id=user_id, category_id=category_id, limit=limit
+            )
+            if not template_ids:
+                return []
+
+            templates = (
                 self.db.query(MarketplaceTemplate)
                 .options(
                     joinedload(MarketplaceTemplate.author),
                     joinedload(MarketplaceTemplate.category),
                 )
-                .filter(MarketplaceTemplate.status == TemplateStatus.APPROVED)
-            )
-
-            # Apply category filter if provided
-            if category_id:
-                query = query.filter(MarketplaceTemplate.category_id == category_id)
-
-            # Apply user-based filtering if user provided
-            if user_id:
-                # Exclude templates the user has already deployed
-                deployed_template_ids = (
-                    self.db.query(TemplateDeploymentHistory.template_id)
-                    .filter(TemplateDeploymentHistory.user_id == user_id)
-                    .distinct()
-                    .subquery()
-                )
-                query = query.filter(~MarketplaceTemplate.id.in_(deployed_template_ids))
-
-            # Sort by performance and popularity
-            return (
-                query.order_by(
-                    desc(MarketplaceTemplate.performance_score),
-                    desc(MarketplaceTemplate.deployment_success_rate),
-                    desc(MarketplaceTemplate.rating_avg),
-                    desc(MarketplaceTemplate.downloads)
+                .filter(
+                    MarketplaceTemplate.id.in_(template_ids),
+                    # The ID tables may predate a rejection or deprecation
+                    MarketplaceTemplate.status == TemplateStatus.APPROVED,
                 )
-                .limit(limit)
                 .all()
             )
 
+            # Preserve recommendation order
+            by_id = {template.id: template for template in templates}
+            return [by_id[template_id] for template_id in template_ids if template_id in by_id]
+
         except Exception as e:
             logger.error(f"Failed to get recommended templates: {e}")
             return []
@@ -704,8 +698,8 @@ class EnhancedTemplateManagementService:
     def _track_template_access(self, template_id: int) -> None:
         """Track template access for analytics."""
         try:
-            # This could be enhanced to track user-specific access patterns
-            # For now, we'll just log the access
+            # Buffered increment; flushed in batches by the counter service
+            get_template_counter_buffer().record_view(template_id)
             logger.debug(f"Template {template_id} accessed")
 
         except Exception as e:
@@ -14,21 +14,67 @@ import json
 from datetime import datetime, timedelta
 from typing import Any, Dict, List, Optional
 
-from sqlalchemy import and_, desc
+from sqlalchemy import and_, desc, func, select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
-from app.db.models import ContainerMetrics, MetricsAlert, User, ContainerMetricsHistory, ContainerHealthScore, ContainerPrediction
+from app.db.models import AlertRuleType, ContainerMetrics, MetricsAlert, User, ContainerMetricsHistory, ContainerHealthScore, ContainerPrediction
+from app.services.alert_rule_engine import AlertRuleEngine, get_alert_rule_engine
 from docker_manager.manager import DockerManager
 
 logger = logging.getLogger(__name__)
 
 
+def parse_alert_rule_fields(data: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Validate and convert the rule fields present in alert create or update data.
+
+    Args:
+        data: Alert data as sent by the client
+
+    Returns:
+        The threshold_value, rule_type, hysteresis and for_samples fields
+        present in data, converted to their column types
+
+    Raises:
+        ValueError: If a field is not numeric, or is out of range
+    """
+    fields: Dict[str, Any] = {}
+    for field, convert in (("threshold_value", float), ("hysteresis", float), ("for_samples", int)):
+        if field in data:
+            try:
+                fields[field] = convert(data[field])
+            except (TypeError, ValueError):
+                raise ValueError(f"{field} must be a number")
+
+    if "rule_type" in data:
+        try:
+            fields["rule_type"] = AlertRuleType(data["rule_type"]).value
+        except ValueError:
+            allowed = ", ".join(rule_type.value for rule_type in AlertRuleType)
+            raise ValueError(f"rule_type must be one of: {allowed}")
+    # A hysteresis of 0 is the default: resolve as soon as the value is back
+    if fields.get("hysteresis", 0.0) < 0:
+        raise ValueError("hysteresis must not be negative")
+    if fields.get("for_samples", 1) < 1:
+        raise ValueError("for_samples must be at least 1")
+    return fields
+
+
 class MetricsService:
     """Service for managing container metrics and alerts."""
 
-    def __init__(self, db: Session, docker_manager: DockerManager):
+    def __init__(
+        self,
+        db: Session,
+        docker_manager: DockerManager,
+        async_db: Optional[AsyncSession] = None,
+        alert_engine: Optional[AlertRuleEngine] = None,
+    ):
         self.db = db
+        self.async_db = async_db
         self.docker_manager = docker_manager
+        self.alert_engine = alert_engine or get_alert_rule_engine()
         self._real_time_streams = {}  # Track active real-time streams
 
     def collect_and_store_metrics(self, container_id: str) -> Dict[str, Any]:
@@ -87,6 +133,26 @@ class MetricsService:
         """
         return self.docker_manager.get_container_stats(container_id)
 
+    def get_latest_sample_time(self, container_id: str) -> Optional[datetime]:
+        """
+        Get the timestamp of the newest stored sample for a container.
+
+        Args:
+            container_id: Container ID or name
+
+        Returns:
+            Timestamp of the latest stored metrics row, or None if there is none
+        """
+        try:
+            return self.db.scalar(
+                select(func.max(ContainerMetrics.timestamp)).where(
+                    ContainerMetrics.container_id == container_id
+                )
+            )
+        except Exception as e:
+            logger.error(f"Error getting latest sample time for {container_id}: {e}")
+            return None
+
     def get_historical_metrics(
         self, container_id: str, hours: int = 24, limit: int = 1000
     ) -> List[Dict[str, Any]]:
@@ -123,31 +189,70 @@ class MetricsService:
             metrics = metrics_query.all()
 
             # Convert to dictionaries
-            result = []
-            for metric in metrics:
-                result.append(
-                    {
-                        "id": metric.id,
-                        "container_id": metric.container_id,
-                        "container_name": metric.container_name,
-                        "timestamp": metric.timestamp.isoformat(),
-                        "cpu_percent": metric.cpu_percent,
-                        "memory_usage": metric.memory_usage,
-                        "memory_limit": metric.memory_limit,
-                        "memory_percent": metric.memory_percent,
-                        "network_rx_bytes": metric.network_rx_bytes,
-                        "network_tx_bytes": metric.network_tx_bytes,
-                        "block_read_bytes": metric.block_read_bytes,
-                        "block_write_bytes": metric.block_write_bytes,
-                    }
+            return [self._metric_to_dict(metric) for metric in metrics]
+
+        except Exception as e:
+            logger.error(f"Error retrieving historical metrics for {container_id}: {e}")
+            return []
+
+    async def get_historical_metrics_async(
+        self, container_id: str, hours: int = 24, limit: int = 1000
+    ) -> List[Dict[str, Any]]:
+        """
+        Get historical metrics for a container without blocking the event loop.
+
+        Args:
+            container_id: Container ID or name
+            hours: Number of hours of history to retrieve
+            limit: Maximum number of records to return
+
+        Returns:
+            List of historical metrics
+        """
+        if self.async_db is None:
+            return self.get_historical_metrics(container_id, hours, limit)
+
+        try:
+            end_time = datetime.utcnow()
+            start_time = end_time - timedelta(hours=hours)
+
+            result = await self.async_db.execute(
+                select(ContainerMetrics)
+                .where(
+                    and_(
+                        ContainerMetrics.container_id == container_id,
+                        ContainerMetrics.timestamp >= start_time,
+                        ContainerMetrics.timestamp <= end_time,
+                    )
                 )
+                .order_by(desc(ContainerMetrics.timestamp))
+                .limit(limit)
+            )
 
-            return result
+            return [self._metric_to_dict(metric) for metric in result.scalars()]
 
         except Exception as e:
             logger.error(f"Error retrieving historical metrics for {container_id}: {e}")
             return []
 
+    @staticmethod
+    def _metric_to_dict(metric: ContainerMetrics) -> Dict[str, Any]:
+        """Convert a ContainerMetrics row to a response dictionary."""
+        return {
+            "id": metric.id,
+            "container_id": metric.container_id,
+            "container_name": metric.container_name,
+            "timestamp": metric.timestamp.isoformat(),
+            "cpu_percent": metric.cpu_percent,
+            "memory_usage": metric.memory_usage,
+            "memory_limit": metric.memory_limit,
+            "memory_percent": metric.memory_percent,
+            "network_rx_bytes": metric.network_rx_bytes,
+            "network_tx_bytes": metric.network_tx_bytes,
+            "block_read_bytes": metric.block_read_bytes,
+            "block_write_bytes": metric.block_write_bytes,
+        }
+
     def get_system_metrics(self) -> Dict[str, Any]:
         """
         Get system-wide metrics.
@@ -435,6 +540,9 @@ class MetricsService:
         threshold_value: float,
         comparison_operator: str,
         description: Optional[str] = None,
+        rule_type: str = "threshold",
+        hysteresis: float = 0.0,
+        for_samples: int = 1,
     ) -> Dict[str, Any]:
         """
         Create a new metrics alert.
@@ -447,6 +555,9 @@ class MetricsService:
             threshold_value: Threshold value for the alert
             comparison_operator: Comparison operator (>, <, >=, <=, ==, !=)
             description: Optional description
+            rule_type: "threshold" to compare values, "rate" to compare per-second change
+            hysteresis: Margin the value must clear past the threshold before the alert resolves
+            for_samples: Consecutive matching samples required before the alert fires
 
         Returns:
             Dictionary containing the created alert or error
@@ -464,11 +575,15 @@ class MetricsService:
                 metric_type=metric_type,
                 threshold_value=threshold_value,
                 comparison_operator=comparison_operator,
+                rule_type=rule_type,
+                hysteresis=hysteresis,
+                for_samples=for_samples,
                 created_by=user_id,
             )
 
             self.db.add(alert)
             self.db.commit()
+            self.alert_engine.invalidate()
 
             logger.info(f"Created alert '{name}' for container {container_id}")
 
@@ -481,6 +596,9 @@ class MetricsService:
                 "metric_type": alert.metric_type,
                 "threshold_value": alert.threshold_value,
                 "comparison_operator": alert.comparison_operator,
+                "rule_type": alert.rule_type,
+                "hysteresis": alert.hysteresis,
+                "for_samples": alert.for_samples,
                 "is_active": alert.is_active,
                 "created_at": alert.created_at.isoformat(),
             }
@@ -508,35 +626,63 @@ class MetricsService:
                 .all()
             )
 
-            result = []
-            for alert in alerts:
-                result.append(
-                    {
-                        "id": alert.id,
-                        "name": alert.name,
-                        "description": alert.description,
-                        "container_id": alert.container_id,
-                        "container_name": alert.container_name,
-                        "metric_type": alert.metric_type,
-                        "threshold_value": alert.threshold_value,
-                        "comparison_operator": alert.comparison_operator,
-                        "is_active": alert.is_active,
-                        "is_triggered": alert.is_triggered,
-                        "last_triggered_at": alert.last_triggered_at.isoformat()
-                        if alert.last_triggered_at
-                        else None,
-                        "trigger_count": alert.trigger_count,
-                        "created_at": alert.created_at.isoformat(),
-                        "updated_at": alert.updated_at.isoformat(),
-                    }
-                )
+            return [self._alert_to_dict(alert) for alert in alerts]
 
-            return result
+        except Exception as e:
+            logger.error(f"Error retrieving alerts for user {user_id}: {e}")
+            return []
+
+    async def get_user_alerts_async(self, user_id: int) -> List[Dict[str, Any]]:
+        """
+        Get all alerts for a user without blocking the event loop.
+
+        Args:
+            user_id: User ID
+
+        Returns:
+            List of user alerts
+        """
+        if self.async_db is None:
+            return self.get_user_alerts(user_id)
+
+        try:
+            result = await self.async_db.execute(
+                select(MetricsAlert)
+                .where(MetricsAlert.created_by == user_id)
+                .order_by(desc(MetricsAlert.created_at))
+            )
+
+            return [self._alert_to_dict(alert) for alert in result.scalars()]
 
         except Exception as e:
             logger.error(f"Error retrieving alerts for user {user_id}: {e}")
             return []
 
+    @staticmethod
+    def _alert_to_dict(alert: MetricsAlert) -> Dict[str, Any]:
+        """Convert a MetricsAlert row to a response dictionary."""
+        return {
+            "id": alert.id,
+            "name": alert.name,
+            "description": alert.description,
+            "container_id": alert.container_id,
+            "container_name": alert.container_name,
+            "metric_type": alert.metric_type,
+            "threshold_value": alert.threshold_value,
+            "comparison_operator": alert.comparison_operator,
+            "rule_type": alert.rule_type,
+            "hysteresis": alert.hysteresis,
+            "for_samples": alert.for_samples,
+            "is_active": alert.is_active,
+            "is_triggered": alert.is_triggered,
+            "last_triggered_at": alert.last_triggered_at.isoformat()
+            if alert.last_triggered_at
+            else None,
+            "trigger_count": alert.trigger_count,
+            "created_at": alert.created_at.isoformat(),
+            "updated_at": alert.updated_at.isoformat(),
+        }
+
     def update_alert(
         self, alert_id: int, user_id: int, update_data: Dict[str, Any]
     ) -> Dict[str, Any]:
@@ -566,6 +712,11 @@ class MetricsService:
             if not alert:
                 return {"error": f"Alert {alert_id} not found or access denied"}
 
+            try:
+                update_data = {**update_data, **parse_alert_rule_fields(update_data)}
+            except ValueError as e:
+                return {"error": str(e)}
+
             # Update allowed fields
             allowed_fields = [
                 "name",
@@ -573,6 +724,9 @@ class MetricsService:
                 "metric_type",
                 "threshold_value",
                 "comparison_operator",
+                "rule_type",
+                "hysteresis",
+                "for_samples",
                 "is_active",
             ]
 
@@ -584,6 +738,7 @@ class MetricsService:
             alert.updated_at = datetime.utcnow()
 
             self.db.commit()
+            self.alert_engine.invalidate()
 
             logger.info(f"Updated alert {alert_id}")
 
@@ -596,6 +751,9 @@ class MetricsService:
                 "metric_type": alert.metric_type,
                 "threshold_value": alert.threshold_value,
                 "comparison_operator": alert.comparison_operator,
+                "rule_type": alert.rule_type,
+                "hysteresis": alert.hysteresis,
+                "for_samples": alert.for_samples,
                 "is_active": alert.is_active,
                 "is_triggered": alert.is_triggered,
                 "last_triggered_at": alert.last_triggered_at.isoformat()
@@ -640,6 +798,7 @@ class MetricsService:
             # Delete the alert
             self.db.delete(alert)
             self.db.commit()
+            self.alert_engine.invalidate()
 
             logger.info(f"Deleted alert {alert_id}")
             return {"message": f"Alert {alert_id} deleted successfully"}
@@ -662,60 +821,31 @@ class MetricsService:
         Returns:
             List of triggered alerts
         """
-        try:
-            # Get active alerts for this container
-            alerts = (
-                self.db.query(MetricsAlert)
-                .filter(
-                    and_(
-                        MetricsAlert.container_id == container_id,
-                        MetricsAlert.is_active == True,
-                    )
-                )
-                .all()
-            )
-
-            triggered_alerts = []
+        return self.check_alerts_batch({container_id: current_metrics})
 
-            for alert in alerts:
-                # Get the metric value
-                metric_value = current_metrics.get(alert.metric_type)
-                if metric_value is None:
-                    continue
+    def check_alerts_batch(
+        self, samples: Dict[str, Dict[str, Any]], timestamp: Optional[float] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Check a batch of container samples against all active alerts in one pass.
 
-                # Check if alert condition is met
-                should_trigger = self._evaluate_alert_condition(
-                    metric_value, alert.threshold_value, alert.comparison_operator
-                )
+        Evaluation runs on the compiled rule index of the alert rule engine;
+        trigger state changes are persisted in batches.
 
-                if should_trigger and not alert.is_triggered:
-                    # Trigger the alert
-                    alert.is_triggered = True
-                    alert.last_triggered_at = datetime.utcnow()
-                    alert.trigger_count += 1
-
-                    triggered_alerts.append(
-                        {
-                            "alert": alert,
-                            "alert_id": alert.id,
-                            "alert_name": alert.name,
-                            "container_id": alert.container_id,
-                            "container_name": alert.container_name,
-                            "metric_type": alert.metric_type,
-                            "metric_value": metric_value,
-                            "threshold_value": alert.threshold_value,
-                            "comparison_operator": alert.comparison_operator,
-                        }
-                    )
+        Args:
+            samples: Mapping of container ID to its current metrics
+            timestamp: Unix timestamp of the samples (now if omitted)
 
-                elif not should_trigger and alert.is_triggered:
-                    # Reset the alert
-                    alert.is_triggered = False
+        Returns:
+            List of triggered alerts
+        """
+        try:
+            triggered_alerts = self.alert_engine.evaluate(samples, self.db, timestamp)
+            self.alert_engine.maybe_flush(self.db)
 
             if triggered_alerts:
-                self.db.commit()
                 logger.info(
-                    f"Triggered {len(triggered_alerts)} alerts for container {container_id}"
+                    f"Triggered {len(triggered_alerts)} alerts across {len(samples)} containers"
                 )
 
                 # Send notifications for triggered alerts
@@ -724,98 +854,29 @@ class MetricsService:
             return triggered_alerts
 
         except Exception as e:
-            logger.error(f"Error checking alerts for container {container_id}: {e}")
+            logger.error(f"Error checking alerts for {len(samples)} containers: {e}")
             self.db.rollback()
             return []
 
-    def _evaluate_alert_condition(
-        self, metric_value: float, threshold_value: float, comparison_operator: str
-    ) -> bool:
-        """
-        Evaluate if an alert condition is met.
-
-        Args:
-            metric_value: Current metric value
-            threshold_value: Alert threshold value
-            comparison_operator: Comparison operator (>, <, >=, <=, ==, !=)
-
-        Returns:
-            True if condition is met, False otherwise
-        """
-        try:
-            if comparison_operator == ">":
-                return metric_value > threshold_value
-            elif comparison_operator == "<":
-                return metric_value < threshold_value
-            elif comparison_operator == ">=":
-                return metric_value >= threshold_value
-            elif comparison_operator == "<=":
-                return metric_value <= threshold_value
-            elif comparison_operator == "==":
-                return metric_value == threshold_value
-            elif comparison_operator == "!=":
-                return metric_value != threshold_value
-            else:
-                logger.warning(f"Unknown comparison operator: {comparison_operator}")
-                return False
-        except Exception as e:
-            logger.error(f"Error evaluating alert condition: {e}")
-            return False
-
     def _send_alert_notifications(self, triggered_alerts: List[Dict[str, Any]]):
         """
-        Send notifications for triggered alerts.
+        Queue notifications for triggered alerts.
+
+        Notifications are appended to the durable outbox in this session;
+        the delivery worker pushes them out in batches, off the metrics path.
 
         Args:
             triggered_alerts: List of triggered alert data
         """
         try:
             # Import here to avoid circular imports
-            import asyncio
-
-            import redis.asyncio as redis
-
-            from app.services.alert_notification_service import AlertNotificationService
-
-            # Initialize Redis client
-            redis_client = None
-            try:
-                redis_client = redis.from_url(
-                    "redis://localhost:6379", decode_responses=True
-                )
-            except Exception as e:
-                logger.warning(f"Redis not available for notifications: {e}")
-
-            # Initialize notification service
-            notification_service = AlertNotificationService(self.db, redis_client)
+            from app.services.notification_outbox import get_notification_outbox
 
-            # Send notifications for each triggered alert
-            for alert_data in triggered_alerts:
-                try:
-                    alert = alert_data["alert"]
-                    metric_value = alert_data["metric_value"]
-
-                    # Get the user who created the alert
-                    from app.db.models import User
-
-                    user = (
-                        self.db.query(User).filter(User.id == alert.created_by).first()
-                    )
-                    if user:
-                        # Run the async notification in a new event loop
-                        asyncio.create_task(
-                            notification_service.notify_alert_triggered(
-                                alert, metric_value, user
-                            )
-                        )
-
-                except Exception as e:
-                    logger.error(
-                        f"Error sending notification for alert {alert_data.get('alert_id')}: {e}"
-                    )
+            get_notification_outbox().enqueue_alerts(self.db, triggered_alerts)
 
         except Exception as e:
-            logger.error(f"Error in alert notification system: {e}")
+            logger.error(f"Error queueing alert notifications: {e}")
+            self.db.rollback()
 
     # --- Real-time Data Collection Methods ---
 
@@ -910,6 +971,8 @@ class MetricsService:
 
                 if "error" in result:
                     logger.warning(f"Error collecting metrics for {container_id}: {result['error']}")
+                else:
+                    self.check_alerts(container_id, result)
 
                 # Wait for next collection
                 await asyncio.sleep(interval_seconds)
@@ -0,0 +1,673 @@
+"""
+Durable notification outbox with batched delivery.
+
+Alert triggers append notifications to the ``notification_outbox`` table in
+the same session that evaluated them, which is cheap and survives
+restarts. A single delivery worker per process claims due rows in batches
+and delivers each batch with:
+
+- one WebSocket push per notification (enqueued on the connection hub)
+- one Redis pipeline for the notification history (``LPUSH`` + ``LTRIM`` +
+  ``EXPIRE`` per user list)
+- concurrent emails, bounded by ``email_concurrency``, with at most one
+  email per user per digest window: alerts for a user who was emailed less
+  than ``digest_window`` seconds ago wait in the outbox until the window
+  closes and then go out together as a single digest email
+
+Each row records the channels already completed, so a retry only repeats
+the channels that failed. Retries back off exponentially (with jitter) and
+rows are marked ``failed`` after ``max_attempts``. Every notification
+carries its idempotency key as ``notification_id`` so clients can drop
+duplicates, and the unique key keeps workers from enqueueing the same
+trigger twice. Claims are leased, so several workers can drain the same
+table and a crashed worker's rows are picked up again.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import random
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List, Optional, Set
+from uuid import uuid4
+
+from sqlalchemy import (
+    DateTime,
+    bindparam,
+    delete,
+    func,
+    insert,
+    or_,
+    select,
+    text,
+    update,
+)
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.db.models import NotificationOutbox, User
+
+logger = logging.getLogger(__name__)
+
+CHANNEL_WEBSOCKET = "websocket"
+CHANNEL_HISTORY = "history"
+CHANNEL_EMAIL = "email"
+
+STATUS_PENDING = "pending"
+STATUS_DELIVERED = "delivered"
+STATUS_FAILED = "failed"
+
+_COMPLETE_DELIVERY = text(
+    "UPDATE notification_outbox "
+    "SET status = :status, channels_done = :channels_done, attempts = :attempts, "
+    "next_attempt_at = :next_attempt_at, last_error = :last_error, "
+    "delivered_at = :delivered_at, locked_by = NULL, locked_until = NULL "
+    "WHERE id = :id AND locked_by = :locked_by"
+).bindparams(
+    bindparam("next_attempt_at", type_=DateTime),
+    bindparam("delivered_at", type_=DateTime),
+)
+
+
+class NotificationOutboxService:
+    """Appends notifications to the outbox table and runs the batched delivery worker."""
+
+    def __init__(
+        self,
+        session_factory: Optional[Callable[[], Session]] = None,
+        manager=None,
+        email_service=None,
+        batch_size: int = 100,
+        poll_interval: float = 1.0,
+        max_attempts: int = 8,
+        backoff_base: float = 2.0,
+        backoff_max: float = 300.0,
+        lease_seconds: float = 60.0,
+        email_concurrency: int = 4,
+        history_size: int = 100,
+        history_ttl: int = 7 * 24 * 3600,
+        retention_days: int = 7,
+        digest_window: Optional[float] = None,
+    ):
+        """
+        Initialize the outbox.
+
+        Args:
+            session_factory: Callable returning a new database session
+            manager: WebSocket connection hub (the process-wide one by default)
+            email_service: Email service (the global one by default)
+            batch_size: Maximum notifications claimed per delivery batch
+            poll_interval: Seconds between polls when no enqueue wakes the worker
+            max_attempts: Attempts before a notification is marked failed
+            backoff_base: Base of the exponential retry delay, in seconds
+            backoff_max: Longest retry delay, in seconds
+            lease_seconds: How long a claimed batch stays reserved for this worker
+            email_concurrency: Emails sent at the same time
+            history_size: Notifications kept in each user's Redis history
+            history_ttl: Seconds before an idle Redis history expires
+            retention_days: Days delivered and failed rows are kept
+            digest_window: Minimum seconds between alert emails to one user
+                (ALERT_EMAIL_DIGEST_WINDOW, default 300; 0 disables digests)
+        """
+        self._session_factory = session_factory
+        self._manager = manager
+        self._email_service = email_service
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.max_attempts = max_attempts
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.lease_seconds = lease_seconds
+        self.email_concurrency = email_concurrency
+        self.history_size = history_size
+        self.history_ttl = history_ttl
+        self.retention_days = retention_days
+        self.digest_window = (
+            digest_window
+            if digest_window is not None
+            else float(os.getenv("ALERT_EMAIL_DIGEST_WINDOW", "300"))
+        )
+        # When each user was last emailed, for digest windows
+        self._last_email_at: Dict[int, datetime] = {}
+
+        self._formatter = None
+        self._task: Optional[asyncio.Task] = None
+        self._stopping: Optional[asyncio.Event] = None
+        self._wake: Optional[asyncio.Event] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._last_purge = 0.0
+        self._stats_lock = threading.Lock()
+        self.stats = {
+            "enqueued": 0,
+            "duplicates": 0,
+            "batches": 0,
+            "delivered": 0,
+            "retried": 0,
+            "failed": 0,
+            "emails": 0,
+            "digested": 0,
+        }
+
+    @property
+    def manager(self):
+        """WebSocket connection hub used for pushes and Redis history."""
+        if self._manager is None:
+            from app.services.alert_notification_service import get_connection_manager
+
+            self._manager = get_connection_manager()
+        return self._manager
+
+    @property
+    def email_service(self):
+        """Email service used for alert emails."""
+        if self._email_service is None:
+            from app.email.service import get_email_service
+
+            self._email_service = get_email_service()
+        return self._email_service
+
+    @property
+    def formatter(self):
+        """Alert notification service used to build and render notifications."""
+        if self._formatter is None:
+            from app.services.alert_notification_service import AlertNotificationService
+
+            self._formatter = AlertNotificationService(None, manager=self.manager)
+            self._formatter.email_service = self.email_service
+        return self._formatter
+
+    def _count(self, key: str, amount: int = 1) -> None:
+        with self._stats_lock:
+            self.stats[key] += amount
+
+    # ===== ENQUEUE =====
+
+    def enqueue_alerts(
+        self, db: Session, triggered_alerts: List[Dict[str, Any]]
+    ) -> int:
+        """
+        Append notifications for triggered alerts to the outbox.
+
+        Args:
+            db: Database session (committed by this call)
+            triggered_alerts: Triggered alerts as returned by the alert rule engine
+
+        Returns:
+            Number of notifications added
+        """
+        rows = []
+        for alert_data in triggered_alerts:
+            alert = alert_data["alert"]
+            notification = self.formatter.build_alert_notification(
+                alert, alert_data["metric_value"]
+            )
+            # One notification per firing, however many workers saw it. The
+            # trigger count is not used: it is persisted lazily and can repeat
+            # after a restart, while the firing time cannot.
+            fired_at = alert_data.get("fired_at")
+            firing = fired_at.isoformat() if fired_at else notification["timestamp"]
+            key = f"alert_triggered:{alert.id}:{firing}"
+            rows.append(
+                self._row(key, "alert_triggered", alert.created_by, notification)
+            )
+        return self._insert(db, rows)
+
+    def enqueue(
+        self,
+        db: Session,
+        user_id: int,
+        notification: Dict[str, Any],
+        idempotency_key: Optional[str] = None,
+    ) -> int:
+        """
+        Append a single notification to the outbox.
+
+        Args:
+            db: Database session (committed by this call)
+            user_id: Recipient user ID
+            notification: Notification message (its ``type`` is the outbox kind)
+            idempotency_key: Key identifying the notification (random if omitted)
+
+        Returns:
+            1 if the notification was added, 0 if the key was already present
+        """
+        key = idempotency_key or str(uuid4())
+        kind = notification.get("type", "notification")
+        return self._insert(db, [self._row(key, kind, user_id, notification)])
+
+    @staticmethod
+    def _row(
+        key: str, kind: str, user_id: int, notification: Dict[str, Any]
+    ) -> Dict[str, Any]:
+        notification = {**notification, "notification_id": key}
+        return {
+            "idempotency_key": key,
+            "kind": kind,
+            "user_id": user_id,
+            "payload": json.dumps(notification, default=str),
+            "status": STATUS_PENDING,
+            "channels_done": "",
+            "attempts": 0,
+            "next_attempt_at": datetime.utcnow(),
+            "created_at": datetime.utcnow(),
+        }
+
+    def _insert(self, db: Session, rows: List[Dict[str, Any]]) -> int:
+        if not rows:
+            return 0
+
+        keys = [row["idempotency_key"] for row in rows]
+        existing = set(
+            db.execute(
+                select(NotificationOutbox.idempotency_key).where(
+                    NotificationOutbox.idempotency_key.in_(keys)
+                )
+            ).scalars()
+        )
+        unique_rows = {
+            row["idempotency_key"]: row
+            for row in rows
+            if row["idempotency_key"] not in existing
+        }
+        new_rows = list(unique_rows.values())
+
+        if new_rows:
+            try:
+                db.execute(insert(NotificationOutbox), new_rows)
+                db.commit()
+            except IntegrityError:
+                # Another worker enqueued some of the same keys meanwhile
+                db.rollback()
+                added = []
+                for row in new_rows:
+                    try:
+                        db.execute(insert(NotificationOutbox), [row])
+                        db.commit()
+                        added.append(row)
+                    except IntegrityError:
+                        db.rollback()
+                new_rows = added
+
+        self._count("enqueued", len(new_rows))
+        self._count("duplicates", len(rows) - len(new_rows))
+        if new_rows:
+            self.wake()
+        return len(new_rows)
+
+    def wake(self) -> None:
+        """Wake the delivery worker (safe to call from any thread)."""
+        if self._loop is None or self._wake is None:
+            return
+        try:
+            self._loop.call_soon_threadsafe(self._wake.set)
+        except RuntimeError:
+            pass
+
+    # ===== CLAIM / COMPLETE =====
+
+    def _new_session(self) -> Session:
+        """Create a database session for the delivery worker."""
+        if self._session_factory is None:
+            from app.db.database import SessionLocal
+
+            self._session_factory = SessionLocal
+        return self._session_factory()
+
+    def _claim_batch(self) -> List[Dict[str, Any]]:
+        """Reserve a batch of due notifications for this worker."""
+        now = datetime.utcnow()
+        token = str(uuid4())
+        claimable = or_(
+            NotificationOutbox.locked_until.is_(None),
+            NotificationOutbox.locked_until < now,
+        )
+
+        db = self._new_session()
+        try:
+            ids = (
+                db.execute(
+                    select(NotificationOutbox.id)
+                    .where(
+                        NotificationOutbox.status == STATUS_PENDING,
+                        NotificationOutbox.next_attempt_at <= now,
+                        claimable,
+                    )
+                    .order_by(NotificationOutbox.id)
+                    .limit(self.batch_size)
+                )
+                .scalars()
+                .all()
+            )
+            if not ids:
+                return []
+
+            db.execute(
+                update(NotificationOutbox)
+                .where(NotificationOutbox.id.in_(ids), claimable)
+                .values(
+                    locked_by=token,
+                    locked_until=now + timedelta(seconds=self.lease_seconds),
+                )
+            )
+            db.commit()
+
+            result = db.execute(
+                select(
+                    NotificationOutbox.id,
+                    NotificationOutbox.kind,
+                    NotificationOutbox.user_id,
+                    NotificationOutbox.payload,
+                    NotificationOutbox.channels_done,
+                    NotificationOutbox.attempts,
+                    User.email,
+                    User.username,
+                )
+                .outerjoin(User, User.id == NotificationOutbox.user_id)
+                .where(NotificationOutbox.locked_by == token)
+                .order_by(NotificationOutbox.id)
+            )
+            return [
+                {
+                    "id": row.id,
+                    "kind": row.kind,
+                    "user_id": row.user_id,
+                    "payload": json.loads(row.payload),
+                    "done": set(filter(None, row.channels_done.split(","))),
+                    "attempts": row.attempts,
+                    "email": row.email,
+                    "username": row.username,
+                    "locked_by": token,
+                    "errors": [],
+                }
+                for row in result
+            ]
+        finally:
+            db.close()
+
+    def _retry_delay(self, attempts: int) -> float:
+        delay = min(self.backoff_max, self.backoff_base**attempts)
+        return delay * random.uniform(0.5, 1.0)
+
+    def _complete(
+        self, batch: List[Dict[str, Any]], required: Dict[int, Set[str]]
+    ) -> None:
+        """Record the outcome of a delivered batch and release its claim."""
+        now = datetime.utcnow()
+        params = []
+        for item in batch:
+            attempts = item["attempts"] + 1
+            delivered = required[item["id"]] <= item["done"]
+            if delivered:
+                status, next_attempt_at = STATUS_DELIVERED, now
+            elif not item["errors"] and item.get("defer_until"):
+                # Only waiting for its digest window; not a failed attempt
+                status, next_attempt_at = STATUS_PENDING, item["defer_until"]
+                attempts -= 1
+            elif attempts >= self.max_attempts:
+                status, next_attempt_at = STATUS_FAILED, now
+            else:
+                status = STATUS_PENDING
+                next_attempt_at = now + timedelta(seconds=self._retry_delay(attempts))
+
+            params.append(
+                {
+                    "id": item["id"],
+                    "locked_by": item["locked_by"],
+                    "status": status,
+                    "channels_done": ",".join(sorted(item["done"])),
+                    "attempts": attempts,
+                    "next_attempt_at": next_attempt_at,
+                    "last_error": "; ".join(item["errors"]) or None,
+                    "delivered_at": now if delivered else None,
+                }
+            )
+
+            if status == STATUS_DELIVERED:
+                self._count("delivered")
+            elif item.get("defer_until") and not item["errors"]:
+                pass
+            elif status == STATUS_FAILED:
+                self._count("failed")
+                logger.error(
+                    f"Giving up on notification {item['id']} after {attempts} attempts: {item['errors']}"
+                )
+            else:
+                self._count("retried")
+
+        db = self._new_session()
+        try:
+            db.execute(_COMPLETE_DELIVERY, params)
+            db.commit()
+        finally:
+            db.close()
+
+    def purge(self) -> int:
+        """
+        Delete delivered and failed notifications older than ``retention_days``.
+
+        Returns:
+            Number of rows deleted
+        """
+        cutoff = datetime.utcnow() - timedelta(days=self.retention_days)
+        db = self._new_session()
+        try:
+            result = db.execute(
+                delete(NotificationOutbox).where(
+                    NotificationOutbox.status.in_([STATUS_DELIVERED, STATUS_FAILED]),
+                    NotificationOutbox.created_at < cutoff,
+                )
+            )
+            db.commit()
+            return result.rowcount or 0
+        finally:
+            db.close()
+
+    # ===== DELIVERY =====
+
+    async def deliver_batch(self) -> int:
+        """
+        Claim and deliver one batch of due notifications.
+
+        Returns:
+            Number of notifications processed
+        """
+        batch = await asyncio.to_thread(self._claim_batch)
+        if not batch:
+            return 0
+
+        manager = self.manager
+        redis_client = manager.redis_client
+        email_enabled = self.email_service.is_configured()
+
+        required: Dict[int, Set[str]] = {}
+        for item in batch:
+            channels = {CHANNEL_WEBSOCKET}
+            if redis_client is not None:
+                channels.add(CHANNEL_HISTORY)
+            if email_enabled and item["kind"] == "alert_triggered" and item["email"]:
+                channels.add(CHANNEL_EMAIL)
+            required[item["id"]] = channels
+
+        def pending(channel: str) -> List[Dict[str, Any]]:
+            return [
+                i
+                for i in batch
+                if channel in required[i["id"]] and channel not in i["done"]
+            ]
+
+        # WebSocket pushes only enqueue on the hub, so they never wait on clients
+        for item in pending(CHANNEL_WEBSOCKET):
+            try:
+                await manager.send_personal_message(item["payload"], item["user_id"])
+                item["done"].add(CHANNEL_WEBSOCKET)
+            except Exception as e:
+                item["errors"].append(f"websocket: {e}")
+
+        # One round trip for the history of the whole batch
+        history = pending(CHANNEL_HISTORY)
+        if history:
+            try:
+                pipe = redis_client.pipeline(transaction=False)
+                for item in history:
+                    key = f"notifications:user:{item['user_id']}"
+                    pipe.lpush(key, json.dumps(item["payload"]))
+                    pipe.ltrim(key, 0, self.history_size - 1)
+                    pipe.expire(key, self.history_ttl)
+                await pipe.execute()
+                for item in history:
+                    item["done"].add(CHANNEL_HISTORY)
+            except Exception as e:
+                for item in history:
+                    item["errors"].append(f"history: {e}")
+
+        emails = self._group_emails(pending(CHANNEL_EMAIL))
+        if emails:
+            semaphore = asyncio.Semaphore(self.email_concurrency)
+
+            async def send(items: List[Dict[str, Any]]) -> None:
+                async with semaphore:
+                    try:
+                        sent = await self.formatter.send_alert_digest_email(
+                            [item["payload"] for item in items],
+                            items[0]["email"],
+                            items[0]["username"],
+                        )
+                    except Exception as e:
+                        sent, error = False, f"email: {e}"
+                    else:
+                        error = "email: provider rejected message"
+                    for item in items:
+                        if sent:
+                            item["done"].add(CHANNEL_EMAIL)
+                        else:
+                            item["errors"].append(error)
+                    if sent:
+                        self._last_email_at[items[0]["user_id"]] = datetime.utcnow()
+                        self._count("emails")
+                        self._count("digested", len(items) - 1)
+
+            await asyncio.gather(*(send(items) for items in emails))
+
+        await asyncio.to_thread(self._complete, batch, required)
+        self._count("batches")
+        return len(batch)
+
+    def _group_emails(self, items: List[Dict[str, Any]]) -> List[List[Dict[str, Any]]]:
+        """
+        Group pending alert emails into one email per user.
+
+        Users emailed within the digest window get their items deferred to
+        the end of the window instead, so the next email is a digest.
+        """
+        by_user: Dict[int, List[Dict[str, Any]]] = {}
+        for item in items:
+            by_user.setdefault(item["user_id"], []).append(item)
+
+        now = datetime.utcnow()
+        window = timedelta(seconds=self.digest_window)
+        if len(self._last_email_at) > 10000:
+            self._last_email_at = {
+                user_id: sent_at
+                for user_id, sent_at in self._last_email_at.items()
+                if sent_at + window > now
+            }
+
+        groups = []
+        for user_id, user_items in by_user.items():
+            last_email_at = self._last_email_at.get(user_id)
+            if last_email_at is not None and self.digest_window > 0:
+                window_ends = last_email_at + window
+                if window_ends > now:
+                    for item in user_items:
+                        item["defer_until"] = window_ends
+                    continue
+            groups.append(user_items)
+        return groups
+
+    async def _run(self) -> None:
+        """Deliver batches until stopped, sleeping between polls when idle."""
+        while not self._stopping.is_set():
+            try:
+                processed = await self.deliver_batch()
+            except Exception as e:
+                logger.error(f"Error in notification delivery loop: {e}")
+                processed = 0
+
+            if time.monotonic() - self._last_purge > 3600:
+                self._last_purge = time.monotonic()
+                try:
+                    await asyncio.to_thread(self.purge)
+                except Exception as e:
+                    logger.error(f"Error purging notification outbox: {e}")
+
+            if processed >= self.batch_size:
+                continue
+
+            self._wake.clear()
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+
+    def start(self) -> None:
+        """Start the delivery worker on the running event loop."""
+        if self._task is not None and not self._task.done():
+            return
+        self._loop = asyncio.get_running_loop()
+        self._stopping = asyncio.Event()
+        self._wake = asyncio.Event()
+        self._task = asyncio.create_task(self._run())
+        logger.info(
+            f"Notification delivery worker started (batch size {self.batch_size})"
+        )
+
+    async def stop(self) -> None:
+        """Stop the delivery worker; undelivered notifications stay in the outbox."""
+        if self._task is None:
+            return
+        self._stopping.set()
+        self._wake.set()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        logger.info("Notification delivery worker stopped")
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get outbox counters and the number of notifications per status."""
+        db = self._new_session()
+        try:
+            backlog = dict(
+                db.execute(
+                    select(NotificationOutbox.status, func.count()).group_by(
+                        NotificationOutbox.status
+                    )
+                ).all()
+            )
+        finally:
+            db.close()
+
+        with self._stats_lock:
+            stats = dict(self.stats)
+        stats["running"] = self._task is not None and not self._task.done()
+        stats["backlog"] = {
+            status: backlog.get(status, 0)
+            for status in (STATUS_PENDING, STATUS_DELIVERED, STATUS_FAILED)
+        }
+        return stats
+
+
+# Global notification outbox instance
+_outbox: Optional[NotificationOutboxService] = None
+
+
+def get_notification_outbox() -> NotificationOutboxService:
+    """Get the global notification outbox instance."""
+    global _outbox
+    if _outbox is None:
+        _outbox = NotificationOutboxService()
+    return _outbox
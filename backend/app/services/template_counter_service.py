@@ -0,0 +1,227 @@
+"""
+Template counter service for buffered download/view counting.
+
+Popular templates receive many downloads and page views. Issuing one
+``UPDATE`` per event makes every request contend on the same row, so this
+service coalesces increments in memory per template and flushes them in
+batches with ``UPDATE ... SET downloads = downloads + :n``.
+"""
+
+import asyncio
+import logging
+import threading
+from collections import defaultdict
+from typing import Callable, Dict, Optional, Tuple
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+logger = logging.getLogger(__name__)
+
+# Counter columns on marketplace_templates that may be incremented
+COUNTER_COLUMNS = ("downloads", "view_count", "deployment_count")
+
+
+class TemplateCounterBuffer:
+    """In-memory, thread-safe buffer that coalesces template counter increments."""
+
+    def __init__(
+        self,
+        session_factory: Optional[Callable[[], Session]] = None,
+        flush_interval: float = 5.0,
+        max_pending: int = 1000,
+    ):
+        """
+        Initialize the counter buffer.
+
+        Args:
+            session_factory: Callable returning a new database session
+            flush_interval: Seconds between background flushes
+            max_pending: Number of distinct pending counters that triggers an early flush
+        """
+        self._session_factory = session_factory
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self._pending: Dict[Tuple[int, str], int] = defaultdict(int)
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._task: Optional[asyncio.Task] = None
+        self._stopping: Optional[asyncio.Event] = None
+        self._wake: Optional[asyncio.Event] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self.stats = {"increments": 0, "flushes": 0, "rows_updated": 0, "errors": 0}
+
+    def increment(
+        self, template_id: int, column: str = "downloads", amount: int = 1
+    ) -> None:
+        """
+        Record an increment for a template counter.
+
+        Args:
+            template_id: Marketplace template ID
+            column: Counter column to increment
+            amount: Increment amount
+        """
+        if column not in COUNTER_COLUMNS:
+            raise ValueError(f"Unsupported counter column: {column}")
+        if amount <= 0:
+            return
+
+        with self._lock:
+            self._pending[(template_id, column)] += amount
+            self.stats["increments"] += 1
+            pending_count = len(self._pending)
+
+        if pending_count >= self.max_pending:
+            if self._task is not None and not self._task.done():
+                # Increments arrive from worker threads too, so wake the loop thread-safely
+                self._loop.call_soon_threadsafe(self._wake.set)
+            else:
+                # No background loop is running, so keep the buffer bounded inline
+                self.flush()
+
+    def record_download(self, template_id: int) -> None:
+        """Record a template download."""
+        self.increment(template_id, "downloads")
+
+    def record_view(self, template_id: int) -> None:
+        """Record a template view."""
+        self.increment(template_id, "view_count")
+
+    def pending(self, template_id: int, column: str = "downloads") -> int:
+        """
+        Get the not-yet-flushed increment for a template counter.
+
+        Args:
+            template_id: Marketplace template ID
+            column: Counter column
+
+        Returns:
+            Pending increment amount
+        """
+        with self._lock:
+            return self._pending.get((template_id, column), 0)
+
+    def _drain(self) -> Dict[Tuple[int, str], int]:
+        """Atomically take all pending increments."""
+        with self._lock:
+            drained = dict(self._pending)
+            self._pending.clear()
+        return drained
+
+    def _restore(self, drained: Dict[Tuple[int, str], int]) -> None:
+        """Put back increments that failed to flush."""
+        with self._lock:
+            for key, amount in drained.items():
+                self._pending[key] += amount
+
+    def flush(self, db: Optional[Session] = None) -> int:
+        """
+        Write all pending increments to the database in one transaction.
+
+        Args:
+            db: Optional database session; a new one is created if omitted
+
+        Returns:
+            Number of counter rows updated
+        """
+        with self._flush_lock:
+            drained = self._drain()
+            if not drained:
+                return 0
+
+            # Group by column so each column is a single executemany statement
+            by_column: Dict[str, list] = defaultdict(list)
+            for (template_id, column), amount in drained.items():
+                by_column[column].append({"template_id": template_id, "amount": amount})
+
+            owns_session = db is None
+            if owns_session:
+                db = self._new_session()
+
+            try:
+                for column, params in by_column.items():
+                    db.execute(
+                        text(
+                            f"UPDATE marketplace_templates "
+                            f"SET {column} = COALESCE({column}, 0) + :amount "
+                            f"WHERE id = :template_id"
+                        ),
+                        params,
+                    )
+                db.commit()
+            except Exception as e:
+                db.rollback()
+                self._restore(drained)
+                self.stats["errors"] += 1
+                logger.error(f"Failed to flush template counters: {e}")
+                return 0
+            finally:
+                if owns_session:
+                    db.close()
+
+            self.stats["flushes"] += 1
+            self.stats["rows_updated"] += len(drained)
+            logger.debug(f"Flushed {len(drained)} template counter updates")
+            return len(drained)
+
+    def _new_session(self) -> Session:
+        """Create a database session for flushing."""
+        if self._session_factory is None:
+            from app.db.database import SessionLocal
+
+            self._session_factory = SessionLocal
+        return self._session_factory()
+
+    async def _flush_periodically(self) -> None:
+        """Flush pending increments every ``flush_interval`` seconds, or early when woken, until stopped."""
+        while not self._stopping.is_set():
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+
+            try:
+                await asyncio.to_thread(self.flush)
+            except Exception as e:
+                logger.error(f"Error in template counter flush loop: {e}")
+
+    def start(self) -> None:
+        """Start the background flush loop on the running event loop."""
+        if self._task is not None and not self._task.done():
+            return
+        self._stopping = asyncio.Event()
+        self._wake = asyncio.Event()
+        self._loop = asyncio.get_running_loop()
+        self._task = asyncio.create_task(self._flush_periodically())
+        logger.info(
+            f"Template counter flush loop started (interval {self.flush_interval}s)"
+        )
+
+    async def stop(self) -> None:
+        """Stop the background loop and flush whatever is still buffered."""
+        if self._task is not None:
+            self._stopping.set()
+            self._wake.set()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+        # Final flush so a graceful shutdown never drops counted events
+        await asyncio.to_thread(self.flush)
+        logger.info("Template counter flush loop stopped")
+
+
+# Global counter buffer instance
+_counter_buffer: Optional[TemplateCounterBuffer] = None
+
+
+def get_template_counter_buffer() -> TemplateCounterBuffer:
+    """Get the global template counter buffer instance."""
+    global _counter_buffer
+    if _counter_buffer is None:
+        _counter_buffer = TemplateCounterBuffer()
+    return _counter_buffer
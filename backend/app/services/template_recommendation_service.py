@@ -0,0 +1,334 @@
+"""
+Template recommendation service with precomputed recommendation tables.
+
+Recommendations are built periodically from TemplateDeploymentHistory:
+- item-item co-deployment similarity (cosine over the sets of users that
+  deployed each template), truncated to the top neighbours per template
+- per-category popularity lists using the marketplace ranking
+  (performance score, success rate, rating, downloads)
+
+Per-user requests are then served from these in-memory tables plus a small
+TTL cache of the templates each user has already deployed, so request
+latency does not grow with deployment history.
+"""
+
+import asyncio
+import logging
+import math
+import threading
+import time
+from collections import OrderedDict, defaultdict
+from typing import Callable, Dict, List, Optional, Set, Tuple
+
+from sqlalchemy import desc
+from sqlalchemy.orm import Session
+
+from app.db.models import MarketplaceTemplate, TemplateDeploymentHistory, TemplateStatus
+
+logger = logging.getLogger(__name__)
+
+
+class TemplateRecommendationEngine:
+    """Precomputed item-item and popularity recommendation tables."""
+
+    def __init__(
+        self,
+        session_factory: Optional[Callable[[], Session]] = None,
+        max_neighbors: int = 20,
+        rebuild_interval: float = 900.0,
+        exclusion_ttl: float = 300.0,
+        exclusion_cache_size: int = 10000,
+    ):
+        """
+        Initialize the recommendation engine.
+
+        Args:
+            session_factory: Callable returning a new database session
+            max_neighbors: Similar templates kept per template
+            rebuild_interval: Seconds between background rebuilds
+            exclusion_ttl: Seconds a user's deployed-template set stays cached
+            exclusion_cache_size: Maximum number of cached user exclusion sets
+        """
+        self._session_factory = session_factory
+        self.max_neighbors = max_neighbors
+        self.rebuild_interval = rebuild_interval
+        self.exclusion_ttl = exclusion_ttl
+        self.exclusion_cache_size = exclusion_cache_size
+
+        # Precomputed tables, swapped atomically on rebuild
+        self._neighbors: Dict[int, List[Tuple[int, float]]] = {}
+        self._popular_by_category: Dict[Optional[int], List[int]] = {}
+        self._template_category: Dict[int, int] = {}
+        self.built_at: Optional[float] = None
+
+        self._exclusions: "OrderedDict[int, Tuple[float, frozenset]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def is_built(self) -> bool:
+        """Whether the recommendation tables have been built."""
+        return self.built_at is not None
+
+    # ===== OFFLINE BUILD =====
+
+    def rebuild(self, db: Optional[Session] = None) -> Dict[str, int]:
+        """
+        Rebuild the similarity and popularity tables from the database.
+
+        Args:
+            db: Optional database session; a new one is created if omitted
+
+        Returns:
+            Dictionary with build statistics
+        """
+        owns_session = db is None
+        if owns_session:
+            db = self._new_session()
+
+        try:
+            popular_rows = (
+                db.query(MarketplaceTemplate.id, MarketplaceTemplate.category_id)
+                .filter(
+                    MarketplaceTemplate.status == TemplateStatus.APPROVED,
+                    MarketplaceTemplate.is_deprecated.isnot(True),
+                )
+                .order_by(
+                    desc(MarketplaceTemplate.performance_score),
+                    desc(MarketplaceTemplate.deployment_success_rate),
+                    desc(MarketplaceTemplate.rating_avg),
+                    desc(MarketplaceTemplate.downloads),
+                )
+                .all()
+            )
+            history_rows = (
+                db.query(
+                    TemplateDeploymentHistory.user_id,
+                    TemplateDeploymentHistory.template_id,
+                )
+                .distinct()
+                .all()
+            )
+        finally:
+            if owns_session:
+                db.close()
+
+        template_category: Dict[int, int] = {}
+        popular_by_category: Dict[Optional[int], List[int]] = defaultdict(list)
+        for template_id, category_id in popular_rows:
+            template_category[template_id] = category_id
+            popular_by_category[None].append(template_id)
+            popular_by_category[category_id].append(template_id)
+
+        neighbors = self._compute_neighbors(history_rows, set(template_category))
+
+        with self._lock:
+            self._neighbors = neighbors
+            self._popular_by_category = dict(popular_by_category)
+            self._template_category = template_category
+            self.built_at = time.time()
+
+        stats = {
+            "templates": len(template_category),
+            "deployments": len(history_rows),
+            "similarity_pairs": sum(len(v) for v in neighbors.values()),
+        }
+        logger.info(f"Rebuilt template recommendation tables: {stats}")
+        return stats
+
+    def _compute_neighbors(
+        self, history_rows: List[Tuple[int, int]], candidates: Set[int]
+    ) -> Dict[int, List[Tuple[int, float]]]:
+        """Compute top-N cosine co-deployment neighbours for each template."""
+        templates_by_user: Dict[int, Set[int]] = defaultdict(set)
+        users_per_template: Dict[int, int] = defaultdict(int)
+        for user_id, template_id in history_rows:
+            templates_by_user[user_id].add(template_id)
+            users_per_template[template_id] += 1
+
+        co_counts: Dict[int, Dict[int, int]] = defaultdict(lambda: defaultdict(int))
+        for templates in templates_by_user.values():
+            deployed = sorted(templates)
+            for i, a in enumerate(deployed):
+                for b in deployed[i + 1 :]:
+                    co_counts[a][b] += 1
+                    co_counts[b][a] += 1
+
+        neighbors: Dict[int, List[Tuple[int, float]]] = {}
+        for template_id, counts in co_counts.items():
+            scored = [
+                (
+                    other_id,
+                    count
+                    / math.sqrt(
+                        users_per_template[template_id] * users_per_template[other_id]
+                    ),
+                )
+                for other_id, count in counts.items()
+                if other_id in candidates
+            ]
+            scored.sort(key=lambda item: item[1], reverse=True)
+            if scored:
+                neighbors[template_id] = [
+                    (other_id, round(score, 4))
+                    for other_id, score in scored[: self.max_neighbors]
+                ]
+        return neighbors
+
+    # ===== ONLINE SERVING =====
+
+    def recommend_ids(
+        self,
+        db: Session,
+        user_id: Optional[int] = None,
+        category_id: Optional[int] = None,
+        limit: int = 10,
+    ) -> List[int]:
+        """
+        Get recommended template IDs from the precomputed tables.
+
+        Args:
+            db: Database session used to load the user's exclusion set on a cache miss
+            user_id: User ID for personalized recommendations
+            category_id: Category ID to restrict recommendations to
+            limit: Maximum number of template IDs to return
+
+        Returns:
+            Ordered list of recommended template IDs
+        """
+        if not self.is_built:
+            self.rebuild(db)
+
+        with self._lock:
+            neighbors = self._neighbors
+            popular = self._popular_by_category.get(category_id, [])
+            template_category = self._template_category
+
+        excluded = self.get_user_exclusions(db, user_id) if user_id else frozenset()
+
+        # Score candidates by similarity to what the user already deployed
+        scores: Dict[int, float] = defaultdict(float)
+        for deployed_id in excluded:
+            for other_id, similarity in neighbors.get(deployed_id, ()):
+                if other_id in excluded:
+                    continue
+                if category_id and template_category.get(other_id) != category_id:
+                    continue
+                scores[other_id] += similarity
+
+        result = [
+            template_id
+            for template_id, _ in sorted(
+                scores.items(), key=lambda item: item[1], reverse=True
+            )
+        ][:limit]
+
+        # Fill the remainder from the popularity list
+        if len(result) < limit:
+            seen = set(result)
+            for template_id in popular:
+                if template_id in excluded or template_id in seen:
+                    continue
+                result.append(template_id)
+                if len(result) >= limit:
+                    break
+
+        return result
+
+    def get_user_exclusions(self, db: Session, user_id: int) -> frozenset:
+        """
+        Get the set of template IDs a user has already deployed (cached with TTL).
+
+        Args:
+            db: Database session used on a cache miss
+            user_id: User ID
+
+        Returns:
+            Frozen set of deployed template IDs
+        """
+        now = time.time()
+        with self._lock:
+            cached = self._exclusions.get(user_id)
+            if cached and now - cached[0] < self.exclusion_ttl:
+                self._exclusions.move_to_end(user_id)
+                return cached[1]
+
+        rows = (
+            db.query(TemplateDeploymentHistory.template_id)
+            .filter(TemplateDeploymentHistory.user_id == user_id)
+            .distinct()
+            .all()
+        )
+        exclusions = frozenset(row[0] for row in rows)
+
+        with self._lock:
+            self._exclusions[user_id] = (now, exclusions)
+            self._exclusions.move_to_end(user_id)
+            while len(self._exclusions) > self.exclusion_cache_size:
+                self._exclusions.popitem(last=False)
+
+        return exclusions
+
+    def invalidate_user(self, user_id: int) -> None:
+        """Drop a user's cached exclusion set, e.g. after a new deployment."""
+        with self._lock:
+            self._exclusions.pop(user_id, None)
+
+    def get_stats(self) -> Dict[str, Optional[float]]:
+        """Get recommendation table statistics."""
+        with self._lock:
+            return {
+                "built_at": self.built_at,
+                "templates": len(self._template_category),
+                "templates_with_neighbors": len(self._neighbors),
+                "categories": len(
+                    [key for key in self._popular_by_category if key is not None]
+                ),
+                "cached_users": len(self._exclusions),
+            }
+
+    # ===== BACKGROUND REBUILD =====
+
+    def _new_session(self) -> Session:
+        """Create a database session for rebuilding."""
+        if self._session_factory is None:
+            from app.db.database import SessionLocal
+
+            self._session_factory = SessionLocal
+        return self._session_factory()
+
+    async def _rebuild_periodically(self) -> None:
+        """Rebuild the tables every ``rebuild_interval`` seconds."""
+        while True:
+            try:
+                await asyncio.to_thread(self.rebuild)
+            except Exception as e:
+                logger.error(f"Error rebuilding template recommendations: {e}")
+            await asyncio.sleep(self.rebuild_interval)
+
+    def start(self) -> None:
+        """Start the background rebuild loop on the running event loop."""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._rebuild_periodically())
+
+    async def stop(self) -> None:
+        """Stop the background rebuild loop."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+# Global recommendation engine instance
+_recommendation_engine: Optional[TemplateRecommendationEngine] = None
+
+
+def get_recommendation_engine() -> TemplateRecommendationEngine:
+    """Get the global template recommendation engine instance."""
+    global _recommendation_engine
+    if _recommendation_engine is None:
+        _recommendation_engine = TemplateRecommendationEngine()
+    return _recommendation_engine
@@ -0,0 +1,327 @@
+"""
+Compact delta-encoded protocol for the metrics WebSocket streams.
+
+Version 1 (the default) sends every update as a full JSON document. Clients
+opt into version 2 either by offering a WebSocket subprotocol
+(``metrics.v2.json`` or ``metrics.v2.msgpack``) or with the query
+parameters ``?protocol=v2&encoding=json|msgpack``.
+
+Version 2 flattens each update into dotted field paths (nested dicts and
+lists included, e.g. ``individual_stats.web.cpu_percent``) and sends:
+
+- a keyframe ``{"t": "k", "seq", "ts", "fields": [...], "values": [...],
+  "static": {...}}`` listing every numeric field in a fixed order, plus the
+  non-numeric fields (names, statuses), whenever the field set or a
+  non-numeric value changes, every ``keyframe_interval`` frames, or when
+  the client asks with ``{"type": "resync"}``
+- otherwise a delta ``{"t": "d", "seq", "ts", "c": [[index, value], ...]}``
+  carrying only numeric fields whose value changed since the last frame
+
+``ts`` is milliseconds since the epoch and replaces the per-sample
+``timestamp`` strings, which are left out of frames. Floats are rounded to
+``float_precision`` decimals, so jitter below that does not produce
+deltas. Control messages (connection_established, errors) keep their v1
+shape. With the msgpack encoding every frame is a binary message; JSON
+frames are serialized without whitespace. Compression is left to the
+server's permessage-deflate support. Frames written through a client's
+send queue are never coalesced; a dropped frame is repaired with a keyframe.
+"""
+
+import json
+import logging
+import time
+from typing import Any, Dict, List, Optional
+
+from fastapi import WebSocket
+
+from app.websocket.send_queue import ClientSendQueue
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+logger = logging.getLogger(__name__)
+
+PROTOCOL_VERSION = 2
+SUBPROTOCOL_JSON = "metrics.v2.json"
+SUBPROTOCOL_MSGPACK = "metrics.v2.msgpack"
+
+# Per-sample fields superseded by the frame's ``ts``
+VOLATILE_KEYS = frozenset({"timestamp"})
+
+# Markers for entering and leaving a nested container while walking a payload
+_DOWN = object()
+_UP = object()
+
+
+def flatten_metrics(
+    data: Any, prefix: str = "", out: Optional[Dict[str, Any]] = None
+) -> Dict[str, Any]:
+    """
+    Flatten nested dicts and lists into the dotted field paths used in keyframes.
+
+    Args:
+        data: Metrics payload
+        prefix: Path of ``data`` within the payload
+
+    Returns:
+        Dictionary mapping field paths to leaf values
+    """
+    if out is None:
+        out = {}
+    if isinstance(data, dict):
+        items = data.items()
+    elif isinstance(data, (list, tuple)):
+        items = enumerate(data)
+    else:
+        out[prefix] = data
+        return out
+
+    for key, value in items:
+        if key in VOLATILE_KEYS:
+            continue
+        path = f"{prefix}.{key}" if prefix else str(key)
+        if isinstance(value, (dict, list, tuple)) and value:
+            flatten_metrics(value, path, out)
+        else:
+            out[path] = value
+    return out
+
+
+def _shape_paths(shape: List[Any]) -> List[str]:
+    """Turn a walked payload shape into the dotted path of each leaf."""
+    paths: List[str] = []
+    stack: List[str] = []
+    i = 0
+    while i < len(shape):
+        item = shape[i]
+        if item is _UP:
+            stack.pop()
+        elif i + 1 < len(shape) and shape[i + 1] is _DOWN:
+            stack.append(str(item))
+            i += 1
+        else:
+            paths.append(".".join(stack + [str(item)]))
+        i += 1
+    return paths
+
+
+class MetricsStreamEncoder:
+    """Encodes successive metrics updates for one v2 WebSocket stream."""
+
+    def __init__(
+        self,
+        encoding: str = "json",
+        subprotocol: Optional[str] = None,
+        keyframe_interval: int = 60,
+        float_precision: int = 2,
+    ):
+        """
+        Initialize the encoder.
+
+        Args:
+            encoding: ``json`` or ``msgpack``
+            subprotocol: Negotiated WebSocket subprotocol, if any
+            keyframe_interval: Frames between unconditional keyframes
+            float_precision: Decimals floats are rounded to
+        """
+        if encoding == "msgpack" and msgpack is None:
+            raise ValueError("msgpack encoding requested but msgpack is not installed")
+        self.encoding = encoding
+        self.subprotocol = subprotocol
+        self.keyframe_interval = keyframe_interval
+        self.float_precision = float_precision
+
+        self._shape: List[Any] = []
+        self._leaves: List[Any] = []
+        self._numeric_index: List[Optional[int]] = []
+        self._seq = 0
+        self._frames_since_keyframe = 0
+        self._force_keyframe = True
+        self.stats = {"keyframes": 0, "deltas": 0, "bytes": 0}
+        self._dropped_seen = 0
+
+    # ===== NEGOTIATION =====
+
+    @classmethod
+    def negotiate(cls, websocket: WebSocket) -> Optional["MetricsStreamEncoder"]:
+        """
+        Pick the protocol requested by a client.
+
+        Args:
+            websocket: Connection being accepted
+
+        Returns:
+            An encoder for v2 clients, or None for v1 clients
+        """
+        offered = websocket.scope.get("subprotocols") or []
+        if SUBPROTOCOL_MSGPACK in offered and msgpack is not None:
+            return cls("msgpack", subprotocol=SUBPROTOCOL_MSGPACK)
+        if SUBPROTOCOL_JSON in offered:
+            return cls("json", subprotocol=SUBPROTOCOL_JSON)
+
+        params = websocket.query_params
+        if params.get("protocol") == "v2":
+            encoding = params.get("encoding", "json")
+            if encoding == "msgpack" and msgpack is None:
+                logger.warning(
+                    "msgpack not installed; falling back to JSON metrics frames"
+                )
+                encoding = "json"
+            return cls("msgpack" if encoding == "msgpack" else "json")
+        return None
+
+    # ===== ENCODING =====
+
+    def request_keyframe(self) -> None:
+        """Send a keyframe with the next update (e.g. after a client resync)."""
+        self._force_keyframe = True
+
+    def encode_update(
+        self, metrics: Dict[str, Any], timestamp: Optional[float] = None
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Build the next frame for a metrics update.
+
+        Args:
+            metrics: Full metrics payload
+            timestamp: Unix timestamp of the update (now if omitted)
+
+        Returns:
+            Keyframe or delta frame, or None if nothing changed
+        """
+        # Walk the payload collecting raw keys and leaf values; dotted paths
+        # are only built when the shape changes, which keeps steady-state
+        # frames cheaper than serializing the full payload
+        shape: List[Any] = []
+        leaves: List[Any] = []
+        self._walk(metrics, shape, leaves)
+        ts = int((timestamp if timestamp is not None else time.time()) * 1000)
+
+        if (
+            self._force_keyframe
+            or shape != self._shape
+            or self._frames_since_keyframe >= self.keyframe_interval
+        ):
+            return self._keyframe(shape, leaves, ts)
+
+        if leaves == self._leaves:
+            self._frames_since_keyframe += 1
+            return None
+
+        changes = []
+        numeric_index = self._numeric_index
+        for i, (old, value) in enumerate(zip(self._leaves, leaves)):
+            if old != value:
+                if numeric_index[i] is None:
+                    # A name or status changed: resend the schema
+                    return self._keyframe(shape, leaves, ts)
+                changes.append([numeric_index[i], value])
+
+        self._leaves = leaves
+        self._frames_since_keyframe += 1
+        self._seq += 1
+        self.stats["deltas"] += 1
+        return {"t": "d", "seq": self._seq, "ts": ts, "c": changes}
+
+    def _walk(self, data: Any, shape: List[Any], leaves: List[Any]) -> None:
+        precision = self.float_precision
+        items = data.items() if type(data) is dict else enumerate(data)
+        for key, value in items:
+            if key in VOLATILE_KEYS:
+                continue
+            value_type = type(value)
+            if (
+                value_type is dict or value_type is list or value_type is tuple
+            ) and value:
+                shape.append(key)
+                shape.append(_DOWN)
+                self._walk(value, shape, leaves)
+                shape.append(_UP)
+            else:
+                shape.append(key)
+                leaves.append(round(value, precision) if value_type is float else value)
+
+    def _keyframe(self, shape: List[Any], leaves: List[Any], ts: int) -> Dict[str, Any]:
+        paths = _shape_paths(shape)
+        fields, values, static = [], [], {}
+        numeric_index: List[Optional[int]] = []
+        for path, value in zip(paths, leaves):
+            value_type = type(value)
+            if value_type is float or value_type is int:
+                numeric_index.append(len(fields))
+                fields.append(path)
+                values.append(value)
+            else:
+                numeric_index.append(None)
+                static[path] = value
+
+        self._shape, self._leaves, self._numeric_index = shape, leaves, numeric_index
+        self._force_keyframe = False
+        self._frames_since_keyframe = 0
+        self._seq += 1
+        self.stats["keyframes"] += 1
+        return {
+            "t": "k",
+            "v": PROTOCOL_VERSION,
+            "seq": self._seq,
+            "ts": ts,
+            "fields": fields,
+            "values": values,
+            "static": static,
+        }
+
+    def serialize(self, frame: Dict[str, Any]) -> Any:
+        """Serialize a frame as compact JSON text or msgpack bytes."""
+        if self.encoding == "msgpack":
+            return msgpack.packb(frame, use_bin_type=True)
+        return json.dumps(frame, separators=(",", ":"), default=str)
+
+    # ===== SENDING =====
+
+    async def send(self, websocket: WebSocket, frame: Dict[str, Any]) -> None:
+        """Send a frame or control message in the negotiated encoding."""
+        payload = self.serialize(frame)
+        self.stats["bytes"] += len(payload)
+        if self.encoding == "msgpack":
+            await websocket.send_bytes(payload)
+        else:
+            await websocket.send_text(payload)
+
+    async def send_update(self, websocket: WebSocket, metrics: Dict[str, Any]) -> None:
+        """Encode and send a metrics update, skipping empty deltas."""
+        frame = self.encode_update(metrics)
+        if frame is not None:
+            await self.send(websocket, frame)
+
+    def enqueue(self, send_queue: ClientSendQueue, frame: Dict[str, Any]) -> bool:
+        """Queue a frame or control message in the negotiated encoding."""
+        payload = self.serialize(frame)
+        self.stats["bytes"] += len(payload)
+        return send_queue.put(payload)
+
+    def enqueue_update(
+        self, send_queue: ClientSendQueue, metrics: Dict[str, Any]
+    ) -> bool:
+        """
+        Encode and queue a metrics update, skipping empty deltas.
+
+        Frames are never coalesced since deltas build on the frames before
+        them; once the queue has dropped a frame the next update is a keyframe.
+
+        Args:
+            send_queue: The connection's send queue
+            metrics: Full metrics payload
+
+        Returns:
+            False if the queue no longer accepts messages
+        """
+        dropped = send_queue.stats["dropped"]
+        if dropped != self._dropped_seen:
+            self._dropped_seen = dropped
+            self.request_keyframe()
+        frame = self.encode_update(metrics)
+        if frame is None:
+            return not send_queue.closed
+        return self.enqueue(send_queue, frame)
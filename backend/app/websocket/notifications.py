@@ -40,15 +40,14 @@ async def websocket_notifications_endpoint(
         await connection_manager.connect(websocket, user_id)
 
         # Send connection confirmation
-        await websocket.send_text(
-            json.dumps(
-                {
-                    "type": "connection_established",
-                    "timestamp": "2024-01-01T00:00:00Z",  # Will be replaced with actual timestamp
-                    "user_id": user_id,
-                    "message": "Connected to DockerDeployer notifications",
-                }
-            )
+        connection_manager.send_to_connection(
+            websocket,
+            {
+                "type": "connection_established",
+                "timestamp": "2024-01-01T00:00:00Z",  # Will be replaced with actual timestamp
+                "user_id": user_id,
+                "message": "Connected to DockerDeployer notifications",
+            },
         )
 
         # Initialize Redis client for notification history
@@ -78,13 +77,13 @@ async def websocket_notifications_endpoint(
             except WebSocketDisconnect:
                 break
             except json.JSONDecodeError:
-                await websocket.send_text(
-                    json.dumps({"type": "error", "message": "Invalid JSON format"})
+                connection_manager.send_to_connection(
+                    websocket, {"type": "error", "message": "Invalid JSON format"}
                 )
             except Exception as e:
                 logger.error(f"Error handling WebSocket message: {e}")
-                await websocket.send_text(
-                    json.dumps({"type": "error", "message": "Internal server error"})
+                connection_manager.send_to_connection(
+                    websocket, {"type": "error", "message": "Internal server error"}
                 )
 
     except Exception as e:
@@ -111,13 +110,12 @@ async def handle_websocket_message(
 
     if message_type == "ping":
         # Respond to ping with pong
-        await websocket.send_text(
-            json.dumps(
-                {
-                    "type": "pong",
-                    "timestamp": "2024-01-01T00:00:00Z",  # Will be replaced with actual timestamp
-                }
-            )
+        connection_manager.send_to_connection(
+            websocket,
+            {
+                "type": "pong",
+                "timestamp": "2024-01-01T00:00:00Z",  # Will be replaced with actual timestamp
+            },
         )
 
     elif message_type == "acknowledge_alert":
@@ -129,15 +127,14 @@ async def handle_websocket_message(
             notification_service = AlertNotificationService(db)
             success = await notification_service.acknowledge_alert(alert_id, user_id)
 
-            await websocket.send_text(
-                json.dumps(
-                    {
-                        "type": "alert_acknowledgment_response",
-                        "alert_id": alert_id,
-                        "success": success,
-                        "timestamp": "2024-01-01T00:00:00Z",
-                    }
-                )
+            connection_manager.send_to_connection(
+                websocket,
+                {
+                    "type": "alert_acknowledgment_response",
+                    "alert_id": alert_id,
+                    "success": success,
+                    "timestamp": "2024-01-01T00:00:00Z",
+                },
             )
 
     elif message_type == "get_notification_history":
@@ -146,10 +143,9 @@ async def handle_websocket_message(
         await send_notification_history(websocket, user_id, limit)
 
     else:
-        await websocket.send_text(
-            json.dumps(
-                {"type": "error", "message": f"Unknown message type: {message_type}"}
-            )
+        connection_manager.send_to_connection(
+            websocket,
+            {"type": "error", "message": f"Unknown message type: {message_type}"},
         )
 
 
@@ -175,7 +171,7 @@ async def send_pending_notifications(
                 try:
                     notification = json.loads(notification_str)
                     notification["type"] = "pending_notification"
-                    await websocket.send_text(json.dumps(notification))
+                    connection_manager.send_to_connection(websocket, notification)
                 except json.JSONDecodeError:
                     continue
 
@@ -209,25 +205,23 @@ async def send_notification_history(
             except json.JSONDecodeError:
                 continue
 
-        await websocket.send_text(
-            json.dumps(
-                {
-                    "type": "notification_history",
-                    "notifications": history,
-                    "count": len(history),
-                    "timestamp": "2024-01-01T00:00:00Z",
-                }
-            )
+        connection_manager.send_to_connection(
+            websocket,
+            {
+                "type": "notification_history",
+                "notifications": history,
+                "count": len(history),
+                "timestamp": "2024-01-01T00:00:00Z",
+            },
         )
 
         await redis_client.close()
 
     except Exception as e:
         logger.error(f"Error sending notification history: {e}")
-        await websocket.send_text(
-            json.dumps(
-                {"type": "error", "message": "Failed to retrieve notification history"}
-            )
+        connection_manager.send_to_connection(
+            websocket,
+            {"type": "error", "message": "Failed to retrieve notification history"},
         )
 
 
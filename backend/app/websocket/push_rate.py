@@ -0,0 +1,179 @@
+"""
+Adaptive push intervals for the metrics WebSocket streams.
+
+Clients request a resolution with the ``interval`` query parameter (or a
+``{"type": "set_interval", "interval": seconds}`` message where the stream
+reads client messages). The server never pushes faster than the sampler
+produces new data, and backs off towards ``max_interval`` while values stay
+within tolerance or while the client falls behind (slow sends, or earlier
+pushes still waiting in its send queue). Any significant
+change snaps the interval back to the requested resolution.
+"""
+
+import logging
+import os
+from typing import Any, Dict, Optional
+
+from fastapi import WebSocket
+
+from app.websocket.metrics_protocol import flatten_metrics
+
+logger = logging.getLogger(__name__)
+
+
+class AdaptivePushInterval:
+    """Computes the delay before the next push on one metrics stream."""
+
+    def __init__(
+        self,
+        base_interval: float = 5.0,
+        requested_interval: Optional[float] = None,
+        sampler_interval: Optional[float] = None,
+        min_interval: Optional[float] = None,
+        max_interval: Optional[float] = None,
+        backoff_factor: float = 1.5,
+        stable_ticks: int = 3,
+        relative_tolerance: float = 0.01,
+        absolute_tolerance: float = 0.1,
+    ):
+        """
+        Initialize the push interval controller.
+
+        Args:
+            base_interval: Interval used when the client does not request one
+            requested_interval: Resolution requested by the client, in seconds
+            sampler_interval: Cadence at which new samples land, if known
+            min_interval: Lowest interval a client may request (WS_METRICS_MIN_INTERVAL)
+            max_interval: Interval backoff stops at (WS_METRICS_MAX_INTERVAL)
+            backoff_factor: Multiplier applied on each backoff step
+            stable_ticks: Unchanged pushes in a row before backing off
+            relative_tolerance: Relative change below which a value counts as stable
+            absolute_tolerance: Absolute change below which a value counts as stable
+        """
+        self.base_interval = base_interval
+        self.sampler_interval = sampler_interval
+        self.min_interval = min_interval or float(
+            os.getenv("WS_METRICS_MIN_INTERVAL", "1")
+        )
+        self.max_interval = max_interval or float(
+            os.getenv("WS_METRICS_MAX_INTERVAL", "30")
+        )
+        self.backoff_factor = backoff_factor
+        self.stable_ticks = stable_ticks
+        self.relative_tolerance = relative_tolerance
+        self.absolute_tolerance = absolute_tolerance
+
+        self.requested_interval = requested_interval
+        self.current = self.floor
+        self._previous: Optional[Dict[str, Any]] = None
+        self._stable_streak = 0
+        self.stats = {"pushes": 0, "stable": 0, "slow_sends": 0}
+
+    @classmethod
+    def from_websocket(
+        cls,
+        websocket: WebSocket,
+        base_interval: float,
+        sampler_interval: Optional[float] = None,
+    ) -> "AdaptivePushInterval":
+        """Create a controller using the ``interval`` query parameter of a connection."""
+        return cls(
+            base_interval=base_interval,
+            requested_interval=_parse_interval(websocket.query_params.get("interval")),
+            sampler_interval=sampler_interval,
+        )
+
+    @property
+    def floor(self) -> float:
+        """Shortest interval for this stream: requested resolution, bounded by the sampler."""
+        interval = self.requested_interval or self.base_interval
+        if self.sampler_interval:
+            interval = max(interval, self.sampler_interval)
+        return min(max(interval, self.min_interval), self.max_interval)
+
+    def set_requested_interval(self, interval: Any) -> float:
+        """
+        Apply a resolution requested by the client.
+
+        Args:
+            interval: Requested interval in seconds
+
+        Returns:
+            The interval that will be used
+        """
+        self.requested_interval = _parse_interval(interval)
+        self.current = self.floor
+        self._stable_streak = 0
+        return self.current
+
+    def has_changed(self, payload: Dict[str, Any]) -> bool:
+        """
+        Check whether any numeric value moved beyond tolerance since the last push.
+
+        Args:
+            payload: Metrics payload about to be pushed
+
+        Returns:
+            True if the payload differs significantly (or is the first one)
+        """
+        flat = flatten_metrics(payload)
+        previous, self._previous = self._previous, flat
+        if previous is None or previous.keys() != flat.keys():
+            return True
+
+        for path, value in flat.items():
+            old = previous[path]
+            if type(value) in (int, float) and type(old) in (int, float):
+                if abs(value - old) > max(
+                    self.absolute_tolerance, self.relative_tolerance * abs(old)
+                ):
+                    return True
+            elif value != old:
+                return True
+        return False
+
+    def record(
+        self, changed: bool, send_seconds: float = 0.0, backlog: int = 0
+    ) -> float:
+        """
+        Record a push and compute the delay before the next one.
+
+        Args:
+            changed: Whether the pushed values changed significantly
+            send_seconds: How long writing to the client took
+            backlog: Messages still queued for the client when the push was made
+
+        Returns:
+            Seconds to wait before the next push
+        """
+        self.stats["pushes"] += 1
+        floor = self.floor
+
+        if backlog > 0 or send_seconds > max(1.0, self.current / 2):
+            # Client (or its network) cannot keep up: push less often
+            self.stats["slow_sends"] += 1
+            self.current = min(self.max_interval, self.current * self.backoff_factor)
+        elif changed:
+            self._stable_streak = 0
+            self.current = floor
+        else:
+            self.stats["stable"] += 1
+            self._stable_streak += 1
+            if self._stable_streak >= self.stable_ticks:
+                self.current = min(
+                    self.max_interval, self.current * self.backoff_factor
+                )
+
+        self.current = max(self.current, floor)
+        return self.current
+
+
+def _parse_interval(value: Any) -> Optional[float]:
+    if value in (None, ""):
+        return None
+    try:
+        interval = float(value)
+    except (TypeError, ValueError):
+        logger.debug(f"Ignoring invalid metrics push interval: {value!r}")
+        return None
+    return interval if interval > 0 else None
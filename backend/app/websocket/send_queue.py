@@ -0,0 +1,209 @@
+"""
+Per-connection outbound queues for WebSocket clients.
+
+Each connection gets a bounded queue drained by its own writer task, so
+enqueueing a message is O(1) and never waits on the network. A slow or
+stalled client only fills its own queue; what happens then is decided by
+its slow-consumer policy:
+
+- ``drop_oldest``: discard the oldest queued message
+- ``coalesce``: replace a queued message with the same coalesce key (e.g.
+  the latest metrics for a container) and otherwise drop the oldest
+- ``disconnect``: close the connection
+"""
+
+import asyncio
+import logging
+from collections import deque
+from enum import Enum
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional, Union
+
+from fastapi import WebSocket, status
+
+logger = logging.getLogger(__name__)
+
+
+class SlowConsumerPolicy(str, Enum):
+    """What to do when a client's send queue is full."""
+
+    DROP_OLDEST = "drop_oldest"
+    COALESCE = "coalesce"
+    DISCONNECT = "disconnect"
+
+
+class ClientSendQueue:
+    """Bounded outbound queue with a dedicated writer task for one WebSocket."""
+
+    def __init__(
+        self,
+        websocket: WebSocket,
+        max_size: int = 256,
+        policy: SlowConsumerPolicy = SlowConsumerPolicy.COALESCE,
+        send_timeout: float = 10.0,
+        on_close: Optional[Callable[[WebSocket], Awaitable[None]]] = None,
+    ):
+        """
+        Initialize the send queue.
+
+        Args:
+            websocket: Connection to write to
+            max_size: Maximum number of queued messages
+            policy: Slow-consumer policy applied when the queue is full
+            send_timeout: Seconds a single send may take before the client is dropped
+            on_close: Coroutine called with the websocket once the writer gives up on it
+        """
+        self.websocket = websocket
+        self.max_size = max_size
+        self.policy = SlowConsumerPolicy(policy)
+        self.send_timeout = send_timeout
+        self._on_close = on_close
+
+        # Entries are [coalesce_key, message] so coalescing can swap the message in place
+        self._queue: Deque[List[Any]] = deque()
+        self._keyed: Dict[str, List[Any]] = {}
+        self._ready = asyncio.Event()
+        self._idle = asyncio.Event()
+        self._idle.set()
+        self._task: Optional[asyncio.Task] = None
+        self._close_task: Optional[asyncio.Task] = None
+        self.closed = False
+        self.stats = {
+            "enqueued": 0,
+            "sent": 0,
+            "dropped": 0,
+            "coalesced": 0,
+            "max_depth": 0,
+        }
+
+    def __len__(self) -> int:
+        return len(self._queue)
+
+    def start(self) -> None:
+        """Start the writer task on the running event loop."""
+        if self._task is None:
+            self._task = asyncio.create_task(self._writer())
+
+    def put(
+        self, message: Union[str, bytes], coalesce_key: Optional[str] = None
+    ) -> bool:
+        """
+        Queue a serialized message without waiting.
+
+        Args:
+            message: Serialized message; bytes are sent as a binary frame
+            coalesce_key: Messages sharing this key replace each other while queued
+
+        Returns:
+            False if the message was not queued (queue closed or client dropped)
+        """
+        if self.closed:
+            return False
+
+        self.stats["enqueued"] += 1
+        if coalesce_key is not None and self.policy == SlowConsumerPolicy.COALESCE:
+            entry = self._keyed.get(coalesce_key)
+            if entry is not None:
+                entry[1] = message
+                self.stats["coalesced"] += 1
+                return True
+
+        if len(self._queue) >= self.max_size:
+            if self.policy == SlowConsumerPolicy.DISCONNECT:
+                logger.warning(
+                    f"Disconnecting slow WebSocket consumer ({len(self._queue)} messages queued)"
+                )
+                self._abandon(status.WS_1013_TRY_AGAIN_LATER)
+                return False
+            self._drop_oldest()
+
+        entry = [coalesce_key, message]
+        self._queue.append(entry)
+        if coalesce_key is not None and self.policy == SlowConsumerPolicy.COALESCE:
+            self._keyed[coalesce_key] = entry
+
+        self.stats["max_depth"] = max(self.stats["max_depth"], len(self._queue))
+        self._idle.clear()
+        self._ready.set()
+        return True
+
+    def _drop_oldest(self) -> None:
+        key, _ = entry = self._queue.popleft()
+        if key is not None and self._keyed.get(key) is entry:
+            del self._keyed[key]
+        self.stats["dropped"] += 1
+
+    async def _writer(self) -> None:
+        """Send queued messages in order until the queue is closed."""
+        while True:
+            if not self._queue:
+                self._idle.set()
+                self._ready.clear()
+                await self._ready.wait()
+                continue
+
+            key, _ = entry = self._queue.popleft()
+            if key is not None and self._keyed.get(key) is entry:
+                del self._keyed[key]
+
+            message = entry[1]
+            send = (
+                self.websocket.send_bytes
+                if isinstance(message, bytes)
+                else self.websocket.send_text
+            )
+            try:
+                await asyncio.wait_for(send(message), self.send_timeout)
+                self.stats["sent"] += 1
+            except asyncio.CancelledError:
+                raise
+            except asyncio.TimeoutError:
+                logger.warning(
+                    f"WebSocket send timed out after {self.send_timeout}s; dropping client"
+                )
+                self._abandon(status.WS_1013_TRY_AGAIN_LATER)
+                return
+            except Exception as e:
+                logger.debug(f"WebSocket send failed: {e}")
+                self._abandon()
+                return
+
+    def _abandon(self, close_code: Optional[int] = None) -> None:
+        """Stop accepting messages and hand the connection back for cleanup."""
+        self.closed = True
+        self._queue.clear()
+        self._keyed.clear()
+        self._idle.set()
+        self._close_task = asyncio.create_task(self._close_connection(close_code))
+
+    async def _close_connection(self, close_code: Optional[int]) -> None:
+        if close_code is not None:
+            try:
+                await self.websocket.close(code=close_code)
+            except Exception:
+                pass
+        if self._on_close is not None:
+            await self._on_close(self.websocket)
+
+    async def join(self) -> None:
+        """Wait until every queued message has been sent (or the client dropped)."""
+        await self._idle.wait()
+        if (
+            self._close_task is not None
+            and self._close_task is not asyncio.current_task()
+        ):
+            await self._close_task
+
+    async def close(self) -> None:
+        """Discard pending messages and stop the writer task."""
+        self.closed = True
+        self._queue.clear()
+        self._keyed.clear()
+        self._idle.set()
+
+        task, self._task = self._task, None
+        if task is not None and task is not asyncio.current_task() and not task.done():
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
@@ -0,0 +1,713 @@
+"""
+Compose deployment engine.
+
+Turns a Docker Compose style configuration into running containers using the
+Docker SDK. Services form a dependency graph through ``depends_on``,
+``volumes_from`` and ``network_mode: service:<name>``; the graph is split into
+levels where every service only depends on services in earlier levels. A
+deployment then runs in stages:
+
+1. files: write the template's ``files`` into the project directory
+2. images: pull (or build) every image concurrently, bounded by a pool
+3. resources: create the project's networks and named volumes
+4. services: create and start each level's services concurrently, one level
+   after the other
+
+Progress is reported through an optional async ``on_event`` callback and the
+duration of each stage is returned with the result.
+"""
+
+import asyncio
+import logging
+import os
+import time
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Awaitable,
+    Callable,
+    Dict,
+    List,
+    Optional,
+    Set,
+    Tuple,
+)
+
+try:
+    from docker.errors import ImageNotFound, NotFound
+except ImportError:
+    ImageNotFound = Exception
+    NotFound = Exception
+
+if TYPE_CHECKING:
+    from .images import ImagePullCoordinator
+
+logger = logging.getLogger(__name__)
+
+ProgressCallback = Callable[[Dict[str, Any]], Awaitable[None]]
+
+
+class ComposeConfigError(Exception):
+    """Raised when a compose configuration cannot be deployed."""
+
+    pass
+
+
+def _as_list(value: Any) -> List:
+    if value is None:
+        return []
+    if isinstance(value, dict):
+        return list(value)
+    if isinstance(value, (list, tuple)):
+        return list(value)
+    return [value]
+
+
+def service_dependencies(services: Dict[str, Dict]) -> Dict[str, Set[str]]:
+    """
+    Get the services each service depends on.
+
+    Args:
+        services: The ``services`` section of a compose configuration
+
+    Returns:
+        Mapping of service name to the names it depends on
+
+    Raises:
+        ComposeConfigError: If a service depends on an unknown service
+    """
+    dependencies = {}
+    for name, service in services.items():
+        deps = set(str(dep) for dep in _as_list(service.get("depends_on")))
+        for source in _as_list(service.get("volumes_from")):
+            # "service" or "service:ro"; "container:name" refers to a container
+            if not str(source).startswith("container:"):
+                deps.add(str(source).split(":")[0])
+        network_mode = str(service.get("network_mode") or "")
+        if network_mode.startswith("service:"):
+            deps.add(network_mode[len("service:") :])
+        unknown = deps - set(services)
+        if unknown:
+            raise ComposeConfigError(
+                f"Service {name} depends on undefined service(s): {', '.join(sorted(unknown))}"
+            )
+        dependencies[name] = deps
+    return dependencies
+
+
+def deployment_levels(services: Dict[str, Dict]) -> List[List[str]]:
+    """
+    Split services into levels that can be started concurrently.
+
+    Every service's dependencies are in earlier levels.
+
+    Args:
+        services: The ``services`` section of a compose configuration
+
+    Returns:
+        Service names per level, sorted within each level
+
+    Raises:
+        ComposeConfigError: If a dependency is unknown or the graph has a cycle
+    """
+    dependencies = service_dependencies(services)
+    dependents: Dict[str, List[str]] = {name: [] for name in services}
+    remaining = {name: len(deps) for name, deps in dependencies.items()}
+    for name, deps in dependencies.items():
+        for dep in deps:
+            dependents[dep].append(name)
+
+    levels = []
+    ready = sorted(name for name, count in remaining.items() if count == 0)
+    while ready:
+        levels.append(ready)
+        next_ready = []
+        for name in ready:
+            for dependent in dependents[name]:
+                remaining[dependent] -= 1
+                if remaining[dependent] == 0:
+                    next_ready.append(dependent)
+        ready = sorted(next_ready)
+
+    placed = sum(len(level) for level in levels)
+    if placed != len(services):
+        cyclic = sorted(name for name, count in remaining.items() if count > 0)
+        raise ComposeConfigError(
+            f"Circular dependency between services: {', '.join(cyclic)}"
+        )
+    return levels
+
+
+def split_image_reference(image: str) -> Tuple[str, Optional[str]]:
+    """Split an image reference into repository and tag (or digest)."""
+    if "@" in image:
+        repository, digest = image.split("@", 1)
+        return repository, digest
+    name = image.rsplit("/", 1)[-1]
+    if ":" in name:
+        repository, tag = image.rsplit(":", 1)
+        return repository, tag
+    return image, "latest"
+
+
+def _parse_ports(ports: List) -> Dict[str, Any]:
+    bindings: Dict[str, Any] = {}
+    for port in ports:
+        if isinstance(port, dict):
+            container_port = f"{port['target']}/{port.get('protocol', 'tcp')}"
+            host = port.get("published")
+            host = (
+                (port["host_ip"], int(host)) if port.get("host_ip") and host else host
+            )
+        else:
+            spec, _, protocol = str(port).partition("/")
+            parts = spec.split(":")
+            container_port = f"{parts[-1]}/{protocol or 'tcp'}"
+            if len(parts) == 1:
+                host = None
+            elif len(parts) == 2:
+                host = int(parts[0]) if parts[0] else None
+            else:
+                host = (parts[0], int(parts[1])) if parts[1] else (parts[0],)
+        if container_port in bindings:
+            existing = bindings[container_port]
+            bindings[container_port] = (
+                existing if isinstance(existing, list) else [existing]
+            ) + [host]
+        else:
+            bindings[container_port] = host
+    return bindings
+
+
+def _parse_environment(environment: Any) -> Dict[str, str]:
+    if isinstance(environment, dict):
+        return {str(k): "" if v is None else str(v) for k, v in environment.items()}
+    result = {}
+    for item in environment or []:
+        key, _, value = str(item).partition("=")
+        result[key] = value
+    return result
+
+
+def _restart_policy(restart: Optional[str]) -> Optional[Dict[str, Any]]:
+    if not restart or restart == "no":
+        return None
+    name, _, retries = str(restart).partition(":")
+    policy: Dict[str, Any] = {"Name": name}
+    if name == "on-failure" and retries:
+        policy["MaximumRetryCount"] = int(retries)
+    return policy
+
+
+def _volume_source(volume: Any) -> Optional[str]:
+    if isinstance(volume, dict):
+        return volume.get("source")
+    parts = str(volume).split(":")
+    return parts[0] if len(parts) > 1 else None
+
+
+def _is_named_volume(source: str) -> bool:
+    return not source.startswith(("/", ".", "~"))
+
+
+def _is_host_path(source: str) -> bool:
+    """Whether a bind mount source lies outside the project directory."""
+    if source.startswith(("/", "~")):
+        return True
+    return os.path.normpath(source).split(os.sep)[0] == ".."
+
+
+def host_access_options(config: Dict[str, Any]) -> List[str]:
+    """
+    List the options of a configuration that give its containers access to the host.
+
+    These are privileged mode, added capabilities, the host's PID namespace or
+    network stack, and bind mounts of paths outside the project directory.
+
+    Args:
+        config: Rendered compose configuration
+
+    Returns:
+        One ``"<service>: <option>"`` entry per option found
+    """
+    services = config.get("services") if isinstance(config, dict) else None
+    found = []
+    for name, service in (services if isinstance(services, dict) else {}).items():
+        if not isinstance(service, dict):
+            continue
+        for key in ("privileged", "pid", "cap_add"):
+            if service.get(key):
+                found.append(f"{name}: {key}")
+        if str(service.get("network_mode") or "") == "host":
+            found.append(f"{name}: network_mode host")
+        for volume in service.get("volumes") or []:
+            source = _volume_source(volume)
+            if source and not _is_named_volume(source) and _is_host_path(source):
+                found.append(f"{name}: bind mount {source}")
+    return found
+
+
+class ComposeDeployer:
+    """Deploys a compose configuration as one project."""
+
+    def __init__(
+        self,
+        client,
+        project: str,
+        project_dir: Optional[str] = None,
+        max_parallel_pulls: int = 4,
+        on_event: Optional[ProgressCallback] = None,
+        images: Optional["ImagePullCoordinator"] = None,
+        allow_host_access: bool = True,
+    ):
+        """
+        Initialize the deployer.
+
+        Args:
+            client: Docker SDK client
+            project: Project name, used to name containers, networks and volumes
+            project_dir: Directory for template files and relative bind mounts
+            max_parallel_pulls: Images pulled or built at the same time
+            on_event: Async callback receiving progress events
+            images: Coordinator sharing pulls with other deployments
+            allow_host_access: Whether the options listed by
+                ``host_access_options`` may be deployed
+        """
+        self.client = client
+        self.project = project
+        self.project_dir = os.path.abspath(project_dir or os.getcwd())
+        self.max_parallel_pulls = max_parallel_pulls
+        self.on_event = on_event
+        self.images = images
+        self.allow_host_access = allow_host_access
+
+    async def _emit(self, stage: str, status: str, **details) -> None:
+        if self.on_event is None:
+            return
+        try:
+            await self.on_event({"stage": stage, "status": status, **details})
+        except Exception as e:
+            logger.warning(f"Failed to report deployment progress: {e}")
+
+    def _labels(self, service: Optional[str] = None) -> Dict[str, str]:
+        labels = {"com.docker.compose.project": self.project}
+        if service:
+            labels["com.docker.compose.service"] = service
+        return labels
+
+    def _resource_name(self, name: str, definition: Optional[Dict]) -> str:
+        if definition and definition.get("name"):
+            return str(definition["name"])
+        return f"{self.project}_{name}"
+
+    def plan(self, config: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Validate a configuration and work out what to deploy.
+
+        Args:
+            config: Rendered compose configuration
+
+        Returns:
+            Service levels, images to pull, images to build, networks and volumes
+
+        Raises:
+            ComposeConfigError: If the configuration cannot be deployed
+        """
+        services = config.get("services")
+        if not isinstance(services, dict) or not services:
+            raise ComposeConfigError("Configuration has no services")
+        if not self.allow_host_access:
+            options = host_access_options(config)
+            if options:
+                raise ComposeConfigError(
+                    "Host access is not allowed: " + ", ".join(options)
+                )
+        levels = deployment_levels(services)
+
+        networks = {
+            name: definition or {}
+            for name, definition in (config.get("networks") or {}).items()
+        }
+        volumes = {
+            name: definition or {}
+            for name, definition in (config.get("volumes") or {}).items()
+        }
+        pulls: Set[str] = set()
+        builds: Dict[str, Dict] = {}
+        uses_default_network = False
+        for name, service in services.items():
+            if not isinstance(service, dict):
+                raise ComposeConfigError(f"Service {name} must be a mapping")
+            if "build" in service:
+                build = service["build"]
+                build = (
+                    {"context": build} if isinstance(build, str) else dict(build or {})
+                )
+                build.setdefault("context", ".")
+                builds[service.get("image") or f"{self.project}-{name}"] = build
+            elif service.get("image"):
+                pulls.add(str(service["image"]))
+            else:
+                raise ComposeConfigError(
+                    f"Service {name} must have either 'image' or 'build' defined"
+                )
+
+            service_networks = _as_list(service.get("networks"))
+            for network in service_networks:
+                if network not in networks:
+                    raise ComposeConfigError(
+                        f"Service {name} uses undefined network: {network}"
+                    )
+            if not service_networks and not service.get("network_mode"):
+                uses_default_network = True
+
+            for volume in service.get("volumes") or []:
+                source = _volume_source(volume)
+                if source and _is_named_volume(source) and source not in volumes:
+                    raise ComposeConfigError(
+                        f"Service {name} uses undefined volume: {source}"
+                    )
+
+        if uses_default_network:
+            networks.setdefault("default", {})
+        return {
+            "levels": levels,
+            "pulls": sorted(pulls),
+            "builds": builds,
+            "networks": networks,
+            "volumes": volumes,
+        }
+
+    async def deploy(self, config: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Deploy a configuration.
+
+        Args:
+            config: Rendered compose configuration; a template's ``files`` are
+                written into the project directory first
+
+        Returns:
+            Result with ``status`` ("deployed" or "failed"), per-service
+            container details, created networks and volumes, per-stage
+            timings in seconds and the error message on failure
+        """
+        result: Dict[str, Any] = {
+            "project": self.project,
+            "status": "failed",
+            "services": {},
+            "networks": [],
+            "volumes": [],
+            "images": {},
+            "stage_timings": {},
+            "error": None,
+        }
+        started = time.monotonic()
+        stage = "plan"
+        try:
+            plan = self.plan(config)
+            result["levels"] = plan["levels"]
+            result["stage_timings"]["plan"] = round(time.monotonic() - started, 3)
+            await self._emit("plan", "completed", levels=plan["levels"])
+
+            for stage, run in (
+                ("files", lambda: self._write_files(config.get("files") or [])),
+                ("images", lambda: self._prepare_images(plan, result)),
+                ("resources", lambda: self._create_resources(plan, result)),
+                (
+                    "services",
+                    lambda: self._start_services(config["services"], plan, result),
+                ),
+            ):
+                stage_started = time.monotonic()
+                await self._emit(stage, "started")
+                await run()
+                result["stage_timings"][stage] = round(
+                    time.monotonic() - stage_started, 3
+                )
+                await self._emit(
+                    stage, "completed", seconds=result["stage_timings"][stage]
+                )
+            result["status"] = "deployed"
+        except Exception as e:
+            result["error"] = str(e)
+            result["failed_stage"] = stage
+            logger.error(f"Deployment of {self.project} failed during {stage}: {e}")
+            await self._emit(stage, "failed", error=str(e))
+        result["stage_timings"]["total"] = round(time.monotonic() - started, 3)
+        return result
+
+    async def _write_files(self, files: List[Dict]) -> None:
+        def write():
+            for entry in files:
+                relative = os.path.normpath(str(entry["path"]))
+                if relative.startswith("..") or os.path.isabs(relative):
+                    raise ComposeConfigError(f"Invalid file path: {entry['path']}")
+                path = os.path.join(self.project_dir, relative)
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                with open(path, "w") as f:
+                    f.write(str(entry.get("content", "")))
+
+        os.makedirs(self.project_dir, exist_ok=True)
+        if files:
+            await asyncio.to_thread(write)
+
+    async def _prepare_images(
+        self, plan: Dict[str, Any], result: Dict[str, Any]
+    ) -> None:
+        semaphore = asyncio.Semaphore(self.max_parallel_pulls)
+
+        async def prepare(image: str, build: Optional[Dict]) -> None:
+            async with semaphore:
+                image_started = time.monotonic()
+                if build is not None:
+                    await asyncio.to_thread(self.build_image, image, build)
+                    source = "built"
+                else:
+                    source = await asyncio.to_thread(self.pull_image, image)
+                seconds = round(time.monotonic() - image_started, 3)
+                result["images"][image] = {"source": source, "seconds": seconds}
+                await self._emit(
+                    "images", "progress", image=image, source=source, seconds=seconds
+                )
+
+        await asyncio.gather(
+            *[prepare(image, None) for image in plan["pulls"]],
+            *[prepare(image, build) for image, build in plan["builds"].items()],
+        )
+
+    def pull_image(self, image: str) -> str:
+        """
+        Make an image available locally, pulling it if it is missing.
+
+        Pulls go through the image coordinator when one is set, so
+        concurrent deployments share a single pull per image.
+
+        Returns:
+            "cached" if the image was present, "joined" if another
+            deployment's pull was awaited, otherwise "pulled"
+        """
+        if self.images is not None:
+            return self.images.ensure(image, self.client)
+        try:
+            self.client.images.get(image)
+            return "cached"
+        except ImageNotFound:
+            pass
+        repository, tag = split_image_reference(image)
+        self.client.images.pull(repository, tag=tag)
+        return "pulled"
+
+    def build_image(self, image: str, build: Dict[str, Any]) -> None:
+        """Build an image from a service's ``build`` section."""
+        context = build["context"]
+        if not os.path.isabs(context):
+            context = os.path.join(self.project_dir, context)
+        kwargs = {"path": context, "tag": image, "rm": True}
+        if build.get("dockerfile"):
+            kwargs["dockerfile"] = build["dockerfile"]
+        if build.get("args"):
+            kwargs["buildargs"] = {
+                str(k): str(v) for k, v in dict(build["args"]).items()
+            }
+        self.client.images.build(**kwargs)
+
+    async def _create_resources(
+        self, plan: Dict[str, Any], result: Dict[str, Any]
+    ) -> None:
+        def ensure_network(name: str, definition: Dict) -> Optional[str]:
+            if definition.get("external"):
+                return None
+            full_name = self._resource_name(name, definition)
+            if self.client.networks.list(names=[full_name]):
+                return None
+            self.client.networks.create(
+                full_name,
+                driver=definition.get("driver", "bridge"),
+                labels=self._labels(),
+            )
+            return full_name
+
+        def ensure_volume(name: str, definition: Dict) -> Optional[str]:
+            if definition.get("external"):
+                return None
+            full_name = self._resource_name(name, definition)
+            try:
+                self.client.volumes.get(full_name)
+                return None
+            except NotFound:
+                pass
+            self.client.volumes.create(
+                name=full_name,
+                driver=definition.get("driver", "local"),
+                driver_opts=definition.get("driver_opts"),
+                labels=self._labels(),
+            )
+            return full_name
+
+        created = await asyncio.gather(
+            *[
+                asyncio.to_thread(ensure_network, n, d)
+                for n, d in plan["networks"].items()
+            ],
+            *[
+                asyncio.to_thread(ensure_volume, n, d)
+                for n, d in plan["volumes"].items()
+            ],
+        )
+        network_count = len(plan["networks"])
+        result["networks"] = [name for name in created[:network_count] if name]
+        result["volumes"] = [name for name in created[network_count:] if name]
+
+    async def _start_services(
+        self, services: Dict[str, Dict], plan: Dict[str, Any], result: Dict[str, Any]
+    ) -> None:
+        container_ids: Dict[str, str] = {}
+
+        async def start(name: str, level: int) -> None:
+            service_started = time.monotonic()
+            container, create_seconds = await asyncio.to_thread(
+                self._create_container, name, services[name], plan, container_ids
+            )
+            start_started = time.monotonic()
+            await asyncio.to_thread(container.start)
+            container_ids[name] = container.id
+            result["services"][name] = {
+                "container_id": container.id,
+                "container_name": container.name,
+                "level": level,
+                "create_seconds": create_seconds,
+                "start_seconds": round(time.monotonic() - start_started, 3),
+            }
+            await self._emit(
+                "services",
+                "progress",
+                service=name,
+                level=level,
+                seconds=round(time.monotonic() - service_started, 3),
+            )
+
+        for level, names in enumerate(plan["levels"]):
+            await asyncio.gather(*[start(name, level) for name in names])
+
+    def _create_container(
+        self,
+        name: str,
+        service: Dict[str, Any],
+        plan: Dict[str, Any],
+        container_ids: Dict[str, str],
+    ):
+        started = time.monotonic()
+        container_name = service.get("container_name") or f"{self.project}-{name}-1"
+        try:
+            existing = self.client.containers.get(container_name)
+        except NotFound:
+            pass
+        else:
+            # Recreate, like `docker compose up` does for a changed service, but
+            # never touch containers that belong to something else
+            owner = (existing.labels or {}).get("com.docker.compose.project")
+            if owner != self.project:
+                raise ComposeConfigError(
+                    f"container name {container_name} is already used by "
+                    + (
+                        f"project {owner}"
+                        if owner
+                        else "a container outside this project"
+                    )
+                )
+            existing.remove(force=True)
+
+        image = service.get("image") or f"{self.project}-{name}"
+        kwargs: Dict[str, Any] = {
+            "name": container_name,
+            "detach": True,
+            "labels": {
+                **_parse_environment(service.get("labels") or {}),
+                **self._labels(name),
+            },
+        }
+        for key in (
+            "command",
+            "entrypoint",
+            "working_dir",
+            "user",
+            "hostname",
+            "tty",
+            "privileged",
+        ):
+            if key in service:
+                kwargs[key] = service[key]
+        if "stdin_open" in service:
+            kwargs["stdin_open"] = service["stdin_open"]
+        if service.get("environment"):
+            kwargs["environment"] = _parse_environment(service["environment"])
+        if service.get("ports"):
+            kwargs["ports"] = _parse_ports(service["ports"])
+        restart_policy = _restart_policy(service.get("restart"))
+        if restart_policy:
+            kwargs["restart_policy"] = restart_policy
+        volumes = self._volume_binds(name, service.get("volumes") or [], plan)
+        if volumes:
+            kwargs["volumes"] = volumes
+        if service.get("volumes_from"):
+            kwargs["volumes_from"] = []
+            for source in map(str, service["volumes_from"]):
+                if source.startswith("container:"):
+                    kwargs["volumes_from"].append(source[len("container:") :])
+                    continue
+                # "service[:mode]"; the service was started in an earlier level
+                base, _, mode = source.partition(":")
+                container = container_ids[base]
+                kwargs["volumes_from"].append(
+                    f"{container}:{mode}" if mode else container
+                )
+
+        networks = _as_list(service.get("networks"))
+        network_mode = service.get("network_mode")
+        if network_mode:
+            if str(network_mode).startswith("service:"):
+                network_mode = (
+                    f"container:{container_ids[str(network_mode)[len('service:'):]]}"
+                )
+            kwargs["network_mode"] = network_mode
+        else:
+            networks = networks or ["default"]
+            first = self._resource_name(networks[0], plan["networks"].get(networks[0]))
+            kwargs["network"] = first
+            # Other services reach this one by its service name
+            kwargs["networking_config"] = {
+                first: self.client.api.create_endpoint_config(aliases=[name])
+            }
+
+        container = self.client.containers.create(image, **kwargs)
+        for network in networks[1:] if not network_mode else []:
+            full_name = self._resource_name(network, plan["networks"].get(network))
+            self.client.networks.get(full_name).connect(container, aliases=[name])
+        return container, round(time.monotonic() - started, 3)
+
+    def _volume_binds(
+        self, service_name: str, volumes: List, plan: Dict[str, Any]
+    ) -> List[str]:
+        binds = []
+        for i, volume in enumerate(volumes):
+            if isinstance(volume, dict):
+                source, target = volume.get("source"), volume["target"]
+                mode = "ro" if volume.get("read_only") else "rw"
+            else:
+                parts = str(volume).split(":")
+                if len(parts) == 1:
+                    source, target, mode = None, parts[0], "rw"
+                else:
+                    source, target = parts[0], parts[1]
+                    mode = parts[2] if len(parts) > 2 else "rw"
+            if not source:
+                # Anonymous volume; a per-service named volume keeps it across recreation
+                source = f"{self.project}_{service_name}_{i}"
+            elif _is_named_volume(source):
+                source = self._resource_name(source, plan["volumes"].get(source))
+            else:
+                source = os.path.normpath(
+                    os.path.join(self.project_dir, os.path.expanduser(source))
+                )
+            binds.append(f"{source}:{target}:{mode}")
+        return binds
@@ -0,0 +1,355 @@
+"""
+Image pull coordination.
+
+Deployments of the same templates tend to need the same images. The
+coordinator makes sure each image reference is pulled at most once at a
+time: the first caller pulls and every concurrent caller for the same
+reference waits for that pull instead of starting its own. Images seen
+locally are tracked with their ID, repository digests and size.
+
+During idle periods the coordinator prefetches the images of popular
+templates, so a first deployment of a popular template finds its images
+already present. Images pulled by the coordinator are kept within a disk
+budget; when the budget is exceeded, images no container uses are removed,
+least recently used first and images of popular templates last. Images the
+coordinator did not pull are never removed.
+
+Background prefetching is opt-in: set IMAGE_PREFETCH_ENABLED=true to start
+it with the application.
+"""
+
+import asyncio
+import logging
+import os
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+from .compose import split_image_reference
+
+try:
+    from docker.errors import ImageNotFound
+except ImportError:
+    ImageNotFound = Exception
+
+logger = logging.getLogger(__name__)
+
+
+def is_image_prefetch_enabled() -> bool:
+    """Whether background image prefetching has been enabled in the environment."""
+    return os.getenv("IMAGE_PREFETCH_ENABLED", "false").lower() == "true"
+
+
+@dataclass
+class CachedImage:
+    """A locally present image."""
+
+    reference: str
+    image_id: Optional[str]
+    digests: List[str]
+    size: int
+    managed: bool
+    last_used: float = field(default_factory=time.time)
+
+
+class _Flight:
+    """A pull in progress that other callers can wait for."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.error: Optional[BaseException] = None
+
+
+class ImagePullCoordinator:
+    """Deduplicates image pulls, prefetches popular images and evicts unused ones."""
+
+    def __init__(
+        self,
+        client_factory: Optional[Callable[[], Any]] = None,
+        candidate_source: Optional[Callable[[], List[str]]] = None,
+        disk_budget_bytes: Optional[int] = None,
+        idle_seconds: float = 120.0,
+        prefetch_interval: float = 300.0,
+        prefetch_limit: int = 20,
+    ):
+        """
+        Initialize the coordinator.
+
+        Args:
+            client_factory: Callable returning a Docker SDK client, used for
+                prefetching and eviction
+            candidate_source: Callable returning the images to prefetch, most
+                popular first
+            disk_budget_bytes: Total size of pulled images to keep
+            idle_seconds: Seconds without pulls before prefetching starts
+            prefetch_interval: Seconds between background prefetch runs
+            prefetch_limit: Maximum number of images prefetched per run
+        """
+        self._client_factory = client_factory
+        self.candidate_source = candidate_source
+        self.disk_budget_bytes = (
+            disk_budget_bytes
+            or int(os.getenv("IMAGE_CACHE_BUDGET_MB", "10240")) * 1024 * 1024
+        )
+        self.idle_seconds = idle_seconds
+        self.prefetch_interval = prefetch_interval
+        self.prefetch_limit = prefetch_limit
+
+        self._lock = threading.Lock()
+        self._inflight: Dict[str, _Flight] = {}
+        self._images: Dict[str, CachedImage] = {}
+        self._last_activity = time.monotonic()
+        self._task: Optional[asyncio.Task] = None
+        self.stats = {
+            "hits": 0,
+            "pulls": 0,
+            "joined": 0,
+            "pull_errors": 0,
+            "prefetched": 0,
+            "evicted": 0,
+            "evicted_bytes": 0,
+        }
+
+    def _client(self):
+        if self._client_factory is None:
+            from docker_manager.manager import DockerManager
+
+            return DockerManager().client
+        return self._client_factory()
+
+    def _record(self, reference: str, image: Any, managed: bool) -> None:
+        attrs = getattr(image, "attrs", None) or {}
+        with self._lock:
+            previous = self._images.get(reference)
+            self._images[reference] = CachedImage(
+                reference=reference,
+                image_id=getattr(image, "id", None),
+                digests=list(attrs.get("RepoDigests") or []),
+                size=int(attrs.get("Size") or 0),
+                managed=managed or (previous is not None and previous.managed),
+            )
+
+    def _find_local(self, image: str, client) -> bool:
+        """Record an image that is already present locally."""
+        try:
+            local = client.images.get(image)
+        except ImageNotFound:
+            return False
+        self._record(image, local, managed=False)
+        self.stats["hits"] += 1
+        return True
+
+    def ensure(self, image: str, client=None, prefetch: bool = False) -> str:
+        """
+        Make an image available locally, pulling it at most once at a time.
+
+        Args:
+            image: Image reference
+            client: Docker SDK client; defaults to the coordinator's client
+            prefetch: Whether this is a background prefetch rather than a
+                deployment
+
+        Returns:
+            "cached" if the image was present, "pulled" if this call pulled
+            it, or "joined" if it waited for another caller's pull
+        """
+        client = client or self._client()
+        if not prefetch:
+            self._last_activity = time.monotonic()
+
+        if self._find_local(image, client):
+            return "cached"
+
+        with self._lock:
+            flight = self._inflight.get(image)
+            leader = flight is None
+            if leader:
+                flight = self._inflight[image] = _Flight()
+
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            self.stats["joined"] += 1
+            return "joined"
+
+        try:
+            # A pull that finished between the check above and taking the
+            # lead has already made the image available
+            if self._find_local(image, client):
+                return "cached"
+            repository, tag = split_image_reference(image)
+            pulled = client.images.pull(repository, tag=tag)
+            self._record(image, pulled, managed=True)
+            self.stats["prefetched" if prefetch else "pulls"] += 1
+            return "pulled"
+        except Exception as e:
+            flight.error = e
+            self.stats["pull_errors"] += 1
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(image, None)
+            flight.done.set()
+
+    def is_idle(self) -> bool:
+        """Whether no pull is running and none was requested recently."""
+        return (
+            not self._inflight
+            and time.monotonic() - self._last_activity >= self.idle_seconds
+        )
+
+    def prefetch(
+        self, images: Optional[Iterable[str]] = None, client=None
+    ) -> List[str]:
+        """
+        Pull popular images that are not present yet, then enforce the budget.
+
+        Prefetching stops as soon as a deployment requests an image.
+
+        Args:
+            images: Images to prefetch; defaults to the candidate source
+            client: Docker SDK client; defaults to the coordinator's client
+
+        Returns:
+            The images pulled
+        """
+        if images is None:
+            images = self.candidate_source() if self.candidate_source else []
+        candidates = list(dict.fromkeys(images))[: self.prefetch_limit]
+        client = client or self._client()
+        started = self._last_activity
+
+        pulled = []
+        for image in candidates:
+            if self._last_activity != started:
+                logger.info("Deployment activity detected, pausing image prefetch")
+                break
+            try:
+                if self.ensure(image, client, prefetch=True) == "pulled":
+                    pulled.append(image)
+            except Exception as e:
+                logger.warning(f"Failed to prefetch image {image}: {e}")
+
+        self.evict(client, protect=candidates)
+        if pulled:
+            logger.info(f"Prefetched {len(pulled)} images: {', '.join(pulled)}")
+        return pulled
+
+    def evict(self, client=None, protect: Iterable[str] = ()) -> List[str]:
+        """
+        Remove unused pulled images until they fit in the disk budget.
+
+        Args:
+            client: Docker SDK client; defaults to the coordinator's client
+            protect: Images removed only after all others, such as the images
+                of popular templates
+
+        Returns:
+            The images removed
+        """
+        with self._lock:
+            managed = [record for record in self._images.values() if record.managed]
+        total = sum(record.size for record in managed)
+        if total <= self.disk_budget_bytes:
+            return []
+
+        client = client or self._client()
+        in_use = {
+            container.attrs.get("Image")
+            for container in client.containers.list(all=True)
+        }
+        protected = set(protect)
+
+        removed = []
+        for record in sorted(
+            managed, key=lambda r: (r.reference in protected, r.last_used)
+        ):
+            if total <= self.disk_budget_bytes:
+                break
+            if record.image_id in in_use or record.reference in self._inflight:
+                continue
+            try:
+                client.images.remove(record.reference)
+            except ImageNotFound:
+                pass
+            except Exception as e:
+                logger.warning(f"Failed to remove image {record.reference}: {e}")
+                continue
+            with self._lock:
+                self._images.pop(record.reference, None)
+            total -= record.size
+            removed.append(record.reference)
+            self.stats["evicted"] += 1
+            self.stats["evicted_bytes"] += record.size
+
+        if removed:
+            logger.info(
+                f"Evicted {len(removed)} images to stay within the image disk budget"
+            )
+        return removed
+
+    def get_image(self, image: str) -> Optional[CachedImage]:
+        """Get what is known about a locally present image."""
+        return self._images.get(image)
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.prefetch_interval)
+            if not self.is_idle():
+                continue
+            try:
+                await asyncio.to_thread(self.prefetch)
+            except Exception as e:
+                logger.error(f"Error prefetching images: {e}")
+
+    def start(self, candidate_source: Optional[Callable[[], List[str]]] = None) -> None:
+        """
+        Start prefetching images in the background.
+
+        Args:
+            candidate_source: Callable returning the images to prefetch
+        """
+        if candidate_source is not None:
+            self.candidate_source = candidate_source
+        if self._task is not None and not self._task.done():
+            return
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Stop prefetching images."""
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get pull counters and the size of the tracked images."""
+        with self._lock:
+            managed = [record for record in self._images.values() if record.managed]
+            tracked = len(self._images)
+        return {
+            **self.stats,
+            "tracked": tracked,
+            "managed": len(managed),
+            "managed_bytes": sum(record.size for record in managed),
+            "disk_budget_bytes": self.disk_budget_bytes,
+            "in_flight": len(self._inflight),
+        }
+
+
+# Global image pull coordinator instance
+_coordinator: Optional[ImagePullCoordinator] = None
+
+
+def get_image_pull_coordinator() -> ImagePullCoordinator:
+    """Get the global image pull coordinator instance."""
+    global _coordinator
+    if _coordinator is None:
+        _coordinator = ImagePullCoordinator()
+    return _coordinator
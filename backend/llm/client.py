@@ -1,12 +1,29 @@
+import json
 import os
-from typing import Any, Dict, Optional
+from typing import Any, AsyncIterator, Dict, Optional
 
 import httpx
 
+from llm.engine.parser import (
+    DockerCommandParser,
+    JSONStreamScanner,
+    parse_json_candidate,
+)
+
+try:
+    import h2  # noqa: F401  (enables HTTP/2 in httpx)
+except ImportError:
+    h2 = None
+
 
 class LLMClient:
     """
     Abstracts communication with Ollama (local), LiteLLM, and OpenRouter APIs.
+
+    Requests go through one long-lived ``httpx.AsyncClient`` per LLMClient, so
+    consecutive queries reuse pooled keep-alive connections (HTTP/2 when the
+    ``h2`` package is installed) instead of paying for a new TCP and TLS
+    handshake each time. Call ``aclose()`` on shutdown.
     """
 
     def __init__(
@@ -15,15 +32,24 @@ class LLMClient:
         api_url: Optional[str] = None,
         api_key: Optional[str] = None,
         model: str = "llama2",
+        http_client: Optional[httpx.AsyncClient] = None,
+        max_connections: int = 20,
+        keepalive_expiry: float = 30.0,
     ):
         """
         provider: "local", "ollama", "litellm", or "openrouter"
         api_url: URL for the LLM API endpoint
         api_key: API key for LiteLLM, OpenRouter, or remote providers
         model: Model name to use
+        http_client: Shared HTTP client to use instead of creating one
+        max_connections: Connection pool size of the HTTP client
+        keepalive_expiry: Seconds an idle pooled connection is kept open
         """
         self.provider = provider
         self.model = model
+        self.max_connections = max_connections
+        self.keepalive_expiry = keepalive_expiry
+        self._http_client = http_client
         # Defaults for each provider
         if provider in ["local", "ollama"]:
             self.api_url = api_url or os.getenv(
@@ -44,15 +70,45 @@ class LLMClient:
             self.api_url = api_url
             self.api_key = api_key
 
+    @property
+    def http_client(self) -> httpx.AsyncClient:
+        """The pooled HTTP client, created on first use."""
+        if self._http_client is None or self._http_client.is_closed is True:
+            self._http_client = httpx.AsyncClient(
+                http2=h2 is not None,
+                limits=httpx.Limits(
+                    max_connections=self.max_connections,
+                    max_keepalive_connections=self.max_connections,
+                    keepalive_expiry=self.keepalive_expiry,
+                ),
+                timeout=httpx.Timeout(60.0, connect=10.0),
+            )
+        return self._http_client
+
+    async def aclose(self) -> None:
+        """Close the pooled HTTP client."""
+        if self._http_client is not None:
+            await self._http_client.aclose()
+            self._http_client = None
+
     async def send_query(
         self,
         prompt: str,
         context: Optional[str] = None,
         params: Optional[Dict[str, Any]] = None,
+        stop_at_json: bool = False,
     ) -> str:
         """
         Sends a prompt to the configured LLM provider and returns the response.
+
+        With ``stop_at_json`` the completion is streamed and the query returns
+        as soon as a JSON object answering a parse request (one with a valid
+        ``is_docker_command`` field) has closed, dropping the rest. Other
+        objects, such as examples shown before the answer, do not stop the
+        stream; if no answer arrives the whole completion is returned.
         """
+        if stop_at_json:
+            return await self._send_until_json(prompt, context, params)
         if self.provider in ["local", "ollama"]:
             return await self._send_ollama(prompt, context, params)
         elif self.provider == "litellm":
@@ -62,40 +118,66 @@ class LLMClient:
         else:
             raise ValueError(f"Unsupported LLM provider: {self.provider}")
 
-    async def _send_ollama(
+    async def stream_query(
+        self,
+        prompt: str,
+        context: Optional[str] = None,
+        params: Optional[Dict[str, Any]] = None,
+    ) -> AsyncIterator[str]:
+        """
+        Sends a prompt and yields the completion as tokens arrive.
+
+        Ollama streams newline-delimited JSON and OpenRouter streams
+        OpenAI-style server-sent events. LiteLLM has no streaming contract
+        here, so its full response is yielded as one chunk.
+        """
+        if self.provider in ["local", "ollama"]:
+            tokens = self._stream_ollama(prompt, context, params)
+        elif self.provider == "litellm":
+            tokens = self._stream_whole(self._send_litellm(prompt, context, params))
+        elif self.provider == "openrouter":
+            tokens = self._stream_openrouter(prompt, context, params)
+        else:
+            raise ValueError(f"Unsupported LLM provider: {self.provider}")
+        async for token in tokens:
+            yield token
+
+    async def _send_until_json(
         self, prompt: str, context: Optional[str], params: Optional[Dict[str, Any]]
     ) -> str:
+        scanner = JSONStreamScanner()
+        parser = DockerCommandParser()
+        parts = []
+        tokens = self.stream_query(prompt, context, params)
+        try:
+            async for token in tokens:
+                parts.append(token)
+                for candidate in scanner.feed(token):
+                    for obj in parse_json_candidate(candidate):
+                        if parser.is_command_answer(obj):
+                            return json.dumps(obj)
+        finally:
+            # Closing the generator closes the response, which stops generation
+            await tokens.aclose()
+        return "".join(parts)
+
+    async def _stream_whole(self, response) -> AsyncIterator[str]:
+        yield await response
+
+    def _ollama_payload(
+        self, prompt: str, params: Optional[Dict[str, Any]]
+    ) -> Dict[str, Any]:
         # Ollama expects: model, prompt, and optional parameters
         payload = {
             "model": (params or {}).get("model", self.model),
             "prompt": prompt,
         }
         payload.update((params or {}))
-        async with httpx.AsyncClient() as client:
-            resp = await client.post(self.api_url, json=payload, timeout=60)
-            resp.raise_for_status()
-            data = resp.json()
-            # Ollama returns 'response' or 'message' or 'text'
-            return data.get("response") or data.get("message") or data.get("text") or ""
+        return payload
 
-    async def _send_litellm(
+    def _openrouter_request(
         self, prompt: str, context: Optional[str], params: Optional[Dict[str, Any]]
-    ) -> str:
-        payload = {"prompt": prompt, "context": context, "params": params or {}}
-        headers = {}
-        if self.api_key:
-            headers["Authorization"] = f"Bearer {self.api_key}"
-        async with httpx.AsyncClient() as client:
-            resp = await client.post(
-                self.api_url, json=payload, headers=headers, timeout=60
-            )
-            resp.raise_for_status()
-            data = resp.json()
-            return data.get("response") or data.get("text") or ""
-
-    async def _send_openrouter(
-        self, prompt: str, context: Optional[str], params: Optional[Dict[str, Any]]
-    ) -> str:
+    ):
         # OpenRouter expects OpenAI-compatible chat/completions API
         payload = {
             "model": (params or {}).get(
@@ -116,16 +198,87 @@ class LLMClient:
             "HTTP-Referer": "https://dockerdeployer.com",  # For OpenRouter analytics
             "X-Title": "DockerDeployer",
         }
-        async with httpx.AsyncClient() as client:
-            resp = await client.post(
-                self.api_url, json=payload, headers=headers, timeout=60
-            )
+        return payload, headers
+
+    async def _send_ollama(
+        self, prompt: str, context: Optional[str], params: Optional[Dict[str, Any]]
+    ) -> str:
+        payload = self._ollama_payload(prompt, params)
+        payload.setdefault("stream", False)
+        resp = await self.http_client.post(self.api_url, json=payload, timeout=60)
+        resp.raise_for_status()
+        data = resp.json()
+        # Ollama returns 'response' or 'message' or 'text'
+        return data.get("response") or data.get("message") or data.get("text") or ""
+
+    async def _stream_ollama(
+        self, prompt: str, context: Optional[str], params: Optional[Dict[str, Any]]
+    ) -> AsyncIterator[str]:
+        payload = self._ollama_payload(prompt, params)
+        payload["stream"] = True
+        async with self.http_client.stream(
+            "POST", self.api_url, json=payload, timeout=60
+        ) as resp:
+            resp.raise_for_status()
+            async for line in resp.aiter_lines():
+                if not line.strip():
+                    continue
+                chunk = json.loads(line)
+                token = chunk.get("response")
+                if token:
+                    yield token
+                if chunk.get("done"):
+                    break
+
+    async def _send_litellm(
+        self, prompt: str, context: Optional[str], params: Optional[Dict[str, Any]]
+    ) -> str:
+        payload = {"prompt": prompt, "context": context, "params": params or {}}
+        headers = {}
+        if self.api_key:
+            headers["Authorization"] = f"Bearer {self.api_key}"
+        resp = await self.http_client.post(
+            self.api_url, json=payload, headers=headers, timeout=60
+        )
+        resp.raise_for_status()
+        data = resp.json()
+        return data.get("response") or data.get("text") or ""
+
+    async def _send_openrouter(
+        self, prompt: str, context: Optional[str], params: Optional[Dict[str, Any]]
+    ) -> str:
+        payload, headers = self._openrouter_request(prompt, context, params)
+        resp = await self.http_client.post(
+            self.api_url, json=payload, headers=headers, timeout=60
+        )
+        resp.raise_for_status()
+        data = resp.json()
+        # OpenRouter returns OpenAI-style response
+        if "choices" in data and data["choices"]:
+            return data["choices"][0].get("message", {}).get("content", "")
+        return data.get("response") or data.get("text") or ""
+
+    async def _stream_openrouter(
+        self, prompt: str, context: Optional[str], params: Optional[Dict[str, Any]]
+    ) -> AsyncIterator[str]:
+        payload, headers = self._openrouter_request(prompt, context, params)
+        payload["stream"] = True
+        async with self.http_client.stream(
+            "POST", self.api_url, json=payload, headers=headers, timeout=60
+        ) as resp:
             resp.raise_for_status()
-            data = resp.json()
-            # OpenRouter returns OpenAI-style response
-            if "choices" in data and data["choices"]:
-                return data["choices"][0].get("message", {}).get("content", "")
-            return data.get("response") or data.get("text") or ""
+            async for line in resp.aiter_lines():
+                # Server-sent events; lines starting with ':' are keep-alive comments
+                if not line.startswith("data:"):
+                    continue
+                data = line[len("data:") :].strip()
+                if data == "[DONE]":
+                    break
+                choices = json.loads(data).get("choices") or []
+                if choices:
+                    token = (choices[0].get("delta") or {}).get("content")
+                    if token:
+                        yield token
 
     def set_provider(
         self,
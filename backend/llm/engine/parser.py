@@ -6,7 +6,7 @@ into actionable Docker commands and operations.
 
 import json
 import re
-from typing import Any, Dict, Optional, Tuple, Union
+from typing import Any, Dict, Iterator, List, Optional, Tuple, Union
 
 try:
     import yaml
@@ -20,6 +20,173 @@ class ResponseParsingError(Exception):
     pass
 
 
+# Characters that change scanner state inside an object, and inside a string
+_OBJECT_SPECIAL = re.compile(r'[{}"]')
+_STRING_SPECIAL = re.compile(r'["\\]')
+
+_DECODER = json.JSONDecoder()
+
+
+class JSONStreamScanner:
+    """
+    Single-pass scanner for balanced top-level JSON objects in LLM output.
+
+    Text can be fed in chunks as it streams in; each call returns the
+    candidates whose closing brace arrived in that chunk. Braces and quotes
+    inside JSON strings (including escaped quotes) are skipped, and quotes in
+    the prose around objects are ignored. Every character is looked at once,
+    so scanning is linear in the length of the response.
+    """
+
+    def __init__(self):
+        self._parts: List[str] = []
+        self._depth = 0
+        self._in_string = False
+        self._escaped = False
+
+    def feed(self, chunk: str) -> List[str]:
+        """
+        Scan the next chunk of the response.
+
+        Args:
+            chunk: Next piece of the response text
+
+        Returns:
+            Text of each top-level ``{...}`` candidate completed in this chunk
+        """
+        candidates = []
+        start = 0
+        pos = 0
+        end = len(chunk)
+        if self._escaped and end:
+            # The previous chunk ended on a backslash inside a string
+            self._escaped = False
+            pos = 1
+
+        while pos < end:
+            if self._depth == 0:
+                pos = chunk.find("{", pos)
+                if pos < 0:
+                    break
+                start = pos
+                self._depth = 1
+                pos += 1
+            elif self._in_string:
+                match = _STRING_SPECIAL.search(chunk, pos)
+                if match is None:
+                    break
+                pos = match.end()
+                if match.group() == '"':
+                    self._in_string = False
+                elif pos < end:
+                    pos += 1
+                else:
+                    self._escaped = True
+            else:
+                match = _OBJECT_SPECIAL.search(chunk, pos)
+                if match is None:
+                    break
+                pos = match.end()
+                char = match.group()
+                if char == '"':
+                    self._in_string = True
+                elif char == "{":
+                    self._depth += 1
+                else:
+                    self._depth -= 1
+                    if self._depth == 0:
+                        self._parts.append(chunk[start:pos])
+                        candidates.append("".join(self._parts))
+                        self._parts = []
+
+        if self._depth > 0:
+            self._parts.append(chunk[start:])
+        return candidates
+
+
+def _object_ends(text: str) -> Dict[int, int]:
+    """Map the offset of each ``{`` outside strings to the offset after its ``}``."""
+    ends: Dict[int, int] = {}
+    opened: List[int] = []
+    in_string = False
+    pos = 0
+    end = len(text)
+    while pos < end:
+        match = (_STRING_SPECIAL if in_string else _OBJECT_SPECIAL).search(text, pos)
+        if match is None:
+            break
+        pos = match.end()
+        char = match.group()
+        if in_string:
+            if char == '"':
+                in_string = False
+            else:
+                pos += 1
+        elif char == '"':
+            in_string = True
+        elif char == "{":
+            opened.append(pos - 1)
+        elif opened:
+            ends[opened.pop()] = pos
+    return ends
+
+
+def parse_json_candidate(candidate: str) -> Iterator[Dict[str, Any]]:
+    """
+    Decode a scanned candidate into JSON objects.
+
+    A candidate that is not valid JSON as a whole (for example prose wrapped
+    in braces) is searched for valid objects nested inside it, in one pass
+    over its braces. Decoding stops at the first invalid character, and every
+    object still open there is invalid too, so those are skipped rather than
+    decoded again; nesting depth costs neither extra passes nor recursion.
+
+    Args:
+        candidate: Balanced ``{...}`` text from JSONStreamScanner
+
+    Yields:
+        Each valid JSON object found
+    """
+    try:
+        value, _ = _DECODER.raw_decode(candidate)
+    except json.JSONDecodeError as e:
+        failed_at = e.pos
+    except RecursionError:
+        # Nested deeper than the decoder can go
+        return
+    else:
+        yield value
+        return
+
+    ends = _object_ends(candidate)
+    resume = 1
+    for start in sorted(ends):
+        if start < resume or start < failed_at < ends[start]:
+            continue
+        try:
+            value, resume = _DECODER.raw_decode(candidate, start)
+        except json.JSONDecodeError as e:
+            failed_at = e.pos
+        except RecursionError:
+            resume = ends[start]
+        else:
+            yield value
+
+
+def iter_json_objects(text: str) -> Iterator[Dict[str, Any]]:
+    """
+    Yield every valid JSON object embedded in a text, in order.
+
+    Args:
+        text: Raw LLM response text
+
+    Yields:
+        Parsed JSON objects
+    """
+    for candidate in JSONStreamScanner().feed(text):
+        yield from parse_json_candidate(candidate)
+
+
 class DockerCommandParser:
     """
     Parser for LLM responses related to Docker commands.
@@ -70,24 +237,16 @@ class DockerCommandParser:
         Raises:
             ResponseParsingError: If JSON extraction fails
         """
-        # Try to find JSON object in the response using regex
-        json_match = re.search(r"({[\s\S]*})", response)
-        if not json_match:
-            # If no JSON object is found, try to find a code block
-            code_block_match = re.search(r"```(?:json)?\s*([\s\S]*?)\s*```", response)
-            if code_block_match:
-                json_str = code_block_match.group(1)
-            else:
-                # If no code block is found, use the entire response
-                json_str = response
-        else:
-            json_str = json_match.group(1)
+        parsed = next(iter_json_objects(response), None)
+        if parsed is not None:
+            return parsed
 
-        # Clean up the JSON string
-        json_str = json_str.strip()
+        # No embedded object: try a code block, then the whole response
+        code_block_match = re.search(r"```(?:json)?\s*([\s\S]*?)\s*```", response)
+        json_str = code_block_match.group(1) if code_block_match else response
 
         try:
-            return json.loads(json_str)
+            return json.loads(json_str.strip())
         except json.JSONDecodeError as e:
             raise ResponseParsingError(f"Failed to parse JSON from LLM response: {e}")
 
@@ -133,6 +292,41 @@ class DockerCommandParser:
 
         return True, None
 
+    def is_command_answer(self, candidate: Dict[str, Any]) -> bool:
+        """
+        Check whether a JSON object is a complete answer to a parse request.
+
+        Args:
+            candidate: JSON object found in a response
+
+        Returns:
+            True if it has the requested ``is_docker_command`` field and is valid
+        """
+        return (
+            "is_docker_command" in candidate
+            and self.validate_docker_command(candidate)[0]
+        )
+
+    def _select_command(self, response: str) -> Dict[str, Any]:
+        """
+        Pick the answer among the JSON objects in a response.
+
+        Chatty responses may show an example object before the answer, so the
+        first complete answer (see ``is_command_answer``) wins, then the first
+        valid object, then the first object.
+        """
+        candidates = list(iter_json_objects(response))
+        if not candidates:
+            return self.extract_json_from_response(response)
+        for candidate in candidates:
+            if self.is_command_answer(candidate):
+                return candidate
+        results = [(c, self.validate_docker_command(c)[0]) for c in candidates]
+        for candidate, is_valid in results:
+            if is_valid:
+                return candidate
+        return candidates[0]
+
     def parse_response(self, response: str) -> Dict[str, Any]:
         """
         Parse an LLM response into a structured Docker command.
@@ -147,7 +341,7 @@ class DockerCommandParser:
             ResponseParsingError: If parsing or validation fails
         """
         try:
-            parsed_data = self.extract_json_from_response(response)
+            parsed_data = self._select_command(response)
             is_valid, error = self.validate_docker_command(parsed_data)
 
             if not is_valid:
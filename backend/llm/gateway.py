@@ -0,0 +1,398 @@
+"""
+Gateway in front of one or more LLM providers.
+
+A slow or failing provider must not pile up waiting requests or stall NLP
+parsing, so every query goes through:
+
+- Single-flight coalescing: identical in-flight queries share one request.
+- A per-provider semaphore that bounds concurrent requests.
+- A per-provider circuit breaker. It opens after consecutive failures, or
+  when recent p95 latency exceeds a threshold. While open the provider is
+  skipped; after ``reset_timeout`` one trial request is let through.
+- Hedging: when the first provider has not answered within ``hedge_delay``
+  seconds (or has failed), the next configured provider is tried too, and
+  the first answer wins.
+- An overall deadline, so callers wait at most ``timeout`` seconds before
+  ``LLMUnavailableError`` lets them fall back to local parsing.
+"""
+
+import asyncio
+import json
+import logging
+import time
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+from llm.client import LLMClient
+
+logger = logging.getLogger(__name__)
+
+
+class LLMUnavailableError(Exception):
+    """Raised when no LLM provider answered within the deadline."""
+
+    pass
+
+
+def _percentile(values: List[float], percentile: float) -> Optional[float]:
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * percentile))]
+
+
+class CircuitBreaker:
+    """Failure and latency based circuit breaker for one provider."""
+
+    def __init__(
+        self,
+        failure_threshold: int = 5,
+        latency_threshold: float = 10.0,
+        reset_timeout: float = 30.0,
+        window: int = 20,
+        min_samples: int = 5,
+    ):
+        """
+        Initialize the breaker.
+
+        Args:
+            failure_threshold: Consecutive failures that open the circuit
+            latency_threshold: p95 latency in seconds that opens the circuit
+            reset_timeout: Seconds the circuit stays open before a trial request
+            window: Number of recent latencies considered
+            min_samples: Latencies needed before the latency check applies
+        """
+        self.failure_threshold = failure_threshold
+        self.latency_threshold = latency_threshold
+        self.reset_timeout = reset_timeout
+        self.min_samples = min_samples
+        self.latencies: Deque[float] = deque(maxlen=window)
+        self.consecutive_failures = 0
+        self.state = "closed"
+        self.opened_at = 0.0
+        self.times_opened = 0
+        self._trial_in_flight = False
+
+    def allow(self) -> bool:
+        """Check whether a request may be sent now."""
+        if self.state == "closed":
+            return True
+        if self.state == "open":
+            if time.monotonic() - self.opened_at < self.reset_timeout:
+                return False
+            self.state = "half_open"
+            self._trial_in_flight = False
+        # Half-open: let a single trial request through
+        if self._trial_in_flight:
+            return False
+        self._trial_in_flight = True
+        return True
+
+    def release_trial(self) -> None:
+        """Give back a half-open trial whose request was abandoned."""
+        self._trial_in_flight = False
+
+    def _open(self) -> None:
+        if self.state != "open":
+            self.times_opened += 1
+        self.state = "open"
+        self.opened_at = time.monotonic()
+        self._trial_in_flight = False
+
+    def record_success(self, latency: float) -> None:
+        """Record a successful request and its latency."""
+        self.consecutive_failures = 0
+        self.latencies.append(latency)
+        if self.state == "half_open":
+            if latency <= self.latency_threshold:
+                self.state = "closed"
+                self._trial_in_flight = False
+                # Judge the closed circuit on fresh latencies only
+                self.latencies.clear()
+            else:
+                self._open()
+            return
+        if len(self.latencies) >= self.min_samples:
+            p95 = _percentile(list(self.latencies), 0.95)
+            if p95 > self.latency_threshold:
+                logger.warning(
+                    f"LLM p95 latency {p95:.1f}s exceeds {self.latency_threshold}s; opening circuit"
+                )
+                self._open()
+                self.latencies.clear()
+
+    def record_failure(self) -> None:
+        """Record a failed or timed out request."""
+        self.consecutive_failures += 1
+        if (
+            self.state == "half_open"
+            or self.consecutive_failures >= self.failure_threshold
+        ):
+            self._open()
+
+
+class _Provider:
+    """An LLM client with its concurrency limit, breaker and metrics."""
+
+    def __init__(
+        self,
+        name: str,
+        client: LLMClient,
+        max_concurrency: int,
+        breaker: CircuitBreaker,
+    ):
+        self.name = name
+        self.client = client
+        self.semaphore = asyncio.Semaphore(max_concurrency)
+        self.breaker = breaker
+        self.in_flight = 0
+        self.latencies: Deque[float] = deque(maxlen=200)
+        self.stats = {
+            "requests": 0,
+            "successes": 0,
+            "failures": 0,
+            "timeouts": 0,
+            "rejected": 0,
+            "estimated_prompt_tokens": 0,
+            "estimated_completion_tokens": 0,
+        }
+
+    def get_stats(self) -> Dict[str, Any]:
+        latencies = list(self.latencies)
+        p50 = _percentile(latencies, 0.5)
+        p95 = _percentile(latencies, 0.95)
+        return {
+            **self.stats,
+            "in_flight": self.in_flight,
+            "circuit": self.breaker.state,
+            "circuit_opened": self.breaker.times_opened,
+            "p50_ms": round(p50 * 1000, 1) if p50 is not None else None,
+            "p95_ms": round(p95 * 1000, 1) if p95 is not None else None,
+        }
+
+
+def _estimate_tokens(text: Optional[str]) -> int:
+    # Providers report usage differently (or not at all); ~4 characters per token
+    return len(text or "") // 4
+
+
+class LLMGateway:
+    """Coalescing, rate-limited and circuit-broken front for LLM clients."""
+
+    def __init__(
+        self,
+        clients: List[LLMClient],
+        max_concurrency: int = 4,
+        timeout: float = 20.0,
+        hedge_delay: float = 3.0,
+        failure_threshold: int = 5,
+        latency_threshold: float = 10.0,
+        reset_timeout: float = 30.0,
+    ):
+        """
+        Initialize the gateway.
+
+        Args:
+            clients: LLM clients in order of preference; later clients are
+                only used for hedging and when earlier circuits are open, and
+                use their own configured model
+            max_concurrency: Concurrent requests allowed per provider
+            timeout: Seconds a query may take across all providers
+            hedge_delay: Seconds to wait for a provider before also trying the next
+            failure_threshold: Consecutive failures that open a provider's circuit
+            latency_threshold: p95 latency in seconds that opens a provider's circuit
+            reset_timeout: Seconds before an open circuit lets a trial request through
+        """
+        if not clients:
+            raise ValueError("LLMGateway needs at least one client")
+        self.timeout = timeout
+        self.hedge_delay = hedge_delay
+        self.providers: List[_Provider] = []
+        for i, client in enumerate(clients):
+            name = client.provider
+            if any(p.name == name for p in self.providers):
+                name = f"{name}-{i}"
+            breaker = CircuitBreaker(
+                failure_threshold=failure_threshold,
+                latency_threshold=latency_threshold,
+                reset_timeout=reset_timeout,
+            )
+            self.providers.append(_Provider(name, client, max_concurrency, breaker))
+
+        self._in_flight: Dict[Tuple, asyncio.Future] = {}
+        self.stats = {
+            "queries": 0,
+            "coalesced": 0,
+            "hedged": 0,
+            "hedge_wins": 0,
+            "unavailable": 0,
+        }
+
+    @property
+    def provider(self) -> str:
+        """Name of the preferred provider."""
+        return self.providers[0].client.provider
+
+    async def send_query(
+        self,
+        prompt: str,
+        context: Optional[str] = None,
+        params: Optional[Dict[str, Any]] = None,
+        stop_at_json: bool = False,
+    ) -> str:
+        """
+        Send a query through the gateway.
+
+        Takes the same arguments as ``LLMClient.send_query``.
+
+        Raises:
+            LLMUnavailableError: If every provider is open, failed or timed out
+        """
+        self.stats["queries"] += 1
+        key = (
+            prompt,
+            context,
+            json.dumps(params or {}, sort_keys=True, default=str),
+            stop_at_json,
+        )
+        future = self._in_flight.get(key)
+        if future is not None:
+            self.stats["coalesced"] += 1
+            return await asyncio.shield(future)
+
+        future = asyncio.ensure_future(
+            self._dispatch(prompt, context, params, stop_at_json)
+        )
+        self._in_flight[key] = future
+        future.add_done_callback(lambda f: self._complete(key, f))
+        # Shielded so a cancelled caller does not cancel the request for the others
+        return await asyncio.shield(future)
+
+    def _complete(self, key: Tuple, future: asyncio.Future) -> None:
+        self._in_flight.pop(key, None)
+        if not future.cancelled():
+            # Mark the exception retrieved in case every caller went away
+            future.exception()
+
+    async def _dispatch(
+        self,
+        prompt: str,
+        context: Optional[str],
+        params: Optional[Dict[str, Any]],
+        stop_at_json: bool,
+    ) -> str:
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.timeout
+        waiting = list(self.providers)
+        running: Dict[asyncio.Task, _Provider] = {}
+        first: List[_Provider] = []
+
+        def launch_next() -> bool:
+            while waiting:
+                provider = waiting.pop(0)
+                if not provider.breaker.allow():
+                    provider.stats["rejected"] += 1
+                    continue
+                task = asyncio.ensure_future(
+                    self._call(provider, prompt, context, params, stop_at_json)
+                )
+                running[task] = provider
+                if not first:
+                    first.append(provider)
+                return True
+            return False
+
+        if not launch_next():
+            self.stats["unavailable"] += 1
+            raise LLMUnavailableError(
+                "All LLM providers are unavailable (circuit open)"
+            )
+
+        errors = []
+        try:
+            while running:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                done, _ = await asyncio.wait(
+                    running,
+                    timeout=min(remaining, self.hedge_delay) if waiting else remaining,
+                    return_when=asyncio.FIRST_COMPLETED,
+                )
+                for task in done:
+                    provider = running.pop(task)
+                    if task.exception() is None:
+                        if provider is not first[0]:
+                            self.stats["hedge_wins"] += 1
+                        return task.result()
+                    errors.append(f"{provider.name}: {task.exception()}")
+                # Slow or failed: hedge on the next provider
+                if waiting and loop.time() < deadline and launch_next():
+                    self.stats["hedged"] += 1
+        finally:
+            for task, provider in running.items():
+                task.cancel()
+                if loop.time() >= deadline:
+                    provider.stats["timeouts"] += 1
+                    provider.breaker.record_failure()
+
+        self.stats["unavailable"] += 1
+        reason = "; ".join(errors) if errors else f"no response within {self.timeout}s"
+        raise LLMUnavailableError(f"LLM providers unavailable: {reason}")
+
+    async def _call(
+        self,
+        provider: _Provider,
+        prompt: str,
+        context: Optional[str],
+        params: Optional[Dict[str, Any]],
+        stop_at_json: bool,
+    ) -> str:
+        provider.stats["requests"] += 1
+        if provider is not self.providers[0] and params and "model" in params:
+            # The model is chosen for the preferred provider; others use their own
+            params = {k: v for k, v in params.items() if k != "model"}
+        try:
+            async with provider.semaphore:
+                provider.in_flight += 1
+                started = time.monotonic()
+                try:
+                    response = await provider.client.send_query(
+                        prompt,
+                        context=context,
+                        params=params,
+                        stop_at_json=stop_at_json,
+                    )
+                finally:
+                    provider.in_flight -= 1
+        except asyncio.CancelledError:
+            # Lost a hedge race or hit the deadline; the dispatcher accounts for it
+            provider.breaker.release_trial()
+            raise
+        except Exception:
+            provider.stats["failures"] += 1
+            provider.breaker.record_failure()
+            raise
+
+        latency = time.monotonic() - started
+        provider.latencies.append(latency)
+        provider.stats["successes"] += 1
+        provider.stats["estimated_prompt_tokens"] += _estimate_tokens(
+            prompt
+        ) + _estimate_tokens(context)
+        provider.stats["estimated_completion_tokens"] += _estimate_tokens(response)
+        provider.breaker.record_success(latency)
+        return response
+
+    async def aclose(self) -> None:
+        """Close the clients' HTTP connections."""
+        for provider in self.providers:
+            await provider.client.aclose()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get gateway and per-provider statistics."""
+        return {
+            **self.stats,
+            "in_flight": len(self._in_flight),
+            "providers": {p.name: p.get_stats() for p in self.providers},
+        }
@@ -4,6 +4,7 @@ These templates are used to generate prompts for the LLM to understand and proce
 natural language commands related to Docker operations.
 """
 
+import hashlib
 from typing import Any, Dict, List, Optional
 
 # Base system prompt that defines the LLM's role and capabilities
@@ -54,6 +55,12 @@ Analyze this command and respond with a JSON object containing:
 JSON Response:
 """
 
+# Identifies the command-parsing prompt; it is part of the NLP parse cache key,
+# so editing the prompt invalidates previously cached parses
+PARSE_COMMAND_PROMPT_VERSION = hashlib.sha256(
+    (SYSTEM_PROMPT + PARSE_COMMAND_TEMPLATE).encode()
+).hexdigest()[:12]
+
 # Template for generating docker-compose.yml content
 GENERATE_COMPOSE_TEMPLATE = """
 {system_prompt}
@@ -6,71 +6,210 @@ and extracting actionable intents and parameters for Docker deployment and manag
 """
 
 import asyncio
-from typing import Any, Dict, Optional
+import os
+import time
+from typing import Any, Callable, Dict, List, Optional
 
 from app.config.settings_manager import SettingsManager
 from llm.client import LLMClient
 from llm.engine.parser import ResponseParsingError, parse_llm_response
-from llm.prompts.docker_commands import get_parse_command_prompt
+from llm.gateway import LLMGateway
+from llm.prompts.docker_commands import (
+    PARSE_COMMAND_PROMPT_VERSION,
+    get_parse_command_prompt,
+)
+from nlp.intent_rules import RuleIntentClassifier
+from nlp.parse_cache import ParseCache, load_embedder
+from templates.loader import list_cached_templates as list_templates
+
+DEFAULT_MODEL = "meta-llama/llama-3.2-3b-instruct:free"
 
 
 class IntentParser:
-    def __init__(self):
-        """Initialize the intent parser with LLM client."""
+    def __init__(
+        self,
+        cache: Optional[ParseCache] = None,
+        use_rules: bool = True,
+        container_source: Optional[Callable[[], List[str]]] = None,
+        entity_refresh_interval: float = 30.0,
+    ):
+        """
+        Initialize the intent parser with LLM client.
+
+        Args:
+            cache: Parse cache to use; by default one is configured from the
+                NLP_PARSE_CACHE_* and NLP_SEMANTIC_CACHE_* environment variables
+            use_rules: Resolve common commands with the rule-based classifier
+                before asking the LLM
+            container_source: Returns the names of existing containers for the
+                classifier; defaults to the live Docker container list
+            entity_refresh_interval: Seconds between container and template
+                name refreshes
+        """
         self.settings_manager = SettingsManager()
+        self.classifier = (
+            RuleIntentClassifier(
+                min_confidence=float(os.getenv("NLP_RULE_CONFIDENCE", "0.8"))
+            )
+            if use_rules
+            else None
+        )
+        self._container_source = container_source or self._list_live_containers
+        self._docker_manager = None
+        self.entity_refresh_interval = entity_refresh_interval
+        self._entities_loaded_at: Optional[float] = None
         self._llm_client = None
+        self._provider = "ollama"
+        self._model = DEFAULT_MODEL
+        self.cache = cache or ParseCache(
+            max_entries=int(os.getenv("NLP_PARSE_CACHE_SIZE", "1024")),
+            ttl=float(os.getenv("NLP_PARSE_CACHE_TTL", "3600")),
+            embedder=load_embedder(),
+            similarity_threshold=float(
+                os.getenv("NLP_SEMANTIC_CACHE_THRESHOLD", "0.95")
+            ),
+        )
         self._initialize_llm_client()
 
     def _initialize_llm_client(self):
         """Initialize the LLM client with current settings."""
         try:
             settings = self.settings_manager.load()
-            self._llm_client = LLMClient(
-                provider=settings.get("llm_provider", "ollama"),
-                api_url=settings.get("llm_api_url"),
-                api_key=settings.get("llm_api_key")
-                or settings.get("openrouter_api_key"),
+            self._provider = settings.get("llm_provider", "ollama")
+            self._model = settings.get("llm_model", DEFAULT_MODEL)
+            clients = [
+                LLMClient(
+                    provider=self._provider,
+                    api_url=settings.get("llm_api_url"),
+                    api_key=settings.get("llm_api_key")
+                    or settings.get("openrouter_api_key"),
+                )
+            ]
+            # An optional second provider to hedge slow requests onto
+            fallback_provider = settings.get("llm_fallback_provider")
+            if fallback_provider and fallback_provider != self._provider:
+                clients.append(
+                    LLMClient(
+                        provider=fallback_provider,
+                        model=settings.get("llm_fallback_model", "llama2"),
+                    )
+                )
+            self._llm_client = LLMGateway(
+                clients,
+                max_concurrency=int(os.getenv("LLM_MAX_CONCURRENCY", "4")),
+                timeout=float(os.getenv("LLM_TIMEOUT", "20")),
+                hedge_delay=float(os.getenv("LLM_HEDGE_DELAY", "3")),
+                latency_threshold=float(os.getenv("LLM_LATENCY_THRESHOLD", "10")),
             )
         except Exception as e:
             print(f"Warning: Failed to initialize LLM client: {e}")
             self._llm_client = None
 
+    def get_stats(self) -> Dict[str, Any]:
+        """Get rule classifier, parse cache and LLM gateway statistics."""
+        return {
+            "rules": self.classifier.get_stats() if self.classifier else None,
+            "cache": self.cache.get_stats(),
+            "llm": self._llm_client.get_stats() if self._llm_client else None,
+        }
+
+    async def aclose(self):
+        """Close the LLM client's pooled HTTP connections."""
+        if self._llm_client:
+            await self._llm_client.aclose()
+
+    async def reload(self):
+        """
+        Rebuild the LLM gateway from the saved settings, e.g. after they were
+        updated, and drop the parses cached under the previous settings.
+        """
+        previous = self._llm_client
+        self._initialize_llm_client()
+        self.cache.clear()
+        if previous:
+            await previous.aclose()
+
+    def _list_live_containers(self) -> List[str]:
+        """List the names of all containers on the Docker host."""
+        if self._docker_manager is None:
+            from docker_manager.manager import DockerManager
+
+            self._docker_manager = DockerManager()
+        return [c["name"] for c in self._docker_manager.list_containers(all=True)]
+
+    async def _refresh_entities(self):
+        """Recompile the rule grammar with current container and template names."""
+        now = time.monotonic()
+        if (
+            self._entities_loaded_at is not None
+            and now - self._entities_loaded_at < self.entity_refresh_interval
+        ):
+            return
+        self._entities_loaded_at = now
+
+        try:
+            containers = await asyncio.to_thread(self._container_source)
+        except Exception as e:
+            print(f"Warning: Failed to list containers for intent rules: {e}")
+            containers = []
+        try:
+            templates = [t.get("name") for t in await asyncio.to_thread(list_templates)]
+        except Exception as e:
+            print(f"Warning: Failed to list templates for intent rules: {e}")
+            templates = []
+        self.classifier.update_entities(containers, templates)
+
     async def parse(self, command: str) -> Dict[str, Any]:
         """
-        Parse a natural language command and extract intent and parameters using LLM.
+        Parse a natural language command and extract intent and parameters.
+
+        Common commands are resolved locally by the rule-based classifier;
+        the LLM is only asked when the classifier is not confident.
 
         Args:
             command (str): The user's natural language input.
 
         Returns:
-            dict: Parsed intent and parameters from LLM.
+            dict: Parsed intent and parameters.
         """
+        rule_result = None
+        if self.classifier:
+            await self._refresh_entities()
+            rule_result = self.classifier.classify(command)
+            if self.classifier.is_confident(rule_result):
+                return rule_result
+
         if not self._llm_client:
-            # Fallback to simple parsing if LLM is not available
-            return self._fallback_parse(command)
+            # Fallback to local parsing if LLM is not available
+            return rule_result or self._fallback_parse(command)
 
         try:
             result = await self._parse_with_llm(command)
             return result
         except Exception as e:
+            # Includes LLMUnavailableError when the gateway's circuits are open
             print(f"LLM parsing failed: {e}")
-            return self._fallback_parse(command)
+            return rule_result or self._fallback_parse(command)
 
     async def _parse_with_llm(self, command: str) -> Dict[str, Any]:
         """Parse command using LLM."""
+        cache_key = (self._provider, self._model, PARSE_COMMAND_PROMPT_VERSION, command)
+        cached = self.cache.get(*cache_key)
+        if cached is not None:
+            return cached
+
         # Generate prompt for command parsing
         prompt = get_parse_command_prompt(command)
 
-        # Get model from settings
-        settings = self.settings_manager.load()
-        model = settings.get("llm_model", "meta-llama/llama-3.2-3b-instruct:free")
-
-        # Send to LLM with model parameter
-        response = await self._llm_client.send_query(prompt, params={"model": model})
+        # Stream from the LLM and stop as soon as the JSON answer has closed
+        response = await self._llm_client.send_query(
+            prompt, params={"model": self._model}, stop_at_json=True
+        )
 
         # Parse the LLM response
         try:
             parsed_response = parse_llm_response(response, "command")
+            self.cache.put(*cache_key, parsed_response)
             return parsed_response
         except ResponseParsingError:
             # If parsing fails, return a structured fallback
@@ -0,0 +1,352 @@
+"""
+Rule-based intent classifier for common Docker commands.
+
+Most NLP traffic is short commands such as "restart web" or "show logs for
+db". These are resolved locally from a compiled grammar instead of waiting on
+an LLM round trip. The grammar is a token trie over verb phrases and over the
+names of live containers and available templates. A command is scanned once,
+taking the longest phrase at each position. The scan yields a confidence
+score, and callers only fall back to the LLM when it is low.
+"""
+
+import re
+import threading
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+# Verb phrase -> (command_type, operation)
+VERBS = {
+    "start": ("container", "start"),
+    "boot": ("container", "start"),
+    "bring up": ("container", "start"),
+    "stop": ("container", "stop"),
+    "halt": ("container", "stop"),
+    "shut down": ("container", "stop"),
+    "shutdown": ("container", "stop"),
+    "restart": ("container", "restart"),
+    "reboot": ("container", "restart"),
+    "bounce": ("container", "restart"),
+    "logs": ("container", "logs"),
+    "log": ("container", "logs"),
+    "tail": ("container", "logs"),
+    "show logs": ("container", "logs"),
+    "get logs": ("container", "logs"),
+    "stats": ("container", "stats"),
+    "statistics": ("container", "stats"),
+    "usage": ("container", "stats"),
+    "resource usage": ("container", "stats"),
+    "list": ("container", "list"),
+    "ls": ("container", "list"),
+    "ps": ("container", "list"),
+    "show": ("container", "list"),
+    "deploy": ("compose", "up"),
+    "install": ("compose", "up"),
+    "create": ("compose", "up"),
+    "spin up": ("compose", "up"),
+    "set up": ("compose", "up"),
+    "setup": ("compose", "up"),
+}
+
+# Words that carry no meaning for classification
+FILLER = {
+    "a",
+    "an",
+    "the",
+    "my",
+    "our",
+    "please",
+    "can",
+    "could",
+    "you",
+    "me",
+    "i",
+    "want",
+    "to",
+    "now",
+    "and",
+    "of",
+    "for",
+    "from",
+    "on",
+    "in",
+    "named",
+    "called",
+    "container",
+    "containers",
+    "service",
+    "services",
+    "app",
+    "application",
+    "stack",
+    "template",
+    "lines",
+    "last",
+    "what",
+    "are",
+    "is",
+    "docker",
+    "current",
+    "currently",
+}
+
+_TOKEN = re.compile(r"[a-z0-9][a-z0-9_.\-]*")
+
+
+def tokenize(text: str) -> List[str]:
+    """Split a command into lowercase tokens, keeping container-name characters."""
+    return [token.rstrip(".-") or token for token in _TOKEN.findall(text.lower())]
+
+
+class PhraseTrie:
+    """Trie over token sequences with longest-match lookup."""
+
+    def __init__(self):
+        self._root: Dict[str, Any] = {}
+
+    def add(self, phrase: str, value: Tuple[str, str]) -> None:
+        """Add a phrase mapping to a (kind, value) entry."""
+        node = self._root
+        for token in tokenize(phrase):
+            node = node.setdefault(token, {})
+        node.setdefault(None, set()).add(value)
+
+    def longest_match(
+        self, tokens: List[str], start: int
+    ) -> Tuple[int, Set[Tuple[str, str]]]:
+        """
+        Find the longest phrase starting at ``tokens[start]``.
+
+        Returns:
+            Number of tokens matched (0 for no match) and the phrase's entries
+        """
+        node = self._root
+        length, values = 0, set()
+        for i in range(start, len(tokens)):
+            node = node.get(tokens[i])
+            if node is None:
+                break
+            if None in node:
+                length, values = i - start + 1, node[None]
+        return length, values
+
+
+@dataclass
+class _Scan:
+    verbs: List[Tuple[str, str]] = field(default_factory=list)
+    containers: List[str] = field(default_factory=list)
+    templates: List[str] = field(default_factory=list)
+    numbers: List[int] = field(default_factory=list)
+    unknown: List[str] = field(default_factory=list)
+    all: bool = False
+
+
+class RuleIntentClassifier:
+    """Compiled intent grammar over verbs, live containers and templates."""
+
+    def __init__(
+        self,
+        containers: Iterable[str] = (),
+        templates: Iterable[str] = (),
+        min_confidence: float = 0.8,
+    ):
+        """
+        Initialize the classifier.
+
+        Args:
+            containers: Names of existing containers
+            templates: Names of deployable templates
+            min_confidence: Confidence at which a result is used without the LLM
+        """
+        self.min_confidence = min_confidence
+        self._lock = threading.Lock()
+        self._trie = PhraseTrie()
+        self.stats = {"resolved": 0, "low_confidence": 0, "unmatched": 0}
+        self.update_entities(containers, templates)
+
+    def update_entities(
+        self, containers: Iterable[str] = (), templates: Iterable[str] = ()
+    ) -> None:
+        """
+        Recompile the grammar with the current container and template names.
+
+        Args:
+            containers: Names of existing containers
+            templates: Names of deployable templates
+        """
+        trie = PhraseTrie()
+        for phrase, intent in VERBS.items():
+            trie.add(phrase, ("verb", "/".join(intent)))
+        for name in containers:
+            if name:
+                trie.add(name, ("container", name))
+        for name in templates:
+            if name:
+                trie.add(name, ("template", name))
+        trie.add("all", ("all", "all"))
+        trie.add("everything", ("all", "all"))
+        with self._lock:
+            self._trie = trie
+
+    def _scan(self, tokens: List[str]) -> _Scan:
+        scan = _Scan()
+        trie = self._trie
+        i = 0
+        while i < len(tokens):
+            length, values = trie.longest_match(tokens, i)
+            if length:
+                for kind, value in values:
+                    if kind == "verb":
+                        intent = tuple(value.split("/"))
+                        if intent not in scan.verbs:
+                            scan.verbs.append(intent)
+                    elif kind == "container":
+                        scan.containers.append(value)
+                    elif kind == "template":
+                        scan.templates.append(value)
+                    else:
+                        scan.all = True
+                i += length
+                continue
+            token = tokens[i]
+            if token.isdigit():
+                scan.numbers.append(int(token))
+            elif token not in FILLER:
+                scan.unknown.append(token)
+            i += 1
+        return scan
+
+    def classify(self, command: str) -> Optional[Dict[str, Any]]:
+        """
+        Classify a command.
+
+        Args:
+            command: Natural language command
+
+        Returns:
+            Parsed command in the LLM response shape plus a ``confidence``
+            score, or None when no known verb was found. Results below
+            ``min_confidence`` should be confirmed by the LLM.
+        """
+        scan = self._scan(tokenize(command))
+        if not scan.verbs:
+            self.stats["unmatched"] += 1
+            return None
+
+        # "show logs"/"show stats" are covered by longer phrases; a bare "show"
+        # only means list when nothing more specific was asked for
+        verbs = scan.verbs
+        if len(verbs) > 1 and ("container", "list") in verbs:
+            verbs = [verb for verb in verbs if verb != ("container", "list")]
+        command_type, operation = verbs[0]
+
+        if command_type == "compose":
+            result, confidence = self._deploy(scan)
+        else:
+            result, confidence = self._container(operation, scan)
+
+        if len(verbs) > 1:
+            # Compound commands ("stop web and start db") need the LLM
+            confidence = min(confidence, 0.3)
+        # Each unrecognized word makes the reading less certain
+        confidence -= 0.15 * max(0, len(scan.unknown) - 1)
+        if scan.unknown and confidence > 0.7:
+            confidence = 0.7
+
+        confidence = round(max(confidence, 0.0), 2)
+        if confidence >= self.min_confidence:
+            self.stats["resolved"] += 1
+        else:
+            self.stats["low_confidence"] += 1
+
+        result.update(
+            {
+                "is_docker_command": True,
+                "command_type": command_type,
+                "operation": operation,
+                "confidence": confidence,
+                "source": "rules",
+            }
+        )
+        result.setdefault("missing_info", [])
+        return result
+
+    def is_confident(self, result: Optional[Dict[str, Any]]) -> bool:
+        """Check whether a classification can be used without the LLM."""
+        return result is not None and result["confidence"] >= self.min_confidence
+
+    def _deploy(self, scan: _Scan) -> Tuple[Dict[str, Any], float]:
+        if len(scan.templates) != 1:
+            return {
+                "parameters": {"templates": scan.templates},
+                "missing_info": ["template"] if not scan.templates else [],
+                "explanation": "Deploy a template",
+            }, 0.4
+        template = scan.templates[0]
+        return {
+            "parameters": {"template": template},
+            "docker_command": "docker compose up -d",
+            "explanation": f"Deploy the {template} template",
+        }, 0.95
+
+    def _container(self, operation: str, scan: _Scan) -> Tuple[Dict[str, Any], float]:
+        containers = list(dict.fromkeys(scan.containers))
+        parameters: Dict[str, Any] = {"containers": containers}
+        if scan.all:
+            parameters["all"] = True
+
+        if operation == "list":
+            command = "docker ps -a" if scan.all else "docker ps"
+            return {
+                "parameters": parameters,
+                "docker_command": command,
+                "explanation": "List all containers"
+                if scan.all
+                else "List running containers",
+            }, 0.9
+
+        if operation == "stats":
+            target = " ".join(containers)
+            return {
+                "parameters": parameters,
+                "docker_command": f"docker stats --no-stream {target}".strip(),
+                "explanation": f"Show resource usage for {target or 'running containers'}",
+            }, 0.95 if containers else 0.9
+
+        if operation == "logs":
+            tail = scan.numbers[0] if scan.numbers else 100
+            parameters["tail"] = tail
+            if len(containers) != 1:
+                return {
+                    "parameters": parameters,
+                    "missing_info": ["container"] if not containers else [],
+                    "explanation": "Show container logs",
+                }, 0.4
+            return {
+                "parameters": parameters,
+                "docker_command": f"docker logs --tail {tail} {containers[0]}",
+                "explanation": f"Show the last {tail} log lines of {containers[0]}",
+            }, 0.95
+
+        # start / stop / restart
+        if containers:
+            target = " ".join(containers)
+            return {
+                "parameters": parameters,
+                "docker_command": f"docker {operation} {target}",
+                "explanation": f"{operation.capitalize()} {', '.join(containers)}",
+            }, 0.95
+        if scan.all:
+            return {
+                "parameters": parameters,
+                "docker_command": f"docker {operation} $(docker ps -aq)",
+                "explanation": f"{operation.capitalize()} all containers",
+            }, 0.9
+        return {
+            "parameters": parameters,
+            "missing_info": ["container"],
+            "explanation": f"{operation.capitalize()} a container",
+        }, 0.4
+
+    def get_stats(self) -> Dict[str, int]:
+        """Get classification statistics."""
+        return dict(self.stats)
@@ -0,0 +1,229 @@
+"""
+Response cache for NLP command parsing.
+
+Parsing a command costs an LLM round trip of seconds and tokens, while users
+repeat the same commands ("list containers") constantly. The cache has two
+levels:
+
+1. An exact LRU keyed by the normalized command text.
+2. An optional semantic level that embeds the command and reuses the parse of
+   the most similar cached command when the cosine similarity is at least
+   ``similarity_threshold``. It is only enabled when an embedding function is
+   supplied, since near-duplicates with different parameters ("stop web" vs
+   "stop api") must not collide; keep the threshold high.
+
+Every key includes the LLM provider, model and prompt version, so changing
+any of them never serves a parse produced under the old configuration.
+"""
+
+import copy
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+try:
+    from sentence_transformers import SentenceTransformer
+except ImportError:
+    SentenceTransformer = None
+
+Embedder = Callable[[str], Sequence[float]]
+CacheKey = Tuple[str, str, str, str]
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_command(command: str) -> str:
+    """Normalize a command for exact matching: case, whitespace and trailing punctuation."""
+    return _WHITESPACE.sub(" ", command.strip().lower()).rstrip(".!?")
+
+
+def load_embedder(model_name: Optional[str] = None) -> Optional[Embedder]:
+    """
+    Load a local sentence embedding model for the semantic cache level.
+
+    Args:
+        model_name: sentence-transformers model name; defaults to the
+            NLP_SEMANTIC_CACHE_MODEL environment variable
+
+    Returns:
+        Embedding function, or None when no model is configured or the
+        sentence-transformers package is not installed
+    """
+    model_name = model_name or os.getenv("NLP_SEMANTIC_CACHE_MODEL")
+    if not model_name or SentenceTransformer is None:
+        return None
+    model = SentenceTransformer(model_name)
+    return lambda text: model.encode(text)
+
+
+class ParseCache:
+    """Two-level (exact and semantic) cache of parsed NLP commands."""
+
+    def __init__(
+        self,
+        max_entries: int = 1024,
+        ttl: float = 3600.0,
+        embedder: Optional[Embedder] = None,
+        similarity_threshold: float = 0.95,
+        max_semantic_entries: int = 1024,
+    ):
+        """
+        Initialize the cache.
+
+        Args:
+            max_entries: Maximum number of exact entries
+            ttl: Seconds a cached parse stays valid
+            embedder: Function mapping text to an embedding vector; enables
+                the semantic level
+            similarity_threshold: Minimum cosine similarity for a semantic hit
+            max_semantic_entries: Maximum number of embeddings per
+                provider/model/prompt version
+        """
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.embedder = embedder
+        self.similarity_threshold = similarity_threshold
+        self.max_semantic_entries = max_semantic_entries
+
+        self._lock = threading.Lock()
+        # key -> (stored at, parsed result)
+        self._entries: "OrderedDict[CacheKey, Tuple[float, Dict[str, Any]]]" = (
+            OrderedDict()
+        )
+        # (provider, model, version) -> (unit embedding matrix, exact keys by row)
+        self._vectors: Dict[
+            Tuple[str, str, str], Tuple[np.ndarray, List[CacheKey]]
+        ] = {}
+        self.stats = {
+            "exact_hits": 0,
+            "semantic_hits": 0,
+            "misses": 0,
+            "stores": 0,
+            "evictions": 0,
+        }
+
+    @staticmethod
+    def make_key(provider: str, model: str, version: str, command: str) -> CacheKey:
+        """Build the exact cache key for a command."""
+        return (provider, model, version, normalize_command(command))
+
+    def _embed(self, text: str) -> Optional[np.ndarray]:
+        vector = np.asarray(self.embedder(text), dtype=np.float32).ravel()
+        norm = np.linalg.norm(vector)
+        if not norm:
+            return None
+        return vector / norm
+
+    def _lookup_exact(self, key: CacheKey, now: float) -> Optional[Dict[str, Any]]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        stored_at, result = entry
+        if now - stored_at > self.ttl:
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return result
+
+    def get(
+        self, provider: str, model: str, version: str, command: str
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Look up a cached parse.
+
+        Args:
+            provider: LLM provider
+            model: LLM model name
+            version: Prompt version
+            command: Natural language command
+
+        Returns:
+            A copy of the cached parse, or None on a miss
+        """
+        key = self.make_key(provider, model, version, command)
+        now = time.monotonic()
+        with self._lock:
+            result = self._lookup_exact(key, now)
+            if result is not None:
+                self.stats["exact_hits"] += 1
+                return copy.deepcopy(result)
+
+        if self.embedder is not None:
+            vector = self._embed(key[3])
+            with self._lock:
+                matrix, keys = self._vectors.get(key[:3], (None, []))
+                if vector is not None and matrix is not None and len(keys):
+                    scores = matrix @ vector
+                    best = int(np.argmax(scores))
+                    if scores[best] >= self.similarity_threshold:
+                        result = self._lookup_exact(keys[best], now)
+                        if result is not None:
+                            self.stats["semantic_hits"] += 1
+                            return copy.deepcopy(result)
+
+        with self._lock:
+            self.stats["misses"] += 1
+        return None
+
+    def put(
+        self,
+        provider: str,
+        model: str,
+        version: str,
+        command: str,
+        result: Dict[str, Any],
+    ) -> None:
+        """
+        Cache a parse.
+
+        Args:
+            provider: LLM provider
+            model: LLM model name
+            version: Prompt version
+            command: Natural language command
+            result: Parsed command to cache
+        """
+        key = self.make_key(provider, model, version, command)
+        vector = self._embed(key[3]) if self.embedder is not None else None
+
+        with self._lock:
+            is_new = key not in self._entries
+            self._entries[key] = (time.monotonic(), copy.deepcopy(result))
+            self._entries.move_to_end(key)
+            self.stats["stores"] += 1
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.stats["evictions"] += 1
+
+            if vector is not None and is_new:
+                matrix, keys = self._vectors.get(key[:3], (None, []))
+                if matrix is None or matrix.shape[1] != vector.shape[0]:
+                    matrix, keys = vector[np.newaxis, :], [key]
+                else:
+                    matrix = np.vstack([matrix, vector])[-self.max_semantic_entries :]
+                    keys = (keys + [key])[-self.max_semantic_entries :]
+                self._vectors[key[:3]] = (matrix, keys)
+
+    def clear(self) -> None:
+        """Drop all cached parses."""
+        with self._lock:
+            self._entries.clear()
+            self._vectors.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get cache hit statistics."""
+        with self._lock:
+            hits = self.stats["exact_hits"] + self.stats["semantic_hits"]
+            lookups = hits + self.stats["misses"]
+            return {
+                **self.stats,
+                "entries": len(self._entries),
+                "semantic_enabled": self.embedder is not None,
+                "similarity_threshold": self.similarity_threshold,
+                "hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+            }
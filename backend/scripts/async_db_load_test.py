@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+"""
+Load test comparing sync and async database sessions inside one event loop.
+
+Simulates a single uvicorn worker serving concurrent container metrics
+history requests. The sync path runs the query inline in ``async def`` code,
+as handlers did before the async session was introduced; the async path uses
+``AsyncSession`` (aiosqlite). For each mode the script reports throughput,
+request latency and event-loop lag measured by a heartbeat coroutine, which
+is what websocket streams on the same worker experience.
+
+Usage:
+    python scripts/async_db_load_test.py --concurrency 50 --requests 500
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from typing import Dict, List
+
+# Add the backend directory to the Python path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import and_, create_engine, desc, select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import NullPool
+
+from app.db.models import Base, ContainerMetrics
+
+
+def seed_database(database_path: str, containers: int, rows_per_container: int) -> None:
+    """Create the schema and insert synthetic metrics rows."""
+    engine = create_engine(f"sqlite:///{database_path}")
+    Base.metadata.create_all(bind=engine)
+    Session = sessionmaker(bind=engine)
+
+    now = datetime.utcnow()
+    with Session() as session:
+        for container in range(containers):
+            session.add_all(
+                ContainerMetrics(
+                    container_id=f"container-{container}",
+                    container_name=f"container-{container}",
+                    timestamp=now - timedelta(seconds=5 * i),
+                    date_partition=now.replace(
+                        hour=0, minute=0, second=0, microsecond=0
+                    ),
+                    cpu_percent=float(i % 100),
+                    memory_usage_bytes=1024 * i,
+                    memory_limit_bytes=1024 * 1024 * 1024,
+                    memory_percent=float(i % 100),
+                )
+                for i in range(rows_per_container)
+            )
+        session.commit()
+    engine.dispose()
+
+
+def history_statement(container_id: str):
+    """Build the metrics history query used by the history endpoint."""
+    end_time = datetime.utcnow()
+    start_time = end_time - timedelta(hours=24)
+    return (
+        select(ContainerMetrics)
+        .where(
+            and_(
+                ContainerMetrics.container_id == container_id,
+                ContainerMetrics.timestamp >= start_time,
+                ContainerMetrics.timestamp <= end_time,
+            )
+        )
+        .order_by(desc(ContainerMetrics.timestamp))
+        .limit(1000)
+    )
+
+
+async def heartbeat(
+    stop: asyncio.Event, lags: List[float], interval: float = 0.01
+) -> None:
+    """Measure how late the event loop wakes up a periodic task."""
+    while not stop.is_set():
+        expected = time.perf_counter() + interval
+        await asyncio.sleep(interval)
+        lags.append(max(0.0, (time.perf_counter() - expected) * 1000))
+
+
+async def run_mode(
+    mode: str, database_path: str, args: argparse.Namespace
+) -> Dict[str, float]:
+    """Run the load for one session mode and collect statistics."""
+    sync_engine = create_engine(
+        f"sqlite:///{database_path}", connect_args={"check_same_thread": False}
+    )
+    SyncSession = sessionmaker(bind=sync_engine)
+    async_engine = create_async_engine(
+        f"sqlite+aiosqlite:///{database_path}", poolclass=NullPool
+    )
+    AsyncSessionLocal = async_sessionmaker(async_engine, class_=AsyncSession)
+
+    semaphore = asyncio.Semaphore(args.concurrency)
+    latencies: List[float] = []
+
+    async def request(index: int) -> None:
+        container_id = f"container-{index % args.containers}"
+        async with semaphore:
+            start = time.perf_counter()
+            if mode == "sync":
+                with SyncSession() as session:
+                    session.execute(history_statement(container_id)).scalars().all()
+            else:
+                async with AsyncSessionLocal() as session:
+                    (
+                        await session.execute(history_statement(container_id))
+                    ).scalars().all()
+            latencies.append((time.perf_counter() - start) * 1000)
+
+    stop = asyncio.Event()
+    lags: List[float] = []
+    heartbeat_task = asyncio.create_task(heartbeat(stop, lags))
+
+    start = time.perf_counter()
+    await asyncio.gather(*(request(i) for i in range(args.requests)))
+    elapsed = time.perf_counter() - start
+
+    stop.set()
+    await heartbeat_task
+    sync_engine.dispose()
+    await async_engine.dispose()
+
+    latencies.sort()
+    return {
+        "requests_per_second": round(args.requests / elapsed, 1),
+        "latency_p50_ms": round(statistics.median(latencies), 2),
+        "latency_p95_ms": round(latencies[int(len(latencies) * 0.95) - 1], 2),
+        "loop_lag_max_ms": round(max(lags) if lags else 0.0, 2),
+        "loop_lag_p95_ms": round(
+            sorted(lags)[int(len(lags) * 0.95) - 1] if lags else 0.0, 2
+        ),
+        "heartbeats": len(lags),
+    }
+
+
+async def main() -> int:
+    """Run the load test for both modes and print a comparison."""
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--containers", type=int, default=20)
+    parser.add_argument(
+        "--rows", type=int, default=2000, help="Metrics rows per container"
+    )
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        database_path = os.path.join(tmp_dir, "load_test.db")
+        print(f"Seeding {args.containers} containers x {args.rows} metrics rows...")
+        seed_database(database_path, args.containers, args.rows)
+
+        results = {}
+        for mode in ("sync", "async"):
+            results[mode] = await run_mode(mode, database_path, args)
+
+    print(f"\n{'metric':<22}{'sync':>12}{'async':>12}")
+    for key in results["sync"]:
+        print(f"{key:<22}{results['sync'][key]:>12}{results['async'][key]:>12}")
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
@@ -0,0 +1,187 @@
+#!/usr/bin/env python3
+"""
+Benchmark notification broadcast to many simulated WebSocket clients.
+
+Connects N simulated sockets to a ConnectionManager, a fraction of which
+are slow (each send takes ``--slow-delay`` seconds). For the queued
+manager the script reports how long ``broadcast_message`` takes to return
+and how long fast clients wait for delivery. For comparison it also runs
+the previous behaviour, awaiting ``send_text`` for every socket in turn,
+where every client waits behind the slow ones.
+
+Usage:
+    python scripts/websocket_broadcast_benchmark.py --sockets 5000 --slow 50
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import time
+from typing import List
+
+# Add the backend directory to the Python path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.alert_notification_service import ConnectionManager
+
+
+class SimulatedWebSocket:
+    """WebSocket stand-in that records when each message arrived."""
+
+    def __init__(self, delay: float = 0.0):
+        self.delay = delay
+        self.received_at: List[float] = []
+        self.done = asyncio.Event()
+        self.expected = 0
+
+    async def accept(self):
+        pass
+
+    async def close(self, code: int = 1000):
+        pass
+
+    async def send_text(self, data: str):
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        self.received_at.append(time.perf_counter())
+        if len(self.received_at) >= self.expected:
+            self.done.set()
+
+
+def percentile(values: List[float], pct: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct))]
+
+
+def make_sockets(
+    count: int, slow: int, slow_delay: float, messages: int
+) -> List[SimulatedWebSocket]:
+    sockets = [
+        SimulatedWebSocket(slow_delay if i < slow else 0.0) for i in range(count)
+    ]
+    for websocket in sockets:
+        websocket.expected = messages
+    return sockets
+
+
+async def run_sequential(args) -> dict:
+    """Await every send in turn, as broadcast did before send queues."""
+    sockets = make_sockets(args.sockets, args.slow, args.slow_delay, args.messages)
+    start = time.perf_counter()
+    for i in range(args.messages):
+        message_str = json.dumps({"type": "system_notification", "sequence": i})
+        for websocket in sockets:
+            await websocket.send_text(message_str)
+    elapsed = time.perf_counter() - start
+    return summarize("sequential", sockets, start, elapsed, args.slow)
+
+
+async def run_queued(args) -> dict:
+    """Broadcast through the per-connection send queues."""
+    manager = ConnectionManager(
+        max_queue_size=args.queue_size, slow_consumer_policy=args.policy
+    )
+    sockets = make_sockets(args.sockets, args.slow, args.slow_delay, args.messages)
+    for user_id, websocket in enumerate(sockets):
+        await manager.connect(websocket, user_id)
+
+    start = time.perf_counter()
+    for i in range(args.messages):
+        await manager.broadcast_message({"type": "system_notification", "sequence": i})
+    enqueue_elapsed = time.perf_counter() - start
+
+    fast = sockets[args.slow :]
+    await asyncio.gather(*(websocket.done.wait() for websocket in fast))
+    fast_elapsed = time.perf_counter() - start
+    await manager.flush(timeout=args.slow_delay * args.messages + 30)
+
+    result = summarize("queued", sockets, start, time.perf_counter() - start, args.slow)
+    result["broadcast_call_ms"] = enqueue_elapsed * 1000 / args.messages
+    result["fast_clients_done_s"] = fast_elapsed
+    result["queue_stats"] = manager.get_queue_stats()
+
+    for websocket in sockets:
+        await manager.disconnect(websocket)
+    return result
+
+
+def summarize(
+    mode: str,
+    sockets: List[SimulatedWebSocket],
+    start: float,
+    elapsed: float,
+    slow: int,
+) -> dict:
+    fast_latencies = [
+        (received - start) * 1000
+        for websocket in sockets[slow:]
+        for received in websocket.received_at[:1]
+    ]
+    return {
+        "mode": mode,
+        "total_s": elapsed,
+        "fast_first_message_p50_ms": statistics.median(fast_latencies),
+        "fast_first_message_p99_ms": percentile(fast_latencies, 0.99),
+    }
+
+
+def print_result(result: dict) -> None:
+    print(f"\n{result['mode']}:")
+    print(f"  total time:                {result['total_s']:.2f}s")
+    if "broadcast_call_ms" in result:
+        print(f"  broadcast_message call:    {result['broadcast_call_ms']:.2f}ms")
+        print(f"  all fast clients done:     {result['fast_clients_done_s']:.3f}s")
+    print(f"  fast client latency p50:   {result['fast_first_message_p50_ms']:.1f}ms")
+    print(f"  fast client latency p99:   {result['fast_first_message_p99_ms']:.1f}ms")
+    if "queue_stats" in result:
+        stats = result["queue_stats"]
+        print(
+            f"  queue: sent={stats['sent']} dropped={stats['dropped']} "
+            f"coalesced={stats['coalesced']} max_depth={stats['max_depth']}"
+        )
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Benchmark WebSocket notification broadcast"
+    )
+    parser.add_argument(
+        "--sockets", type=int, default=5000, help="Simulated connections"
+    )
+    parser.add_argument(
+        "--slow", type=int, default=50, help="How many of them are slow"
+    )
+    parser.add_argument(
+        "--slow-delay",
+        type=float,
+        default=0.05,
+        help="Seconds per send for slow clients",
+    )
+    parser.add_argument("--messages", type=int, default=5, help="Messages to broadcast")
+    parser.add_argument(
+        "--queue-size", type=int, default=256, help="Per-connection queue size"
+    )
+    parser.add_argument(
+        "--policy",
+        default="coalesce",
+        choices=["drop_oldest", "coalesce", "disconnect"],
+    )
+    parser.add_argument(
+        "--skip-sequential", action="store_true", help="Only run the queued mode"
+    )
+    args = parser.parse_args()
+
+    print(
+        f"Broadcasting {args.messages} messages to {args.sockets} sockets "
+        f"({args.slow} slow at {args.slow_delay * 1000:.0f}ms/send)"
+    )
+    print_result(await run_queued(args))
+    if not args.skip_sequential:
+        print_result(await run_sequential(args))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
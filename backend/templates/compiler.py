@@ -0,0 +1,298 @@
+"""
+Template compiler for DockerDeployer.
+
+Rendering a template means resolving ``${VAR}`` references throughout its
+services, volumes and files. Instead of rescanning every string with regular
+expressions on each deployment, a template is compiled once into a
+substitution plan: a tree mirroring the template in which plain values are
+constants and strings containing references are pre-split into literal and
+variable slots. Rendering with user overrides is then a single pass that
+fills the slots, so its cost is bounded by the size of the output.
+"""
+
+import hashlib
+import json
+import re
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from templates.validator import TemplateValidationError, validate_variables
+
+VARIABLE_REF = re.compile(r"\$\{([A-Z][A-Z0-9_]*)\}")
+
+# Sections copied as-is rather than substituted
+UNRENDERED_SECTIONS = ("variables",)
+
+# Plan node kinds
+_CONST = 0
+_SLOT = 1
+_DICT = 2
+_LIST = 3
+
+
+def _canonical_json(data: Any) -> str:
+    return json.dumps(data, sort_keys=True, separators=(",", ":"), default=str)
+
+
+def template_fingerprint(template_data: Dict[str, Any]) -> str:
+    """
+    Compute a stable hash of a template definition.
+
+    Args:
+        template_data: The template data
+
+    Returns:
+        Hex SHA-256 of the template's canonical JSON form
+    """
+    return hashlib.sha256(_canonical_json(template_data).encode("utf-8")).hexdigest()
+
+
+class RenderedTemplate:
+    """The result of rendering a compiled template."""
+
+    def __init__(
+        self, config: Dict[str, Any], values: Dict[str, Any], content_hash: str
+    ):
+        self.config = config
+        self.values = values
+        # Equal for any two renders that produce the same config
+        self.content_hash = content_hash
+
+
+class CompiledTemplate:
+    """A template pre-scanned into a substitution plan."""
+
+    def __init__(
+        self, template_data: Dict[str, Any], fingerprint: Optional[str] = None
+    ):
+        """
+        Compile a template.
+
+        Args:
+            template_data: The template data
+            fingerprint: Precomputed ``template_fingerprint`` of the template
+
+        Raises:
+            TemplateValidationError: If the variables section is invalid
+        """
+        is_valid, error = validate_variables(template_data)
+        if not is_valid:
+            raise TemplateValidationError(error)
+
+        self.fingerprint = fingerprint or template_fingerprint(template_data)
+        self.variables: Dict[str, Dict] = template_data.get("variables") or {}
+        self.defaults = {
+            name: config["default"]
+            for name, config in self.variables.items()
+            if "default" in config
+        }
+        self.required = [
+            name
+            for name, config in self.variables.items()
+            if config.get("required", False) and "default" not in config
+        ]
+        self.options = {
+            name: {str(option) for option in config["options"]}
+            for name, config in self.variables.items()
+            if config.get("options")
+        }
+
+        # (path, original string) of every string with variable references
+        self.slots: List[Tuple[Tuple, str]] = []
+        self.referenced: Set[str] = set()
+        # References to undeclared variables are left in the output verbatim,
+        # e.g. JavaScript template literals in file contents
+        self.undefined_refs: Set[str] = set()
+        self._plan = (
+            _DICT,
+            [
+                (
+                    key,
+                    (_CONST, value)
+                    if key in UNRENDERED_SECTIONS
+                    else self._compile(value, (key,)),
+                )
+                for key, value in template_data.items()
+            ],
+        )
+
+    def _compile(self, node: Any, path: Tuple) -> Tuple:
+        if isinstance(node, str):
+            pieces = VARIABLE_REF.split(node)
+            if len(pieces) == 1:
+                return (_CONST, node)
+            parts = []
+            literal = pieces[0]
+            for i in range(1, len(pieces), 2):
+                name = pieces[i]
+                if name in self.variables:
+                    if literal:
+                        parts.append((False, literal))
+                    parts.append((True, name))
+                    self.referenced.add(name)
+                    literal = pieces[i + 1]
+                else:
+                    self.undefined_refs.add(name)
+                    literal += "${" + name + "}" + pieces[i + 1]
+            if not any(is_var for is_var, _ in parts):
+                return (_CONST, node)
+            if literal:
+                parts.append((False, literal))
+            self.slots.append((path, node))
+            return (_SLOT, tuple(parts))
+        if isinstance(node, dict):
+            return (
+                _DICT,
+                [
+                    (key, self._compile(value, path + (key,)))
+                    for key, value in node.items()
+                ],
+            )
+        if isinstance(node, list):
+            return (
+                _LIST,
+                [self._compile(item, path + (i,)) for i, item in enumerate(node)],
+            )
+        return (_CONST, node)
+
+    def resolve(self, overrides: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """
+        Merge overrides into the variable defaults.
+
+        Args:
+            overrides: User-provided variable values
+
+        Returns:
+            Value of every variable that has one
+
+        Raises:
+            TemplateValidationError: If a value is not one of the variable's
+                options or a required variable has no value
+        """
+        values = dict(self.defaults)
+        for name, value in (overrides or {}).items():
+            if name not in self.variables:
+                continue
+            options = self.options.get(name)
+            if options and str(value) not in options:
+                raise TemplateValidationError(
+                    f"Value for {name} must be one of: {', '.join(sorted(options))}"
+                )
+            values[name] = value
+        for name in self.required:
+            if name not in values:
+                raise TemplateValidationError(f"Missing required variable: {name}")
+        return values
+
+    def render(self, overrides: Optional[Dict[str, Any]] = None) -> RenderedTemplate:
+        """
+        Render the template with variable overrides.
+
+        Args:
+            overrides: User-provided variable values
+
+        Returns:
+            The rendered template
+
+        Raises:
+            TemplateValidationError: If the overrides are invalid
+        """
+        values = self.resolve(overrides)
+        # Referenced variables without a value render as empty strings
+        text_values = {name: str(values.get(name, "")) for name in self.referenced}
+        config = _build(self._plan, text_values)
+        digest = hashlib.sha256(
+            f"{self.fingerprint}:{_canonical_json(text_values)}".encode("utf-8")
+        ).hexdigest()
+        return RenderedTemplate(config, values, digest)
+
+
+def _build(node: Tuple, values: Dict[str, str]) -> Any:
+    kind, payload = node
+    if kind == _CONST:
+        if isinstance(payload, (dict, list)):
+            return _copy(payload)
+        return payload
+    if kind == _SLOT:
+        return "".join(values[text] if is_var else text for is_var, text in payload)
+    if kind == _DICT:
+        return {key: _build(child, values) for key, child in payload}
+    return [_build(child, values) for child in payload]
+
+
+def _copy(data: Any) -> Any:
+    # Plain YAML data only, so this is much cheaper than copy.deepcopy
+    if isinstance(data, dict):
+        return {key: _copy(value) for key, value in data.items()}
+    if isinstance(data, list):
+        return [_copy(item) for item in data]
+    return data
+
+
+class TemplateCompiler:
+    """LRU cache of compiled templates keyed by template fingerprint."""
+
+    def __init__(self, max_entries: int = 256):
+        """
+        Initialize the compiler.
+
+        Args:
+            max_entries: Maximum number of compiled templates kept
+        """
+        self.max_entries = max_entries
+        self._cache: "OrderedDict[str, CompiledTemplate]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "evictions": 0}
+
+    def compile(self, template_data: Dict[str, Any]) -> CompiledTemplate:
+        """
+        Get the compiled form of a template, compiling it on first use.
+
+        Args:
+            template_data: The template data
+
+        Returns:
+            The compiled template
+
+        Raises:
+            TemplateValidationError: If the variables section is invalid
+        """
+        fingerprint = template_fingerprint(template_data)
+        with self._lock:
+            compiled = self._cache.get(fingerprint)
+            if compiled is not None:
+                self._cache.move_to_end(fingerprint)
+                self.stats["hits"] += 1
+                return compiled
+            self.stats["misses"] += 1
+
+        compiled = CompiledTemplate(template_data, fingerprint)
+        with self._lock:
+            self._cache[fingerprint] = compiled
+            if len(self._cache) > self.max_entries:
+                self._cache.popitem(last=False)
+                self.stats["evictions"] += 1
+        return compiled
+
+    def clear(self) -> None:
+        """Drop all compiled templates."""
+        with self._lock:
+            self._cache.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get cache counters."""
+        with self._lock:
+            return {**self.stats, "size": len(self._cache)}
+
+
+# Global template compiler instance
+_compiler: Optional[TemplateCompiler] = None
+
+
+def get_template_compiler() -> TemplateCompiler:
+    """Get the global template compiler instance."""
+    global _compiler
+    if _compiler is None:
+        _compiler = TemplateCompiler()
+    return _compiler
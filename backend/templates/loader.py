@@ -1,95 +1,288 @@
+import asyncio
+import copy
+import logging
 import os
+import threading
+import time
 from typing import Dict, List, Optional
 
 import yaml
 
+logger = logging.getLogger(__name__)
+
 TEMPLATES_DIR = os.path.abspath(
     os.path.join(os.path.dirname(__file__), "../../templates")
 )
 
+# Returned for development/testing when the templates directory is missing
+DEFAULT_TEMPLATES = [
+    {
+        "name": "lemp",
+        "title": "LEMP Stack",
+        "description": "Linux, Nginx, MySQL, PHP stack for web applications",
+        "category": "web",
+        "complexity": "medium",
+        "tags": ["nginx", "mysql", "php", "web"],
+        "version": "1.0"
+    },
+    {
+        "name": "mean",
+        "title": "MEAN Stack",
+        "description": "MongoDB, Express.js, Angular, Node.js stack",
+        "category": "web",
+        "complexity": "medium",
+        "tags": ["mongodb", "express", "angular", "nodejs"],
+        "version": "1.0"
+    },
+    {
+        "name": "wordpress",
+        "title": "WordPress",
+        "description": "WordPress CMS with MySQL database",
+        "category": "cms",
+        "complexity": "easy",
+        "tags": ["wordpress", "mysql", "cms"],
+        "version": "1.0"
+    }
+]
 
-def list_templates() -> List[Dict]:
-    """
-    List all available stack templates in the templates directory.
-    Returns a list of dicts with template name and description.
-    """
-    templates = []
-
-    # Check if templates directory exists
-    if not os.path.exists(TEMPLATES_DIR):
-        print(f"⚠️  Templates directory not found: {TEMPLATES_DIR}")
-        # Return default templates for development/testing
-        return [
-            {
-                "name": "lemp",
-                "title": "LEMP Stack",
-                "description": "Linux, Nginx, MySQL, PHP stack for web applications",
-                "category": "web",
-                "complexity": "medium",
-                "tags": ["nginx", "mysql", "php", "web"],
-                "version": "1.0"
-            },
-            {
-                "name": "mean",
-                "title": "MEAN Stack",
-                "description": "MongoDB, Express.js, Angular, Node.js stack",
-                "category": "web",
-                "complexity": "medium",
-                "tags": ["mongodb", "express", "angular", "nodejs"],
-                "version": "1.0"
-            },
-            {
-                "name": "wordpress",
-                "title": "WordPress",
-                "description": "WordPress CMS with MySQL database",
-                "category": "cms",
-                "complexity": "easy",
-                "tags": ["wordpress", "mysql", "cms"],
-                "version": "1.0"
-            }
-        ]
 
-    try:
-        for entry in os.listdir(TEMPLATES_DIR):
-            entry_path = os.path.join(TEMPLATES_DIR, entry)
-            if os.path.isdir(entry_path) and os.path.exists(
-                os.path.join(entry_path, "template.yaml")
-            ):
-                meta = load_template_metadata(entry)
-                if meta:
-                    templates.append(meta)
-    except Exception as e:
-        print(f"⚠️  Error reading templates directory: {e}")
+class TemplateEntry:
+    """A parsed template in the catalog, with metadata precomputed for listing."""
 
-    return templates
+    def __init__(self, name: str, path: str, mtime_ns: int, definition: Dict):
+        self.name = name
+        self.path = path
+        self.mtime_ns = mtime_ns
+        # Full template.yaml contents plus name; the path stays server-side
+        self.definition = definition
+        variables = definition.get("variables") or {}
+        self.variables: Dict[str, Dict] = variables if isinstance(variables, dict) else {}
+        self.tags = [str(tag) for tag in definition.get("tags") or []]
+        self.category = definition.get("category")
+        self.required_variables = [
+            var for var, config in self.variables.items()
+            if isinstance(config, dict) and config.get("required", False)
+        ]
 
 
-def load_template_metadata(template_name: str) -> Optional[Dict]:
+class TemplateCatalog:
     """
-    Load metadata for a given template (from template.yaml).
-    """
-    meta_path = os.path.join(TEMPLATES_DIR, template_name, "template.yaml")
-    if not os.path.exists(meta_path):
-        return None
-    try:
-        with open(meta_path, "r") as f:
-            meta = yaml.safe_load(f)
-        meta["name"] = template_name
-        return meta
-    except yaml.YAMLError:
-        return None
-
-
-def load_template(template_name: str) -> Optional[Dict]:
-    """
-    Load the full template definition (docker-compose, Dockerfiles, etc.).
+    In-memory index of the local stack templates.
+
+    Every template.yaml is parsed once and kept, keyed by template name, with
+    tags, category and variables precomputed, so listing and loading templates
+    are dictionary lookups instead of a directory scan and a YAML parse per
+    request. Changes on disk are picked up by polling modification times:
+    directory and file mtimes are compared on each refresh, and only added,
+    changed or removed templates are re-read. The poll runs in a background
+    task once ``start()`` is called, and otherwise on access at most every
+    ``poll_interval`` seconds.
+
+    Returned dicts are shared with the catalog and must be treated as read-only.
     """
-    template_path = os.path.join(TEMPLATES_DIR, template_name)
-    if not os.path.exists(template_path):
-        return None
-    # For now, just return metadata and path; can be extended to load files
-    meta = load_template_metadata(template_name)
-    if not meta:
-        return None
-    meta["path"] = template_path
-    return meta
+
+    def __init__(self, templates_dir: Optional[str] = None, poll_interval: float = 2.0):
+        """
+        Initialize the catalog.
+
+        Args:
+            templates_dir: Directory holding one sub-directory per template
+            poll_interval: Seconds between checks for changes on disk
+        """
+        self.templates_dir = templates_dir or TEMPLATES_DIR
+        self.poll_interval = poll_interval
+        self._entries: Dict[str, TemplateEntry] = {}
+        self._listing: List[Dict] = []
+        self._by_category: Dict[str, List[Dict]] = {}
+        self._by_tag: Dict[str, List[Dict]] = {}
+        # mtimes of template.yaml files that failed to parse, so they are not re-read
+        self._failed: Dict[str, int] = {}
+        self._last_poll = 0.0
+        self._loaded = False
+        self._lock = threading.Lock()
+        self._task: Optional[asyncio.Task] = None
+        self.stats = {"refreshes": 0, "parsed": 0, "parse_errors": 0, "removed": 0}
+
+    def refresh(self) -> bool:
+        """
+        Re-read templates whose files changed since the last refresh.
+
+        Returns:
+            True if the catalog changed
+        """
+        with self._lock:
+            self._last_poll = time.monotonic()
+            self.stats["refreshes"] += 1
+            if not os.path.isdir(self.templates_dir):
+                changed = self._loaded and bool(self._entries)
+                if not self._loaded:
+                    logger.warning(f"Templates directory not found: {self.templates_dir}")
+                self._entries = {}
+                self._reindex(copy.deepcopy(DEFAULT_TEMPLATES))
+                self._loaded = True
+                return changed
+
+            entries = {}
+            changed = False
+            try:
+                with os.scandir(self.templates_dir) as it:
+                    candidates = [e for e in it if e.is_dir()]
+            except OSError as e:
+                logger.error(f"Error reading templates directory: {e}")
+                return False
+
+            for candidate in candidates:
+                meta_path = os.path.join(candidate.path, "template.yaml")
+                try:
+                    mtime_ns = os.stat(meta_path).st_mtime_ns
+                except OSError:
+                    continue
+                current = self._entries.get(candidate.name)
+                if current is not None and current.mtime_ns == mtime_ns:
+                    entries[candidate.name] = current
+                    continue
+                if self._failed.get(candidate.name) == mtime_ns:
+                    continue
+                entry = self._parse(candidate.name, candidate.path, meta_path, mtime_ns)
+                if entry is None:
+                    self._failed[candidate.name] = mtime_ns
+                    continue
+                self._failed.pop(candidate.name, None)
+                entries[candidate.name] = entry
+                changed = True
+
+            removed = set(self._entries) - set(entries)
+            if removed:
+                self.stats["removed"] += len(removed)
+                changed = True
+            if changed or not self._loaded:
+                self._entries = entries
+                self._reindex([entry.definition for entry in entries.values()])
+                self._loaded = True
+            return changed
+
+    def _parse(self, name: str, path: str, meta_path: str, mtime_ns: int) -> Optional[TemplateEntry]:
+        try:
+            with open(meta_path, "r") as f:
+                definition = yaml.safe_load(f) or {}
+        except (OSError, yaml.YAMLError) as e:
+            self.stats["parse_errors"] += 1
+            logger.warning(f"Skipping template {name}: {e}")
+            return None
+        if not isinstance(definition, dict):
+            self.stats["parse_errors"] += 1
+            logger.warning(f"Skipping template {name}: template.yaml is not a mapping")
+            return None
+        self.stats["parsed"] += 1
+        definition["name"] = name
+        return TemplateEntry(name, path, mtime_ns, definition)
+
+    def _reindex(self, definitions: List[Dict]) -> None:
+        listing = sorted(definitions, key=lambda d: d["name"])
+        by_category: Dict[str, List[Dict]] = {}
+        by_tag: Dict[str, List[Dict]] = {}
+        for definition in listing:
+            category = definition.get("category")
+            if category:
+                by_category.setdefault(str(category), []).append(definition)
+            for tag in definition.get("tags") or []:
+                by_tag.setdefault(str(tag), []).append(definition)
+        # Swap whole structures so readers never see a half-built index
+        self._listing = listing
+        self._by_category = by_category
+        self._by_tag = by_tag
+
+    def _ensure_fresh(self) -> None:
+        if not self._loaded:
+            self.refresh()
+        elif self._task is None and time.monotonic() - self._last_poll >= self.poll_interval:
+            self.refresh()
+
+    def list(self, category: Optional[str] = None, tag: Optional[str] = None) -> List[Dict]:
+        """
+        List templates, optionally filtered by category and tag.
+
+        Args:
+            category: Only include templates in this category
+            tag: Only include templates with this tag
+
+        Returns:
+            Template definitions sorted by name
+        """
+        self._ensure_fresh()
+        if category is not None and tag is not None:
+            tagged = {id(d) for d in self._by_tag.get(tag, [])}
+            return [d for d in self._by_category.get(category, []) if id(d) in tagged]
+        if category is not None:
+            return list(self._by_category.get(category, []))
+        if tag is not None:
+            return list(self._by_tag.get(tag, []))
+        return list(self._listing)
+
+    def get_entry(self, name: str) -> Optional[TemplateEntry]:
+        """Get the catalog entry for a template, or None if it does not exist."""
+        self._ensure_fresh()
+        return self._entries.get(name)
+
+    def get(self, name: str) -> Optional[Dict]:
+        """Get a template definition by name, or None if it does not exist."""
+        entry = self.get_entry(name)
+        return entry.definition if entry is not None else None
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.poll_interval)
+            try:
+                if await asyncio.to_thread(self.refresh):
+                    logger.info(f"Template catalog reloaded ({len(self._entries)} templates)")
+            except Exception as e:
+                logger.error(f"Error refreshing template catalog: {e}")
+
+    def start(self) -> None:
+        """Build the catalog and start watching the templates directory for changes."""
+        if self._task is not None and not self._task.done():
+            return
+        self.refresh()
+        self._task = asyncio.create_task(self._run())
+        logger.info(f"Template catalog started ({len(self._entries)} templates)")
+
+    async def stop(self) -> None:
+        """Stop watching the templates directory."""
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    def get_stats(self) -> Dict:
+        """Get catalog size and refresh counters."""
+        return {
+            **self.stats,
+            "templates": len(self._listing),
+            "watching": self._task is not None and not self._task.done(),
+        }
+
+
+# Global template catalog instance
+_catalog: Optional[TemplateCatalog] = None
+
+
+def get_template_catalog() -> TemplateCatalog:
+    """Get the global template catalog instance."""
+    global _catalog
+    if _catalog is None:
+        _catalog = TemplateCatalog()
+    return _catalog
+
+
+def list_cached_templates() -> List[Dict]:
+    """List all available stack templates from the catalog."""
+    return get_template_catalog().list()
+
+
+def load_cached_template(template_name: str) -> Optional[Dict]:
+    """Load a template definition from the catalog."""
+    return get_template_catalog().get(template_name)
@@ -5,7 +5,7 @@ Pytest configuration file for DockerDeployer backend tests.
 import os
 import sys
 import tempfile
-from unittest.mock import MagicMock, patch
+from unittest.mock import AsyncMock, MagicMock, patch
 
 import docker as docker_sdk
 import httpx
@@ -21,6 +21,7 @@ if project_root not in sys.path:
 
 # Set up test environment variables before importing main
 os.environ["CONFIG_REPO_PATH"] = tempfile.mkdtemp()
+os.environ["DEPLOYMENTS_DIR"] = tempfile.mkdtemp()
 os.environ["DATABASE_URL"] = "sqlite:///test.db"
 os.environ["JWT_SECRET_KEY"] = "test-secret-key-for-testing-only"
 os.environ["EMAIL_PROVIDER"] = "test"
@@ -163,6 +164,7 @@ def authenticated_client(clean_database):
             "created_at": "2024-01-01T12:00:00",
         }
         mock_service.get_user_alerts.return_value = []
+        mock_service.get_user_alerts_async = AsyncMock(return_value=[])
         mock_service.get_current_metrics.return_value = {
             "container_id": "test_container",
             "name": "test_container_name",
@@ -177,6 +179,7 @@ def authenticated_client(clean_database):
             "timestamp": "2024-01-01T12:00:00",
         }
         mock_service.get_historical_metrics.return_value = []
+        mock_service.get_historical_metrics_async = AsyncMock(return_value=[])
         mock_service.get_system_metrics.return_value = {
             "timestamp": "2024-01-01T12:00:00",
             "containers_total": 3,
@@ -304,10 +307,10 @@ def mock_template_loader():
     """
     Create mock template loader functions for testing.
     """
-    from backend.templates.loader import list_templates, load_template
+    from backend.templates.loader import list_cached_templates, load_cached_template
 
     # Import functions to ensure they're available for patching
-    _ = list_templates, load_template
+    _ = list_cached_templates, load_cached_template
 
     # Sample template data
     templates = [
@@ -334,12 +337,12 @@ def mock_template_loader():
         },
     ]
 
-    # Create patch for list_templates
+    # Create patch for list_cached_templates
     list_templates_patch = patch(
-        "backend.templates.loader.list_templates", return_value=templates
+        "backend.templates.loader.list_cached_templates", return_value=templates
     )
 
-    # Create patch for load_template
+    # Create patch for load_cached_template
     def mock_load_template(template_name):
         for template in templates:
             if template["name"] == template_name:
@@ -347,7 +350,7 @@ def mock_template_loader():
         return None
 
     load_template_patch = patch(
-        "backend.templates.loader.load_template", side_effect=mock_load_template
+        "backend.templates.loader.load_cached_template", side_effect=mock_load_template
     )
 
     # Start patches
@@ -370,6 +373,7 @@ def mock_git_manager():
 
     # Setup mock methods
     mock_manager.commit_all.return_value = "test_commit_hash"
+    mock_manager.commit.return_value = "test_commit_hash"
     mock_manager.get_history.return_value = [
         ("abc123", "Test User", "Initial commit"),
         ("def456", "Test User", "Update configuration"),
@@ -2,11 +2,13 @@
 Tests for the alert notification service and WebSocket notifications.
 """
 
+import asyncio
 import json
 from datetime import datetime
 from unittest.mock import AsyncMock, MagicMock, patch
 
 import pytest
+import pytest_asyncio
 from fastapi import WebSocket, status
 from sqlalchemy.orm import Session
 
@@ -71,6 +73,7 @@ class TestConnectionManager:
 
         await manager.connect(mock_websocket, user_id)
         await manager.send_personal_message(message, user_id)
+        await manager.flush(timeout=1)
 
         mock_websocket.send_text.assert_called_once_with(json.dumps(message))
 
@@ -84,6 +87,7 @@ class TestConnectionManager:
         await manager.connect(mock_websocket1, 1)
         await manager.connect(mock_websocket2, 2)
         await manager.broadcast_message(message)
+        await manager.flush(timeout=1)
 
         expected_message = json.dumps(message)
         mock_websocket1.send_text.assert_called_once_with(expected_message)
@@ -292,15 +296,17 @@ class TestGlobalConnectionManager:
 class TestWebSocketNotifications:
     """Test WebSocket notification endpoints and message handling."""
 
-    @pytest.fixture
-    def mock_websocket(self):
-        """Create mock WebSocket."""
+    @pytest_asyncio.fixture
+    async def mock_websocket(self):
+        """Create mock WebSocket registered with the connection manager."""
         websocket = AsyncMock()
         websocket.accept = AsyncMock()
         websocket.send_text = AsyncMock()
         websocket.receive_text = AsyncMock()
         websocket.close = AsyncMock()
-        return websocket
+        await connection_manager.connect(websocket, 1)
+        yield websocket
+        await connection_manager.disconnect(websocket)
 
     @pytest.fixture
     def mock_db(self):
@@ -373,7 +379,7 @@ class TestWebSocketNotifications:
 
                     # Verify connection was established
                     mock_manager.connect.assert_called_once_with(mock_websocket, user_id)
-                    mock_websocket.send_text.assert_called()
+                    mock_manager.send_to_connection.assert_called()
                     mock_send_pending.assert_called_once()
                     mock_manager.disconnect.assert_called_once_with(mock_websocket)
 
@@ -400,7 +406,7 @@ class TestWebSocketNotifications:
 
                 # Verify connection was still established despite Redis failure
                 mock_manager.connect.assert_called_once_with(mock_websocket, user_id)
-                mock_websocket.send_text.assert_called()
+                mock_manager.send_to_connection.assert_called()
                 mock_manager.disconnect.assert_called_once_with(mock_websocket)
 
     @pytest.mark.asyncio
@@ -427,7 +433,7 @@ class TestWebSocketNotifications:
                 await websocket_notifications_endpoint(mock_websocket, user_id, mock_db)
 
                 # Verify error message was sent
-                error_calls = [call for call in mock_websocket.send_text.call_args_list
+                error_calls = [call for call in mock_manager.send_to_connection.call_args_list
                               if "Invalid JSON format" in str(call)]
                 assert len(error_calls) > 0
 
@@ -439,6 +445,7 @@ class TestWebSocketNotifications:
 
         await handle_websocket_message(mock_websocket, user_id, message, mock_db)
 
+        await connection_manager.flush(timeout=1)
         # Verify pong response was sent
         mock_websocket.send_text.assert_called_once()
         call_args = mock_websocket.send_text.call_args[0][0]
@@ -461,6 +468,7 @@ class TestWebSocketNotifications:
 
             # Verify service was called and response was sent
             mock_service.acknowledge_alert.assert_called_once_with(alert_id, user_id)
+            await connection_manager.flush(timeout=1)
             mock_websocket.send_text.assert_called_once()
             call_args = mock_websocket.send_text.call_args[0][0]
             response = json.loads(call_args)
@@ -476,6 +484,7 @@ class TestWebSocketNotifications:
 
         await handle_websocket_message(mock_websocket, user_id, message, mock_db)
 
+        await connection_manager.flush(timeout=1)
         # Should not send any response since alert_id is missing
         mock_websocket.send_text.assert_not_called()
 
@@ -510,6 +519,7 @@ class TestWebSocketNotifications:
 
         await handle_websocket_message(mock_websocket, user_id, message, mock_db)
 
+        await connection_manager.flush(timeout=1)
         # Verify error response was sent
         mock_websocket.send_text.assert_called_once()
         call_args = mock_websocket.send_text.call_args[0][0]
@@ -533,6 +543,7 @@ class TestWebSocketNotifications:
         mock_redis.lrange.assert_called_once_with(f"notifications:user:{user_id}", 0, 9)
 
         # Verify notifications were sent (in reverse order)
+        await connection_manager.flush(timeout=1)
         assert mock_websocket.send_text.call_count == 2
 
         # Check first notification (should be the second one due to reverse order)
@@ -550,6 +561,7 @@ class TestWebSocketNotifications:
         await send_pending_notifications(mock_websocket, user_id, mock_redis)
 
         mock_redis.lrange.assert_called_once()
+        await connection_manager.flush(timeout=1)
         mock_websocket.send_text.assert_not_called()
 
     @pytest.mark.asyncio
@@ -566,6 +578,7 @@ class TestWebSocketNotifications:
         await send_pending_notifications(mock_websocket, user_id, mock_redis)
 
         # Should only send valid notifications (2 out of 3)
+        await connection_manager.flush(timeout=1)
         assert mock_websocket.send_text.call_count == 2
 
     @pytest.mark.asyncio
@@ -577,6 +590,7 @@ class TestWebSocketNotifications:
         # Should not raise exception
         await send_pending_notifications(mock_websocket, user_id, mock_redis)
 
+        await connection_manager.flush(timeout=1)
         mock_websocket.send_text.assert_not_called()
 
     @pytest.mark.asyncio
@@ -603,6 +617,7 @@ class TestWebSocketNotifications:
             mock_redis_client.lrange.assert_called_once_with(f"notifications:user:{user_id}", 0, limit - 1)
             mock_redis_client.close.assert_called_once()
 
+            await connection_manager.flush(timeout=1)
             # Verify response was sent
             mock_websocket.send_text.assert_called_once()
             call_args = mock_websocket.send_text.call_args[0][0]
@@ -622,6 +637,7 @@ class TestWebSocketNotifications:
 
             await send_notification_history(mock_websocket, user_id, limit)
 
+            await connection_manager.flush(timeout=1)
             # Verify error response was sent
             mock_websocket.send_text.assert_called_once()
             call_args = mock_websocket.send_text.call_args[0][0]
@@ -649,6 +665,7 @@ class TestWebSocketNotifications:
 
             await send_notification_history(mock_websocket, user_id, limit)
 
+            await connection_manager.flush(timeout=1)
             # Verify response contains only valid notifications
             mock_websocket.send_text.assert_called_once()
             call_args = mock_websocket.send_text.call_args[0][0]
@@ -768,7 +785,7 @@ class TestWebSocketNotifications:
                     await websocket_notifications_endpoint(mock_websocket, user_id, mock_db)
 
                     # Verify error response was sent
-                    error_calls = [call for call in mock_websocket.send_text.call_args_list
+                    error_calls = [call for call in mock_manager.send_to_connection.call_args_list
                                   if "Internal server error" in str(call)]
                     assert len(error_calls) > 0
 
@@ -799,6 +816,7 @@ class TestWebSocketNotifications:
         # Mock the disconnect method to avoid issues
         with patch.object(manager, 'disconnect') as mock_disconnect:
             await manager.broadcast_message(message)
+            await manager.flush(timeout=1)
 
             # Verify successful WebSocket received message
             mock_websocket1.send_text.assert_called_once()
@@ -822,6 +840,156 @@ class TestWebSocketNotifications:
 
         with patch.object(manager, 'disconnect') as mock_disconnect:
             await manager.send_personal_message(message, 1)
+            await manager.flush(timeout=1)
 
             # Verify disconnect was called due to error
             mock_disconnect.assert_called_once_with(mock_websocket)
+
+
+class FakeBroker:
+    """In-memory stand-in for a Redis server's pub/sub."""
+
+    def __init__(self):
+        self.subscriptions = {}
+
+    def publish(self, channel, data):
+        for pubsub in list(self.subscriptions.get(channel, ())):
+            pubsub.queue.put_nowait({"type": "message", "channel": channel, "data": data})
+
+
+class FakePubSub:
+    """Minimal async pub/sub connection bound to a FakeBroker."""
+
+    def __init__(self, broker):
+        self.broker = broker
+        self.queue = asyncio.Queue()
+        self.channels = set()
+
+    async def subscribe(self, channel):
+        self.channels.add(channel)
+        self.broker.subscriptions.setdefault(channel, set()).add(self)
+
+    async def unsubscribe(self, channel):
+        self.channels.discard(channel)
+        self.broker.subscriptions.get(channel, set()).discard(self)
+
+    async def get_message(self, timeout=None):
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    async def aclose(self):
+        for channel in list(self.channels):
+            await self.unsubscribe(channel)
+
+
+class FakeRedis:
+    """Minimal async Redis client bound to a FakeBroker."""
+
+    def __init__(self, broker):
+        self.broker = broker
+
+    async def ping(self):
+        return True
+
+    async def publish(self, channel, data):
+        self.broker.publish(channel, data)
+
+    def pubsub(self, ignore_subscribe_messages=True):
+        return FakePubSub(self.broker)
+
+    async def aclose(self):
+        pass
+
+
+class TestConnectionManagerPubSub:
+    """Test cross-worker fan-out through Redis pub/sub."""
+
+    @pytest_asyncio.fixture
+    async def workers(self):
+        """Create two connection managers (workers) sharing one broker."""
+        broker = FakeBroker()
+        worker_a, worker_b = ConnectionManager(), ConnectionManager()
+        with patch(
+            "app.services.alert_notification_service.redis.from_url",
+            side_effect=lambda *args, **kwargs: FakeRedis(broker),
+        ):
+            assert await worker_a.start("redis://fake")
+            assert await worker_b.start("redis://fake")
+        yield worker_a, worker_b, broker
+        await worker_a.stop()
+        await worker_b.stop()
+
+    async def _drain(self, *workers):
+        for _ in range(5):
+            await asyncio.sleep(0)
+        for worker in workers:
+            await worker.flush(timeout=1)
+
+    @pytest.mark.asyncio
+    async def test_personal_message_reaches_other_worker(self, workers):
+        """Test that a message published on one worker is delivered by the socket's worker."""
+        worker_a, worker_b, _ = workers
+        websocket = AsyncMock()
+        await worker_b.connect(websocket, 7)
+
+        await worker_a.send_personal_message({"type": "alert"}, 7)
+        await self._drain(worker_b)
+
+        websocket.send_text.assert_called_once_with(json.dumps({"type": "alert"}))
+        assert worker_a.stats["published"] == 1
+        assert worker_b.stats["delivered"] == 1
+
+    @pytest.mark.asyncio
+    async def test_workers_subscribe_only_to_local_users(self, workers):
+        """Test that user channels follow the sockets each worker holds."""
+        worker_a, worker_b, broker = workers
+        websocket = AsyncMock()
+
+        await worker_b.connect(websocket, 7)
+        assert broker.subscriptions["notifications:user:7"] == {worker_b._pubsub}
+
+        await worker_b.disconnect(websocket)
+        assert broker.subscriptions["notifications:user:7"] == set()
+
+    @pytest.mark.asyncio
+    async def test_broadcast_reaches_all_workers(self, workers):
+        """Test that a broadcast is published once and delivered everywhere."""
+        worker_a, worker_b, _ = workers
+        socket_a, socket_b = AsyncMock(), AsyncMock()
+        await worker_a.connect(socket_a, 1)
+        await worker_b.connect(socket_b, 2)
+
+        await worker_a.broadcast_message({"type": "system"})
+        await self._drain(worker_a, worker_b)
+
+        socket_a.send_text.assert_called_once()
+        socket_b.send_text.assert_called_once()
+        assert worker_a.stats["published"] == 1
+
+    @pytest.mark.asyncio
+    async def test_falls_back_to_local_delivery_without_redis(self):
+        """Test that the manager stays process-local when Redis is unavailable."""
+        manager = ConnectionManager()
+        with patch(
+            "app.services.alert_notification_service.redis.from_url",
+            side_effect=ConnectionError("refused"),
+        ):
+            assert await manager.start("redis://unavailable") is False
+
+        websocket = AsyncMock()
+        await manager.connect(websocket, 3)
+        await manager.send_personal_message({"type": "local"}, 3)
+        await manager.flush(timeout=1)
+
+        assert not manager.pubsub_enabled
+        websocket.send_text.assert_called_once()
+
+    def test_notification_service_shares_global_hub(self):
+        """Test that notification services reuse the process-wide connection manager."""
+        first = AlertNotificationService(MagicMock())
+        second = AlertNotificationService(MagicMock())
+
+        assert first.connection_manager is connection_manager
+        assert second.connection_manager is connection_manager
@@ -0,0 +1,314 @@
+"""
+Tests for the compiled alert rule engine.
+"""
+
+import time
+import uuid
+from types import SimpleNamespace
+from unittest.mock import MagicMock
+
+import pytest
+from sqlalchemy.orm import Session
+
+from app.db.models import MetricsAlert, User, UserRole
+from app.services.alert_rule_engine import AlertRuleEngine
+from tests.conftest import TestingSessionLocal
+
+
+def make_alert(
+    alert_id,
+    container_id="web",
+    metric_type="cpu_percent",
+    threshold=80.0,
+    operator=">",
+    **options,
+):
+    """Create an alert row stand-in with the attributes the engine reads."""
+    return SimpleNamespace(
+        id=alert_id,
+        name=f"Alert {alert_id}",
+        description=None,
+        container_id=container_id,
+        container_name=container_id,
+        metric_type=metric_type,
+        threshold_value=threshold,
+        comparison_operator=operator,
+        created_by=1,
+        rule_type=options.get("rule_type", "threshold"),
+        hysteresis=options.get("hysteresis", 0.0),
+        for_samples=options.get("for_samples", 1),
+        is_triggered=options.get("is_triggered", False),
+        trigger_count=options.get("trigger_count", 0),
+        last_triggered_at=None,
+    )
+
+
+def session_with(alerts):
+    """Create a mock session whose active-alert query returns ``alerts``."""
+    db = MagicMock(spec=Session)
+    db.query.return_value.filter.return_value.all.return_value = alerts
+    return db
+
+
+def fired_ids(result):
+    return [alert["alert_id"] for alert in result]
+
+
+class TestAlertRuleEngine:
+    """Test rule compilation and evaluation."""
+
+    def test_all_operators(self):
+        """Test that every comparison operator matches like the scalar evaluation."""
+        operators = [">", "<", ">=", "<=", "==", "!="]
+        alerts = [
+            make_alert(i, threshold=80.0, operator=op) for i, op in enumerate(operators)
+        ]
+        engine = AlertRuleEngine()
+
+        result = engine.evaluate({"web": {"cpu_percent": 80.0}}, session_with(alerts))
+
+        assert sorted(fired_ids(result)) == [2, 3, 4]
+
+    def test_fires_once_and_resolves(self):
+        """Test that an alert fires on the first match and resolves when the condition clears."""
+        engine = AlertRuleEngine()
+        db = session_with([make_alert(1)])
+
+        assert fired_ids(engine.evaluate({"web": {"cpu_percent": 90.0}}, db)) == [1]
+        assert engine.evaluate({"web": {"cpu_percent": 95.0}}, db) == []
+        engine.evaluate({"web": {"cpu_percent": 50.0}}, db)
+
+        state = engine.get_rule_state(1)
+        assert state["is_triggered"] is False
+        assert state["trigger_count"] == 1
+        assert engine.stats["resolved"] == 1
+
+    def test_hysteresis(self):
+        """Test that a triggered alert only resolves past the hysteresis band."""
+        engine = AlertRuleEngine()
+        db = session_with([make_alert(1, hysteresis=5.0)])
+
+        engine.evaluate({"web": {"cpu_percent": 85.0}}, db)
+        engine.evaluate({"web": {"cpu_percent": 78.0}}, db)
+        assert engine.get_rule_state(1)["is_triggered"] is True
+
+        engine.evaluate({"web": {"cpu_percent": 74.0}}, db)
+        assert engine.get_rule_state(1)["is_triggered"] is False
+
+    def test_for_samples(self):
+        """Test that an alert waits for N consecutive matching samples."""
+        engine = AlertRuleEngine()
+        db = session_with([make_alert(1, for_samples=3)])
+
+        assert engine.evaluate({"web": {"cpu_percent": 90.0}}, db) == []
+        assert engine.evaluate({"web": {"cpu_percent": 90.0}}, db) == []
+        # A non-matching sample restarts the count
+        assert engine.evaluate({"web": {"cpu_percent": 10.0}}, db) == []
+        assert engine.evaluate({"web": {"cpu_percent": 90.0}}, db) == []
+        assert engine.evaluate({"web": {"cpu_percent": 90.0}}, db) == []
+        assert fired_ids(engine.evaluate({"web": {"cpu_percent": 90.0}}, db)) == [1]
+
+    def test_rate_rule(self):
+        """Test that rate rules compare the per-second change between samples."""
+        engine = AlertRuleEngine()
+        db = session_with(
+            [
+                make_alert(
+                    1, metric_type="network_rx", threshold=1000.0, rule_type="rate"
+                )
+            ]
+        )
+
+        assert (
+            engine.evaluate({"web": {"network_rx_bytes": 0}}, db, timestamp=100.0) == []
+        )
+        assert (
+            engine.evaluate({"web": {"network_rx_bytes": 5000}}, db, timestamp=110.0)
+            == []
+        )
+        result = engine.evaluate(
+            {"web": {"network_rx_bytes": 20000}}, db, timestamp=120.0
+        )
+
+        assert fired_ids(result) == [1]
+        assert result[0]["metric_value"] == 1500.0
+
+    def test_rate_rule_skips_missing_metric(self):
+        """Test that a sample without the metric keeps the previous value for the next rate."""
+        engine = AlertRuleEngine()
+        db = session_with(
+            [
+                make_alert(
+                    1, metric_type="network_rx", threshold=1000.0, rule_type="rate"
+                )
+            ]
+        )
+
+        engine.evaluate({"web": {"network_rx_bytes": 0}}, db, timestamp=100.0)
+        engine.evaluate({"web": {"cpu_percent": 5.0}}, db, timestamp=110.0)
+        result = engine.evaluate(
+            {"web": {"network_rx_bytes": 30000}}, db, timestamp=120.0
+        )
+
+        assert fired_ids(result) == [1]
+        assert result[0]["metric_value"] == 1500.0
+
+    def test_metric_type_aliases(self):
+        """Test that alert metric types map onto the container stats field names."""
+        engine = AlertRuleEngine()
+        db = session_with([make_alert(1, metric_type="block_write", threshold=100.0)])
+
+        result = engine.evaluate({"web": {"block_write_bytes": 500}}, db)
+
+        assert fired_ids(result) == [1]
+
+    def test_missing_samples_keep_state(self):
+        """Test that rules of unsampled containers or missing metrics are left alone."""
+        engine = AlertRuleEngine()
+        db = session_with([make_alert(1), make_alert(2, container_id="db")])
+
+        engine.evaluate({"web": {"cpu_percent": 90.0}, "db": {"cpu_percent": 90.0}}, db)
+        engine.evaluate({"web": {"memory_percent": 10.0}}, db)
+
+        assert engine.get_rule_state(1)["is_triggered"] is True
+        assert engine.get_rule_state(2)["is_triggered"] is True
+
+    def test_reload_preserves_state(self):
+        """Test that rebuilding the index keeps in-memory trigger state and picks up new rules."""
+        engine = AlertRuleEngine()
+        alerts = [make_alert(1)]
+        db = session_with(alerts)
+        engine.evaluate({"web": {"cpu_percent": 90.0}}, db)
+
+        alerts.append(make_alert(2, threshold=50.0))
+        engine.invalidate()
+        result = engine.evaluate({"web": {"cpu_percent": 90.0}}, db)
+
+        assert fired_ids(result) == [2]
+        assert engine.get_rule_state(1)["trigger_count"] == 1
+        assert engine.get_stats()["rules"] == 2
+
+    def test_unknown_operator_skipped(self):
+        """Test that rules with unknown operators are not compiled."""
+        engine = AlertRuleEngine()
+
+        assert (
+            engine.evaluate(
+                {"web": {"cpu_percent": 90.0}},
+                session_with([make_alert(1, operator="~")]),
+            )
+            == []
+        )
+        assert engine.get_stats()["rules"] == 0
+
+    def test_evaluates_500_containers_within_sampler_interval(self):
+        """Test that a 1 s sampler tick for 500 containers is evaluated well within budget."""
+        alerts = []
+        for c in range(500):
+            alerts.append(
+                make_alert(4 * c, f"c{c}", "cpu_percent", 80.0, ">", for_samples=2)
+            )
+            alerts.append(
+                make_alert(
+                    4 * c + 1, f"c{c}", "memory_percent", 90.0, ">=", hysteresis=5.0
+                )
+            )
+            alerts.append(make_alert(4 * c + 2, f"c{c}", "memory_usage", 100.0, "<"))
+            alerts.append(
+                make_alert(4 * c + 3, f"c{c}", "network_rx", 1e6, ">", rule_type="rate")
+            )
+        engine = AlertRuleEngine(max_pending=10**6)
+        db = session_with(alerts)
+        engine.evaluate({}, db)
+
+        ticks = 20
+        started = time.perf_counter()
+        for tick in range(ticks):
+            samples = {
+                f"c{c}": {
+                    "cpu_percent": float((c + tick) % 100),
+                    "memory_percent": float((c * 7 + tick) % 100),
+                    "memory_usage": 1000 + c,
+                    "network_rx_bytes": tick * c * 1000,
+                }
+                for c in range(500)
+            }
+            engine.evaluate(samples, db, timestamp=1000.0 + tick)
+        per_tick = (time.perf_counter() - started) / ticks
+
+        assert engine.stats["samples"] == 500 * ticks
+        assert engine.stats["fired"] > 0
+        assert per_tick < 0.1
+
+
+@pytest.fixture
+def db_session():
+    """Create a database session for testing."""
+    session = TestingSessionLocal()
+    try:
+        yield session
+    finally:
+        session.close()
+
+
+@pytest.fixture
+def stored_alert(db_session: Session):
+    """Create an active alert in the test database."""
+    unique_id = str(uuid.uuid4())[:8]
+    user = User(
+        username=f"alerts_{unique_id}",
+        email=f"alerts_{unique_id}@example.com",
+        hashed_password="hashed_password",
+        role=UserRole.USER,
+        is_active=True,
+    )
+    db_session.add(user)
+    db_session.commit()
+
+    alert = MetricsAlert(
+        name="High CPU",
+        container_id=f"engine_{unique_id}",
+        container_name="engine",
+        metric_type="cpu_percent",
+        threshold_value=80.0,
+        comparison_operator=">",
+        created_by=user.id,
+    )
+    db_session.add(alert)
+    db_session.commit()
+    db_session.refresh(alert)
+    return alert
+
+
+class TestAlertStatePersistence:
+    """Test batched persistence of alert state."""
+
+    def test_flush_writes_state_in_batch(self, stored_alert, db_session):
+        """Test that trigger state is written on flush, not on every evaluation."""
+        engine = AlertRuleEngine(session_factory=TestingSessionLocal, flush_interval=60)
+        samples = {stored_alert.container_id: {"cpu_percent": 95.0}}
+
+        assert fired_ids(engine.evaluate(samples)) == [stored_alert.id]
+        assert engine.maybe_flush() == 0
+        db_session.refresh(stored_alert)
+        assert stored_alert.is_triggered is False
+
+        assert engine.flush() == 1
+        db_session.refresh(stored_alert)
+        assert stored_alert.is_triggered is True
+        assert stored_alert.trigger_count == 1
+        assert stored_alert.last_triggered_at is not None
+        assert engine.pending() == 0
+
+    def test_failed_flush_is_retried(self, stored_alert):
+        """Test that state from a failed flush stays pending."""
+        engine = AlertRuleEngine(session_factory=TestingSessionLocal)
+        engine.evaluate({stored_alert.container_id: {"cpu_percent": 95.0}})
+
+        broken = MagicMock(spec=Session)
+        broken.execute.side_effect = Exception("Database error")
+
+        assert engine.flush(broken) == 0
+        broken.rollback.assert_called_once()
+        assert engine.pending() == 1
+        assert engine.stats["errors"] == 1
@@ -69,6 +69,27 @@ class TestAlertsEndpoints:
         response = authenticated_client.post("/api/alerts", json=incomplete_data)
         assert response.status_code == status.HTTP_400_BAD_REQUEST
 
+    @pytest.mark.parametrize(
+        "field, value",
+        [
+            ("threshold_value", "high"),
+            ("rule_type", "spike"),
+            ("hysteresis", -1),
+            ("for_samples", 0),
+            ("for_samples", "three"),
+        ],
+    )
+    def test_create_alert_invalid_rule(
+        self, authenticated_client, sample_alert_data, field, value
+    ):
+        """Test that invalid rule settings are rejected as bad requests."""
+        response = authenticated_client.post(
+            "/api/alerts", json={**sample_alert_data, field: value}
+        )
+
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert field in response.json()["detail"]
+
     def test_create_alert_unauthorized(self, unauthenticated_client, sample_alert_data):
         """Test alert creation without authentication."""
         response = unauthenticated_client.post("/api/alerts", json=sample_alert_data)
@@ -165,6 +165,19 @@ def test_history(authenticated_client):
             assert "commit" in h and "author" in h and "message" in h
 
 
+def test_history_diff(authenticated_client, mock_git_manager):
+    mock_git_manager.get_diff.return_value = "diff --git a/stack.yaml b/stack.yaml"
+    with patch("backend.app.main.git_manager", mock_git_manager):
+        resp = authenticated_client.get("/history/abc123/diff")
+    assert resp.status_code == 200
+    assert resp.json() == {
+        "commit": "abc123",
+        "base": "abc123^",
+        "diff": "diff --git a/stack.yaml b/stack.yaml",
+    }
+    mock_git_manager.get_diff.assert_called_once_with("abc123^", "abc123")
+
+
 class TestContainerEndpointsMocked:
     """Test suite for container-related API endpoints using mocks."""
 
@@ -279,7 +292,7 @@ class TestTemplateEndpointsMocked:
             assert response.json()["template"] == "lemp"
             assert response.json()["status"] == "deployed"
 
-            mock_git_manager.commit_all.assert_called_once()
+            mock_git_manager.commit.assert_awaited_once()
 
 
 class TestNLPEndpointsMocked:
@@ -2,10 +2,11 @@
 Comprehensive tests for authentication dependencies.
 """
 
-from unittest.mock import MagicMock, patch
+from unittest.mock import AsyncMock, MagicMock, patch
 
 import pytest
 from fastapi import HTTPException, WebSocket, WebSocketException, status
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
 from app.auth.dependencies import (
@@ -227,14 +228,12 @@ class TestGetCurrentUserWebSocket:
         mock_websocket.query_params.get.return_value = "valid_token"
         mock_websocket.headers.get.return_value = None
 
-        mock_db = MagicMock(spec=Session)
+        mock_db = AsyncMock(spec=AsyncSession)
         mock_user = MagicMock(spec=User)
         mock_user.id = 1
         mock_user.is_active = True
 
-        mock_query = MagicMock()
-        mock_query.filter.return_value.first.return_value = mock_user
-        mock_db.query.return_value = mock_query
+        mock_db.get.return_value = mock_user
 
         with patch("app.auth.dependencies.decode_token") as mock_decode:
             mock_decode.return_value = {"sub": 1, "type": "access"}
@@ -253,14 +252,12 @@ class TestGetCurrentUserWebSocket:
         mock_websocket.query_params.get.return_value = None
         mock_websocket.headers.get.return_value = "Bearer valid_token"
 
-        mock_db = MagicMock(spec=Session)
+        mock_db = AsyncMock(spec=AsyncSession)
         mock_user = MagicMock(spec=User)
         mock_user.id = 1
         mock_user.is_active = True
 
-        mock_query = MagicMock()
-        mock_query.filter.return_value.first.return_value = mock_user
-        mock_db.query.return_value = mock_query
+        mock_db.get.return_value = mock_user
 
         with patch("app.auth.dependencies.decode_token") as mock_decode:
             mock_decode.return_value = {"sub": 1, "type": "access"}
@@ -276,14 +273,12 @@ class TestGetCurrentUserWebSocket:
     async def test_websocket_auth_success_direct_token(self):
         """Test successful WebSocket authentication with direct token parameter."""
         mock_websocket = MagicMock(spec=WebSocket)
-        mock_db = MagicMock(spec=Session)
+        mock_db = AsyncMock(spec=AsyncSession)
         mock_user = MagicMock(spec=User)
         mock_user.id = 1
         mock_user.is_active = True
 
-        mock_query = MagicMock()
-        mock_query.filter.return_value.first.return_value = mock_user
-        mock_db.query.return_value = mock_query
+        mock_db.get.return_value = mock_user
 
         with patch("app.auth.dependencies.decode_token") as mock_decode:
             mock_decode.return_value = {"sub": 1, "type": "access"}
@@ -302,7 +297,7 @@ class TestGetCurrentUserWebSocket:
         mock_websocket.query_params.get.return_value = None
         mock_websocket.headers.get.return_value = None
 
-        mock_db = MagicMock(spec=Session)
+        mock_db = AsyncMock(spec=AsyncSession)
 
         with pytest.raises(WebSocketException) as exc_info:
             await get_current_user_websocket(
@@ -319,7 +314,7 @@ class TestGetCurrentUserWebSocket:
         mock_websocket.query_params.get.return_value = "invalid_token"
         mock_websocket.headers.get.return_value = None
 
-        mock_db = MagicMock(spec=Session)
+        mock_db = AsyncMock(spec=AsyncSession)
 
         with patch("app.auth.dependencies.decode_token") as mock_decode:
             mock_decode.return_value = {"sub": 1, "type": "refresh"}  # Wrong type
@@ -339,7 +334,7 @@ class TestGetCurrentUserWebSocket:
         mock_websocket.query_params.get.return_value = "token_without_user_id"
         mock_websocket.headers.get.return_value = None
 
-        mock_db = MagicMock(spec=Session)
+        mock_db = AsyncMock(spec=AsyncSession)
 
         with patch("app.auth.dependencies.decode_token") as mock_decode:
             mock_decode.return_value = {"type": "access"}  # No 'sub' field
@@ -359,12 +354,8 @@ class TestGetCurrentUserWebSocket:
         mock_websocket.query_params.get.return_value = "valid_token"
         mock_websocket.headers.get.return_value = None
 
-        mock_db = MagicMock(spec=Session)
-
-        # Mock database query returning None
-        mock_query = MagicMock()
-        mock_query.filter.return_value.first.return_value = None
-        mock_db.query.return_value = mock_query
+        mock_db = AsyncMock(spec=AsyncSession)
+        mock_db.get.return_value = None
 
         with patch("app.auth.dependencies.decode_token") as mock_decode:
             mock_decode.return_value = {"sub": 999, "type": "access"}
@@ -384,14 +375,12 @@ class TestGetCurrentUserWebSocket:
         mock_websocket.query_params.get.return_value = "valid_token"
         mock_websocket.headers.get.return_value = None
 
-        mock_db = MagicMock(spec=Session)
+        mock_db = AsyncMock(spec=AsyncSession)
         mock_user = MagicMock(spec=User)
         mock_user.id = 1
         mock_user.is_active = False
 
-        mock_query = MagicMock()
-        mock_query.filter.return_value.first.return_value = mock_user
-        mock_db.query.return_value = mock_query
+        mock_db.get.return_value = mock_user
 
         with patch("app.auth.dependencies.decode_token") as mock_decode:
             mock_decode.return_value = {"sub": 1, "type": "access"}
@@ -411,7 +400,7 @@ class TestGetCurrentUserWebSocket:
         mock_websocket.query_params.get.return_value = "malformed_token"
         mock_websocket.headers.get.return_value = None
 
-        mock_db = MagicMock(spec=Session)
+        mock_db = AsyncMock(spec=AsyncSession)
 
         with patch("app.auth.dependencies.decode_token") as mock_decode:
             mock_decode.side_effect = Exception("Token decode error")
@@ -431,7 +420,7 @@ class TestGetCurrentUserWebSocket:
         mock_websocket.query_params.get.return_value = None
         mock_websocket.headers.get.return_value = "InvalidHeader"  # Not "Bearer ..."
 
-        mock_db = MagicMock(spec=Session)
+        mock_db = AsyncMock(spec=AsyncSession)
 
         with pytest.raises(WebSocketException) as exc_info:
             await get_current_user_websocket(
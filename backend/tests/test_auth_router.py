@@ -9,7 +9,13 @@ import pytest
 from fastapi.testclient import TestClient
 from sqlalchemy.orm import Session
 
-from app.auth.jwt import create_access_token, create_refresh_token, get_password_hash
+from app.auth.jwt import (
+    create_access_token,
+    create_refresh_token,
+    decode_token,
+    get_password_hash,
+    hash_token_id,
+)
 from app.db.database import get_db
 from app.db.models import EmailVerificationToken, PasswordResetToken
 from app.db.models import Token as TokenModel
@@ -193,11 +199,11 @@ class TestAuthRouter:
         assert login_response.status_code == 200
         tokens = login_response.json()
 
-        # Verify the refresh token exists in database
+        # Verify the refresh token's hashed jti exists in database
         db_token = (
             self.db.query(TokenModel)
             .filter(
-                TokenModel.token == tokens["refresh_token"],
+                TokenModel.jti_hash == hash_token_id(decode_token(tokens["refresh_token"])["jti"]),
                 TokenModel.user_id == self.test_user.id,
             )
             .first()
@@ -264,7 +270,8 @@ class TestAuthRouter:
         )
 
         db_token = TokenModel(
-            token=refresh_token,
+            jti_hash=hash_token_id(decode_token(refresh_token)["jti"]),
+            family_id=decode_token(refresh_token)["fid"],
             user_id=self.test_user.id,
             expires_at=datetime.utcnow() + timedelta(days=7),
             is_revoked=True,  # Already revoked
@@ -628,7 +635,8 @@ class TestAuthRouter:
 
         # Store token in database
         db_token = TokenModel(
-            token=refresh_token,
+            jti_hash=hash_token_id(decode_token(refresh_token)["jti"]),
+            family_id=decode_token(refresh_token)["fid"],
             user_id=self.test_user.id,
             expires_at=datetime.utcnow() + timedelta(days=7),
         )
@@ -0,0 +1,612 @@
+"""
+Tests for the compose deployment engine and service.
+"""
+
+import asyncio
+import os
+import threading
+import time
+import uuid
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+from docker.errors import ImageNotFound, NotFound
+
+from app.db.models import (
+    MarketplaceTemplate,
+    TemplateCategory,
+    TemplateDeploymentHistory,
+    TemplateStatus,
+    User,
+    UserRole,
+)
+from app.services.compose_deployment_service import (
+    ComposeDeploymentService,
+    project_name,
+)
+from docker_manager.compose import (
+    ComposeConfigError,
+    ComposeDeployer,
+    deployment_levels,
+    host_access_options,
+    split_image_reference,
+)
+from tests.conftest import TestingSessionLocal
+
+LEMP = {
+    "services": {
+        "nginx": {
+            "image": "nginx:latest",
+            "ports": ["8080:80"],
+            "depends_on": ["php"],
+            "volumes": ["./www:/var/www/html"],
+            "restart": "unless-stopped",
+        },
+        "php": {"image": "php:8.1-fpm", "volumes": ["./www:/var/www/html"]},
+        "mysql": {
+            "image": "mysql:8.0",
+            "environment": {"MYSQL_DATABASE": "app"},
+            "volumes": ["mysql_data:/var/lib/mysql"],
+        },
+        "phpmyadmin": {"image": "phpmyadmin/phpmyadmin", "depends_on": ["mysql"]},
+    },
+    "volumes": {"mysql_data": {"driver": "local"}},
+    "files": [{"path": "www/index.php", "content": "<?php echo 'ok';"}],
+}
+
+
+class Tracker:
+    """Counts how many calls of a kind run at the same time."""
+
+    def __init__(self, delay):
+        self.delay = delay
+        self.active = 0
+        self.max_active = 0
+        self.lock = threading.Lock()
+
+    def run(self):
+        with self.lock:
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+        time.sleep(self.delay)
+        with self.lock:
+            self.active -= 1
+
+
+class FakeDockerClient:
+    """Docker SDK client stand-in that records calls."""
+
+    def __init__(self, present=(), delay=0.05, fail_start=(), existing=None):
+        self.present = set(present)
+        self.existing = dict(existing or {})
+        self.fail_start = set(fail_start)
+        self.pulls = Tracker(delay)
+        self.starts = Tracker(delay)
+        self.events = []
+        self.created = {}
+        self.images = SimpleNamespace(
+            get=self._get_image, pull=self._pull, build=MagicMock()
+        )
+        self.containers = SimpleNamespace(get=self._get_container, create=self._create)
+        self.networks = SimpleNamespace(
+            list=lambda names: [], create=MagicMock(), get=MagicMock()
+        )
+        self.volumes = SimpleNamespace(
+            get=MagicMock(side_effect=NotFound("missing")), create=MagicMock()
+        )
+        self.api = SimpleNamespace(
+            create_endpoint_config=lambda aliases: {"Aliases": aliases}
+        )
+
+    def _get_image(self, image):
+        if image not in self.present:
+            raise ImageNotFound(image)
+
+    def _pull(self, repository, tag=None):
+        self.pulls.run()
+        self.events.append(("pull", f"{repository}:{tag}"))
+
+    def _get_container(self, name):
+        if name not in self.existing:
+            raise NotFound(name)
+        return self.existing[name]
+
+    def _create(self, image, **kwargs):
+        service = kwargs["labels"]["com.docker.compose.service"]
+        self.created[service] = {"image": image, **kwargs}
+        self.events.append(("create", service))
+
+        def start():
+            if service in self.fail_start:
+                raise RuntimeError(f"{service} failed to start")
+            self.starts.run()
+            self.events.append(("start", service))
+
+        return SimpleNamespace(id=f"id-{service}", name=kwargs["name"], start=start)
+
+
+class TestDeploymentGraph:
+    """Test dependency graph construction."""
+
+    def test_levels(self):
+        """Test that services are grouped by dependency depth."""
+        assert deployment_levels(LEMP["services"]) == [
+            ["mysql", "php"],
+            ["nginx", "phpmyadmin"],
+        ]
+
+    def test_volumes_from_and_network_mode(self):
+        """Test that shared volumes and network namespaces are dependencies."""
+        services = {
+            "app": {"image": "a", "network_mode": "service:vpn"},
+            "backup": {"image": "b", "volumes_from": ["app:ro"]},
+            "vpn": {"image": "c"},
+        }
+
+        assert deployment_levels(services) == [["vpn"], ["app"], ["backup"]]
+
+    def test_cycle(self):
+        """Test that circular dependencies are rejected."""
+        services = {"a": {"depends_on": ["b"]}, "b": {"depends_on": {"a": {}}}, "c": {}}
+
+        with pytest.raises(ComposeConfigError, match="a, b"):
+            deployment_levels(services)
+
+    def test_unknown_dependency(self):
+        """Test that dependencies on undefined services are rejected."""
+        with pytest.raises(ComposeConfigError, match="db"):
+            deployment_levels({"web": {"depends_on": ["db"]}})
+
+    @pytest.mark.parametrize(
+        "image,expected",
+        [
+            ("nginx", ("nginx", "latest")),
+            ("mysql:8.0", ("mysql", "8.0")),
+            ("localhost:5000/app", ("localhost:5000/app", "latest")),
+            ("localhost:5000/app:v2", ("localhost:5000/app", "v2")),
+            ("redis@sha256:abc", ("redis", "sha256:abc")),
+        ],
+    )
+    def test_split_image_reference(self, image, expected):
+        """Test image reference parsing."""
+        assert split_image_reference(image) == expected
+
+
+class TestComposeDeployer:
+    """Test deploying a configuration against a fake Docker client."""
+
+    @pytest.mark.asyncio
+    async def test_deploy_stack(self, tmp_path):
+        """Test that images are pulled in parallel and levels start concurrently in order."""
+        client = FakeDockerClient(present={"php:8.1-fpm"})
+        events = []
+
+        async def on_event(event):
+            events.append(event)
+
+        deployer = ComposeDeployer(
+            client,
+            "lemp",
+            project_dir=str(tmp_path),
+            max_parallel_pulls=2,
+            on_event=on_event,
+        )
+        result = await deployer.deploy(LEMP)
+
+        assert result["status"] == "deployed", result["error"]
+        assert result["images"]["php:8.1-fpm"]["source"] == "cached"
+        assert client.pulls.max_active == 2
+        assert client.starts.max_active == 2
+        order = [service for kind, service in client.events if kind == "start"]
+        assert set(order[:2]) == {"mysql", "php"}
+        assert set(order[2:]) == {"nginx", "phpmyadmin"}
+        assert result["services"]["nginx"]["level"] == 1
+        assert set(result["stage_timings"]) == {
+            "plan",
+            "files",
+            "images",
+            "resources",
+            "services",
+            "total",
+        }
+        assert result["volumes"] == ["lemp_mysql_data"]
+        assert result["networks"] == ["lemp_default"]
+        assert (tmp_path / "www" / "index.php").read_text() == "<?php echo 'ok';"
+
+        nginx = client.created["nginx"]
+        assert nginx["name"] == "lemp-nginx-1"
+        assert nginx["ports"] == {"80/tcp": 8080}
+        assert nginx["volumes"] == [f"{tmp_path}/www:/var/www/html:rw"]
+        assert nginx["restart_policy"] == {"Name": "unless-stopped"}
+        assert nginx["networking_config"] == {"lemp_default": {"Aliases": ["nginx"]}}
+        assert client.created["mysql"]["volumes"] == [
+            "lemp_mysql_data:/var/lib/mysql:rw"
+        ]
+        assert {(e["stage"], e["status"]) for e in events} >= {
+            ("services", "completed"),
+            ("images", "progress"),
+        }
+
+    @pytest.mark.asyncio
+    async def test_parallel_bring_up_is_faster(self, tmp_path):
+        """Test that independent services start together rather than one by one."""
+        services = {f"svc{i}": {"image": f"image{i}"} for i in range(6)}
+        client = FakeDockerClient(present={f"image{i}" for i in range(6)}, delay=0.1)
+
+        result = await ComposeDeployer(
+            client, "wide", project_dir=str(tmp_path)
+        ).deploy({"services": services})
+
+        assert result["status"] == "deployed"
+        # Bounded only by the default thread pool
+        assert client.starts.max_active > 1
+        assert result["stage_timings"]["services"] < 0.1 * 6 / 2
+
+    @pytest.mark.asyncio
+    async def test_failure_stops_later_levels(self, tmp_path):
+        """Test that a failed service aborts the deployment before its dependents."""
+        images = {service["image"] for service in LEMP["services"].values()}
+        client = FakeDockerClient(present=images, fail_start={"mysql"})
+        events = []
+
+        async def on_event(event):
+            events.append(event)
+
+        result = await ComposeDeployer(
+            client, "lemp", project_dir=str(tmp_path), on_event=on_event
+        ).deploy(LEMP)
+
+        assert result["status"] == "failed"
+        assert result["failed_stage"] == "services"
+        assert "mysql failed to start" in result["error"]
+        assert "phpmyadmin" not in client.created
+        assert events[-1]["status"] == "failed"
+
+    @pytest.mark.asyncio
+    async def test_recreates_own_containers_only(self, tmp_path):
+        """Test that existing containers are replaced only when they belong to the project."""
+        own = SimpleNamespace(
+            labels={"com.docker.compose.project": "app"}, remove=MagicMock()
+        )
+        foreign = SimpleNamespace(labels={}, remove=MagicMock())
+        client = FakeDockerClient(
+            present={"nginx", "postgres"},
+            existing={"app-web-1": own, "postgres": foreign},
+        )
+        deployer = ComposeDeployer(client, "app", project_dir=str(tmp_path))
+
+        result = await deployer.deploy({"services": {"web": {"image": "nginx"}}})
+        assert result["status"] == "deployed"
+        own.remove.assert_called_once_with(force=True)
+
+        result = await deployer.deploy(
+            {"services": {"db": {"image": "postgres", "container_name": "postgres"}}}
+        )
+        assert result["status"] == "failed"
+        assert (
+            "postgres is already used by a container outside this project"
+            in result["error"]
+        )
+        foreign.remove.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_invalid_config(self, tmp_path):
+        """Test that undeployable configurations fail during planning."""
+        config = {"services": {"web": {"image": "nginx", "volumes": ["data:/data"]}}}
+
+        result = await ComposeDeployer(
+            FakeDockerClient(), "x", project_dir=str(tmp_path)
+        ).deploy(config)
+
+        assert result["failed_stage"] == "plan"
+        assert "undefined volume: data" in result["error"]
+
+    def test_host_access_options(self):
+        """Test that options reaching into the host are found."""
+        config = {
+            "services": {
+                "root": {
+                    "image": "busybox",
+                    "privileged": True,
+                    "volumes": ["/:/host", "~/.ssh:/keys", "../up:/up"],
+                },
+                "net": {
+                    "image": "busybox",
+                    "network_mode": "host",
+                    "pid": "host",
+                    "cap_add": ["SYS_ADMIN"],
+                },
+                "app": {
+                    "image": "busybox",
+                    "volumes": [
+                        "./www:/www",
+                        "data:/data",
+                        {"source": "/etc", "target": "/etc"},
+                    ],
+                },
+            }
+        }
+
+        assert host_access_options(config) == [
+            "root: privileged",
+            "root: bind mount /",
+            "root: bind mount ~/.ssh",
+            "root: bind mount ../up",
+            "net: pid",
+            "net: cap_add",
+            "net: network_mode host",
+            "app: bind mount /etc",
+        ]
+        assert host_access_options(LEMP) == []
+
+    @pytest.mark.asyncio
+    async def test_host_access_not_allowed(self, tmp_path):
+        """Test that restricted deployers refuse host access before creating anything."""
+        client = FakeDockerClient(present={"nginx"})
+        config = {"services": {"web": {"image": "nginx", "privileged": True}}}
+
+        result = await ComposeDeployer(
+            client, "x", project_dir=str(tmp_path), allow_host_access=False
+        ).deploy(config)
+
+        assert result["failed_stage"] == "plan"
+        assert "Host access is not allowed: web: privileged" in result["error"]
+        assert client.created == {}
+
+
+class TestComposeDeploymentService:
+    """Test deployment history and progress reporting."""
+
+    @pytest.fixture
+    def marketplace_template(self):
+        """Create an approved marketplace template."""
+        db = TestingSessionLocal()
+        unique_id = str(uuid.uuid4())[:8]
+        user = User(
+            username=f"deploy_{unique_id}",
+            email=f"deploy_{unique_id}@example.com",
+            hashed_password="hashed_password",
+            role=UserRole.USER,
+            is_active=True,
+        )
+        category = TemplateCategory(name=f"Deploy {unique_id}")
+        db.add_all([user, category])
+        db.commit()
+        template = MarketplaceTemplate(
+            name=f"stack-{unique_id}",
+            description="Stack for deployment tests",
+            author_id=user.id,
+            category_id=category.id,
+            docker_compose_yaml="services:\n  app:\n    image: busybox\n",
+            status=TemplateStatus.APPROVED,
+        )
+        db.add(template)
+        db.commit()
+        try:
+            yield db, template, user
+        finally:
+            db.query(TemplateDeploymentHistory).filter_by(
+                template_id=template.id
+            ).delete()
+            db.delete(template)
+            db.delete(category)
+            db.delete(user)
+            db.commit()
+            db.close()
+
+    def test_deploy_endpoint_sanitizes_config_path(
+        self, tmp_path, authenticated_client, marketplace_template
+    ):
+        """Test that template names cannot place the rendered config outside the repo."""
+        _, template, _ = marketplace_template
+        service = MagicMock()
+        service.create_history.return_value = SimpleNamespace(deployment_id="d1")
+        service.deploy = AsyncMock()
+        git = MagicMock()
+        git.commit = AsyncMock(return_value="abc")
+        repo = tmp_path / "repo" / "config"
+        repo.mkdir(parents=True)
+
+        with patch("backend.app.main.repo_path", str(repo)), patch(
+            "backend.app.main.git_manager", git
+        ), patch(
+            "backend.app.main.get_compose_deployment_service", return_value=service
+        ), patch(
+            "backend.app.main.get_recommendation_engine"
+        ) as get_engine:
+            response = authenticated_client.post(
+                "/api/templates/deploy",
+                json={
+                    "template_name": "../../escape",
+                    "marketplace_template_id": template.id,
+                },
+            )
+
+        assert response.status_code == 200
+        # The deploying user's recommendations are recomputed
+        get_engine.return_value.invalidate_user.assert_called_once_with(
+            service.create_history.call_args.args[2]
+        )
+        assert os.listdir(repo) == [f"marketplace_{template.id}_template.yaml"]
+        assert not (tmp_path / "escape_template.yaml").exists()
+        assert git.commit.call_args.args[0] == [
+            str(repo / f"marketplace_{template.id}_template.yaml")
+        ]
+        # Users deploying the same template never share containers
+        assert service.deploy.call_args.kwargs["project"] == "escape-u1"
+
+    def test_raw_deploy_requires_admin(self, authenticated_client):
+        """Test that arbitrary compose configurations can only be deployed by admins."""
+        response = authenticated_client.post(
+            "/deploy", json={"config": {"services": {"app": {"image": "busybox"}}}}
+        )
+
+        assert response.status_code == 403
+
+    def test_template_host_access_requires_admin(
+        self, authenticated_client, marketplace_template
+    ):
+        """Test that users cannot deploy templates that reach into the host."""
+        db, template, _ = marketplace_template
+        template.docker_compose_yaml = (
+            "services:\n  app:\n    image: busybox\n    privileged: true\n"
+        )
+        db.commit()
+        service = MagicMock()
+
+        with patch(
+            "backend.app.main.get_compose_deployment_service", return_value=service
+        ):
+            response = authenticated_client.post(
+                "/api/templates/deploy",
+                json={"template_name": "stack", "marketplace_template_id": template.id},
+            )
+
+        assert response.status_code == 403
+        assert "app: privileged" in response.json()["detail"]
+        service.create_history.assert_not_called()
+
+    def test_project_name(self):
+        """Test that names are turned into valid project names."""
+        assert project_name("LEMP Stack!") == "lemp-stack"
+        assert project_name("***") == "default"
+        assert project_name("LEMP Stack!", 7) == "lemp-stack-u7"
+
+    @pytest.mark.asyncio
+    async def test_records_history_and_streams_progress(
+        self, tmp_path, marketplace_template
+    ):
+        """Test that stage timings land in the deployment history and events reach the user."""
+        db, template, user = marketplace_template
+        manager = MagicMock()
+        manager.send_personal_message = AsyncMock()
+        service = ComposeDeploymentService(
+            session_factory=TestingSessionLocal,
+            deployments_dir=str(tmp_path),
+            client_factory=lambda: FakeDockerClient(present={"busybox"}),
+        )
+        history = service.create_history(db, template.id, user.id, "stack")
+
+        with patch(
+            "app.services.alert_notification_service.get_connection_manager",
+            return_value=manager,
+        ):
+            result = await service.deploy(
+                {"services": {"app": {"image": "busybox"}}},
+                "stack",
+                user.id,
+                history.deployment_id,
+            )
+
+        assert result["status"] == "deployed"
+        db.expire_all()
+        record = (
+            db.query(TemplateDeploymentHistory)
+            .filter_by(deployment_id=history.deployment_id)
+            .one()
+        )
+        assert record.deployment_status == "completed"
+        assert record.deployment_success is True
+        assert record.containers_created == 1
+        assert set(record.stage_timings) >= {"images", "services", "total"}
+
+        messages = [
+            call.args[0] for call in manager.send_personal_message.call_args_list
+        ]
+        assert all(
+            m["type"] == "deployment_progress"
+            and m["deployment_id"] == history.deployment_id
+            for m in messages
+        )
+        assert messages[-1]["stage"] == "deployment"
+        assert messages[-1]["status"] == "deployed"
+        assert service.get_stats()["deployed"] == 1
+
+    def test_popular_images(self, tmp_path, marketplace_template):
+        """Test that featured templates' images are prefetch candidates."""
+        db, template, _ = marketplace_template
+        template.is_featured = True
+        template.docker_compose_yaml = (
+            "services:\n"
+            "  web:\n    image: nginx:1.25\n"
+            "  app:\n    build: .\n    image: local/app\n"
+            "  db:\n    image: postgres:${PG_VERSION}\n"
+            "  cache:\n    image: busybox\n"
+        )
+        db.commit()
+        service = ComposeDeploymentService(
+            session_factory=TestingSessionLocal, deployments_dir=str(tmp_path)
+        )
+
+        images = service.popular_images(limit=100)
+
+        assert images.index("nginx:1.25") < images.index("busybox")
+        assert "local/app" not in images
+        assert not any("$" in image for image in images)
+        assert len(images) == len(set(images))
+
+    @pytest.mark.asyncio
+    async def test_deploys_of_one_project_are_serialized(self, tmp_path):
+        """Test that concurrent deploys of a project run one after the other."""
+        active = {}
+        overlap = {}
+
+        class SlowDeployer:
+            def __init__(self, client, project, **kwargs):
+                self.project = project
+
+            async def deploy(self, config):
+                active[self.project] = active.get(self.project, 0) + 1
+                overlap[self.project] = max(
+                    overlap.get(self.project, 0), active[self.project]
+                )
+                await asyncio.sleep(0.05)
+                active[self.project] -= 1
+                return {"status": "deployed", "error": None, "stage_timings": {}}
+
+        service = ComposeDeploymentService(
+            session_factory=TestingSessionLocal,
+            deployments_dir=str(tmp_path),
+            client_factory=MagicMock,
+        )
+        with patch(
+            "app.services.compose_deployment_service.ComposeDeployer", SlowDeployer
+        ), patch(
+            "app.services.alert_notification_service.get_connection_manager"
+        ) as get_manager:
+            get_manager.return_value.send_personal_message = AsyncMock()
+            await asyncio.gather(
+                service.deploy({}, "same", 1),
+                service.deploy({}, "same", 1),
+                service.deploy({}, "other", 1),
+            )
+
+        assert overlap == {"same": 1, "other": 1}
+        messages = [
+            c.args[0]
+            for c in get_manager.return_value.send_personal_message.call_args_list
+        ]
+        assert [m["project"] for m in messages if m["stage"] == "queued"] == ["same"]
+
+    @pytest.mark.asyncio
+    async def test_docker_unavailable(self, tmp_path):
+        """Test that a missing Docker daemon fails the deployment without raising."""
+
+        def unavailable():
+            raise ConnectionError("Docker socket not found")
+
+        service = ComposeDeploymentService(
+            session_factory=TestingSessionLocal,
+            deployments_dir=str(tmp_path),
+            client_factory=unavailable,
+        )
+        with patch(
+            "app.services.alert_notification_service.get_connection_manager"
+        ) as get_manager:
+            get_manager.return_value.send_personal_message = AsyncMock()
+            result = await service.deploy({"services": {}}, "x", 1)
+
+        assert result["status"] == "failed"
+        assert "Docker socket not found" in result["error"]
+        assert service.get_stats()["failed"] == 1
@@ -67,8 +67,10 @@ class TestEmailProviders:
     @pytest.mark.asyncio
     async def test_gmail_provider_success(self):
         """Test Gmail provider successful email sending."""
-        with patch("app.email.service.aiosmtplib.send") as mock_send:
-            mock_send.return_value = None  # aiosmtplib.send returns None on success
+        with patch("app.email.smtp_pool.aiosmtplib.SMTP") as mock_smtp_class:
+            mock_smtp = mock_smtp_class.return_value
+            mock_smtp.connect = AsyncMock()
+            mock_smtp.send_message = AsyncMock()
 
             provider = GmailProvider(
                 username="test@gmail.com",
@@ -85,13 +87,44 @@ class TestEmailProviders:
             )
 
             assert result is True
-            mock_send.assert_called_once()
+            mock_smtp.connect.assert_awaited_once()
+            mock_smtp.send_message.assert_awaited_once()
+
+    @pytest.mark.asyncio
+    async def test_gmail_provider_reuses_connection(self):
+        """Test Gmail provider sending consecutive emails on one SMTP session."""
+        with patch("app.email.smtp_pool.aiosmtplib.SMTP") as mock_smtp_class:
+            mock_smtp = mock_smtp_class.return_value
+            mock_smtp.connect = AsyncMock()
+            mock_smtp.send_message = AsyncMock()
+            mock_smtp.is_connected = True
+
+            provider = GmailProvider(
+                username="test@gmail.com",
+                password="test_password",
+                from_email="test@gmail.com",
+                from_name="Test App",
+            )
+
+            for i in range(3):
+                assert await provider.send_email(
+                    to_emails=["user@example.com"],
+                    subject=f"Test Subject {i}",
+                    html_content="<h1>Test</h1>",
+                )
+
+            mock_smtp_class.assert_called_once()
+            mock_smtp.connect.assert_awaited_once()
+            assert mock_smtp.send_message.await_count == 3
+            assert provider.pool.get_stats()["reused"] == 2
 
     @pytest.mark.asyncio
     async def test_gmail_provider_failure(self):
         """Test Gmail provider email sending failure."""
-        with patch("app.email.service.aiosmtplib.send") as mock_send:
-            mock_send.side_effect = Exception("SMTP error")
+        with patch("app.email.smtp_pool.aiosmtplib.SMTP") as mock_smtp_class:
+            mock_smtp = mock_smtp_class.return_value
+            mock_smtp.connect = AsyncMock()
+            mock_smtp.send_message = AsyncMock(side_effect=Exception("SMTP error"))
 
             provider = GmailProvider(
                 username="test@gmail.com",
@@ -512,8 +545,10 @@ class TestEmailIntegration:
         """Test Gmail provider SMTP timeout handling."""
         import asyncio
 
-        with patch("app.email.service.aiosmtplib.send") as mock_send:
-            mock_send.side_effect = asyncio.TimeoutError("SMTP timeout")
+        with patch("app.email.smtp_pool.aiosmtplib.SMTP") as mock_smtp_class:
+            mock_smtp_class.return_value.connect = AsyncMock(
+                side_effect=asyncio.TimeoutError("SMTP timeout")
+            )
 
             provider = GmailProvider(
                 username="test@gmail.com",
@@ -534,8 +569,10 @@ class TestEmailIntegration:
     @pytest.mark.asyncio
     async def test_gmail_provider_connection_error(self):
         """Test Gmail provider connection error handling."""
-        with patch("app.email.service.aiosmtplib.send") as mock_send:
-            mock_send.side_effect = ConnectionError("Connection failed")
+        with patch("app.email.smtp_pool.aiosmtplib.SMTP") as mock_smtp_class:
+            mock_smtp_class.return_value.connect = AsyncMock(
+                side_effect=ConnectionError("Connection failed")
+            )
 
             provider = GmailProvider(
                 username="test@gmail.com",
@@ -1318,8 +1355,10 @@ class TestEmailServiceEnhancedConfiguration:
                 "GMAIL_PASSWORD": "test_password",
             },
         ):
-            with patch("app.email.service.aiosmtplib.send") as mock_send:
-                mock_send.side_effect = asyncio.TimeoutError("Connection timeout")
+            with patch("app.email.smtp_pool.aiosmtplib.SMTP") as mock_smtp_class:
+                mock_smtp_class.return_value.connect = AsyncMock(
+                    side_effect=asyncio.TimeoutError("Connection timeout")
+                )
 
                 service = EmailService()
                 result = await service.send_email(
@@ -0,0 +1,249 @@
+"""
+Tests for the configuration repository manager.
+"""
+
+import asyncio
+import os
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from version_control.git_manager import GitManager
+
+
+@pytest.fixture
+def manager(tmp_path):
+    """Create a manager for an empty config repo."""
+    return GitManager(str(tmp_path / "config_repo"), batch_window=0.05)
+
+
+def write(manager, name, content):
+    path = f"{manager.repo_path}/{name}"
+    with open(path, "w") as f:
+        f.write(content)
+    return path
+
+
+class TestCommitPaths:
+    """Test committing only the written config files."""
+
+    def test_stages_only_given_paths(self, manager):
+        """Test that other changes in the working tree are left alone."""
+        path = write(manager, "docker-compose.yml", "services: {}\n")
+        write(manager, "scratch.txt", "not a deploy")
+
+        hexsha = manager.commit_paths([path], "Deploy")
+
+        commit = manager.repo.commit(hexsha)
+        assert set(commit.stats.files) == {"docker-compose.yml"}
+        assert "scratch.txt" in manager.repo.untracked_files
+        assert (
+            manager.get_file_at_commit("docker-compose.yml", hexsha) == "services: {}\n"
+        )
+
+    def test_unchanged_files(self, manager):
+        """Test that rewriting identical content creates no commit."""
+        path = write(manager, "stack.yaml", "a: 1\n")
+        first = manager.commit_paths([path], "Deploy")
+
+        write(manager, "stack.yaml", "a: 1\n")
+
+        assert manager.commit_paths([path], "Deploy again") == ""
+        assert manager.get_current_commit() == first
+        assert manager.stats["unchanged"] == 1
+
+    def test_deleted_files(self, manager):
+        """Test that deleted config files are removed from the repo."""
+        path = write(manager, "stack.yaml", "a: 1\n")
+        manager.commit_paths([path], "Add")
+
+        os.remove(path)
+        hexsha = manager.commit_paths(["stack.yaml"], "Remove")
+
+        assert hexsha
+        assert manager.get_file_at_commit("stack.yaml", hexsha) is None
+
+    def test_commit_all(self, manager):
+        """Test that committing everything still works and skips clean trees."""
+        write(manager, "a.yaml", "a: 1\n")
+        write(manager, "b.yaml", "b: 1\n")
+
+        hexsha = manager.commit_all("Everything")
+
+        assert set(manager.repo.commit(hexsha).stats.files) == {"a.yaml", "b.yaml"}
+        assert manager.commit_all("Nothing") == ""
+
+
+class TestCommitBatching:
+    """Test coalescing concurrent deploy commits."""
+
+    @pytest.mark.asyncio
+    async def test_concurrent_commits_share_one_commit(self, manager):
+        """Test that commits requested within the batch window become one commit."""
+        start = manager.get_current_commit()
+        paths = [write(manager, f"stack{i}.yaml", f"n: {i}\n") for i in range(3)]
+
+        hashes = await asyncio.gather(
+            *[
+                manager.commit([path], f"Deploy stack{i}")
+                for i, path in enumerate(paths)
+            ]
+        )
+
+        assert len(set(hashes)) == 1
+        commit = manager.repo.commit(hashes[0])
+        assert commit.parents[0].hexsha == start
+        assert set(commit.stats.files) == {"stack0.yaml", "stack1.yaml", "stack2.yaml"}
+        assert commit.message.startswith("Batch of 3 config changes")
+        assert "- Deploy stack1" in commit.message
+        assert manager.stats["commits"] == 1
+
+    @pytest.mark.asyncio
+    async def test_sequential_commits(self, manager):
+        """Test that a single request keeps its own message."""
+        path = write(manager, "stack.yaml", "a: 1\n")
+        first = await manager.commit([path], "Deploy one")
+        write(manager, "stack.yaml", "a: 2\n")
+        second = await manager.commit([path], "Deploy two")
+
+        assert first != second
+        assert manager.get_history(max_count=2)[0][2] == "Deploy two"
+
+    @pytest.mark.asyncio
+    async def test_commit_errors_reach_every_request(self, manager):
+        """Test that a failed batch fails all requests in it."""
+        with patch.object(
+            manager, "commit_paths", side_effect=OSError("index.lock exists")
+        ):
+            results = await asyncio.gather(
+                manager.commit(["a.yaml"], "One"),
+                manager.commit(["b.yaml"], "Two"),
+                return_exceptions=True,
+            )
+
+        assert all(isinstance(result, OSError) for result in results)
+
+
+class TestLatestCommitIndex:
+    """Test the per-file latest commit index."""
+
+    def test_latest_commit(self, manager):
+        """Test that the latest commit per file is known without walking history."""
+        a = write(manager, "a.yaml", "a: 1\n")
+        b = write(manager, "b.yaml", "b: 1\n")
+        first = manager.commit_paths([a, b], "Add both")
+        write(manager, "a.yaml", "a: 2\n")
+        second = manager.commit_paths([a], "Change a")
+
+        assert manager.latest_commit("a.yaml") == second
+        assert manager.latest_commit(b) == first
+        assert manager.latest_commit("missing.yaml") is None
+
+        # A new manager rebuilds the index lazily from history
+        reopened = GitManager(manager.repo_path)
+        assert reopened.latest_commit("b.yaml") == first
+
+    def test_rollback_resets_index(self, manager):
+        """Test that rolling back forgets commits that are no longer on the branch."""
+        path = write(manager, "a.yaml", "a: 1\n")
+        first = manager.commit_paths([path], "One")
+        write(manager, "a.yaml", "a: 2\n")
+        manager.commit_paths([path], "Two")
+
+        assert manager.rollback_to(first)
+        assert manager.latest_commit("a.yaml") == first
+
+
+class TestHistoryQueries:
+    """Test paginated history and cached queries on immutable commits."""
+
+    @pytest.fixture
+    def history(self, manager):
+        """Create a repo with five config commits, oldest first."""
+        hashes = []
+        for i in range(5):
+            path = write(manager, "stack.yaml", f"version: {i}\n")
+            hashes.append(manager.commit_paths([path], f"Deploy {i}"))
+        return manager, hashes
+
+    def test_pagination(self, history):
+        """Test that pages follow each other without gaps or overlap."""
+        manager, hashes = history
+
+        first = manager.get_history(max_count=2)
+        second = manager.get_history(max_count=2, before=first[-1][0])
+        third = manager.get_history(max_count=2, before=second[-1][0])
+
+        assert [h[0] for h in first + second + third] == hashes[::-1] + [
+            next(manager.iter_history(max_count=1, skip=5))[0]
+        ]
+        assert [h[2] for h in first] == ["Deploy 4", "Deploy 3"]
+        assert manager.get_history(max_count=2, before=third[-1][0]) == []
+
+    def test_iter_history_is_lazy(self, history):
+        """Test that history can be consumed one commit at a time."""
+        manager, hashes = history
+
+        commits = manager.iter_history()
+
+        assert next(commits)[0] == hashes[-1]
+        assert next(commits)[0] == hashes[-2]
+
+    def test_history_cache_follows_head(self, history):
+        """Test that cached pages are reused until a new commit moves HEAD."""
+        manager, _ = history
+        first = manager.get_history(max_count=3)
+        assert manager.get_history(max_count=3) == first
+        assert manager.get_stats()["history_cache"]["hits"] == 1
+
+        path = write(manager, "stack.yaml", "version: 5\n")
+        manager.commit_paths([path], "Deploy 5")
+
+        assert manager.get_history(max_count=3)[0][2] == "Deploy 5"
+
+    def test_file_and_diff_cache(self, history):
+        """Test that file contents and diffs are computed once per commit."""
+        manager, hashes = history
+
+        assert manager.get_file_at_commit("stack.yaml", hashes[1]) == "version: 1\n"
+        assert manager.get_file_at_commit("missing.yaml", hashes[1]) is None
+        diff = manager.get_diff(hashes[0], hashes[2])
+        assert "-version: 0" in diff and "+version: 2" in diff
+
+        repo = MagicMock()
+        repo.commit.side_effect = repo.git.diff.side_effect = AssertionError(
+            "not cached"
+        )
+        with patch.object(manager, "repo", repo):
+            assert manager.get_file_at_commit("stack.yaml", hashes[1]) == "version: 1\n"
+            assert manager.get_file_at_commit("missing.yaml", hashes[1]) is None
+            assert manager.get_diff(hashes[0], hashes[2]) == diff
+
+        stats = manager.get_stats()
+        assert stats["file_cache"]["hits"] == 2
+        assert stats["diff_cache"]["hits"] == 1
+
+    def test_symbolic_revisions_are_resolved(self, history):
+        """Test that revisions like HEAD are not cached by name."""
+        manager, hashes = history
+        assert manager.get_file_at_commit("stack.yaml", "HEAD") == "version: 4\n"
+
+        path = write(manager, "stack.yaml", "version: 5\n")
+        manager.commit_paths([path], "Deploy 5")
+
+        assert manager.get_file_at_commit("stack.yaml", "HEAD") == "version: 5\n"
+        assert manager.get_file_at_commit("stack.yaml", "bogus-ref") is None
+
+    def test_cache_eviction(self, tmp_path):
+        """Test that caches are bounded."""
+        manager = GitManager(str(tmp_path / "repo"), cache_size=2)
+        head = manager.get_current_commit()
+        for name in ["a", "b", "c"]:
+            manager.get_file_at_commit(name, head)
+
+        assert manager.get_stats()["file_cache"] == {
+            "hits": 0,
+            "misses": 3,
+            "evictions": 1,
+            "size": 2,
+        }
@@ -0,0 +1,230 @@
+"""
+Tests for the image pull coordinator.
+"""
+
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+from unittest.mock import MagicMock
+
+import pytest
+from docker.errors import APIError, ImageNotFound
+
+from docker_manager.compose import ComposeDeployer
+from docker_manager.images import ImagePullCoordinator, is_image_prefetch_enabled
+
+MB = 1024 * 1024
+
+
+class FakeImageClient:
+    """Docker SDK client stand-in with an in-memory image store."""
+
+    def __init__(self, present=None, delay=0.05, fail=(), in_use=()):
+        self.store = dict(present or {})
+        self.delay = delay
+        self.fail = set(fail)
+        self.pulls = []
+        self.removed = []
+        self.lock = threading.Lock()
+        self.images = SimpleNamespace(
+            get=self._get, pull=self._pull, remove=self._remove
+        )
+        self.containers = SimpleNamespace(
+            list=lambda all=False: [
+                SimpleNamespace(attrs={"Image": f"sha256:{name}"}) for name in in_use
+            ]
+        )
+
+    def _image(self, reference):
+        return SimpleNamespace(
+            id=f"sha256:{reference}",
+            attrs={
+                "RepoDigests": [f"{reference}@sha256:abc"],
+                "Size": self.store[reference],
+            },
+        )
+
+    def _get(self, reference):
+        if reference not in self.store:
+            raise ImageNotFound(reference)
+        return self._image(reference)
+
+    def _pull(self, repository, tag=None):
+        reference = f"{repository}:{tag}"
+        with self.lock:
+            self.pulls.append(reference)
+        time.sleep(self.delay)
+        if reference in self.fail:
+            raise APIError(f"pull access denied for {repository}")
+        self.store.setdefault(reference, 100 * MB)
+        return self._image(reference)
+
+    def _remove(self, reference):
+        del self.store[reference]
+        self.removed.append(reference)
+
+
+class TestImagePullCoordinator:
+    """Test pull deduplication, prefetching and eviction."""
+
+    def test_concurrent_pulls_are_shared(self):
+        """Test that concurrent requests for a missing image pull it once."""
+        client = FakeImageClient(delay=0.2)
+        coordinator = ImagePullCoordinator(client_factory=lambda: client)
+
+        with ThreadPoolExecutor(max_workers=5) as pool:
+            results = list(
+                pool.map(lambda _: coordinator.ensure("nginx:latest"), range(5))
+            )
+
+        assert client.pulls == ["nginx:latest"]
+        assert sorted(results) == ["joined"] * 4 + ["pulled"]
+        assert coordinator.ensure("nginx:latest") == "cached"
+
+        image = coordinator.get_image("nginx:latest")
+        assert image.image_id == "sha256:nginx:latest"
+        assert image.digests == ["nginx:latest@sha256:abc"]
+        assert image.managed is True
+        stats = coordinator.get_stats()
+        assert (stats["pulls"], stats["joined"], stats["hits"]) == (1, 4, 1)
+        assert stats["in_flight"] == 0
+
+    def test_image_pulled_before_taking_the_lead(self):
+        """Test that a pull finishing just before a caller takes the lead is not repeated."""
+        client = FakeImageClient(delay=0)
+        image = SimpleNamespace(id="sha256:nginx", attrs={"Size": MB})
+        client.images.get = MagicMock(
+            side_effect=[ImageNotFound("nginx:latest"), image]
+        )
+        coordinator = ImagePullCoordinator(client_factory=lambda: client)
+
+        assert coordinator.ensure("nginx:latest") == "cached"
+        assert client.pulls == []
+        assert coordinator.get_stats()["in_flight"] == 0
+
+    def test_pull_errors_reach_waiters(self):
+        """Test that a failed pull fails every caller waiting for it."""
+        client = FakeImageClient(delay=0.2, fail={"private:latest"})
+        coordinator = ImagePullCoordinator(client_factory=lambda: client)
+
+        with ThreadPoolExecutor(max_workers=3) as pool:
+            futures = [
+                pool.submit(coordinator.ensure, "private:latest") for _ in range(3)
+            ]
+            errors = [future.exception() for future in futures]
+
+        assert all(isinstance(error, APIError) for error in errors)
+        assert client.pulls == ["private:latest"]
+        assert coordinator.get_stats()["pull_errors"] == 1
+
+    def test_prefetch(self):
+        """Test that missing candidates are pulled while idle."""
+        client = FakeImageClient(present={"redis:7": 50 * MB}, delay=0)
+        coordinator = ImagePullCoordinator(
+            client_factory=lambda: client,
+            candidate_source=lambda: [
+                "redis:7",
+                "nginx:latest",
+                "redis:7",
+                "mysql:8.0",
+            ],
+            idle_seconds=0,
+        )
+
+        assert coordinator.is_idle()
+        assert coordinator.prefetch() == ["nginx:latest", "mysql:8.0"]
+        assert coordinator.get_stats()["prefetched"] == 2
+        # Images present before are tracked but not owned
+        assert coordinator.get_image("redis:7").managed is False
+
+    def test_prefetch_yields_to_deployments(self):
+        """Test that prefetching stops once a deployment requests an image."""
+        client = FakeImageClient(delay=0)
+        coordinator = ImagePullCoordinator(client_factory=lambda: client)
+        original_pull = client.images.pull
+
+        def pull(repository, tag=None):
+            result = original_pull(repository, tag=tag)
+            if repository == "a":
+                coordinator.ensure("deploy:latest", client)
+            return result
+
+        client.images.pull = pull
+        coordinator.prefetch(["a:1", "b:1", "c:1"])
+
+        assert client.pulls == ["a:1", "deploy:latest"]
+
+    def test_eviction(self):
+        """Test that unused images are removed least recently used first, popular ones last."""
+        client = FakeImageClient(delay=0, in_use={"used:1"})
+        coordinator = ImagePullCoordinator(
+            client_factory=lambda: client, disk_budget_bytes=250 * MB
+        )
+        for image in ["popular:1", "used:1", "old:1", "recent:1"]:
+            coordinator.ensure(image)
+            time.sleep(0.01)
+        client.store["base:1"] = 500 * MB
+        coordinator.ensure("base:1")
+
+        removed = coordinator.evict(protect=["popular:1"])
+
+        # 400MB pulled: the oldest unpopular image goes first, the in-use image stays
+        assert removed == ["old:1", "recent:1"]
+        assert "base:1" in client.store
+        stats = coordinator.get_stats()
+        assert stats["managed_bytes"] == 200 * MB
+        assert stats["evicted_bytes"] == 200 * MB
+        assert coordinator.evict() == []
+
+    def test_failed_removal_is_skipped(self):
+        """Test that images Docker refuses to remove are left alone."""
+        client = FakeImageClient(delay=0)
+        coordinator = ImagePullCoordinator(
+            client_factory=lambda: client, disk_budget_bytes=MB
+        )
+        coordinator.ensure("a:1")
+        coordinator.ensure("b:1")
+        client.images.remove = MagicMock(side_effect=[APIError("conflict"), None])
+
+        assert coordinator.evict() == ["b:1"]
+        assert coordinator.get_image("a:1") is not None
+
+    @pytest.mark.asyncio
+    async def test_concurrent_deployments_share_pulls(self, tmp_path):
+        """Test that deployments of the same stack pull each image once."""
+        client = FakeImageClient(delay=0.2)
+        coordinator = ImagePullCoordinator(client_factory=lambda: client)
+        config = {
+            "services": {"web": {"image": "nginx:latest"}, "db": {"image": "mysql:8.0"}}
+        }
+
+        deployers = [
+            ComposeDeployer(
+                client, f"p{i}", project_dir=str(tmp_path / str(i)), images=coordinator
+            )
+            for i in range(3)
+        ]
+        plans = [deployer.plan(config) for deployer in deployers]
+        results = [{"images": {}} for _ in deployers]
+        await asyncio.gather(
+            *[
+                deployer._prepare_images(plan, result)
+                for deployer, plan, result in zip(deployers, plans, results)
+            ]
+        )
+
+        assert sorted(client.pulls) == ["mysql:8.0", "nginx:latest"]
+        # Callers arriving after the pull finished find the image present
+        sources = [result["images"]["nginx:latest"]["source"] for result in results]
+        assert sources.count("pulled") == 1
+        assert set(sources) <= {"pulled", "joined", "cached"}
+
+    def test_prefetch_disabled_by_default(self, monkeypatch):
+        """Test that background prefetching only runs when enabled in the environment."""
+        monkeypatch.delenv("IMAGE_PREFETCH_ENABLED", raising=False)
+        assert not is_image_prefetch_enabled()
+
+        monkeypatch.setenv("IMAGE_PREFETCH_ENABLED", "true")
+        assert is_image_prefetch_enabled()
@@ -2,6 +2,7 @@
 Tests for the LLM client module and related components.
 """
 
+import json
 from unittest.mock import AsyncMock, MagicMock, patch
 
 import httpx
@@ -750,6 +751,8 @@ class TestNaturalLanguageProcessing:
             mock_client.__aenter__.return_value = mock_client
             mock_client.__aexit__.return_value = None
             mock_async_client_class.return_value = mock_client
+            # The pooled client is reused, so drop it to pick up the new mock
+            await client.aclose()
 
             response = await client.send_query(
                 natural_command,
@@ -792,6 +795,8 @@ class TestNaturalLanguageProcessing:
             mock_client.__aenter__.return_value = mock_client
             mock_client.__aexit__.return_value = None
             mock_async_client_class.return_value = mock_client
+            # The pooled client is reused, so drop it to pick up the new mock
+            await client.aclose()
 
             response = await client.send_query(
                 f"Analyze intent: {command}",
@@ -840,6 +845,8 @@ class TestNaturalLanguageProcessing:
             mock_client.__aenter__.return_value = mock_client
             mock_client.__aexit__.return_value = None
             mock_async_client_class.return_value = mock_client
+            # The pooled client is reused, so drop it to pick up the new mock
+            await client.aclose()
 
             response = await client.send_query(
                 f"Extract parameters: {command}",
@@ -1613,6 +1620,8 @@ class TestResponseProcessingAndValidation:
             mock_client.__aenter__.return_value = mock_client
             mock_client.__aexit__.return_value = None
             mock_async_client_class.return_value = mock_client
+            # The pooled client is reused, so drop it to pick up the new mock
+            await client.aclose()
 
             response = await client.send_query("Parse this response format")
             assert test_case["expected"] in response
@@ -1657,6 +1666,8 @@ class TestResponseProcessingAndValidation:
             mock_client.__aenter__.return_value = mock_client
             mock_client.__aexit__.return_value = None
             mock_async_client_class.return_value = mock_client
+            # The pooled client is reused, so drop it to pick up the new mock
+            await client.aclose()
 
             response = await client.send_query(scenario["prompt"])
 
@@ -1750,6 +1761,8 @@ class TestResponseProcessingAndValidation:
             mock_client.__aenter__.return_value = mock_client
             mock_client.__aexit__.return_value = None
             mock_async_client_class.return_value = mock_client
+            # The pooled client is reused, so drop it to pick up the new mock
+            await client.aclose()
 
             with pytest.raises(httpx.HTTPStatusError) as exc_info:
                 await client.send_query("Test error extraction")
@@ -1784,6 +1797,8 @@ class TestResponseProcessingAndValidation:
             mock_client.__aenter__.return_value = mock_client
             mock_client.__aexit__.return_value = None
             mock_async_client_class.return_value = mock_client
+            # The pooled client is reused, so drop it to pick up the new mock
+            await client.aclose()
 
             # First call
             response1 = await client.send_query(query)
@@ -1795,3 +1810,137 @@ class TestResponseProcessingAndValidation:
 
             # Verify both responses are consistent
             assert response1 == response2
+
+
+class TestPooledStreamingClient:
+    """Tests for the pooled HTTP client and streaming responses."""
+
+    @staticmethod
+    def streaming_client(lines, seen):
+        """Create an HTTP client whose responses stream ``lines``, recording consumption."""
+
+        async def body():
+            for line in lines:
+                seen.append(line)
+                yield (line + "\n").encode()
+
+        def handler(request):
+            seen.append(json.loads(request.content))
+            return httpx.Response(200, content=body())
+
+        return httpx.AsyncClient(transport=httpx.MockTransport(handler))
+
+    @pytest.mark.asyncio
+    @patch("httpx.AsyncClient")
+    async def test_http_client_reused_across_queries(self, mock_async_client_class):
+        """Test that consecutive queries share one pooled HTTP client."""
+        mock_response = MagicMock()
+        mock_response.json.return_value = {"response": "ok"}
+        mock_client = AsyncMock()
+        mock_client.is_closed = False
+        mock_client.post.return_value = mock_response
+        mock_async_client_class.return_value = mock_client
+
+        client = LLMClient(provider="ollama")
+        await client.send_query("first")
+        await client.send_query("second")
+
+        mock_async_client_class.assert_called_once()
+        assert mock_client.post.await_count == 2
+        assert mock_client.post.call_args[1]["json"]["stream"] is False
+
+        await client.aclose()
+        mock_client.aclose.assert_awaited_once()
+
+    @pytest.mark.asyncio
+    async def test_stream_ollama_tokens(self):
+        """Test that Ollama NDJSON chunks are yielded as tokens."""
+        seen = []
+        lines = [
+            json.dumps({"response": "Hello", "done": False}),
+            json.dumps({"response": " world", "done": False}),
+            json.dumps({"response": "", "done": True}),
+        ]
+        client = LLMClient(provider="ollama", http_client=self.streaming_client(lines, seen))
+
+        tokens = [token async for token in client.stream_query("hi")]
+
+        assert tokens == ["Hello", " world"]
+        assert seen[0]["stream"] is True
+        await client.aclose()
+
+    @pytest.mark.asyncio
+    async def test_stream_openrouter_sse(self):
+        """Test that OpenAI-style server-sent events are yielded as tokens."""
+        seen = []
+        lines = [
+            ": keep-alive",
+            "data: " + json.dumps({"choices": [{"delta": {"role": "assistant"}}]}),
+            "data: " + json.dumps({"choices": [{"delta": {"content": "docker"}}]}),
+            "data: " + json.dumps({"choices": [{"delta": {"content": " ps"}}]}),
+            "data: [DONE]",
+        ]
+        client = LLMClient(
+            provider="openrouter", api_key="key", http_client=self.streaming_client(lines, seen)
+        )
+
+        tokens = [token async for token in client.stream_query("list")]
+
+        assert tokens == ["docker", " ps"]
+        assert seen[0]["stream"] is True
+        await client.aclose()
+
+    @pytest.mark.asyncio
+    async def test_stop_at_json_returns_when_object_closes(self):
+        """Test that the query returns once the JSON object closes, without reading the rest."""
+        seen = []
+        pieces = [
+            'Sure! {"is_docker_command": false, "note": "a } in {a str',
+            'ing}"',
+            "}",
+            " Hope",
+            " this",
+            " helps",
+        ]
+        lines = [json.dumps({"response": piece, "done": False}) for piece in pieces]
+        client = LLMClient(provider="ollama", http_client=self.streaming_client(lines, seen))
+
+        response = await client.send_query("parse", stop_at_json=True)
+
+        assert json.loads(response) == {"is_docker_command": False, "note": "a } in {a string}"}
+        # The request plus the three chunks up to the closing brace
+        assert len(seen) == 4
+        await client.aclose()
+
+    @pytest.mark.asyncio
+    async def test_stop_at_json_skips_example_objects(self):
+        """Test that an example object shown before the answer does not stop the stream."""
+        seen = []
+        answer = {"is_docker_command": True, "command_type": "container", "operation": "list"}
+        pieces = [
+            'Answers look like {"command_type": "...", "operation": "..."}. ',
+            "Here it is: ",
+            json.dumps(answer),
+            " Done.",
+        ]
+        lines = [json.dumps({"response": piece, "done": False}) for piece in pieces]
+        client = LLMClient(provider="ollama", http_client=self.streaming_client(lines, seen))
+
+        response = await client.send_query("parse", stop_at_json=True)
+
+        assert json.loads(response) == answer
+        assert len(seen) == 4
+        await client.aclose()
+
+    @pytest.mark.asyncio
+    async def test_stop_at_json_without_answer_returns_everything(self):
+        """Test that the whole completion is returned when no answer object arrives."""
+        pieces = ['Example: {"a": 1}', " and nothing else"]
+        lines = [json.dumps({"response": piece, "done": False}) for piece in pieces]
+        client = LLMClient(provider="ollama", http_client=self.streaming_client(lines, []))
+
+        response = await client.send_query("parse", stop_at_json=True)
+
+        assert response == 'Example: {"a": 1} and nothing else'
+        await client.aclose()
+
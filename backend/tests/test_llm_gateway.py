@@ -0,0 +1,194 @@
+"""
+Tests for the LLM gateway.
+"""
+
+import asyncio
+import time
+from unittest.mock import patch
+
+import pytest
+
+from llm.gateway import CircuitBreaker, LLMGateway, LLMUnavailableError
+from nlp.intent import IntentParser
+
+
+class FakeClient:
+    """LLM client stand-in with a configurable delay and failure."""
+
+    def __init__(
+        self, provider="ollama", delay=0.0, error=None, response='{"ok": true}'
+    ):
+        self.provider = provider
+        self.delay = delay
+        self.error = error
+        self.response = response
+        self.calls = []
+        self.active = 0
+        self.max_active = 0
+        self.closed = False
+
+    async def send_query(self, prompt, context=None, params=None, stop_at_json=False):
+        self.calls.append({"prompt": prompt, "params": params})
+        self.active += 1
+        self.max_active = max(self.max_active, self.active)
+        try:
+            await asyncio.sleep(self.delay)
+            if self.error:
+                raise self.error
+            return self.response
+        finally:
+            self.active -= 1
+
+    async def aclose(self):
+        self.closed = True
+
+
+class TestCoalescingAndLimits:
+    """Test single-flight coalescing and concurrency limits."""
+
+    @pytest.mark.asyncio
+    async def test_identical_queries_coalesced(self):
+        """Test that identical in-flight queries share one provider request."""
+        client = FakeClient(delay=0.05)
+        gateway = LLMGateway([client])
+
+        results = await asyncio.gather(
+            *[gateway.send_query("list", params={"model": "m"}) for _ in range(5)]
+        )
+
+        assert results == ['{"ok": true}'] * 5
+        assert len(client.calls) == 1
+        assert gateway.stats["coalesced"] == 4
+        assert gateway.get_stats()["in_flight"] == 0
+
+        await gateway.send_query("list", params={"model": "m"})
+        assert len(client.calls) == 2
+
+    @pytest.mark.asyncio
+    async def test_per_provider_concurrency_limit(self):
+        """Test that concurrent requests to a provider are bounded."""
+        client = FakeClient(delay=0.02)
+        gateway = LLMGateway([client], max_concurrency=2)
+
+        await asyncio.gather(*[gateway.send_query(f"prompt {i}") for i in range(6)])
+
+        assert len(client.calls) == 6
+        assert client.max_active == 2
+
+
+class TestCircuitBreaker:
+    """Test failure and latency circuit breaking."""
+
+    @pytest.mark.asyncio
+    async def test_opens_after_failures_and_recovers(self):
+        """Test that an open circuit fails fast and closes after a successful trial."""
+        client = FakeClient(error=ConnectionError("refused"))
+        gateway = LLMGateway([client], failure_threshold=2, reset_timeout=0.05)
+
+        for _ in range(2):
+            with pytest.raises(LLMUnavailableError):
+                await gateway.send_query("q")
+        with pytest.raises(LLMUnavailableError, match="circuit open"):
+            await gateway.send_query("q")
+        assert len(client.calls) == 2
+
+        provider = gateway.get_stats()["providers"]["ollama"]
+        assert provider["circuit"] == "open"
+        assert provider["rejected"] == 1
+
+        await asyncio.sleep(0.06)
+        client.error = None
+        assert await gateway.send_query("q") == '{"ok": true}'
+        assert gateway.get_stats()["providers"]["ollama"]["circuit"] == "closed"
+
+    def test_opens_on_slow_responses(self):
+        """Test that a high p95 latency opens the circuit."""
+        breaker = CircuitBreaker(latency_threshold=1.0, min_samples=5)
+
+        for _ in range(4):
+            breaker.record_success(2.0)
+        assert breaker.state == "closed"
+        breaker.record_success(2.0)
+
+        assert breaker.state == "open"
+        assert not breaker.allow()
+
+    def test_half_open_allows_single_trial(self):
+        """Test that only one trial request passes a half-open circuit."""
+        breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0)
+        breaker.record_failure()
+
+        assert breaker.allow()
+        assert breaker.state == "half_open"
+        assert not breaker.allow()
+        breaker.release_trial()
+        assert breaker.allow()
+
+
+class TestHedgingAndDeadline:
+    """Test hedged requests and the overall deadline."""
+
+    @pytest.mark.asyncio
+    async def test_hedge_to_second_provider(self):
+        """Test that a slow primary is hedged onto the next provider, which wins."""
+        slow = FakeClient("openrouter", delay=1.0, response="slow")
+        fast = FakeClient("ollama", delay=0.01, response="fast")
+        gateway = LLMGateway([slow, fast], hedge_delay=0.02)
+
+        started = time.perf_counter()
+        result = await gateway.send_query(
+            "q", params={"model": "remote/model", "temperature": 0}
+        )
+
+        assert result == "fast"
+        assert time.perf_counter() - started < 0.5
+        assert gateway.stats["hedged"] == 1
+        assert gateway.stats["hedge_wins"] == 1
+        # The hedge provider uses its own model
+        assert fast.calls[0]["params"] == {"temperature": 0}
+        await asyncio.sleep(0)
+        assert slow.active == 0
+
+    @pytest.mark.asyncio
+    async def test_failed_primary_hedges_immediately(self):
+        """Test that a failing primary does not wait for the hedge delay."""
+        broken = FakeClient("openrouter", error=ConnectionError("down"))
+        backup = FakeClient("ollama", response="backup")
+        gateway = LLMGateway([broken, backup], hedge_delay=5)
+
+        started = time.perf_counter()
+        assert await gateway.send_query("q") == "backup"
+        assert time.perf_counter() - started < 1
+
+    @pytest.mark.asyncio
+    async def test_deadline(self):
+        """Test that a hung provider is abandoned at the deadline and counted as a timeout."""
+        client = FakeClient(delay=10)
+        gateway = LLMGateway([client], timeout=0.05)
+
+        started = time.perf_counter()
+        with pytest.raises(LLMUnavailableError, match="no response"):
+            await gateway.send_query("q")
+
+        assert time.perf_counter() - started < 0.5
+        stats = gateway.get_stats()["providers"]["ollama"]
+        assert stats["timeouts"] == 1
+        assert stats["in_flight"] == 0
+
+    @pytest.mark.asyncio
+    @patch("nlp.intent.list_templates", return_value=[])
+    @patch("nlp.intent.SettingsManager")
+    async def test_parser_falls_back_locally_when_llm_degraded(
+        self, mock_settings_manager_class, mock_list_templates
+    ):
+        """Test that NLP parsing latency stays bounded when the LLM hangs."""
+        parser = IntentParser(container_source=lambda: [])
+        parser._llm_client = LLMGateway([FakeClient(delay=10)], timeout=0.05)
+
+        started = time.perf_counter()
+        result = await parser.parse("start webapp")
+
+        assert time.perf_counter() - started < 0.5
+        # The low-confidence rule result is better than nothing
+        assert result["operation"] == "start"
+        assert parser.get_stats()["llm"]["unavailable"] == 1
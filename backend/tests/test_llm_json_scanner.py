@@ -0,0 +1,208 @@
+"""
+Fuzz and scaling tests for streaming JSON extraction from LLM responses.
+"""
+
+import json
+import os
+import random
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from llm.engine.parser import (
+    DockerCommandParser,
+    JSONStreamScanner,
+    ResponseParsingError,
+    iter_json_objects,
+    parse_json_candidate,
+)
+
+FIXTURES = os.path.join(os.path.dirname(__file__), "fixtures", "llm_responses.json")
+
+with open(FIXTURES, encoding="utf-8") as f:
+    RESPONSES = json.load(f)["responses"]
+
+
+def scan_chunked(text, rng):
+    """Feed ``text`` to a scanner in random chunks and collect the candidates."""
+    scanner = JSONStreamScanner()
+    candidates = []
+    pos = 0
+    while pos < len(text):
+        size = rng.randint(1, 12)
+        candidates.extend(scanner.feed(text[pos : pos + size]))
+        pos += size
+    return candidates
+
+
+class TestJSONStreamScanner:
+    """Test the scanner on hand-written cases."""
+
+    def test_braces_and_escapes_in_strings(self):
+        """Test that braces and escaped quotes inside strings do not end the object."""
+        text = 'x {"a": "}{", "b": "say \\"}\\" ok", "c": {"d": "\\\\"}} y'
+
+        assert JSONStreamScanner().feed(text) == [text[2:-2]]
+
+    def test_multiple_candidates(self):
+        """Test that every top-level object is returned, in order."""
+        text = 'first {"a": 1} then {"b": {"c": 2}} and {unclosed'
+
+        assert JSONStreamScanner().feed(text) == ['{"a": 1}', '{"b": {"c": 2}}']
+
+    def test_quotes_in_prose_ignored(self):
+        """Test that apostrophes and quotes outside objects do not start strings."""
+        text = 'I\'d say "use this": {"op": "list"}'
+
+        assert list(iter_json_objects(text)) == [{"op": "list"}]
+
+    def test_split_escape(self):
+        """Test that a backslash at a chunk boundary still escapes the next character."""
+        scanner = JSONStreamScanner()
+
+        assert scanner.feed('{"a": "\\') == []
+        assert scanner.feed('"}"}') == ['{"a": "\\"}"}']
+
+    def test_nested_recovery(self):
+        """Test that a valid object wrapped in invalid braces is still found."""
+        assert list(parse_json_candidate('{ note: {"a": 1} }')) == [{"a": 1}]
+
+    def test_no_object_raises(self):
+        """Test that responses without JSON still raise ResponseParsingError."""
+        with pytest.raises(ResponseParsingError):
+            DockerCommandParser().extract_json_from_response("{ nothing here }")
+
+
+class TestRecordedResponses:
+    """Test extraction over representative LLM outputs."""
+
+    @pytest.mark.parametrize("case", RESPONSES, ids=[c["name"] for c in RESPONSES])
+    def test_parse_response(self, case):
+        """Test that the intended answer is extracted from each response."""
+        assert (
+            DockerCommandParser().parse_response(case["response"]) == case["expected"]
+        )
+
+    @pytest.mark.parametrize("case", RESPONSES, ids=[c["name"] for c in RESPONSES])
+    def test_streaming_matches_whole(self, case):
+        """Test that any chunking of a response yields the same candidates."""
+        whole = JSONStreamScanner().feed(case["response"])
+        rng = random.Random(case["name"])
+
+        for _ in range(20):
+            assert scan_chunked(case["response"], rng) == whole
+
+
+class TestFuzz:
+    """Randomized robustness tests."""
+
+    ALPHABET = "abc {}[]\":,\\'\n 0123"
+
+    def test_random_input_never_crashes(self):
+        """Test that arbitrary brace/quote soup only ever raises ResponseParsingError."""
+        rng = random.Random(1234)
+        parser = DockerCommandParser()
+
+        for _ in range(2000):
+            text = "".join(rng.choice(self.ALPHABET) for _ in range(rng.randint(0, 80)))
+            try:
+                parser.parse_response(text)
+            except ResponseParsingError:
+                pass
+            assert scan_chunked(text, rng) == JSONStreamScanner().feed(text)
+
+    def test_objects_found_in_noise(self):
+        """Test that objects embedded in random prose are all recovered."""
+        rng = random.Random(99)
+        prose = "abc xyz 'quoted' \"text\" ,.:;\n"
+
+        for _ in range(300):
+            objects = [
+                {"k": rng.randint(0, 9), "s": '{}"\\' * rng.randint(0, 2)}
+                for _ in range(rng.randint(1, 4))
+            ]
+            parts = []
+            for obj in objects:
+                parts.append(
+                    "".join(rng.choice(prose) for _ in range(rng.randint(0, 30)))
+                )
+                parts.append(json.dumps(obj))
+            text = "".join(parts)
+
+            assert list(iter_json_objects(text)) == objects
+
+
+class TestScaling:
+    """Work done on long, chatty or deeply nested completions."""
+
+    @staticmethod
+    def chatty_response(size):
+        filler = 'Think {step} by {step}: the {container} {name} is "quoted". '
+        answer = json.dumps(RESPONSES[0]["expected"])
+        return filler * (size // len(filler)) + answer + " " + filler * 10
+
+    @staticmethod
+    def count_decodes(text):
+        """Parse ``text`` and count the decode attempts made on the way."""
+        decoder = MagicMock(wraps=json.JSONDecoder())
+        with patch("llm.engine.parser._DECODER", decoder):
+            objects = list(iter_json_objects(text))
+        return objects, decoder.raw_decode.call_count
+
+    def test_linear_work(self):
+        """Test that each candidate of a long response is decoded once."""
+        counts = []
+        for size in (100_000, 400_000):
+            text = self.chatty_response(size)
+            objects, decodes = self.count_decodes(text)
+            assert objects == [RESPONSES[0]["expected"]]
+            assert decodes == len(JSONStreamScanner().feed(text))
+            counts.append(decodes)
+
+        # 4x the input means roughly 4x the candidates, nowhere near 16x
+        assert counts[1] < counts[0] * 5
+
+    @pytest.mark.parametrize("depth", [100, 400, 5000])
+    def test_deeply_nested_invalid_object(self, depth):
+        """Test that objects still open where decoding failed are not decoded again."""
+        text = '{"a": ' * depth + "oops" + "}" * depth
+
+        objects, decodes = self.count_decodes(text)
+
+        assert objects == []
+        assert decodes == 1
+
+    def test_nested_recovery_decodes_each_object_once(self):
+        """Test that valid objects around the failure are found with one attempt each."""
+        text = '{"a": {"b": 1}, "c": {"d": {"e": 2}, "f": oops}, "g": {"h": 3}}'
+
+        objects, decodes = self.count_decodes(text)
+
+        assert objects == [{"b": 1}, {"e": 2}, {"h": 3}]
+        # The whole text, then {"b"...}, {"e"...} and {"h"...}
+        assert decodes == 4
+
+    def test_too_deep_for_the_decoder(self):
+        """Test that objects nested past the recursion limit are skipped, not raised."""
+        text = 'x {"a": ' + "[" * 5000 + "]" * 5000 + '} {"ok": true}'
+
+        assert list(iter_json_objects(text)) == [{"ok": True}]
+        with pytest.raises(ResponseParsingError):
+            DockerCommandParser().parse_response(
+                '{"a": ' + "[" * 5000 + "]" * 5000 + "}"
+            )
+
+    def test_streaming_chunks(self):
+        """Test that token-sized chunks of a long response yield the same candidates."""
+        text = self.chatty_response(200_000)
+        scanner = JSONStreamScanner()
+
+        candidates = []
+        for pos in range(0, len(text), 4):
+            candidates.extend(scanner.feed(text[pos : pos + 4]))
+
+        assert candidates == JSONStreamScanner().feed(text)
+        objects = [
+            obj for candidate in candidates for obj in parse_json_candidate(candidate)
+        ]
+        assert objects == [RESPONSES[0]["expected"]]
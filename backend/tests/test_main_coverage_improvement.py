@@ -686,7 +686,7 @@ class TestMainCoverageImprovement:
             }
 
             with patch("app.main.git_manager") as mock_git:
-                mock_git.commit_all = MagicMock()
+                mock_git.commit = AsyncMock()
 
                 with patch("builtins.open", create=True) as mock_open:
                     mock_open.return_value.__enter__.return_value = MagicMock()
@@ -833,7 +833,7 @@ class TestMainCoverageImprovement:
 
             with patch("app.main.inject_secrets_into_env") as mock_inject:
                 with patch("app.main.git_manager") as mock_git:
-                    mock_git.commit_all = MagicMock()
+                    mock_git.commit = AsyncMock()
 
                     with patch("builtins.open", create=True) as mock_open:
                         mock_open.return_value.__enter__.return_value = MagicMock()
@@ -1031,7 +1031,7 @@ class TestMainCoverageImprovement:
 
             with patch("app.main.inject_secrets_into_env") as mock_inject:
                 with patch("app.main.git_manager") as mock_git:
-                    mock_git.commit_all.side_effect = Exception("Git commit failed")
+                    mock_git.commit.side_effect = Exception("Git commit failed")
 
                     with patch("builtins.open", create=True) as mock_open:
                         mock_file = MagicMock()
@@ -1236,7 +1236,7 @@ class TestMainCoverageImprovement:
             }
 
             with patch("app.main.git_manager") as mock_git:
-                mock_git.commit_all.side_effect = Exception("Git commit failed")
+                mock_git.commit.side_effect = Exception("Git commit failed")
 
                 with patch("builtins.open", create=True) as mock_open:
                     mock_open.return_value.__enter__.return_value = MagicMock()
@@ -2551,10 +2551,10 @@ class TestMainCoverageImprovement:
             assert response.status_code == status.HTTP_500_INTERNAL_SERVER_ERROR
             assert "Docker daemon not running" in response.json()["detail"]
 
-    def test_deploy_containers_error(self, client_with_nlp_service):
+    def test_deploy_containers_error(self, client_with_admin_user):
         """Test deploy containers endpoint when operation fails."""
         with patch("app.main.git_manager") as mock_git:
-            mock_git.commit_all.side_effect = Exception("Git commit failed")
+            mock_git.commit.side_effect = Exception("Git commit failed")
 
             deploy_data = {
                 "config": {
@@ -2568,16 +2568,16 @@ class TestMainCoverageImprovement:
                 }
             }
 
-            response = client_with_nlp_service.post("/deploy", json=deploy_data)
+            response = client_with_admin_user.post("/deploy", json=deploy_data)
 
             assert response.status_code == status.HTTP_500_INTERNAL_SERVER_ERROR
             assert "Git commit failed" in response.json()["detail"]
 
-    def test_deploy_containers_invalid_config(self, client_with_nlp_service):
+    def test_deploy_containers_invalid_config(self, client_with_admin_user):
         """Test deploy containers endpoint with invalid config."""
         deploy_data = {}  # Missing config field entirely
 
-        response = client_with_nlp_service.post("/deploy", json=deploy_data)
+        response = client_with_admin_user.post("/deploy", json=deploy_data)
 
         assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
 
@@ -2677,10 +2677,10 @@ class TestMainCoverageImprovement:
             assert data["container_id"] == "test_container"
             assert data["logs"] == "Container log output"
 
-    def test_deploy_containers_success_scenario(self, client_with_nlp_service):
+    def test_deploy_containers_success_scenario(self, client_with_admin_user):
         """Test successful container deployment."""
         with patch("app.main.git_manager") as mock_git:
-            mock_git.commit_all.return_value = None
+            mock_git.commit = AsyncMock(return_value="")
 
             deploy_data = {
                 "config": {
@@ -2694,7 +2694,7 @@ class TestMainCoverageImprovement:
                 }
             }
 
-            response = client_with_nlp_service.post("/deploy", json=deploy_data)
+            response = client_with_admin_user.post("/deploy", json=deploy_data)
 
             assert response.status_code == status.HTTP_200_OK
             data = response.json()
@@ -3197,7 +3197,7 @@ class TestMainCoverageImprovement:
 
             with patch("app.main.inject_secrets_into_env") as mock_inject:
                 with patch("app.main.git_manager") as mock_git:
-                    mock_git.commit_all = MagicMock()
+                    mock_git.commit = AsyncMock()
 
                     with patch("builtins.open", create=True) as mock_open:
                         mock_file = MagicMock()
@@ -3215,7 +3215,7 @@ class TestMainCoverageImprovement:
 
                             assert response.status_code == status.HTTP_200_OK
                             # Verify git commit was called
-                            mock_git.commit_all.assert_called_once()
+                            mock_git.commit.assert_awaited_once()
                             # Verify secrets were injected
                             mock_inject.assert_called_once()
 
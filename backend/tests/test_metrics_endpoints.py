@@ -57,7 +57,7 @@ class TestMetricsEndpoints:
         def override_get_metrics_service():
             mock_service = MagicMock(spec=MetricsService)
             mock_service.get_current_metrics.return_value = {"error": "Container not found"}
-            mock_service.get_historical_metrics.return_value = []
+            mock_service.get_historical_metrics_async.return_value = []
             mock_service.get_system_metrics.return_value = {"error": "Docker daemon unavailable"}
             return mock_service
 
@@ -126,7 +126,7 @@ class TestMetricsEndpoints:
 
         def override_get_metrics_service():
             mock_service = MagicMock(spec=MetricsService)
-            mock_service.get_historical_metrics.return_value = sample_metrics
+            mock_service.get_historical_metrics_async.return_value = sample_metrics
             mock_service.get_current_metrics.return_value = {
                 "container_id": "test_container",
                 "cpu_percent": 25.0,
@@ -226,7 +226,7 @@ class TestMetricsEndpoints:
         def override_get_metrics_service():
             mock_service = MagicMock(spec=MetricsService)
             mock_service.get_current_metrics.side_effect = Exception("Service error")
-            mock_service.get_historical_metrics.side_effect = Exception("Database error")
+            mock_service.get_historical_metrics_async.side_effect = Exception("Database error")
             mock_service.get_system_metrics.side_effect = Exception("System error")
             return mock_service
 
@@ -44,13 +44,13 @@ class TestMetricsPerformance:
             "timestamp": "2024-01-01T00:00:00Z"
         }
 
-        service.get_historical_metrics.return_value = [
+        service.get_historical_metrics_async = AsyncMock(return_value=[
             {
                 "timestamp": "2024-01-01T00:00:00Z",
                 "cpu_percent": 25.5,
                 "memory_percent": 50.0
             }
-        ]
+        ])
         
         service.start_real_time_collection = AsyncMock(return_value={
             "container_id": "test_container",
@@ -0,0 +1,306 @@
+"""
+Tests for the delta-encoded v2 metrics WebSocket protocol.
+"""
+
+import json
+import random
+from datetime import datetime
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import msgpack
+import pytest
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.websocket.metrics_protocol import (
+    SUBPROTOCOL_JSON,
+    SUBPROTOCOL_MSGPACK,
+    MetricsStreamEncoder,
+    flatten_metrics,
+)
+from app.websocket.send_queue import ClientSendQueue, SlowConsumerPolicy
+
+
+def container_stats(container_id, cpu=10.0, rx=1000):
+    """Build a stats payload shaped like DockerManager.get_container_stats()."""
+    return {
+        "container_id": container_id,
+        "container_name": f"{container_id}-name",
+        "timestamp": "2024-01-01T00:00:00",
+        "cpu_percent": cpu,
+        "memory_usage": 256 * 1024 * 1024,
+        "memory_limit": 1024 * 1024 * 1024,
+        "memory_percent": 25.0,
+        "network_rx_bytes": rx,
+        "network_tx_bytes": 500,
+        "block_read_bytes": 0,
+        "block_write_bytes": 0,
+    }
+
+
+def apply_frame(state, frame):
+    """Reconstruct the numeric state a client holds after a frame."""
+    if frame["t"] == "k":
+        return dict(zip(frame["fields"], frame["values"])), frame["fields"]
+    values, fields = state
+    values = dict(values)
+    for index, value in frame["c"]:
+        values[fields[index]] = value
+    return values, fields
+
+
+class TestFlattenMetrics:
+    """Test metrics flattening."""
+
+    def test_nested_dicts_and_lists(self):
+        """Test that nested dicts and lists become dotted paths."""
+        flat = flatten_metrics(
+            {"a": 1, "b": {"c": 2.5, "d": {"e": "x"}}, "f": [3, {"g": 4}], "h": {}}
+        )
+
+        assert flat == {"a": 1, "b.c": 2.5, "b.d.e": "x", "f.0": 3, "f.1.g": 4, "h": {}}
+
+
+class TestMetricsStreamEncoder:
+    """Test keyframe and delta encoding."""
+
+    def test_keyframe_then_deltas(self):
+        """Test that only changed numeric fields are sent after the keyframe."""
+        encoder = MetricsStreamEncoder()
+
+        keyframe = encoder.encode_update(container_stats("web", cpu=10.0))
+        delta = encoder.encode_update(container_stats("web", cpu=12.5))
+
+        assert keyframe["t"] == "k"
+        assert keyframe["static"]["container_name"] == "web-name"
+        assert "container_name" not in keyframe["fields"]
+        assert delta == {
+            "t": "d",
+            "seq": 2,
+            "ts": delta["ts"],
+            "c": [[keyframe["fields"].index("cpu_percent"), 12.5]],
+        }
+
+    def test_unchanged_update_is_skipped(self):
+        """Test that an update without changes produces no frame."""
+        encoder = MetricsStreamEncoder(float_precision=2)
+        encoder.encode_update({"cpu_percent": 10.001})
+
+        assert encoder.encode_update({"cpu_percent": 10.004}) is None
+
+    def test_schema_or_static_change_sends_keyframe(self):
+        """Test that new fields or changed non-numeric values force a keyframe."""
+        encoder = MetricsStreamEncoder()
+        encoder.encode_update({"web": container_stats("web")})
+
+        assert (
+            encoder.encode_update(
+                {"web": container_stats("web"), "db": container_stats("db")}
+            )["t"]
+            == "k"
+        )
+        assert (
+            encoder.encode_update(
+                {
+                    "web": dict(container_stats("web"), container_name="renamed"),
+                    "db": container_stats("db"),
+                }
+            )["t"]
+            == "k"
+        )
+
+    def test_sample_timestamps_are_ignored(self):
+        """Test that per-sample timestamps do not defeat delta encoding."""
+        encoder = MetricsStreamEncoder()
+        keyframe = encoder.encode_update(container_stats("web"))
+
+        assert "timestamp" not in keyframe["static"]
+        assert (
+            encoder.encode_update(dict(container_stats("web"), timestamp="later"))
+            is None
+        )
+
+    def test_keyframe_interval_and_resync(self):
+        """Test periodic keyframes and client-requested resyncs."""
+        encoder = MetricsStreamEncoder(keyframe_interval=2)
+        frames = [encoder.encode_update({"cpu": float(i)})["t"] for i in range(4)]
+        assert frames == ["k", "d", "d", "k"]
+
+        encoder.request_keyframe()
+        assert encoder.encode_update({"cpu": 99.0})["t"] == "k"
+
+    def test_client_reconstructs_state(self):
+        """Test that applying frames in order reproduces every update."""
+        encoder = MetricsStreamEncoder(keyframe_interval=10)
+        rng = random.Random(7)
+        state = None
+
+        for _ in range(50):
+            metrics = {
+                cid: container_stats(
+                    cid, cpu=round(rng.uniform(0, 100), 2), rx=rng.randint(0, 3)
+                )
+                for cid in ("web", "db", "cache")
+            }
+            frame = encoder.encode_update(metrics)
+            if frame is not None:
+                state = apply_frame(state, frame)
+            expected = {
+                path: value
+                for path, value in flatten_metrics(metrics).items()
+                if isinstance(value, (int, float))
+            }
+            assert state[0] == expected
+
+    @pytest.mark.asyncio
+    async def test_keyframe_after_dropped_frame(self):
+        """Test that a frame dropped from a full send queue is repaired by a keyframe."""
+        queue = ClientSendQueue(
+            AsyncMock(), max_size=1, policy=SlowConsumerPolicy.DROP_OLDEST
+        )
+        encoder = MetricsStreamEncoder()
+
+        assert encoder.enqueue_update(queue, {"cpu": 1.0})
+        assert encoder.enqueue_update(queue, {"cpu": 2.0})
+        assert queue.stats["dropped"] == 1
+        encoder.enqueue_update(queue, {"cpu": 3.0})
+
+        assert json.loads(queue._queue[-1][1])["t"] == "k"
+        assert queue._keyed == {}
+
+    def test_msgpack_serialization(self):
+        """Test that msgpack frames round-trip."""
+        encoder = MetricsStreamEncoder("msgpack")
+        frame = encoder.encode_update(container_stats("web"))
+
+        assert msgpack.unpackb(encoder.serialize(frame), raw=False) == frame
+
+    def test_payload_size_reduction(self):
+        """Test that v2 sends several times fewer bytes than v1 for a large subscription."""
+        rng = random.Random(1)
+        containers = [f"container-{i}" for i in range(50)]
+        cpu = {cid: 10.0 for cid in containers}
+        encoders = {
+            "json": MetricsStreamEncoder("json"),
+            "msgpack": MetricsStreamEncoder("msgpack"),
+        }
+        v1_bytes = 0
+        v2_bytes = {"json": 0, "msgpack": 0}
+
+        for _ in range(20):
+            # A handful of containers change per interval
+            for cid in rng.sample(containers, 5):
+                cpu[cid] = round(rng.uniform(0, 100), 2)
+            metrics = {cid: container_stats(cid, cpu=cpu[cid]) for cid in containers}
+
+            v1_bytes += len(
+                json.dumps(
+                    {
+                        "type": "multiple_metrics_update",
+                        "timestamp": datetime.utcnow().isoformat(),
+                        "metrics": metrics,
+                    }
+                )
+            )
+            for name, encoder in encoders.items():
+                frame = encoder.encode_update(metrics)
+                if frame is not None:
+                    v2_bytes[name] += len(encoder.serialize(frame))
+
+        assert v1_bytes / v2_bytes["json"] > 5
+        assert v2_bytes["msgpack"] < v2_bytes["json"]
+
+
+class TestNegotiation:
+    """Test protocol negotiation."""
+
+    def _websocket(self, subprotocols=None, query=None):
+        websocket = MagicMock()
+        websocket.scope = {"subprotocols": subprotocols or []}
+        websocket.query_params = query or {}
+        return websocket
+
+    def test_v1_by_default(self):
+        """Test that clients that do not ask for v2 keep the v1 protocol."""
+        assert MetricsStreamEncoder.negotiate(self._websocket()) is None
+
+    def test_subprotocol(self):
+        """Test negotiation through WebSocket subprotocols."""
+        encoder = MetricsStreamEncoder.negotiate(
+            self._websocket([SUBPROTOCOL_JSON, SUBPROTOCOL_MSGPACK])
+        )
+
+        assert encoder.encoding == "msgpack"
+        assert encoder.subprotocol == SUBPROTOCOL_MSGPACK
+
+    def test_query_parameters(self):
+        """Test negotiation through query parameters."""
+        encoder = MetricsStreamEncoder.negotiate(
+            self._websocket(query={"protocol": "v2", "encoding": "json"})
+        )
+
+        assert encoder.encoding == "json"
+        assert encoder.subprotocol is None
+
+
+class TestMetricsWebSocketV2:
+    """Test the metrics WebSocket endpoints speaking v2."""
+
+    @pytest.fixture
+    def metrics_service(self):
+        """Patch WebSocket authentication and the metrics service."""
+        with patch(
+            "app.auth.dependencies.get_current_user_websocket",
+            AsyncMock(return_value=MagicMock()),
+        ), patch("app.main.get_metrics_service") as mock_get_metrics:
+            mock_get_metrics.return_value.get_current_metrics.return_value = (
+                container_stats("web")
+            )
+            yield mock_get_metrics.return_value
+
+    def test_json_keyframe(self, metrics_service):
+        """Test that a v2 client receives a compact keyframe."""
+        with TestClient(app).websocket_connect(
+            "/ws/metrics/web?protocol=v2"
+        ) as websocket:
+            established = json.loads(websocket.receive_text())
+            keyframe_text = websocket.receive_text()
+
+        assert established["protocol"] == 2
+        assert " " not in keyframe_text
+        assert json.loads(keyframe_text)["static"]["container_name"] == "web-name"
+
+    def test_msgpack_subprotocol(self, metrics_service):
+        """Test that a msgpack client receives binary frames and the chosen subprotocol."""
+        with TestClient(app).websocket_connect(
+            "/ws/metrics/web", subprotocols=[SUBPROTOCOL_MSGPACK]
+        ) as websocket:
+            assert websocket.accepted_subprotocol == SUBPROTOCOL_MSGPACK
+            established = msgpack.unpackb(websocket.receive_bytes())
+            keyframe = msgpack.unpackb(websocket.receive_bytes())
+
+        assert established["encoding"] == "msgpack"
+        assert keyframe["t"] == "k"
+
+    def test_multiple_route_not_shadowed(self, metrics_service):
+        """Test that /ws/metrics/multiple reaches the multi-container endpoint."""
+        with TestClient(app).websocket_connect(
+            "/ws/metrics/multiple?protocol=v2"
+        ) as websocket:
+            established = json.loads(websocket.receive_text())
+
+        assert established["message"] == "Connected to multiple metrics stream"
+
+    def test_msgpack_error_frame(self, metrics_service):
+        """Test that errors reach a msgpack client in msgpack."""
+        metrics_service.get_current_metrics.return_value = {
+            "error": "Container not found"
+        }
+        with TestClient(app).websocket_connect(
+            "/ws/metrics/web", subprotocols=[SUBPROTOCOL_MSGPACK]
+        ) as websocket:
+            msgpack.unpackb(websocket.receive_bytes())
+            error = msgpack.unpackb(websocket.receive_bytes())
+
+        assert error["type"] == "error"
+        assert error["message"] == "Container not found"
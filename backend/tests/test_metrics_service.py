@@ -9,6 +9,7 @@ import pytest
 from sqlalchemy.orm import Session
 
 from app.db.models import ContainerMetrics, MetricsAlert, User
+from app.services.alert_rule_engine import AlertRuleEngine
 from app.services.metrics_service import MetricsService
 from docker_manager.manager import DockerManager
 
@@ -29,7 +30,9 @@ class TestMetricsService:
     @pytest.fixture
     def metrics_service(self, mock_db_session, mock_docker_manager):
         """Create a MetricsService instance with mocked dependencies."""
-        return MetricsService(mock_db_session, mock_docker_manager)
+        return MetricsService(
+            mock_db_session, mock_docker_manager, alert_engine=AlertRuleEngine()
+        )
 
     @pytest.fixture
     def sample_stats(self):
@@ -352,6 +355,28 @@ class TestMetricsService:
         assert "error" not in result
         assert result["name"] == "New Name"
 
+    def test_update_alert_invalid_rule(self, metrics_service, mock_db_session):
+        """Test that alert updates validate rule settings before writing."""
+        mock_alert = MagicMock()
+        mock_alert.for_samples = 1
+        mock_db_session.query.return_value.filter.return_value.first.return_value = (
+            mock_alert
+        )
+
+        result = metrics_service.update_alert(
+            alert_id=1, user_id=1, update_data={"for_samples": 0}
+        )
+        assert result == {"error": "for_samples must be at least 1"}
+        assert metrics_service.update_alert(
+            alert_id=1, user_id=1, update_data={"rule_type": "spike"}
+        )["error"].startswith("rule_type must be one of")
+        mock_db_session.commit.assert_not_called()
+
+        metrics_service.update_alert(
+            alert_id=1, user_id=1, update_data={"hysteresis": "2.5", "for_samples": "3"}
+        )
+        assert (mock_alert.hysteresis, mock_alert.for_samples) == (2.5, 3)
+
     def test_update_alert_not_found(self, metrics_service, mock_db_session):
         """Test alert update when alert not found."""
         mock_db_session.query.return_value.filter.return_value.first.return_value = None
@@ -431,6 +456,9 @@ class TestMetricsService:
         mock_alert1.metric_type = "cpu_percent"
         mock_alert1.threshold_value = 80.0
         mock_alert1.comparison_operator = ">"
+        mock_alert1.rule_type = "threshold"
+        mock_alert1.hysteresis = 0.0
+        mock_alert1.for_samples = 1
         mock_alert1.is_triggered = False
         mock_alert1.trigger_count = 0
 
@@ -442,6 +470,9 @@ class TestMetricsService:
         mock_alert2.metric_type = "memory_percent"
         mock_alert2.threshold_value = 90.0
         mock_alert2.comparison_operator = ">"
+        mock_alert2.rule_type = "threshold"
+        mock_alert2.hysteresis = 0.0
+        mock_alert2.for_samples = 1
         mock_alert2.is_triggered = False
         mock_alert2.trigger_count = 0
 
@@ -464,14 +495,18 @@ class TestMetricsService:
         assert result[0]["alert_name"] == "CPU Alert"
         assert result[0]["metric_value"] == 85.0
 
-        # Verify alert state was updated
-        assert mock_alert1.is_triggered == True
-        assert mock_alert1.trigger_count == 1
-        assert hasattr(mock_alert1, "last_triggered_at")
+        # Verify alert state was updated (and queued for a batched write)
+        engine = metrics_service.alert_engine
+        state = engine.get_rule_state(1)
+        assert state["is_triggered"] == True
+        assert state["trigger_count"] == 1
+        assert state["last_triggered_at"] is not None
+        assert engine.pending() == 1
 
         # Verify second alert was not triggered
-        assert mock_alert2.is_triggered == False
-        assert mock_alert2.trigger_count == 0
+        state = engine.get_rule_state(2)
+        assert state["is_triggered"] == False
+        assert state["trigger_count"] == 0
 
     def test_check_alerts_reset_condition(self, metrics_service, mock_db_session):
         """Test alert reset when condition is no longer met."""
@@ -483,6 +518,9 @@ class TestMetricsService:
         mock_alert.metric_type = "cpu_percent"
         mock_alert.threshold_value = 80.0
         mock_alert.comparison_operator = ">"
+        mock_alert.rule_type = "threshold"
+        mock_alert.hysteresis = 0.0
+        mock_alert.for_samples = 1
         mock_alert.is_triggered = True  # Currently triggered
         mock_alert.trigger_count = 1
 
@@ -501,45 +539,19 @@ class TestMetricsService:
         assert len(result) == 0
 
         # Verify alert was reset
-        assert mock_alert.is_triggered == False
-
-    def test_evaluate_alert_condition_operators(self, metrics_service):
-        """Test alert condition evaluation with different operators."""
-        # Test greater than
-        assert metrics_service._evaluate_alert_condition(85.0, 80.0, ">") == True
-        assert metrics_service._evaluate_alert_condition(75.0, 80.0, ">") == False
-
-        # Test less than
-        assert metrics_service._evaluate_alert_condition(75.0, 80.0, "<") == True
-        assert metrics_service._evaluate_alert_condition(85.0, 80.0, "<") == False
-
-        # Test greater than or equal
-        assert metrics_service._evaluate_alert_condition(80.0, 80.0, ">=") == True
-        assert metrics_service._evaluate_alert_condition(85.0, 80.0, ">=") == True
-        assert metrics_service._evaluate_alert_condition(75.0, 80.0, ">=") == False
-
-        # Test less than or equal
-        assert metrics_service._evaluate_alert_condition(80.0, 80.0, "<=") == True
-        assert metrics_service._evaluate_alert_condition(75.0, 80.0, "<=") == True
-        assert metrics_service._evaluate_alert_condition(85.0, 80.0, "<=") == False
-
-        # Test equal
-        assert metrics_service._evaluate_alert_condition(80.0, 80.0, "==") == True
-        assert metrics_service._evaluate_alert_condition(85.0, 80.0, "==") == False
-
-        # Test not equal
-        assert metrics_service._evaluate_alert_condition(85.0, 80.0, "!=") == True
-        assert metrics_service._evaluate_alert_condition(80.0, 80.0, "!=") == False
-
-        # Test unknown operator
-        assert metrics_service._evaluate_alert_condition(85.0, 80.0, "unknown") == False
+        assert metrics_service.alert_engine.get_rule_state(1)["is_triggered"] == False
 
     def test_check_alerts_missing_metric(self, metrics_service, mock_db_session):
         """Test alert checking when metric is missing from current data."""
         mock_alert = MagicMock()
+        mock_alert.id = 1
+        mock_alert.container_id = "test-container"
         mock_alert.metric_type = "cpu_percent"
         mock_alert.threshold_value = 80.0
         mock_alert.comparison_operator = ">"
+        mock_alert.rule_type = "threshold"
+        mock_alert.hysteresis = 0.0
+        mock_alert.for_samples = 1
         mock_alert.is_triggered = False
 
         mock_db_session.query.return_value.filter.return_value.all.return_value = [
@@ -555,7 +567,7 @@ class TestMetricsService:
 
         # Verify no alerts were triggered
         assert len(result) == 0
-        assert mock_alert.is_triggered == False
+        assert metrics_service.alert_engine.get_rule_state(1)["is_triggered"] == False
 
     def test_check_alerts_exception(self, metrics_service, mock_db_session):
         """Test alert checking with database exception."""
@@ -92,7 +92,8 @@ class TestIntentParser:
         mock_client.send_query.return_value = mock_llm_response
         mock_llm_client_class.return_value = mock_client
         
-        parser = IntentParser()
+        # Exercise the LLM path for a command the rules would answer
+        parser = IntentParser(use_rules=False)
         result = await parser.parse("list all containers")
         
         assert result["is_docker_command"] is True
@@ -265,7 +266,8 @@ class TestIntentParser:
         mock_client.send_query.return_value = mock_llm_response
         mock_llm_client_class.return_value = mock_client
         
-        parser = IntentParser()
+        # Exercise the LLM path for a command the rules would answer
+        parser = IntentParser(use_rules=False)
         result = await parser.parse("restart all containers")
         
         # Verify default model was used
@@ -275,6 +277,40 @@ class TestIntentParser:
         assert result["command_type"] == "container"
         assert result["operation"] == "restart"
 
+    @patch('nlp.intent.SettingsManager')
+    @patch('nlp.intent.LLMClient')
+    @pytest.mark.asyncio
+    async def test_reload_applies_new_settings(self, mock_llm_client_class, mock_settings_manager_class):
+        """Test that reloading picks up a changed model and drops cached parses."""
+        mock_settings_manager_class.return_value.load.return_value = {
+            "llm_provider": "openrouter",
+            "llm_model": "old/model",
+        }
+        mock_client = AsyncMock()
+        mock_client.send_query.return_value = json.dumps({
+            "is_docker_command": True,
+            "command_type": "container",
+            "operation": "restart",
+            "parameters": {},
+        })
+        mock_llm_client_class.return_value = mock_client
+
+        parser = IntentParser(use_rules=False)
+        await parser.parse("restart all containers")
+        old_gateway = parser._llm_client
+
+        mock_settings_manager_class.return_value.load.return_value = {
+            "llm_provider": "openrouter",
+            "llm_model": "new/model",
+        }
+        await parser.reload()
+        await parser.parse("restart all containers")
+
+        assert parser._llm_client is not old_gateway
+        assert parser.cache.get_stats()["entries"] == 1
+        assert mock_client.send_query.call_args[1]["params"]["model"] == "new/model"
+        mock_client.aclose.assert_called_once()
+
     def test_fallback_parse_edge_cases(self):
         """Test fallback parsing for edge cases."""
         parser = IntentParser()
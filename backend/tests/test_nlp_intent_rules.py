@@ -0,0 +1,172 @@
+"""
+Tests for the rule-based intent classifier.
+"""
+
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+
+from nlp.intent import IntentParser
+from nlp.intent_rules import PhraseTrie, RuleIntentClassifier, tokenize
+
+
+@pytest.fixture
+def classifier():
+    """Create a classifier that knows a few containers and templates."""
+    return RuleIntentClassifier(
+        containers=["web", "db", "api-server"], templates=["wordpress", "lemp"]
+    )
+
+
+class TestPhraseTrie:
+    """Test longest-match phrase lookup."""
+
+    def test_longest_match(self):
+        """Test that the longest phrase at a position wins."""
+        trie = PhraseTrie()
+        trie.add("show", ("verb", "list"))
+        trie.add("show logs", ("verb", "logs"))
+
+        assert trie.longest_match(tokenize("show logs for web"), 0) == (
+            2,
+            {("verb", "logs")},
+        )
+        assert trie.longest_match(tokenize("show me"), 0) == (1, {("verb", "list")})
+        assert trie.longest_match(tokenize("web"), 0) == (0, set())
+
+
+class TestRuleIntentClassifier:
+    """Test classification of common commands."""
+
+    @pytest.mark.parametrize(
+        "command,operation,docker_command",
+        [
+            ("restart web", "restart", "docker restart web"),
+            ("Stop the api-server container", "stop", "docker stop api-server"),
+            ("stop web and db", "stop", "docker stop web db"),
+            ("show me the logs for web", "logs", "docker logs --tail 100 web"),
+            ("tail the last 50 lines of db", "logs", "docker logs --tail 50 db"),
+            ("list all containers", "list", "docker ps -a"),
+            ("docker ps", "list", "docker ps"),
+            ("show stats for db", "stats", "docker stats --no-stream db"),
+            ("restart all containers", "restart", "docker restart $(docker ps -aq)"),
+        ],
+    )
+    def test_resolves_common_commands(
+        self, classifier, command, operation, docker_command
+    ):
+        """Test that simple commands are resolved with high confidence."""
+        result = classifier.classify(command)
+
+        assert result["operation"] == operation
+        assert result["docker_command"] == docker_command
+        assert classifier.is_confident(result)
+        assert result["source"] == "rules"
+
+    def test_deploy_template(self, classifier):
+        """Test that deploying a known template is resolved."""
+        result = classifier.classify("deploy wordpress")
+
+        assert result["command_type"] == "compose"
+        assert result["operation"] == "up"
+        assert result["parameters"] == {"template": "wordpress"}
+        assert classifier.is_confident(result)
+
+    @pytest.mark.parametrize(
+        "command",
+        [
+            "start webapp",  # unknown container
+            "create container",  # no template
+            "stop web and start db",  # compound command
+            "deploy a wordpress stack with mysql 8 and redis",  # extra parameters
+        ],
+    )
+    def test_low_confidence_defers(self, classifier, command):
+        """Test that ambiguous or parameterized commands are left to the LLM."""
+        result = classifier.classify(command)
+
+        assert result is not None
+        assert not classifier.is_confident(result)
+
+    def test_unmatched(self, classifier):
+        """Test that commands without a known verb return None."""
+        assert classifier.classify("run nginx on port 80") is None
+        assert classifier.get_stats()["unmatched"] == 1
+
+    def test_update_entities(self, classifier):
+        """Test that recompiling picks up new container names."""
+        assert not classifier.is_confident(classifier.classify("start cache"))
+
+        classifier.update_entities(containers=["cache"])
+
+        assert (
+            classifier.classify("start cache")["docker_command"] == "docker start cache"
+        )
+
+
+class TestIntentParserRules:
+    """Test that the intent parser resolves confident commands locally."""
+
+    @pytest.mark.asyncio
+    @patch("nlp.intent.list_templates", return_value=[{"name": "wordpress"}])
+    @patch("nlp.intent.SettingsManager")
+    @patch("nlp.intent.LLMClient")
+    async def test_simple_command_skips_llm(
+        self, mock_llm_client_class, mock_settings_manager_class, mock_list_templates
+    ):
+        """Test that a command resolved by the rules never reaches the LLM."""
+        mock_client = AsyncMock()
+        mock_llm_client_class.return_value = mock_client
+        source = MagicMock(return_value=["web", "db"])
+
+        parser = IntentParser(container_source=source)
+        result = await parser.parse("restart web")
+        await parser.parse("deploy wordpress")
+
+        assert result["operation"] == "restart"
+        assert result["parameters"]["containers"] == ["web"]
+        mock_client.send_query.assert_not_called()
+        # Entity names are refreshed on an interval, not on every parse
+        source.assert_called_once()
+        assert parser.get_stats()["rules"]["resolved"] == 2
+
+    @pytest.mark.asyncio
+    @patch("nlp.intent.list_templates", return_value=[])
+    @patch("nlp.intent.SettingsManager")
+    @patch("nlp.intent.LLMClient")
+    async def test_unknown_container_uses_llm(
+        self, mock_llm_client_class, mock_settings_manager_class, mock_list_templates
+    ):
+        """Test that low-confidence commands fall through to the LLM."""
+        mock_settings_manager_class.return_value.load.return_value = {
+            "llm_provider": "ollama"
+        }
+        mock_client = AsyncMock()
+        mock_client.send_query.return_value = (
+            '{"is_docker_command": true, "command_type": "container", "operation": "start",'
+            ' "parameters": {"name": "webapp"}, "missing_info": [], "explanation": "Start webapp"}'
+        )
+        mock_llm_client_class.return_value = mock_client
+
+        parser = IntentParser(container_source=lambda: ["web"])
+        result = await parser.parse("start webapp")
+
+        mock_client.send_query.assert_called_once()
+        assert result["parameters"] == {"name": "webapp"}
+
+    @pytest.mark.asyncio
+    @patch("nlp.intent.list_templates", return_value=[])
+    @patch("nlp.intent.SettingsManager")
+    async def test_container_source_failure(
+        self, mock_settings_manager_class, mock_list_templates
+    ):
+        """Test that an unreachable Docker host only disables container names."""
+
+        def unavailable():
+            raise ConnectionError("Docker socket not found")
+
+        parser = IntentParser(container_source=unavailable)
+        result = await parser.parse("list containers")
+
+        assert result["operation"] == "list"
+        assert result["source"] == "rules"
@@ -0,0 +1,163 @@
+"""
+Tests for the NLP command parse cache.
+"""
+
+import json
+import time
+import zlib
+from unittest.mock import AsyncMock, patch
+
+import numpy as np
+import pytest
+
+from nlp.intent import IntentParser
+from nlp.parse_cache import ParseCache, normalize_command
+
+PARSED = {
+    "is_docker_command": True,
+    "command_type": "container",
+    "operation": "list",
+    "parameters": {},
+    "explanation": "List containers",
+}
+
+
+def bag_of_words(text):
+    """Local stand-in embedding model: hashed word counts."""
+    vector = np.zeros(64)
+    for word in text.split():
+        vector[zlib.crc32(word.encode()) % 64] += 1.0
+    return vector
+
+
+def cache_key(command, model="llama"):
+    return ("ollama", model, "v1", command)
+
+
+class TestParseCache:
+    """Test exact and semantic cache levels."""
+
+    def test_normalize_command(self):
+        """Test that case, whitespace and trailing punctuation are ignored."""
+        assert normalize_command("  List   Containers!\n") == "list containers"
+
+    def test_exact_hit_returns_copy(self):
+        """Test that a normalized repeat hits and callers cannot mutate the cached parse."""
+        cache = ParseCache()
+        cache.put(*cache_key("list containers"), PARSED)
+
+        hit = cache.get(*cache_key("List containers."))
+        hit["parameters"]["changed"] = True
+
+        assert cache.get(*cache_key("list containers")) == PARSED
+        assert cache.stats["exact_hits"] == 2
+
+    def test_key_includes_provider_model_and_version(self):
+        """Test that a parse is not reused across models or prompt versions."""
+        cache = ParseCache()
+        cache.put(*cache_key("list containers"), PARSED)
+
+        assert cache.get("ollama", "other", "v1", "list containers") is None
+        assert cache.get("ollama", "llama", "v2", "list containers") is None
+        assert cache.get("openrouter", "llama", "v1", "list containers") is None
+
+    def test_lru_eviction_and_ttl(self):
+        """Test that the least recently used entry is evicted and expired entries miss."""
+        cache = ParseCache(max_entries=2)
+        cache.put(*cache_key("a"), PARSED)
+        cache.put(*cache_key("b"), PARSED)
+        cache.get(*cache_key("a"))
+        cache.put(*cache_key("c"), PARSED)
+
+        assert cache.get(*cache_key("b")) is None
+        assert cache.get(*cache_key("a")) is not None
+        assert cache.stats["evictions"] == 1
+
+        cache.ttl = 0
+        time.sleep(0.001)
+        assert cache.get(*cache_key("a")) is None
+
+    def test_semantic_hit_above_threshold(self):
+        """Test that a similar command reuses the parse when above the threshold."""
+        cache = ParseCache(embedder=bag_of_words, similarity_threshold=0.8)
+        cache.put(*cache_key("list all running containers"), PARSED)
+
+        assert cache.get(*cache_key("list all the running containers")) == PARSED
+        assert cache.get(*cache_key("remove the nginx image")) is None
+        assert cache.stats["semantic_hits"] == 1
+        assert cache.stats["misses"] == 1
+
+    def test_semantic_level_scoped_by_model(self):
+        """Test that semantic matches are only made within the same model."""
+        cache = ParseCache(embedder=bag_of_words, similarity_threshold=0.8)
+        cache.put(*cache_key("list all running containers"), PARSED)
+
+        assert (
+            cache.get(*cache_key("list all the running containers", model="other"))
+            is None
+        )
+
+    def test_stats_hit_rate(self):
+        """Test that hit rate counts both levels."""
+        cache = ParseCache()
+        cache.put(*cache_key("list containers"), PARSED)
+        cache.get(*cache_key("list containers"))
+        cache.get(*cache_key("stop nginx"))
+
+        stats = cache.get_stats()
+        assert stats["hit_rate"] == 0.5
+        assert stats["entries"] == 1
+        assert stats["semantic_enabled"] is False
+
+
+class TestIntentParserCache:
+    """Test that the intent parser uses the cache."""
+
+    @pytest.mark.asyncio
+    @patch("nlp.intent.SettingsManager")
+    @patch("nlp.intent.LLMClient")
+    async def test_repeat_command_skips_llm(
+        self, mock_llm_client_class, mock_settings_manager_class
+    ):
+        """Test that a repeated command is answered from the cache without an LLM call."""
+        mock_settings_manager_class.return_value.load.return_value = {
+            "llm_provider": "ollama",
+            "llm_model": "llama",
+        }
+        mock_client = AsyncMock()
+        mock_client.send_query.return_value = json.dumps({**PARSED, "missing_info": []})
+        mock_llm_client_class.return_value = mock_client
+
+        parser = IntentParser(cache=ParseCache(), use_rules=False)
+        first = await parser.parse("list containers")
+        started = time.perf_counter()
+        second = await parser.parse("List containers")
+        elapsed = time.perf_counter() - started
+
+        assert second == first
+        mock_client.send_query.assert_called_once()
+        # Settings are read once when the parser is created, not per parse
+        mock_settings_manager_class.return_value.load.assert_called_once()
+        assert parser.cache.stats["exact_hits"] == 1
+        assert elapsed < 0.01
+
+    @pytest.mark.asyncio
+    @patch("nlp.intent.SettingsManager")
+    @patch("nlp.intent.LLMClient")
+    async def test_unparseable_response_not_cached(
+        self, mock_llm_client_class, mock_settings_manager_class
+    ):
+        """Test that fallback results for unparseable responses are not cached."""
+        mock_settings_manager_class.return_value.load.return_value = {
+            "llm_provider": "ollama"
+        }
+        mock_client = AsyncMock()
+        mock_client.send_query.return_value = "not json"
+        mock_llm_client_class.return_value = mock_client
+
+        parser = IntentParser(cache=ParseCache(), use_rules=False)
+        await parser.parse("do something")
+        await parser.parse("do something")
+
+        assert mock_client.send_query.await_count == 2
+        assert parser.cache.get_stats()["entries"] == 0
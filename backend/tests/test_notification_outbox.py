@@ -0,0 +1,303 @@
+"""
+Tests for the durable notification outbox.
+"""
+
+import asyncio
+import json
+import uuid
+from datetime import datetime, timedelta
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+from sqlalchemy.orm import Session
+
+from app.db.models import NotificationOutbox, User, UserRole
+from app.services.alert_rule_engine import AlertRule
+from app.services.metrics_service import MetricsService
+from app.services.notification_outbox import NotificationOutboxService as Outbox
+from tests.conftest import TestingSessionLocal
+
+
+class FakeManager:
+    """Connection hub stand-in with a pipelined Redis client."""
+
+    def __init__(self, with_redis: bool = True):
+        self.send_personal_message = AsyncMock()
+        self.pipe = MagicMock()
+        self.pipe.execute = AsyncMock(return_value=[])
+        self.redis_client = MagicMock() if with_redis else None
+        if with_redis:
+            self.redis_client.pipeline.return_value = self.pipe
+
+
+@pytest.fixture
+def db_session():
+    """Create a database session with an empty outbox."""
+    session = TestingSessionLocal()
+    session.query(NotificationOutbox).delete()
+    session.commit()
+    try:
+        yield session
+    finally:
+        session.close()
+
+
+@pytest.fixture
+def user(db_session: Session):
+    """Create an alert owner."""
+    unique_id = str(uuid.uuid4())[:8]
+    user = User(
+        username=f"outbox_{unique_id}",
+        email=f"outbox_{unique_id}@example.com",
+        hashed_password="hashed_password",
+        role=UserRole.USER,
+        is_active=True,
+    )
+    db_session.add(user)
+    db_session.commit()
+    db_session.refresh(user)
+    return user
+
+
+@pytest.fixture
+def email_service():
+    """Create a configured email service stand-in."""
+    service = MagicMock()
+    service.is_configured.return_value = True
+    service.send_email = AsyncMock(return_value=True)
+    return service
+
+
+@pytest.fixture
+def outbox(email_service):
+    """Create an outbox bound to the test database."""
+    return Outbox(
+        session_factory=TestingSessionLocal,
+        manager=FakeManager(),
+        email_service=email_service,
+        poll_interval=0.05,
+        max_attempts=3,
+    )
+
+
+def triggered(user, alert_id=1, trigger_count=1, value=95.0, fired_at=None):
+    """Build a triggered alert entry as returned by the alert rule engine."""
+    rule = AlertRule(
+        id=alert_id,
+        name="High CPU",
+        description=None,
+        container_id="web",
+        container_name="web",
+        metric_type="cpu_percent",
+        threshold_value=80.0,
+        comparison_operator=">",
+        created_by=user.id,
+    )
+    return {
+        "alert": rule,
+        "alert_id": alert_id,
+        "metric_value": value,
+        "trigger_count": trigger_count,
+        "fired_at": fired_at or datetime(2026, 1, 1, 12, 0, trigger_count),
+    }
+
+
+def outbox_rows(db_session):
+    db_session.expire_all()
+    return db_session.query(NotificationOutbox).order_by(NotificationOutbox.id).all()
+
+
+class TestEnqueue:
+    """Test appending notifications to the outbox."""
+
+    def test_enqueue_alerts(self, outbox, user, db_session):
+        """Test that triggered alerts become pending outbox rows."""
+        added = outbox.enqueue_alerts(
+            db_session, [triggered(user, 1), triggered(user, 2)]
+        )
+
+        rows = outbox_rows(db_session)
+        assert added == 2
+        assert [row.status for row in rows] == ["pending", "pending"]
+        payload = json.loads(rows[0].payload)
+        assert payload["type"] == "alert_triggered"
+        assert payload["alert"]["current_value"] == 95.0
+        assert payload["notification_id"] == rows[0].idempotency_key
+
+    def test_same_firing_enqueued_once(self, outbox, user, db_session):
+        """Test that the idempotency key drops repeated enqueues of one firing."""
+        outbox.enqueue_alerts(db_session, [triggered(user, 1, trigger_count=3)])
+        added = outbox.enqueue_alerts(
+            db_session,
+            [triggered(user, 1, trigger_count=3), triggered(user, 1, trigger_count=4)],
+        )
+
+        assert added == 1
+        assert len(outbox_rows(db_session)) == 2
+        assert outbox.stats["duplicates"] == 1
+
+    def test_repeated_trigger_count_after_restart(self, outbox, user, db_session):
+        """Test that a firing reusing a trigger count lost in a crash is still delivered."""
+        outbox.enqueue_alerts(db_session, [triggered(user, 1, trigger_count=3)])
+        added = outbox.enqueue_alerts(
+            db_session,
+            [triggered(user, 1, trigger_count=3, fired_at=datetime(2026, 1, 1, 13, 0))],
+        )
+
+        assert added == 1
+        assert len(outbox_rows(db_session)) == 2
+
+    def test_metrics_service_queues_notifications(self, user, db_session):
+        """Test that alert triggers only write to the outbox, with no event loop needed."""
+        service = MetricsService(db_session, MagicMock())
+
+        service._send_alert_notifications([triggered(user, 7)])
+
+        rows = outbox_rows(db_session)
+        assert len(rows) == 1
+        assert rows[0].user_id == user.id
+
+
+class TestDelivery:
+    """Test batched delivery."""
+
+    @pytest.mark.asyncio
+    async def test_batch_delivered_on_all_channels(
+        self, outbox, user, db_session, email_service
+    ):
+        """Test that a batch uses one history pipeline and marks rows delivered."""
+        outbox.enqueue_alerts(db_session, [triggered(user, i) for i in range(1, 4)])
+
+        processed = await outbox.deliver_batch()
+
+        manager = outbox.manager
+        assert processed == 3
+        assert manager.send_personal_message.await_count == 3
+        manager.redis_client.pipeline.assert_called_once()
+        manager.pipe.execute.assert_awaited_once()
+        assert manager.pipe.lpush.call_count == 3
+        manager.pipe.ltrim.assert_called_with(f"notifications:user:{user.id}", 0, 99)
+        # The three alerts share one recipient, so they go out as one digest
+        email_service.send_email.assert_awaited_once()
+        assert "3 alerts" in email_service.send_email.call_args[1]["subject"]
+        rows = outbox_rows(db_session)
+        assert {row.status for row in rows} == {"delivered"}
+        assert rows[0].channels_done == "email,history,websocket"
+        assert rows[0].locked_by is None
+
+    @pytest.mark.asyncio
+    async def test_failed_channel_retried_alone(
+        self, outbox, user, db_session, email_service
+    ):
+        """Test that a retry repeats only the channel that failed, after a backoff."""
+        outbox.enqueue_alerts(db_session, [triggered(user)])
+        email_service.send_email.side_effect = [Exception("SMTP down"), True]
+
+        await outbox.deliver_batch()
+
+        row = outbox_rows(db_session)[0]
+        assert row.status == "pending"
+        assert row.attempts == 1
+        assert row.channels_done == "history,websocket"
+        assert "SMTP down" in row.last_error
+        assert row.next_attempt_at > datetime.utcnow()
+        assert await outbox.deliver_batch() == 0
+
+        row.next_attempt_at = datetime.utcnow() - timedelta(seconds=1)
+        db_session.commit()
+        await outbox.deliver_batch()
+
+        row = outbox_rows(db_session)[0]
+        assert row.status == "delivered"
+        assert outbox.manager.send_personal_message.await_count == 1
+        assert email_service.send_email.await_count == 2
+
+    @pytest.mark.asyncio
+    async def test_gives_up_after_max_attempts(
+        self, outbox, user, db_session, email_service
+    ):
+        """Test that a notification is marked failed after max_attempts."""
+        outbox.enqueue_alerts(db_session, [triggered(user)])
+        email_service.send_email.return_value = False
+
+        for _ in range(outbox.max_attempts):
+            db_session.query(NotificationOutbox).update(
+                {
+                    NotificationOutbox.next_attempt_at: datetime.utcnow()
+                    - timedelta(seconds=1)
+                }
+            )
+            db_session.commit()
+            await outbox.deliver_batch()
+
+        row = outbox_rows(db_session)[0]
+        assert row.status == "failed"
+        assert row.attempts == outbox.max_attempts
+        assert outbox.stats["failed"] == 1
+
+    @pytest.mark.asyncio
+    async def test_digest_window(self, outbox, user, db_session, email_service):
+        """Test that alerts within a user's digest window are collapsed into one email."""
+        outbox.enqueue_alerts(db_session, [triggered(user, 1)])
+        await outbox.deliver_batch()
+        assert email_service.send_email.await_count == 1
+
+        outbox.enqueue_alerts(db_session, [triggered(user, 2), triggered(user, 3)])
+        await outbox.deliver_batch()
+
+        # Pushed immediately, emailed once the window closes
+        assert email_service.send_email.await_count == 1
+        assert outbox.manager.send_personal_message.await_count == 3
+        deferred = [row for row in outbox_rows(db_session) if row.status == "pending"]
+        assert len(deferred) == 2
+        assert {row.attempts for row in deferred} == {0}
+        assert {row.channels_done for row in deferred} == {"history,websocket"}
+
+        outbox._last_email_at[user.id] -= timedelta(seconds=outbox.digest_window)
+        for row in deferred:
+            row.next_attempt_at = datetime.utcnow() - timedelta(seconds=1)
+        db_session.commit()
+        await outbox.deliver_batch()
+
+        assert email_service.send_email.await_count == 2
+        assert "2 alerts" in email_service.send_email.call_args[1]["subject"]
+        assert {row.status for row in outbox_rows(db_session)} == {"delivered"}
+        assert outbox.stats["digested"] == 1
+
+    @pytest.mark.asyncio
+    async def test_claimed_rows_skipped_by_other_workers(
+        self, outbox, user, db_session
+    ):
+        """Test that rows leased by one worker are not claimed by another."""
+        outbox.enqueue_alerts(db_session, [triggered(user)])
+        other = Outbox(session_factory=TestingSessionLocal, manager=FakeManager())
+
+        claimed = other._claim_batch()
+
+        assert len(claimed) == 1
+        assert await outbox.deliver_batch() == 0
+
+    @pytest.mark.asyncio
+    async def test_worker_wakes_on_enqueue(self, user, db_session):
+        """Test that the running worker delivers newly enqueued notifications."""
+        email_service = MagicMock()
+        email_service.is_configured.return_value = False
+        outbox = Outbox(
+            session_factory=TestingSessionLocal,
+            manager=FakeManager(with_redis=False),
+            email_service=email_service,
+            poll_interval=10,
+        )
+        outbox.start()
+        try:
+            await asyncio.sleep(0.05)
+            outbox.enqueue_alerts(db_session, [triggered(user)])
+            for _ in range(100):
+                if outbox.stats["delivered"]:
+                    break
+                await asyncio.sleep(0.02)
+        finally:
+            await outbox.stop()
+
+        assert outbox.stats["delivered"] == 1
+        assert outbox_rows(db_session)[0].channels_done == "websocket"
@@ -0,0 +1,164 @@
+"""
+Tests for the bounded password hashing pool.
+"""
+
+import asyncio
+import threading
+import time
+import uuid
+from unittest.mock import patch
+
+import pytest
+from fastapi.testclient import TestClient
+from passlib.context import CryptContext
+
+from app.auth.jwt import BCRYPT_ROUNDS, pwd_context
+from app.auth.password_hasher import PasswordHasher, PasswordHasherOverloaded
+from app.db.database import get_db
+from app.db.models import User, UserRole
+from app.main import app
+from tests.conftest import TestingSessionLocal, override_get_db
+
+# Hash with a lower cost factor than the configured one
+legacy_context = CryptContext(schemes=["bcrypt"], bcrypt__rounds=4)
+
+
+@pytest.fixture
+def hasher():
+    """Create a password hasher and shut it down afterwards."""
+    hasher = PasswordHasher(max_workers=2, max_pending=8)
+    yield hasher
+    hasher.shutdown()
+
+
+class TestPasswordHasher:
+    """Test the password hashing pool."""
+
+    @pytest.mark.asyncio
+    async def test_hash_and_verify(self, hasher):
+        """Test hashing and verifying through the pool."""
+        hashed = await hasher.hash("s3cret-password")
+
+        assert await hasher.verify("s3cret-password", hashed)
+        assert not await hasher.verify("wrong-password", hashed)
+        assert hasher.get_stats()["completed"] == 3
+
+    @pytest.mark.asyncio
+    async def test_event_loop_not_blocked(self, hasher):
+        """Test that concurrent hashing leaves the event loop responsive."""
+        lags = []
+
+        async def heartbeat(stop):
+            while not stop.is_set():
+                expected = time.perf_counter() + 0.01
+                await asyncio.sleep(0.01)
+                lags.append(time.perf_counter() - expected)
+
+        stop = asyncio.Event()
+        task = asyncio.create_task(heartbeat(stop))
+        await asyncio.gather(*(hasher.hash(f"password-{i}") for i in range(4)))
+        stop.set()
+        await task
+
+        assert lags
+        assert max(lags) < 0.2
+
+    def test_rejects_when_queue_full(self):
+        """Test that submissions beyond max_pending are rejected."""
+        hasher = PasswordHasher(max_workers=1, max_pending=1)
+        release = threading.Event()
+        blocked = hasher._submit(release.wait)
+        try:
+            with pytest.raises(PasswordHasherOverloaded):
+                hasher.hash_sync("password")
+            assert hasher.get_stats()["rejected"] == 1
+            assert (
+                hasher.get_stats()["queue_depth"] + hasher.get_stats()["running"] == 1
+            )
+        finally:
+            release.set()
+            blocked.result()
+            hasher.shutdown()
+
+        assert hasher.get_stats()["queue_depth"] == 0
+
+    def test_verify_and_update_rehashes_outdated_cost(self, hasher):
+        """Test that hashes with a different cost factor are upgraded."""
+        legacy_hash = legacy_context.hash("password123")
+
+        valid, new_hash = hasher.verify_and_update_sync("password123", legacy_hash)
+
+        assert valid
+        assert new_hash is not None
+        assert new_hash.startswith(f"$2b${BCRYPT_ROUNDS:02d}$")
+        assert hasher.get_stats()["rehashed"] == 1
+
+    def test_verify_and_update_current_hash(self, hasher):
+        """Test that up-to-date hashes are not rehashed."""
+        valid, new_hash = hasher.verify_and_update_sync(
+            "password123", pwd_context.hash("password123")
+        )
+
+        assert valid
+        assert new_hash is None
+
+
+class TestLoginRehash:
+    """Test transparent rehash-on-login."""
+
+    def test_login_upgrades_hash(self):
+        """Test that logging in with a legacy hash stores an upgraded hash."""
+        app.dependency_overrides[get_db] = override_get_db
+        db = TestingSessionLocal()
+        unique_id = str(uuid.uuid4())[:8]
+        user = User(
+            username=f"rehash_{unique_id}",
+            email=f"rehash_{unique_id}@example.com",
+            hashed_password=legacy_context.hash("password123"),
+            role=UserRole.USER,
+            is_active=True,
+        )
+        db.add(user)
+        db.commit()
+
+        try:
+            response = TestClient(app).post(
+                "/auth/login",
+                json={"username": user.username, "password": "password123"},
+            )
+
+            db.refresh(user)
+            assert response.status_code == 200
+            assert user.hashed_password.startswith(f"$2b${BCRYPT_ROUNDS:02d}$")
+            assert pwd_context.verify("password123", user.hashed_password)
+        finally:
+            db.close()
+
+    def test_login_when_pool_saturated(self):
+        """Test that login answers 503 instead of queueing behind a full pool."""
+        app.dependency_overrides[get_db] = override_get_db
+        db = TestingSessionLocal()
+        unique_id = str(uuid.uuid4())[:8]
+        user = User(
+            username=f"busy_{unique_id}",
+            email=f"busy_{unique_id}@example.com",
+            hashed_password=legacy_context.hash("password123"),
+            role=UserRole.USER,
+            is_active=True,
+        )
+        db.add(user)
+        db.commit()
+        saturated = PasswordHasher(max_workers=1, max_pending=0)
+
+        try:
+            with patch("app.auth.router.get_password_hasher", return_value=saturated):
+                response = TestClient(app).post(
+                    "/auth/login",
+                    json={"username": user.username, "password": "password123"},
+                )
+
+            assert response.status_code == 503
+            assert response.headers["Retry-After"] == "1"
+        finally:
+            saturated.shutdown()
+            db.close()
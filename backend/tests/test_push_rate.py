@@ -0,0 +1,230 @@
+"""
+Tests for adaptive metrics push intervals and the derived metrics cache.
+"""
+
+import uuid
+from datetime import datetime, timedelta
+from unittest.mock import MagicMock, patch
+
+from app.db.models import ContainerMetrics
+from app.services.container_metrics_visualization_service import (
+    ContainerMetricsVisualizationService,
+    DerivedMetricsCache,
+)
+from app.services.metrics_service import MetricsService
+from app.websocket.push_rate import AdaptivePushInterval
+from tests.conftest import TestingSessionLocal
+
+
+class TestAdaptivePushInterval:
+    """Test push interval control."""
+
+    def test_requested_interval_bounded_by_sampler(self):
+        """Test that clients cannot request pushes faster than samples land."""
+        push_rate = AdaptivePushInterval(
+            base_interval=3,
+            requested_interval=0.5,
+            sampler_interval=3,
+            min_interval=1,
+            max_interval=30,
+        )
+
+        assert push_rate.current == 3
+        assert push_rate.set_requested_interval(10) == 10
+        assert push_rate.set_requested_interval("not-a-number") == 3
+
+    def test_backs_off_while_stable(self):
+        """Test that stable values stretch the interval up to the maximum."""
+        push_rate = AdaptivePushInterval(
+            base_interval=2, min_interval=1, max_interval=10, stable_ticks=2
+        )
+        delays = [push_rate.record(changed=False) for _ in range(8)]
+
+        assert delays[0] == 2
+        assert delays[1] == 3
+        assert delays[-1] == 10
+
+    def test_change_resets_interval(self):
+        """Test that a significant change returns to the requested resolution."""
+        push_rate = AdaptivePushInterval(
+            base_interval=2, min_interval=1, max_interval=10, stable_ticks=1
+        )
+        for _ in range(5):
+            push_rate.record(changed=False)
+
+        assert push_rate.record(changed=True) == 2
+
+    def test_slow_client_backs_off(self):
+        """Test that slow sends stretch the interval even when values change."""
+        push_rate = AdaptivePushInterval(
+            base_interval=2, min_interval=1, max_interval=10
+        )
+
+        assert push_rate.record(changed=True, send_seconds=1.5) == 3
+        # Earlier pushes still queued for the client
+        assert push_rate.record(changed=True, backlog=1) == 4.5
+
+    def test_has_changed_uses_tolerance(self):
+        """Test that jitter within tolerance and sample timestamps do not count as change."""
+        push_rate = AdaptivePushInterval(
+            relative_tolerance=0.01, absolute_tolerance=0.1
+        )
+
+        assert push_rate.has_changed({"cpu_percent": 50.0, "timestamp": "a"})
+        assert not push_rate.has_changed({"cpu_percent": 50.05, "timestamp": "b"})
+        assert push_rate.has_changed({"cpu_percent": 52.0, "timestamp": "c"})
+        assert push_rate.has_changed({"cpu_percent": 52.0, "status": "exited"})
+
+    def test_from_websocket(self):
+        """Test that the requested interval is read from the query string."""
+        websocket = MagicMock()
+        websocket.query_params = {"interval": "7"}
+
+        push_rate = AdaptivePushInterval.from_websocket(websocket, base_interval=5)
+
+        assert push_rate.current == 7
+
+
+class TestDerivedMetricsCache:
+    """Test the derived metrics cache."""
+
+    def test_recomputes_only_on_new_sample(self):
+        """Test that values are reused until the sample marker changes."""
+        cache = DerivedMetricsCache()
+        compute = MagicMock(side_effect=[{"score": 1}, {"score": 2}])
+        first_sample = datetime(2024, 1, 1, 0, 0, 0)
+
+        assert cache.get_or_compute("web", "health:1", first_sample, compute) == {
+            "score": 1
+        }
+        assert cache.get_or_compute("web", "health:1", first_sample, compute) == {
+            "score": 1
+        }
+        assert cache.get_or_compute(
+            "web", "health:1", first_sample + timedelta(seconds=3), compute
+        ) == {"score": 2}
+        assert compute.call_count == 2
+        assert cache.stats == {"hits": 1, "misses": 2}
+
+    def test_no_samples_disables_caching(self):
+        """Test that containers without stored samples are always recomputed."""
+        cache = DerivedMetricsCache()
+        compute = MagicMock(return_value={})
+
+        cache.get_or_compute("web", "health:1", None, compute)
+        cache.get_or_compute("web", "health:1", None, compute)
+
+        assert compute.call_count == 2
+
+    def test_lru_eviction(self):
+        """Test that the cache is bounded by container count."""
+        cache = DerivedMetricsCache(max_containers=2)
+        for container_id in ("a", "b", "c"):
+            cache.get_or_compute(container_id, "health:1", 1, lambda: container_id)
+
+        compute = MagicMock(return_value="recomputed")
+        assert cache.get_or_compute("a", "health:1", 1, compute) == "recomputed"
+        assert cache.get_or_compute("c", "health:1", 1, compute) == "c"
+
+
+class TestCachedDerivedMetrics:
+    """Test the visualization service's cached derived metrics."""
+
+    def test_shared_between_service_instances(self):
+        """Test that subscribers with separate services share one computation."""
+        cache = DerivedMetricsCache()
+        services = [
+            ContainerMetricsVisualizationService(MagicMock(), MagicMock())
+            for _ in range(3)
+        ]
+
+        with patch(
+            "app.services.container_metrics_visualization_service.get_derived_metrics_cache",
+            return_value=cache,
+        ), patch.object(
+            ContainerMetricsVisualizationService,
+            "predict_resource_usage",
+            return_value={"predictions": {}},
+        ) as predict:
+            for service in services:
+                service.get_cached_predictions(
+                    "web",
+                    hours=6,
+                    prediction_hours=1,
+                    sample_marker=datetime(2024, 1, 1),
+                )
+
+        predict.assert_called_once_with("web", hours=6, prediction_hours=1)
+
+    def test_latest_sample_time(self):
+        """Test reading the newest stored sample time for a container."""
+        db = TestingSessionLocal()
+        container_id = f"push-rate-{uuid.uuid4().hex[:8]}"
+        newest = datetime(2024, 1, 1, 12, 0, 0)
+        try:
+            for offset in (10, 0, 5):
+                timestamp = newest - timedelta(seconds=offset)
+                db.add(
+                    ContainerMetrics(
+                        container_id=container_id,
+                        timestamp=timestamp,
+                        date_partition=timestamp.replace(hour=0),
+                        cpu_percent=1.0,
+                    )
+                )
+            db.commit()
+
+            service = MetricsService(db, MagicMock())
+            assert (
+                service.get_latest_sample_time(container_id).replace(tzinfo=None)
+                == newest
+            )
+            assert service.get_latest_sample_time("missing-container") is None
+        finally:
+            db.query(ContainerMetrics).filter(
+                ContainerMetrics.container_id == container_id
+            ).delete()
+            db.commit()
+            db.close()
+
+
+class TestEnhancedMetricsStream:
+    """Test the enhanced metrics WebSocket stream."""
+
+    def test_uses_cached_derived_metrics(self):
+        """Test that the enhanced stream serves health scores and predictions from the cache."""
+        from unittest.mock import AsyncMock
+
+        from fastapi.testclient import TestClient
+
+        from app.main import app
+
+        with patch(
+            "app.auth.dependencies.get_current_user_websocket",
+            AsyncMock(return_value=MagicMock()),
+        ), patch("app.main.get_metrics_service") as mock_get_metrics, patch(
+            "app.main.get_visualization_service"
+        ) as mock_get_visualization:
+            mock_get_metrics.return_value.start_real_time_collection = AsyncMock()
+            mock_get_metrics.return_value.stop_real_time_collection = AsyncMock()
+            mock_get_metrics.return_value.get_current_metrics.return_value = {
+                "cpu_percent": 5.0
+            }
+            visualization = mock_get_visualization.return_value
+            visualization.get_cached_health_score.return_value = {
+                "overall_health_score": 90.0
+            }
+            visualization.get_cached_predictions.return_value = {"predictions": {}}
+
+            with TestClient(app).websocket_connect(
+                "/ws/metrics/enhanced/web?interval=5"
+            ) as websocket:
+                websocket.receive_json()
+                update = websocket.receive_json()
+
+        assert update["type"] == "enhanced_metrics_update"
+        assert update["health_score"] == {"overall_health_score": 90.0}
+        latest_sample = visualization.get_latest_sample_time.return_value
+        visualization.get_cached_health_score.assert_called_with(
+            "web", hours=1, sample_marker=latest_sample
+        )
@@ -0,0 +1,189 @@
+"""
+Tests for per-request SQL query profiling and N+1 detection.
+"""
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, text
+
+from app.middleware import performance_monitoring
+from app.middleware.performance_monitoring import (
+    PerformanceMetrics,
+    PerformanceMonitoringMiddleware,
+)
+from app.middleware.query_profiling import (
+    QueryProfile,
+    fingerprint_statement,
+    get_current_query_profile,
+    install_query_profiler,
+    start_query_profile,
+    stop_query_profile,
+)
+
+
+@pytest.fixture
+def profiled_engine(tmp_path):
+    """Create an instrumented SQLite engine with a small table."""
+    engine = create_engine(f"sqlite:///{tmp_path / 'profile.db'}")
+    install_query_profiler(engine)
+    with engine.begin() as connection:
+        connection.execute(
+            text("CREATE TABLE users (id INTEGER PRIMARY KEY, name TEXT)")
+        )
+        connection.execute(text("INSERT INTO users (name) VALUES ('a'), ('b'), ('c')"))
+    yield engine
+    engine.dispose()
+
+
+class TestFingerprint:
+    """Test SQL statement fingerprinting."""
+
+    def test_literals_and_parameters_collapse(self):
+        """Test that statements differing only in values share a fingerprint."""
+        assert fingerprint_statement(
+            "SELECT * FROM users WHERE id = 1"
+        ) == fingerprint_statement("SELECT *   FROM users\nWHERE id = 42")
+        assert fingerprint_statement("SELECT * FROM users WHERE name = 'bob'") == (
+            "SELECT * FROM users WHERE name = ?"
+        )
+
+    def test_in_lists_collapse(self):
+        """Test that IN lists of any length share a fingerprint."""
+        assert fingerprint_statement(
+            "SELECT * FROM t WHERE id IN (?, ?, ?)"
+        ) == fingerprint_statement("SELECT * FROM t WHERE id IN (?)")
+
+    def test_named_parameters(self):
+        """Test that driver parameter styles are normalized."""
+        assert fingerprint_statement("SELECT * FROM t WHERE id = %(id_1)s") == (
+            "SELECT * FROM t WHERE id = ?"
+        )
+        assert (
+            fingerprint_statement("SELECT * FROM t WHERE id = $1")
+            == "SELECT * FROM t WHERE id = ?"
+        )
+
+
+class TestQueryProfile:
+    """Test query recording through SQLAlchemy events."""
+
+    def test_queries_recorded_only_while_profiling(self, profiled_engine):
+        """Test that statements are attributed to the active profile only."""
+        with profiled_engine.connect() as connection:
+            connection.execute(text("SELECT 1"))
+            profile = start_query_profile(n_plus_one_threshold=3)
+            try:
+                connection.execute(text("SELECT name FROM users"))
+                connection.execute(text("SELECT COUNT(*) FROM users"))
+            finally:
+                stop_query_profile()
+            connection.execute(text("SELECT 2"))
+
+        assert profile.query_count == 2
+        assert profile.total_time_ms >= 0
+        assert get_current_query_profile() is None
+
+    def test_detects_n_plus_one(self, profiled_engine):
+        """Test that a statement repeated per row is flagged."""
+        profile = start_query_profile(n_plus_one_threshold=3)
+        try:
+            with profiled_engine.connect() as connection:
+                ids = [
+                    row[0] for row in connection.execute(text("SELECT id FROM users"))
+                ]
+                for user_id in ids:
+                    connection.execute(
+                        text("SELECT name FROM users WHERE id = :id"), {"id": user_id}
+                    )
+        finally:
+            stop_query_profile()
+
+        patterns = profile.get_n_plus_one_patterns()
+        assert profile.query_count == 4
+        assert len(patterns) == 1
+        assert patterns[0]["count"] == 3
+        assert patterns[0]["fingerprint"] == "SELECT name FROM users WHERE id = ?"
+
+    def test_below_threshold_not_flagged(self):
+        """Test that repeats under the threshold are not reported."""
+        profile = QueryProfile(n_plus_one_threshold=5)
+        for _ in range(4):
+            profile.record("SELECT * FROM alerts WHERE id = ?", 1.0)
+
+        assert profile.to_dict()["n_plus_one"] == []
+        assert profile.to_dict()["query_count"] == 4
+
+
+class TestProfilingMiddleware:
+    """Test the profiling integration in the performance middleware."""
+
+    @pytest.fixture
+    def client(self, profiled_engine, monkeypatch):
+        """Create an app whose endpoint issues an N+1 query pattern."""
+        monkeypatch.setattr(
+            performance_monitoring, "metrics_collector", PerformanceMetrics()
+        )
+        monkeypatch.setenv("SQL_N_PLUS_ONE_THRESHOLD", "3")
+
+        app = FastAPI()
+        app.add_middleware(
+            PerformanceMonitoringMiddleware,
+            collect_system_metrics=False,
+            profile_queries=True,
+        )
+
+        @app.get("/users")
+        def list_users():
+            with profiled_engine.connect() as connection:
+                ids = [
+                    row[0] for row in connection.execute(text("SELECT id FROM users"))
+                ]
+                return [
+                    connection.execute(
+                        text("SELECT name FROM users WHERE id = :id"), {"id": user_id}
+                    ).scalar()
+                    for user_id in ids
+                ]
+
+        return TestClient(app)
+
+    def test_response_headers(self, client):
+        """Test that query count and DB time are returned as headers."""
+        response = client.get("/users")
+
+        assert response.status_code == 200
+        assert response.headers["X-DB-Query-Count"] == "4"
+        assert response.headers["X-DB-Time"].endswith("ms")
+        assert response.headers["X-DB-N-Plus-One"] == "1"
+
+    def test_summary_includes_database_section(self, client):
+        """Test that the performance summary aggregates per-endpoint query stats."""
+        client.get("/users")
+        client.get("/users")
+
+        summary = performance_monitoring.get_performance_metrics()
+        endpoint = summary["database"]["endpoints"]["/users"]
+        patterns = summary["database"]["n_plus_one_patterns"]
+
+        assert endpoint["requests"] == 2
+        assert endpoint["avg_queries"] == 4
+        assert endpoint["n_plus_one_requests"] == 2
+        assert patterns[0]["occurrences"] == 2
+        assert patterns[0]["max_count"] == 3
+
+    def test_profiling_disabled_by_default(self, monkeypatch):
+        """Test that no query headers are added unless profiling is enabled."""
+        monkeypatch.delenv("SQL_PROFILING_ENABLED", raising=False)
+        app = FastAPI()
+        app.add_middleware(
+            PerformanceMonitoringMiddleware, collect_system_metrics=False
+        )
+
+        @app.get("/ping")
+        def ping():
+            return {"ok": True}
+
+        response = TestClient(app).get("/ping")
+
+        assert "X-DB-Query-Count" not in response.headers
@@ -0,0 +1,197 @@
+"""
+Tests for refresh token storage, rotation and revocation.
+"""
+
+import time
+import uuid
+from datetime import datetime, timedelta
+from unittest.mock import MagicMock
+
+import pytest
+from fastapi import HTTPException
+
+from app.auth.jwt import decode_token, hash_token_id
+from app.auth.refresh_tokens import RefreshTokenStore, TokenDenylist
+from app.db.models import Token as TokenModel
+from app.db.models import User, UserRole
+from tests.conftest import TestingSessionLocal
+
+
+@pytest.fixture
+def db_session():
+    """Create a database session for testing."""
+    session = TestingSessionLocal()
+    try:
+        yield session
+    finally:
+        session.close()
+
+
+@pytest.fixture
+def user(db_session):
+    """Create an active user."""
+    unique_id = str(uuid.uuid4())[:8]
+    user = User(
+        username=f"refresh_{unique_id}",
+        email=f"refresh_{unique_id}@example.com",
+        hashed_password="hashed_password",
+        role=UserRole.USER,
+        is_active=True,
+    )
+    db_session.add(user)
+    db_session.commit()
+    return user
+
+
+@pytest.fixture
+def store():
+    """Create a refresh token store with its own denylist."""
+    return RefreshTokenStore(
+        denylist=TokenDenylist(), session_factory=TestingSessionLocal
+    )
+
+
+def _row(db_session, token):
+    return (
+        db_session.query(TokenModel)
+        .filter(TokenModel.jti_hash == hash_token_id(decode_token(token)["jti"]))
+        .one()
+    )
+
+
+class TestRefreshTokenStore:
+    """Test the refresh token store."""
+
+    def test_issue_stores_hashed_jti(self, store, db_session, user):
+        """Test that only the jti hash and family are persisted."""
+        token = store.issue(db_session, user)
+        db_session.commit()
+        payload = decode_token(token)
+
+        row = _row(db_session, token)
+        assert row.jti_hash == hash_token_id(payload["jti"])
+        assert len(row.jti_hash) == 64
+        assert row.family_id == payload["fid"]
+        assert token not in row.jti_hash
+
+    def test_rotate_keeps_family(self, store, db_session, user):
+        """Test that rotation revokes the old token and issues one in the same family."""
+        token = store.issue(db_session, user)
+        db_session.commit()
+
+        rotated_user, new_token = store.rotate(db_session, decode_token(token))
+
+        assert rotated_user.id == user.id
+        assert decode_token(new_token)["fid"] == decode_token(token)["fid"]
+        assert _row(db_session, token).is_revoked is True
+        assert _row(db_session, new_token).is_revoked is False
+
+    def test_rotated_token_rejected_from_denylist(self, store, db_session, user):
+        """Test that a rotated token is rejected without touching the database."""
+        token = store.issue(db_session, user)
+        db_session.commit()
+        payload = decode_token(token)
+        store.rotate(db_session, payload)
+
+        mock_db = MagicMock()
+        with pytest.raises(HTTPException) as exc_info:
+            store.rotate(mock_db, payload)
+
+        assert exc_info.value.status_code == 401
+        mock_db.execute.assert_not_called()
+
+    def test_reuse_revokes_family(self, db_session, user):
+        """Test that replaying a rotated token revokes every token in its family."""
+        issuer = RefreshTokenStore(denylist=TokenDenylist())
+        token = issuer.issue(db_session, user)
+        db_session.commit()
+        _, new_token = issuer.rotate(db_session, decode_token(token))
+
+        # A worker that has not seen the rotation falls through to the database
+        other_worker = RefreshTokenStore(denylist=TokenDenylist())
+        with pytest.raises(HTTPException):
+            other_worker.rotate(db_session, decode_token(token))
+
+        db_session.expire_all()
+        assert _row(db_session, new_token).is_revoked is True
+        assert other_worker.denylist.contains(f"family:{decode_token(token)['fid']}")
+        with pytest.raises(HTTPException):
+            other_worker.rotate(db_session, decode_token(new_token))
+
+    def test_rotate_unknown_token(self, store, db_session, user):
+        """Test that a validly signed but unknown token is rejected."""
+        from app.auth.jwt import create_refresh_token
+
+        token = create_refresh_token({"sub": str(user.id)})
+
+        with pytest.raises(HTTPException) as exc_info:
+            store.rotate(db_session, decode_token(token))
+
+        assert exc_info.value.detail == "Invalid or revoked token"
+
+    def test_revoke(self, store, db_session, user):
+        """Test that logout revocation is single use."""
+        token = store.issue(db_session, user)
+        db_session.commit()
+        payload = decode_token(token)
+
+        assert store.revoke(db_session, payload, user.id) is True
+        assert store.revoke(db_session, payload, user.id) is False
+        assert store.denylist.contains(hash_token_id(payload["jti"]))
+
+    def test_purge_expired(self, store, db_session, user):
+        """Test that expired token rows are deleted and live ones kept."""
+        live = store.issue(db_session, user)
+        db_session.add(
+            TokenModel(
+                jti_hash=hash_token_id(str(uuid.uuid4())),
+                family_id=str(uuid.uuid4()),
+                user_id=user.id,
+                expires_at=datetime.utcnow() - timedelta(minutes=1),
+            )
+        )
+        db_session.commit()
+
+        assert store.purge_expired() >= 1
+        assert _row(db_session, live) is not None
+        assert (
+            db_session.query(TokenModel)
+            .filter(TokenModel.expires_at < datetime.utcnow())
+            .count()
+            == 0
+        )
+
+
+class TestTokenDenylist:
+    """Test the revocation denylist."""
+
+    def test_entries_expire(self):
+        """Test that entries are dropped once their token would have expired."""
+        denylist = TokenDenylist()
+        denylist.add("live", time.time() + 60)
+        denylist.add("expired", time.time() - 1)
+
+        assert denylist.contains("live")
+        assert not denylist.contains("expired")
+        assert len(denylist) == 1
+
+    def test_bounded(self):
+        """Test that the in-memory denylist does not grow past max_entries."""
+        denylist = TokenDenylist(max_entries=2)
+        for i in range(5):
+            denylist.add(f"key-{i}", time.time() + 60 + i)
+
+        assert len(denylist) == 2
+        assert denylist.contains("key-4")
+
+    def test_redis_shared(self):
+        """Test that entries are written to and read from Redis when configured."""
+        denylist = TokenDenylist()
+        denylist._redis = MagicMock()
+        denylist._redis.exists.return_value = 1
+
+        denylist.add("jti", time.time() + 30)
+
+        denylist._redis.setex.assert_called_once()
+        assert denylist._redis.setex.call_args[0][0] == "token_denylist:jti"
+        assert denylist.contains("other-worker-jti")
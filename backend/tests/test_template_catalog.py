@@ -0,0 +1,154 @@
+"""
+Tests for the in-memory template catalog.
+"""
+
+import asyncio
+import os
+import time
+
+import pytest
+import yaml
+
+from templates.loader import DEFAULT_TEMPLATES, TemplateCatalog
+
+
+def write_template(root, name, **fields):
+    """Write a template.yaml under ``root/name`` and return its path."""
+    directory = root / name
+    directory.mkdir(exist_ok=True)
+    path = directory / "template.yaml"
+    path.write_text(yaml.safe_dump({"description": f"{name} stack", **fields}))
+    return path
+
+
+def touch_later(path):
+    """Bump a file's mtime so the change is visible on coarse-mtime filesystems."""
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+
+@pytest.fixture
+def templates_dir(tmp_path):
+    """Create a templates directory with two templates."""
+    write_template(
+        tmp_path,
+        "lemp",
+        category="web",
+        tags=["nginx", "php"],
+        variables={
+            "WEB_PORT": {"description": "Port", "default": "80", "required": True}
+        },
+    )
+    write_template(tmp_path, "wordpress", category="cms", tags=["php"])
+    (tmp_path / "README.md").write_text("not a template")
+    (tmp_path / "empty").mkdir()
+    return tmp_path
+
+
+class TestTemplateCatalog:
+    """Test catalog indexing and lookups."""
+
+    def test_list_and_get(self, templates_dir):
+        """Test that templates are indexed by name with precomputed metadata."""
+        catalog = TemplateCatalog(str(templates_dir))
+
+        assert [t["name"] for t in catalog.list()] == ["lemp", "wordpress"]
+        lemp = catalog.get("lemp")
+        # The server's filesystem layout is not part of the definition
+        assert "path" not in lemp
+        assert catalog.get("missing") is None
+
+        entry = catalog.get_entry("lemp")
+        assert entry.path == str(templates_dir / "lemp")
+        assert entry.tags == ["nginx", "php"]
+        assert entry.category == "web"
+        assert entry.required_variables == ["WEB_PORT"]
+
+    def test_filters(self, templates_dir):
+        """Test listing by category and tag."""
+        catalog = TemplateCatalog(str(templates_dir))
+
+        assert [t["name"] for t in catalog.list(tag="php")] == ["lemp", "wordpress"]
+        assert [t["name"] for t in catalog.list(category="cms")] == ["wordpress"]
+        assert [t["name"] for t in catalog.list(category="web", tag="php")] == ["lemp"]
+        assert catalog.list(tag="missing") == []
+
+    def test_parsed_once(self, templates_dir):
+        """Test that repeated lookups do not re-read unchanged templates."""
+        catalog = TemplateCatalog(str(templates_dir), poll_interval=0)
+
+        for _ in range(5):
+            catalog.list()
+            catalog.get("lemp")
+
+        assert catalog.stats["parsed"] == 2
+        assert catalog.stats["refreshes"] > 1
+
+    def test_picks_up_changes(self, templates_dir):
+        """Test that added, edited and removed templates are noticed on refresh."""
+        catalog = TemplateCatalog(str(templates_dir), poll_interval=3600)
+        assert len(catalog.list()) == 2
+
+        path = write_template(templates_dir, "lemp", category="stack")
+        touch_later(path)
+        write_template(templates_dir, "mean", category="web")
+        os.remove(templates_dir / "wordpress" / "template.yaml")
+
+        # Within the poll interval the cached catalog is served
+        assert len(catalog.list(category="web")) == 1
+
+        assert catalog.refresh() is True
+        assert [t["name"] for t in catalog.list()] == ["lemp", "mean"]
+        assert catalog.get("lemp")["category"] == "stack"
+        assert catalog.get("wordpress") is None
+        assert catalog.stats["parsed"] == 4
+        assert catalog.refresh() is False
+
+    def test_invalid_yaml_skipped(self, templates_dir):
+        """Test that a broken template is skipped and not re-parsed until it changes."""
+        broken = templates_dir / "broken"
+        broken.mkdir()
+        (broken / "template.yaml").write_text("services: [unclosed")
+        catalog = TemplateCatalog(str(templates_dir))
+
+        assert catalog.get("broken") is None
+        catalog.refresh()
+        assert catalog.stats["parse_errors"] == 1
+
+    def test_missing_directory(self, tmp_path):
+        """Test that the default templates are served when the directory is missing."""
+        catalog = TemplateCatalog(str(tmp_path / "missing"))
+
+        assert catalog.list() == DEFAULT_TEMPLATES
+
+    def test_many_templates_lookup_speed(self, tmp_path):
+        """Test that lookups stay fast with hundreds of templates."""
+        for i in range(300):
+            write_template(
+                tmp_path, f"stack{i:03d}", category="web", tags=[f"t{i % 10}"]
+            )
+        catalog = TemplateCatalog(str(tmp_path), poll_interval=3600)
+        assert len(catalog.list()) == 300
+
+        started = time.perf_counter()
+        for i in range(1000):
+            catalog.get(f"stack{i % 300:03d}")
+        assert time.perf_counter() - started < 0.1
+        assert catalog.stats["parsed"] == 300
+
+    @pytest.mark.asyncio
+    async def test_background_watcher(self, templates_dir):
+        """Test that a started catalog reloads changes without being asked."""
+        catalog = TemplateCatalog(str(templates_dir), poll_interval=0.01)
+        catalog.start()
+        try:
+            write_template(templates_dir, "mean")
+            for _ in range(100):
+                if catalog.get("mean") is not None:
+                    break
+                await asyncio.sleep(0.01)
+            assert catalog.get("mean") is not None
+            assert catalog.get_stats()["watching"] is True
+        finally:
+            await catalog.stop()
+        assert catalog.get_stats()["watching"] is False
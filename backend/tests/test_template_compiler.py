@@ -0,0 +1,183 @@
+"""
+Tests for the template compiler.
+"""
+
+import os
+import re
+import time
+
+import pytest
+import yaml
+
+from templates.compiler import CompiledTemplate, TemplateCompiler, template_fingerprint
+from templates.loader import TEMPLATES_DIR
+from templates.validator import TemplateValidationError
+
+
+@pytest.fixture
+def template():
+    """Create a small parameterized template."""
+    return {
+        "name": "web",
+        "variables": {
+            "PORT": {"description": "Port", "default": "80", "required": True},
+            "VERSION": {
+                "description": "Version",
+                "default": "1.25",
+                "options": ["1.24", "1.25"],
+            },
+            "PASSWORD": {"description": "Password", "required": False},
+        },
+        "services": {
+            "nginx": {
+                "image": "nginx:${VERSION}",
+                "ports": ["${PORT}:80", "443:443"],
+                "environment": {"SECRET": "${PASSWORD}", "MODE": "prod"},
+            }
+        },
+        "files": [
+            {"path": "app.js", "content": "listen(${PORT}); console.log(`${HOST}`)"}
+        ],
+    }
+
+
+def naive_render(template, declared, values):
+    """Reference renderer that rescans every string with a regex."""
+    if isinstance(template, str):
+        return re.sub(
+            r"\$\{([A-Z][A-Z0-9_]*)\}",
+            lambda m: str(values.get(m.group(1), ""))
+            if m.group(1) in declared
+            else m.group(0),
+            template,
+        )
+    if isinstance(template, dict):
+        return {
+            k: v if k == "variables" else naive_render(v, declared, values)
+            for k, v in template.items()
+        }
+    if isinstance(template, list):
+        return [naive_render(item, declared, values) for item in template]
+    return template
+
+
+class TestCompiledTemplate:
+    """Test compiling and rendering templates."""
+
+    def test_plan(self, template):
+        """Test that variable slots are found once, with their paths."""
+        compiled = CompiledTemplate(template)
+
+        assert [path for path, _ in compiled.slots] == [
+            ("services", "nginx", "image"),
+            ("services", "nginx", "ports", 0),
+            ("services", "nginx", "environment", "SECRET"),
+            ("files", 0, "content"),
+        ]
+        assert compiled.referenced == {"PORT", "VERSION", "PASSWORD"}
+        assert compiled.undefined_refs == {"HOST"}
+
+    def test_render(self, template):
+        """Test that overrides and defaults fill the slots."""
+        rendered = CompiledTemplate(template).render({"PORT": 8080, "UNKNOWN": "x"})
+
+        nginx = rendered.config["services"]["nginx"]
+        assert nginx["image"] == "nginx:1.25"
+        assert nginx["ports"] == ["8080:80", "443:443"]
+        assert nginx["environment"] == {"SECRET": "", "MODE": "prod"}
+        # Undeclared references are not template variables
+        assert (
+            rendered.config["files"][0]["content"]
+            == "listen(8080); console.log(`${HOST}`)"
+        )
+        assert rendered.config["variables"] == template["variables"]
+        assert rendered.values["PORT"] == 8080
+
+    def test_renders_are_independent(self, template):
+        """Test that rendered configs share no containers with the template."""
+        compiled = CompiledTemplate(template)
+        first = compiled.render()
+        first.config["services"]["nginx"]["ports"].append("x")
+        first.config["variables"]["PORT"]["default"] = "1"
+
+        second = compiled.render()
+        assert second.config["services"]["nginx"]["ports"] == ["80:80", "443:443"]
+        assert template["variables"]["PORT"]["default"] == "80"
+
+    def test_invalid_override(self, template):
+        """Test that values outside a variable's options are rejected."""
+        with pytest.raises(TemplateValidationError, match="VERSION"):
+            CompiledTemplate(template).render({"VERSION": "2.0"})
+
+    def test_invalid_variables(self, template):
+        """Test that an invalid variables section fails compilation."""
+        template["variables"]["bad_name"] = {"description": "lowercase"}
+
+        with pytest.raises(TemplateValidationError, match="bad_name"):
+            CompiledTemplate(template)
+
+    def test_content_hash(self, template):
+        """Test that the content hash identifies equal renders."""
+        compiled = CompiledTemplate(template)
+
+        assert (
+            compiled.render({"PORT": 80}).content_hash == compiled.render().content_hash
+        )
+        assert (
+            compiled.render({"PORT": 81}).content_hash != compiled.render().content_hash
+        )
+        assert (
+            CompiledTemplate(dict(template)).render().content_hash
+            == compiled.render().content_hash
+        )
+
+    @pytest.mark.parametrize("name", ["lemp", "mean", "wordpress"])
+    def test_matches_regex_rendering(self, name):
+        """Test that the bundled templates render as a regex rescan would."""
+        path = os.path.join(TEMPLATES_DIR, name, "template.yaml")
+        if not os.path.exists(path):
+            pytest.skip("templates directory not available")
+        with open(path) as f:
+            data = yaml.safe_load(f)
+        compiled = CompiledTemplate(data)
+        expected = naive_render(data, set(compiled.variables), compiled.resolve({}))
+
+        assert compiled.render().config == expected
+
+
+class TestTemplateCompiler:
+    """Test the compiled template cache."""
+
+    def test_cache(self, template):
+        """Test that equal templates are compiled once."""
+        compiler = TemplateCompiler(max_entries=1)
+
+        first = compiler.compile(template)
+        assert compiler.compile(dict(template)) is first
+        compiler.compile({"services": {}})
+        assert compiler.compile(template) is not first
+
+        assert compiler.get_stats() == {
+            "hits": 1,
+            "misses": 3,
+            "evictions": 2,
+            "size": 1,
+        }
+
+    def test_fingerprint_ignores_key_order(self, template):
+        """Test that the fingerprint is stable across key order."""
+        reordered = dict(reversed(list(template.items())))
+
+        assert template_fingerprint(reordered) == template_fingerprint(template)
+
+    def test_batch_render_speed(self, template):
+        """Test that rendering many deployments does not rescan the template."""
+        compiled = TemplateCompiler().compile(template)
+
+        started = time.perf_counter()
+        hashes = {
+            compiled.render({"PORT": 8000 + i % 500}).content_hash for i in range(5000)
+        }
+
+        assert time.perf_counter() - started < 2.0
+        assert len(hashes) == 500
@@ -0,0 +1,169 @@
+"""
+Tests for the buffered template counter service.
+"""
+
+import asyncio
+import uuid
+
+import pytest
+from sqlalchemy.orm import Session
+
+from app.db.models import (
+    MarketplaceTemplate,
+    TemplateCategory,
+    TemplateStatus,
+    User,
+    UserRole,
+)
+from app.services.template_counter_service import TemplateCounterBuffer
+from tests.conftest import TestingSessionLocal
+
+
+@pytest.fixture
+def db_session():
+    """Create a database session for testing."""
+    session = TestingSessionLocal()
+    try:
+        yield session
+    finally:
+        session.close()
+
+
+@pytest.fixture
+def template(db_session: Session):
+    """Create an approved marketplace template."""
+    unique_id = str(uuid.uuid4())[:8]
+    user = User(
+        username=f"counter_{unique_id}",
+        email=f"counter_{unique_id}@example.com",
+        hashed_password="hashed_password",
+        role=UserRole.USER,
+        is_active=True,
+    )
+    category = TemplateCategory(name=f"Counters {unique_id}")
+    db_session.add_all([user, category])
+    db_session.commit()
+
+    template = MarketplaceTemplate(
+        name=f"Counter Template {unique_id}",
+        description="Template used for counter buffer tests",
+        author_id=user.id,
+        category_id=category.id,
+        docker_compose_yaml="version: '3'\nservices:\n  web:\n    image: nginx:latest\n",
+        status=TemplateStatus.APPROVED,
+    )
+    db_session.add(template)
+    db_session.commit()
+    db_session.refresh(template)
+    return template
+
+
+@pytest.fixture
+def counter_buffer():
+    """Create a counter buffer bound to the test database."""
+    return TemplateCounterBuffer(
+        session_factory=TestingSessionLocal, flush_interval=0.05
+    )
+
+
+class TestTemplateCounterBuffer:
+    """Test the template counter buffer."""
+
+    def test_increments_are_coalesced(self, counter_buffer):
+        """Test that repeated increments collapse into one pending counter."""
+        for _ in range(25):
+            counter_buffer.record_download(1)
+        counter_buffer.record_view(1)
+
+        assert counter_buffer.pending(1, "downloads") == 25
+        assert counter_buffer.pending(1, "view_count") == 1
+        assert counter_buffer.stats["increments"] == 26
+
+    def test_rejects_unknown_column(self, counter_buffer):
+        """Test that only whitelisted counter columns are accepted."""
+        with pytest.raises(ValueError):
+            counter_buffer.increment(1, "rating_avg")
+
+    def test_flush_applies_batched_update(self, counter_buffer, template, db_session):
+        """Test that a flush adds the buffered amounts to the stored counters."""
+        for _ in range(10):
+            counter_buffer.record_download(template.id)
+        for _ in range(3):
+            counter_buffer.record_view(template.id)
+
+        updated = counter_buffer.flush()
+
+        assert updated == 2
+        assert counter_buffer.pending(template.id) == 0
+        db_session.refresh(template)
+        assert template.downloads == 10
+        assert template.view_count == 3
+
+    def test_flush_with_nothing_pending(self, counter_buffer):
+        """Test that an empty flush does not touch the database."""
+        assert counter_buffer.flush() == 0
+        assert counter_buffer.stats["flushes"] == 0
+
+    def test_failed_flush_keeps_increments(self, template):
+        """Test that increments survive a failed flush for the next attempt."""
+
+        def broken_session():
+            session = TestingSessionLocal()
+            session.execute = lambda *args, **kwargs: (_ for _ in ()).throw(
+                RuntimeError("db down")
+            )
+            return session
+
+        buffer = TemplateCounterBuffer(session_factory=broken_session)
+        buffer.record_download(template.id)
+
+        assert buffer.flush() == 0
+        assert buffer.pending(template.id) == 1
+        assert buffer.stats["errors"] == 1
+
+    def test_max_pending_triggers_inline_flush(self, template, db_session):
+        """Test that the buffer flushes inline once it grows too large."""
+        buffer = TemplateCounterBuffer(
+            session_factory=TestingSessionLocal, max_pending=1
+        )
+
+        buffer.record_download(template.id)
+
+        assert buffer.pending(template.id) == 0
+        db_session.refresh(template)
+        assert template.downloads == 1
+
+    @pytest.mark.asyncio
+    async def test_max_pending_wakes_running_loop(self, template, db_session):
+        """Test that a full buffer is flushed before the interval when the loop is running."""
+        buffer = TemplateCounterBuffer(
+            session_factory=TestingSessionLocal, flush_interval=60.0, max_pending=1
+        )
+        buffer.start()
+        try:
+            await asyncio.to_thread(buffer.record_download, template.id)
+            for _ in range(100):
+                if buffer.stats["flushes"]:
+                    break
+                await asyncio.sleep(0.01)
+
+            assert buffer.pending(template.id) == 0
+            db_session.refresh(template)
+            assert template.downloads == 1
+        finally:
+            await buffer.stop()
+
+    @pytest.mark.asyncio
+    async def test_stop_flushes_pending_increments(
+        self, counter_buffer, template, db_session
+    ):
+        """Test that a graceful stop writes out buffered increments."""
+        counter_buffer.start()
+        for _ in range(5):
+            counter_buffer.record_download(template.id)
+
+        await counter_buffer.stop()
+
+        assert counter_buffer.pending(template.id) == 0
+        db_session.refresh(template)
+        assert template.downloads == 5
@@ -0,0 +1,208 @@
+"""
+Tests for the precomputed template recommendation engine.
+"""
+
+import uuid
+from datetime import datetime
+from unittest.mock import patch
+
+import pytest
+from sqlalchemy.orm import Session
+
+from app.db.models import (
+    MarketplaceTemplate,
+    TemplateCategory,
+    TemplateDeploymentHistory,
+    TemplateStatus,
+    User,
+    UserRole,
+)
+from app.services.enhanced_template_management_service import (
+    EnhancedTemplateManagementService,
+)
+from app.services.template_recommendation_service import TemplateRecommendationEngine
+from tests.conftest import TestingSessionLocal
+
+
+@pytest.fixture
+def db_session():
+    """Create a database session for testing."""
+    session = TestingSessionLocal()
+    try:
+        yield session
+    finally:
+        session.close()
+
+
+def _create_user(db_session: Session) -> User:
+    unique_id = str(uuid.uuid4())[:8]
+    user = User(
+        username=f"rec_{unique_id}",
+        email=f"rec_{unique_id}@example.com",
+        hashed_password="hashed_password",
+        role=UserRole.USER,
+        is_active=True,
+    )
+    db_session.add(user)
+    db_session.commit()
+    return user
+
+
+def _deploy(db_session: Session, user: User, template: MarketplaceTemplate) -> None:
+    db_session.add(
+        TemplateDeploymentHistory(
+            template_id=template.id,
+            user_id=user.id,
+            deployment_id=str(uuid.uuid4()),
+            deployment_name=f"deploy-{template.id}",
+            deployment_requested_at=datetime.utcnow(),
+        )
+    )
+    db_session.commit()
+
+
+@pytest.fixture
+def catalog(db_session: Session):
+    """Create two categories of approved templates and some deployment history."""
+    unique_id = str(uuid.uuid4())[:8]
+    author = _create_user(db_session)
+    web = TemplateCategory(name=f"Web {unique_id}")
+    data = TemplateCategory(name=f"Data {unique_id}")
+    db_session.add_all([web, data])
+    db_session.commit()
+
+    templates = {}
+    for name, category, score in [
+        ("nginx", web, 90.0),
+        ("wordpress", web, 80.0),
+        ("lemp", web, 70.0),
+        ("postgres", data, 60.0),
+        ("redis", data, 50.0),
+    ]:
+        template = MarketplaceTemplate(
+            name=f"{name}-{unique_id}",
+            description=f"{name} template for recommendation tests",
+            author_id=author.id,
+            category_id=category.id,
+            docker_compose_yaml="version: '3'\nservices:\n  app:\n    image: busybox\n",
+            status=TemplateStatus.APPROVED,
+            performance_score=score,
+        )
+        db_session.add(template)
+        templates[name] = template
+    db_session.commit()
+
+    # wordpress and postgres are frequently deployed together
+    for _ in range(3):
+        user = _create_user(db_session)
+        _deploy(db_session, user, templates["wordpress"])
+        _deploy(db_session, user, templates["postgres"])
+
+    return {"templates": templates, "web": web, "data": data}
+
+
+class TestTemplateRecommendationEngine:
+    """Test the template recommendation engine."""
+
+    def test_rebuild_computes_co_deployment_similarity(self, db_session, catalog):
+        """Test that co-deployed templates become neighbours."""
+        engine = TemplateRecommendationEngine()
+        stats = engine.rebuild(db_session)
+
+        wordpress = catalog["templates"]["wordpress"]
+        postgres = catalog["templates"]["postgres"]
+        neighbors = dict(engine._neighbors[wordpress.id])
+
+        assert engine.is_built
+        assert stats["similarity_pairs"] >= 2
+        assert neighbors[postgres.id] == pytest.approx(1.0)
+
+    def test_anonymous_recommendations_follow_popularity(self, db_session, catalog):
+        """Test that users without history get the category popularity list."""
+        engine = TemplateRecommendationEngine()
+        engine.rebuild(db_session)
+        templates = catalog["templates"]
+
+        result = engine.recommend_ids(
+            db_session, category_id=catalog["web"].id, limit=3
+        )
+
+        assert result == [
+            templates["nginx"].id,
+            templates["wordpress"].id,
+            templates["lemp"].id,
+        ]
+
+    def test_personalized_recommendations_rank_similar_first(self, db_session, catalog):
+        """Test that similar templates rank first and deployed ones are excluded."""
+        engine = TemplateRecommendationEngine()
+        engine.rebuild(db_session)
+        templates = catalog["templates"]
+
+        user = _create_user(db_session)
+        _deploy(db_session, user, templates["wordpress"])
+
+        result = engine.recommend_ids(db_session, user_id=user.id, limit=10)
+
+        assert result[0] == templates["postgres"].id
+        assert templates["wordpress"].id not in result
+
+    def test_user_exclusions_are_cached(self, db_session, catalog):
+        """Test that exclusion sets are cached until invalidated."""
+        engine = TemplateRecommendationEngine()
+        engine.rebuild(db_session)
+        templates = catalog["templates"]
+        user = _create_user(db_session)
+
+        assert engine.get_user_exclusions(db_session, user.id) == frozenset()
+
+        _deploy(db_session, user, templates["nginx"])
+        assert engine.get_user_exclusions(db_session, user.id) == frozenset()
+
+        engine.invalidate_user(user.id)
+        assert engine.get_user_exclusions(db_session, user.id) == frozenset(
+            {templates["nginx"].id}
+        )
+
+    def test_exclusion_cache_is_bounded(self, db_session):
+        """Test that the exclusion cache evicts least recently used users."""
+        engine = TemplateRecommendationEngine(exclusion_cache_size=2)
+        for user_id in (900001, 900002, 900003):
+            engine.get_user_exclusions(db_session, user_id)
+
+        assert list(engine._exclusions) == [900002, 900003]
+
+    def test_recommend_builds_tables_lazily(self, db_session, catalog):
+        """Test that the first request builds the tables when needed."""
+        engine = TemplateRecommendationEngine()
+
+        result = engine.recommend_ids(
+            db_session, category_id=catalog["data"].id, limit=5
+        )
+
+        assert engine.is_built
+        assert result == [
+            catalog["templates"]["postgres"].id,
+            catalog["templates"]["redis"].id,
+        ]
+
+    def test_moderated_templates_are_not_recommended(self, db_session, catalog):
+        """Test that templates rejected since the last rebuild are left out."""
+        engine = TemplateRecommendationEngine()
+        engine.rebuild(db_session)
+        templates = catalog["templates"]
+        templates["nginx"].status = TemplateStatus.REJECTED
+        db_session.commit()
+
+        with patch(
+            "app.services.enhanced_template_management_service.get_recommendation_engine",
+            return_value=engine,
+        ):
+            result = EnhancedTemplateManagementService(
+                db_session
+            ).get_recommended_templates(category_id=catalog["web"].id, limit=3)
+
+        assert [template.id for template in result] == [
+            templates["wordpress"].id,
+            templates["lemp"].id,
+        ]
@@ -1,5 +1,5 @@
 """
-Tests for the template system (loader and validator).
+Tests for the template system (validator).
 """
 
 import os
@@ -8,7 +8,6 @@ from unittest.mock import mock_open, patch
 import pytest
 import yaml
 
-from backend.templates.loader import list_templates, load_template
 from backend.templates.validator import (
     validate_files,
     validate_services,
@@ -20,115 +19,6 @@ from backend.templates.validator import (
 )
 
 
-class TestTemplateLoader:
-    """Test suite for template loader functions."""
-
-    @patch("os.listdir")
-    @patch("os.path.isdir")
-    def test_list_templates_empty(self, mock_isdir, mock_listdir):
-        """Test listing templates when none exist."""
-        mock_listdir.return_value = []
-        mock_isdir.return_value = True
-
-        templates = list_templates()
-
-        assert templates == []
-        mock_listdir.assert_called_once()
-
-    @patch("os.listdir")
-    @patch("os.path.isdir")
-    @patch("os.path.exists")
-    @patch("backend.templates.loader.load_template_metadata")
-    def test_list_templates(
-        self, mock_load_metadata, mock_exists, mock_isdir, mock_listdir
-    ):
-        """Test listing templates."""
-        mock_listdir.return_value = ["lemp", "mean", "wordpress"]
-        mock_isdir.return_value = True
-        mock_exists.return_value = True  # template.yaml exists
-
-        # Mock template metadata
-        mock_load_metadata.side_effect = [
-            {"name": "lemp", "description": "LEMP Stack", "version": "1.0.0"},
-            {"name": "mean", "description": "MEAN Stack", "version": "1.0.0"},
-            {"name": "wordpress", "description": "WordPress", "version": "1.0.0"},
-        ]
-
-        templates = list_templates()
-
-        assert len(templates) == 3
-        assert templates[0]["name"] == "lemp"
-        assert templates[1]["name"] == "mean"
-        assert templates[2]["name"] == "wordpress"
-
-        assert mock_load_metadata.call_count == 3
-
-    @patch("os.path.exists")
-    @patch("builtins.open", new_callable=mock_open)
-    @patch("yaml.safe_load")
-    def test_load_template_success(self, mock_yaml_load, mock_file_open, mock_exists):
-        """Test loading a template successfully."""
-        mock_exists.return_value = True
-
-        # Mock YAML data
-        mock_yaml_data = {
-            "description": "LEMP Stack",
-            "version": "1.0.0",
-            "services": {
-                "nginx": {"image": "nginx:latest"},
-                "php": {"image": "php:8.0-fpm"},
-                "mysql": {"image": "mysql:8.0"},
-            },
-        }
-        mock_yaml_load.return_value = mock_yaml_data
-
-        template = load_template("lemp")
-
-        # The function adds name and path to the template
-        expected_template = {**mock_yaml_data, "name": "lemp"}
-        expected_template[
-            "path"
-        ] = "/Volumes/2TB/Projects/DockerDeployer/templates/lemp"
-
-        assert template["name"] == "lemp"
-        assert template["description"] == "LEMP Stack"
-        assert template["version"] == "1.0.0"
-        assert "path" in template
-
-        # exists is called twice: once for directory, once for template.yaml
-        assert mock_exists.call_count == 2
-        mock_file_open.assert_called_once()
-        mock_yaml_load.assert_called_once()
-
-    @patch("os.path.exists")
-    def test_load_template_not_found(self, mock_exists):
-        """Test loading a non-existent template."""
-        mock_exists.return_value = False
-
-        template = load_template("nonexistent")
-
-        assert template is None
-        mock_exists.assert_called_once()
-
-    @patch("os.path.exists")
-    @patch("builtins.open", new_callable=mock_open)
-    @patch("yaml.safe_load")
-    def test_load_template_invalid_yaml(
-        self, mock_yaml_load, mock_file_open, mock_exists
-    ):
-        """Test loading a template with invalid YAML."""
-        mock_exists.return_value = True
-        mock_yaml_load.side_effect = yaml.YAMLError("Invalid YAML")
-
-        template = load_template("invalid")
-
-        assert template is None
-        # exists is called twice: once for directory, once for template.yaml
-        assert mock_exists.call_count == 2
-        mock_file_open.assert_called_once()
-        mock_yaml_load.assert_called_once()
-
-
 class TestTemplateValidator:
     """Test suite for template validator functions."""
 
@@ -0,0 +1,214 @@
+"""
+Tests for per-connection WebSocket send queues and slow-consumer policies.
+"""
+
+import asyncio
+import time
+from unittest.mock import AsyncMock
+
+import pytest
+
+from app.services.alert_notification_service import ConnectionManager
+from app.websocket.send_queue import ClientSendQueue, SlowConsumerPolicy
+
+
+class BlockedWebSocket:
+    """WebSocket whose sends wait until released."""
+
+    def __init__(self):
+        self.release = asyncio.Event()
+        self.sent = []
+        self.close = AsyncMock()
+
+    async def accept(self):
+        pass
+
+    async def send_text(self, data):
+        await self.release.wait()
+        self.sent.append(data)
+
+
+class TestClientSendQueue:
+    """Test a single connection's send queue."""
+
+    @pytest.mark.asyncio
+    async def test_sends_in_order(self):
+        """Test that queued messages are written in order by the writer task."""
+        websocket = AsyncMock()
+        queue = ClientSendQueue(websocket)
+        queue.start()
+
+        for i in range(3):
+            assert queue.put(f"message-{i}")
+        await asyncio.wait_for(queue.join(), 1)
+
+        assert [call.args[0] for call in websocket.send_text.call_args_list] == [
+            "message-0",
+            "message-1",
+            "message-2",
+        ]
+        assert queue.stats["sent"] == 3
+        await queue.close()
+
+    @pytest.mark.asyncio
+    async def test_bytes_sent_as_binary(self):
+        """Test that serialized bytes go out as binary frames."""
+        websocket = AsyncMock()
+        queue = ClientSendQueue(websocket)
+        queue.start()
+
+        queue.put(b"\x81\xa1t\xa1k")
+        queue.put("text")
+        await asyncio.wait_for(queue.join(), 1)
+
+        websocket.send_bytes.assert_called_once_with(b"\x81\xa1t\xa1k")
+        websocket.send_text.assert_called_once_with("text")
+        await queue.close()
+
+    @pytest.mark.asyncio
+    async def test_drop_oldest(self):
+        """Test that a full queue drops its oldest message."""
+        websocket = BlockedWebSocket()
+        queue = ClientSendQueue(
+            websocket, max_size=2, policy=SlowConsumerPolicy.DROP_OLDEST
+        )
+
+        for i in range(4):
+            queue.put(f"message-{i}")
+        queue.start()
+        websocket.release.set()
+        await asyncio.wait_for(queue.join(), 1)
+
+        assert websocket.sent == ["message-2", "message-3"]
+        assert queue.stats["dropped"] == 2
+        await queue.close()
+
+    @pytest.mark.asyncio
+    async def test_coalesce_keeps_latest(self):
+        """Test that keyed messages replace their queued predecessor in place."""
+        websocket = BlockedWebSocket()
+        queue = ClientSendQueue(
+            websocket, max_size=10, policy=SlowConsumerPolicy.COALESCE
+        )
+
+        queue.put("metrics-1", coalesce_key="metrics:web")
+        queue.put("alert")
+        queue.put("metrics-2", coalesce_key="metrics:web")
+        queue.put("metrics-3", coalesce_key="metrics:web")
+        queue.start()
+        websocket.release.set()
+        await asyncio.wait_for(queue.join(), 1)
+
+        assert websocket.sent == ["metrics-3", "alert"]
+        assert queue.stats["coalesced"] == 2
+        await queue.close()
+
+    @pytest.mark.asyncio
+    async def test_disconnect_policy(self):
+        """Test that overflowing a disconnect-policy queue closes the client."""
+        websocket = BlockedWebSocket()
+        on_close = AsyncMock()
+        queue = ClientSendQueue(
+            websocket,
+            max_size=1,
+            policy=SlowConsumerPolicy.DISCONNECT,
+            on_close=on_close,
+        )
+
+        assert queue.put("first")
+        assert not queue.put("second")
+        await asyncio.sleep(0)
+
+        assert queue.closed
+        websocket.close.assert_called_once()
+        on_close.assert_called_once_with(websocket)
+
+    @pytest.mark.asyncio
+    async def test_send_timeout_drops_client(self):
+        """Test that a client stuck on a single send is dropped."""
+        websocket = BlockedWebSocket()
+        on_close = AsyncMock()
+        queue = ClientSendQueue(websocket, send_timeout=0.05, on_close=on_close)
+        queue.start()
+
+        queue.put("stuck")
+        await asyncio.sleep(0.2)
+
+        assert queue.closed
+        on_close.assert_called_once_with(websocket)
+
+
+class TestConnectionManagerQueues:
+    """Test that the connection manager isolates slow clients."""
+
+    @pytest.mark.asyncio
+    async def test_slow_client_does_not_delay_others(self):
+        """Test that a stalled socket does not hold up delivery to other sockets."""
+        manager = ConnectionManager()
+        slow, fast = BlockedWebSocket(), AsyncMock()
+        await manager.connect(slow, 1)
+        await manager.connect(fast, 2)
+
+        await asyncio.wait_for(manager.broadcast_message({"type": "system"}), 0.5)
+        await asyncio.wait_for(manager.send_queues[fast].join(), 0.5)
+
+        fast.send_text.assert_called_once()
+        assert slow.sent == []
+        assert manager.get_queue_stats()["queued"] == 0
+
+        slow.release.set()
+        await manager.flush(timeout=1)
+        assert len(slow.sent) == 1
+
+        await manager.disconnect(slow)
+        await manager.disconnect(fast)
+        assert manager.send_queues == {}
+
+    @pytest.mark.asyncio
+    async def test_failed_send_disconnects(self):
+        """Test that a socket whose send fails is removed from the manager."""
+        manager = ConnectionManager()
+        websocket = AsyncMock()
+        websocket.send_text.side_effect = RuntimeError("connection reset")
+        await manager.connect(websocket, 1)
+
+        await manager.send_personal_message({"type": "test"}, 1)
+        for _ in range(5):
+            await asyncio.sleep(0)
+
+        assert 1 not in manager.active_connections
+        assert websocket not in manager.send_queues
+
+    @pytest.mark.asyncio
+    async def test_send_to_connection(self):
+        """Test that replies to one socket are queued on that socket only."""
+        manager = ConnectionManager()
+        websocket, other = AsyncMock(), AsyncMock()
+        await manager.connect(websocket, 1)
+        await manager.connect(other, 1)
+
+        assert manager.send_to_connection(websocket, {"type": "pong"})
+        await manager.flush(timeout=1)
+
+        websocket.send_text.assert_called_once_with('{"type": "pong"}')
+        other.send_text.assert_not_called()
+        await manager.disconnect(websocket)
+        assert not manager.send_to_connection(websocket, {"type": "pong"})
+        await manager.disconnect(other)
+
+    @pytest.mark.asyncio
+    async def test_broadcast_is_constant_time_per_connection(self):
+        """Test that broadcasting to many sockets only enqueues."""
+        manager = ConnectionManager()
+        websockets = [BlockedWebSocket() for _ in range(1000)]
+        for user_id, websocket in enumerate(websockets):
+            await manager.connect(websocket, user_id)
+
+        start = time.perf_counter()
+        await manager.broadcast_message({"type": "system"})
+        elapsed = time.perf_counter() - start
+
+        assert elapsed < 0.5
+        assert manager.get_queue_stats()["enqueued"] == 1000
+        for websocket in websockets:
+            await manager.disconnect(websocket)
@@ -1,16 +1,96 @@
+import asyncio
+import logging
 import os
-from typing import List, Optional, Tuple
+import re
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Iterable, Iterator, List, Optional, Tuple
 
 import git
 
+logger = logging.getLogger(__name__)
+
+FULL_SHA = re.compile(r"^[0-9a-f]{40}$")
+
+_MISSING = object()
+
+
+class _LRUCache:
+    """Thread-safe LRU cache for values derived from immutable git objects."""
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Hashable, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "evictions": 0}
+
+    def get(self, key: Hashable) -> Any:
+        with self._lock:
+            value = self._entries.get(key, _MISSING)
+            if value is _MISSING:
+                self.stats["misses"] += 1
+            else:
+                self._entries.move_to_end(key)
+                self.stats["hits"] += 1
+            return value
+
+    def put(self, key: Hashable, value: Any) -> None:
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.stats["evictions"] += 1
+
+    def get_stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {**self.stats, "size": len(self._entries)}
+
+
+class _CommitBatch:
+    """Config changes waiting to be committed together."""
+
+    def __init__(self, loop: asyncio.AbstractEventLoop):
+        self.loop = loop
+        self.paths: Dict[str, None] = {}
+        self.messages: List[str] = []
+        self.future: asyncio.Future = loop.create_future()
+
 
 class GitManager:
     """
     Handles version control for DockerDeployer configuration files using GitPython.
+
+    Deploys commit only the files they wrote. Commits requested within
+    ``batch_window`` seconds of each other are coalesced into one commit, and
+    the latest commit touching each config file is kept in memory, so the
+    cost of a deploy does not grow with the size or history of the repo.
+
+    Commits never change, so history pages, file contents and diffs are
+    cached by commit hash in LRU caches. Symbolic revisions such as ``HEAD``
+    are resolved to a hash before the cache is consulted.
     """
 
-    def __init__(self, repo_path: str):
+    def __init__(
+        self,
+        repo_path: str,
+        batch_window: Optional[float] = None,
+        cache_size: int = 1024,
+    ):
         self.repo_path = repo_path
+        self.batch_window = (
+            batch_window
+            if batch_window is not None
+            else float(os.getenv("GIT_COMMIT_BATCH_MS", "50")) / 1000
+        )
+        self._lock = threading.Lock()
+        self._pending: Optional[_CommitBatch] = None
+        # Config file path -> hexsha of the latest commit that changed it
+        self._latest_commits: Dict[str, str] = {}
+        self.stats = {"commits": 0, "batched_requests": 0, "unchanged": 0}
+        self._history_pages = _LRUCache(cache_size)
+        self._files = _LRUCache(cache_size)
+        self._diffs = _LRUCache(cache_size)
         if not os.path.exists(repo_path):
             os.makedirs(repo_path, exist_ok=True)
         if not os.path.exists(os.path.join(repo_path, ".git")):
@@ -26,29 +106,164 @@ class GitManager:
         self.repo.index.add([".gitkeep"])
         self.repo.index.commit("Initial commit: setup version control.")
 
+    def _relative_path(self, path: str) -> str:
+        if os.path.isabs(path):
+            path = os.path.relpath(path, self.repo_path)
+        return path.replace(os.sep, "/")
+
     def commit_all(self, message: str) -> str:
         """
         Stage all changes and commit with the provided message.
-        Returns the commit hash.
+        Returns the commit hash, or an empty string if nothing changed.
+        """
+        with self._lock:
+            self.repo.git.add(A=True)
+            index = self.repo.index
+            if index.write_tree().binsha == self.repo.head.commit.tree.binsha:
+                return ""
+            commit = index.commit(message)
+            self._latest_commits.clear()
+            self.stats["commits"] += 1
+            return commit.hexsha
+
+    def commit_paths(self, paths: Iterable[str], message: str) -> str:
+        """
+        Stage only the given files and commit them with the provided message.
+
+        Files that no longer exist are removed from the repo. The rest of the
+        working tree is neither scanned nor staged.
+
+        Args:
+            paths: File paths, absolute or relative to the repo
+            message: Commit message
+
+        Returns:
+            The commit hash, or an empty string if the files were unchanged
         """
-        self.repo.git.add(A=True)
-        if self.repo.is_dirty(index=True, working_tree=True, untracked_files=True):
-            commit = self.repo.index.commit(message)
+        relative = list(dict.fromkeys(self._relative_path(path) for path in paths))
+        with self._lock:
+            index = self.repo.index
+            present = [
+                p for p in relative if os.path.exists(os.path.join(self.repo_path, p))
+            ]
+            deleted = [
+                p for p in relative if p not in present and (p, 0) in index.entries
+            ]
+            if present:
+                index.add(present)
+            if deleted:
+                index.remove(deleted)
+            if index.write_tree().binsha == self.repo.head.commit.tree.binsha:
+                self.stats["unchanged"] += 1
+                return ""
+            commit = index.commit(message)
+            for path in present + deleted:
+                self._latest_commits[path] = commit.hexsha
+            self.stats["commits"] += 1
             return commit.hexsha
-        return ""
 
-    def get_history(self, max_count: int = 20) -> List[Tuple[str, str, str]]:
+    async def commit(self, paths: Iterable[str], message: str) -> str:
+        """
+        Commit the given files, coalescing requests that arrive close together.
+
+        The first request opens a batch that is committed ``batch_window``
+        seconds later; requests arriving in the meantime join it and share
+        its commit. Commits run one at a time in a worker thread.
+
+        Args:
+            paths: File paths, absolute or relative to the repo
+            message: Commit message
+
+        Returns:
+            The hash of the commit containing the files, or an empty string
+            if nothing changed
+        """
+        loop = asyncio.get_running_loop()
+        batch = self._pending
+        if batch is None or batch.loop is not loop:
+            batch = self._pending = _CommitBatch(loop)
+            loop.create_task(self._flush_after(batch))
+        batch.paths.update(dict.fromkeys(paths))
+        batch.messages.append(message)
+        self.stats["batched_requests"] += 1
+        return await asyncio.shield(batch.future)
+
+    async def _flush_after(self, batch: _CommitBatch) -> None:
+        await asyncio.sleep(self.batch_window)
+        if self._pending is batch:
+            self._pending = None
+        if len(batch.messages) == 1:
+            message = batch.messages[0]
+        else:
+            message = f"Batch of {len(batch.messages)} config changes\n\n" + "\n".join(
+                f"- {m}" for m in batch.messages
+            )
+        try:
+            hexsha = await asyncio.to_thread(
+                self.commit_paths, list(batch.paths), message
+            )
+        except Exception as e:
+            logger.error(f"Failed to commit config changes: {e}")
+            batch.future.set_exception(e)
+        else:
+            batch.future.set_result(hexsha)
+
+    def latest_commit(self, file_path: str) -> Optional[str]:
+        """
+        Returns the hash of the latest commit that changed a config file.
+        """
+        path = self._relative_path(file_path)
+        hexsha = self._latest_commits.get(path)
+        if hexsha is None:
+            commit = next(self.repo.iter_commits(paths=path, max_count=1), None)
+            if commit is None:
+                return None
+            hexsha = self._latest_commits[path] = commit.hexsha
+        return hexsha
+
+    def _resolve(self, rev: str) -> str:
+        """Resolve a revision to the hash of the commit it names."""
+        if FULL_SHA.match(rev):
+            return rev
+        return self.repo.commit(rev).hexsha
+
+    def iter_history(
+        self, rev: str = "HEAD", max_count: Optional[int] = None, skip: int = 0
+    ) -> Iterator[Tuple[str, str, str]]:
+        """
+        Yields (commit_hash, author, message) for commits reachable from rev,
+        newest first, reading them from git as they are consumed.
+        """
+        for c in self.repo.iter_commits(rev, max_count=max_count, skip=skip):
+            yield (c.hexsha, c.author.name, c.message.strip())
+
+    def get_history(
+        self, max_count: int = 20, before: Optional[str] = None
+    ) -> List[Tuple[str, str, str]]:
         """
         Returns a list of (commit_hash, author, message) for recent commits.
+
+        Pass the last commit hash of a page as ``before`` to get the next,
+        older page.
         """
-        commits = list(self.repo.iter_commits("master", max_count=max_count))
-        return [(c.hexsha, c.author.name, c.message.strip()) for c in commits]
+        start = self._resolve(before or "HEAD")
+        skip = 1 if before else 0
+        key = (start, skip, max_count)
+        page = self._history_pages.get(key)
+        if page is _MISSING:
+            page = list(self.iter_history(start, max_count=max_count, skip=skip))
+            self._history_pages.put(key, page)
+        return list(page)
 
     def get_diff(self, commit_a: str, commit_b: str) -> str:
         """
         Returns the diff between two commits.
         """
-        diff = self.repo.git.diff(commit_a, commit_b)
+        key = (self._resolve(commit_a), self._resolve(commit_b))
+        diff = self._diffs.get(key)
+        if diff is _MISSING:
+            diff = self.repo.git.diff(*key)
+            self._diffs.put(key, diff)
         return diff
 
     def rollback_to(self, commit_hash: str) -> bool:
@@ -57,7 +272,9 @@ class GitManager:
         Returns True if successful.
         """
         try:
-            self.repo.git.reset("--hard", commit_hash)
+            with self._lock:
+                self.repo.git.reset("--hard", commit_hash)
+                self._latest_commits.clear()
             return True
         except Exception as e:
             print(f"Rollback failed: {e}")
@@ -68,13 +285,32 @@ class GitManager:
         Returns the contents of a file at a specific commit.
         """
         try:
-            blob = self.repo.commit(commit_hash).tree / file_path
-            return blob.data_stream.read().decode()
+            key = (self._resolve(commit_hash), file_path)
         except Exception:
             return None
+        content = self._files.get(key)
+        if content is _MISSING:
+            try:
+                blob = self.repo.commit(key[0]).tree / file_path
+                content = blob.data_stream.read().decode()
+            except Exception:
+                content = None
+            self._files.put(key, content)
+        return content
 
     def get_current_commit(self) -> str:
         """
         Returns the current HEAD commit hash.
         """
         return self.repo.head.commit.hexsha
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Returns commit counters and history, file and diff cache statistics.
+        """
+        return {
+            **self.stats,
+            "history_cache": self._history_pages.get_stats(),
+            "file_cache": self._files.get_stats(),
+            "diff_cache": self._diffs.get_stats(),
+        }